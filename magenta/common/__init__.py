@@ -16,9 +16,15 @@
 
 from __future__ import absolute_import
 
+from . import record_index
+from . import sampling
 from . import state_util
 from .beam_search import beam_search
+from .beam_search import beam_search_batch
+from .lru_cache import LruCache
 from .sequence_example_lib import count_records
 from .sequence_example_lib import flatten_maybe_padded_sequences
 from .sequence_example_lib import get_padded_batch
+from .sequence_example_lib import has_sparse_inputs
 from .sequence_example_lib import make_sequence_example
+from .sequence_example_lib import make_sparse_sequence_example
@@ -19,7 +19,10 @@ from __future__ import print_function
 
 import collections
 import copy
-import heapq
+
+# internal imports
+
+import numpy as np
 
 
 # A beam entry containing a) the current sequence, b) a "state" containing any
@@ -28,16 +31,23 @@ import heapq
 BeamEntry = collections.namedtuple('BeamEntry', ['sequence', 'state', 'score'])
 
 
-def _generate_branches(beam_entries, generate_step_fn, branch_factor,
-                       num_steps):
+def _deepcopy_branch(sequence, state):
+  """Default branch function, which deep-copies the sequence and state."""
+  return copy.deepcopy(sequence), copy.deepcopy(state)
+
+
+def _generate_branches(beams, generate_step_fn, branch_factor, num_steps,
+                       branch_fn, generate_steps_fn=None):
   """Performs a single iteration of branch generation for beam search.
 
-  This method generates `branch_factor` branches for each sequence in the beam,
-  where each branch extends the event sequence by `num_steps` steps (via calls
-  to `generate_step_fn`). The resulting beam is returned.
+  This method generates `branch_factor` branches for each sequence in each
+  beam, where each branch extends the event sequence by `num_steps` steps (via
+  calls to `generate_step_fn`). The sequences of all beams are extended
+  together, so that `generate_step_fn` can batch them. The resulting beams are
+  returned.
 
   Args:
-    beam_entries: A list of BeamEntry tuples, the current beam.
+    beams: A list of beams, each a list of BeamEntry tuples.
     generate_step_fn: A function that takes three parameters: a list of
         sequences, a list of states, and a list of scores, all of the same size.
         The function should generate a single step for each of the sequences and
@@ -46,40 +56,85 @@ def _generate_branches(beam_entries, generate_step_fn, branch_factor,
         and scores in place, but should also return the modified values.
     branch_factor: The integer branch factor to use.
     num_steps: The integer number of steps to take per branch.
+    branch_fn: A function that takes a sequence and a state and returns copies
+        of both that can be extended independently of the originals.
+    generate_steps_fn: An optional function like `generate_step_fn` that takes
+        the number of steps as a fourth parameter and generates that many steps
+        for each of the sequences. If not None, it is called once instead of
+        calling `generate_step_fn` once per step.
 
   Returns:
-    The updated beam, with `branch_factor` times as many BeamEntry tuples.
+    The updated beams, each with `branch_factor` times as many BeamEntry
+    tuples.
   """
-  if branch_factor > 1:
-    branched_entries = beam_entries * branch_factor
-    all_sequences = [copy.deepcopy(entry.sequence)
-                     for entry in branched_entries]
-    all_states = [copy.deepcopy(entry.state) for entry in branched_entries]
-    all_scores = [entry.score for entry in branched_entries]
+  all_sequences = []
+  all_states = []
+  all_scores = []
+  for beam_entries in beams:
+    for _ in range(branch_factor):
+      for entry in beam_entries:
+        all_sequences.append(entry.sequence)
+        all_states.append(entry.state)
+        all_scores.append(entry.score)
+
+  # The entries being branched are discarded afterwards, so the first branch of
+  # each entry can extend the entry's own sequence and state. Only the other
+  # branches need copies, and these must be made before any are extended.
+  offset = 0
+  for beam_entries in beams:
+    num_entries = len(beam_entries)
+    for i in range(offset + num_entries, offset + num_entries * branch_factor):
+      all_sequences[i], all_states[i] = branch_fn(
+          all_sequences[i], all_states[i])
+    offset += num_entries * branch_factor
+
+  if generate_steps_fn is not None:
+    all_sequences, all_states, all_scores = generate_steps_fn(
+        all_sequences, all_states, all_scores, num_steps)
   else:
-    # No need to make copies if there's no branching.
-    all_sequences = [entry.sequence for entry in beam_entries]
-    all_states = [entry.state for entry in beam_entries]
-    all_scores = [entry.score for entry in beam_entries]
+    for _ in range(num_steps):
+      all_sequences, all_states, all_scores = generate_step_fn(
+          all_sequences, all_states, all_scores)
+
+  all_entries = [BeamEntry(sequence, state, score)
+                 for sequence, state, score
+                 in zip(all_sequences, all_states, all_scores)]
+  branched_beams = []
+  offset = 0
+  for beam_entries in beams:
+    num_entries = len(beam_entries) * branch_factor
+    branched_beams.append(all_entries[offset:offset + num_entries])
+    offset += num_entries
+  return branched_beams
 
-  for _ in range(num_steps):
-    all_sequences, all_states, all_scores = generate_step_fn(
-        all_sequences, all_states, all_scores)
 
-  return [BeamEntry(sequence, state, score)
-          for sequence, state, score
-          in zip(all_sequences, all_states, all_scores)]
+def _prune_branches(beam_entries, k, sampled_pruning=False):
+  """Prune all but `k` sequences from the beam.
 
+  Args:
+    beam_entries: A list of BeamEntry tuples.
+    k: The integer number of entries to keep.
+    sampled_pruning: If False, keep the `k` entries with highest score. If
+        True, sample `k` entries without replacement, each with probability
+        proportional to the exponentiated score, by keeping the `k` entries with
+        highest score after adding independent Gumbel noise to each score (the
+        Gumbel-top-k trick).
 
-def _prune_branches(beam_entries, k):
-  """Prune all but the `k` sequences with highest score from the beam."""
-  indices = heapq.nlargest(k, range(len(beam_entries)),
-                           key=lambda i: beam_entries[i].score)
+  Returns:
+    A list of the kept BeamEntry tuples, in order of decreasing (perturbed)
+    score.
+  """
+  scores = np.array([entry.score for entry in beam_entries], dtype=np.float64)
+  if sampled_pruning:
+    scores += np.random.gumbel(size=len(scores))
+  # A stable sort keeps entries with equal scores in their original order.
+  indices = np.argsort(-scores, kind='mergesort')[:k]
   return [beam_entries[i] for i in indices]
 
 
 def beam_search(initial_sequence, initial_state, generate_step_fn, num_steps,
-                beam_size, branch_factor, steps_per_iteration):
+                beam_size, branch_factor, steps_per_iteration, branch_fn=None,
+                generate_steps_fn=None, sampled_pruning=False):
   """Generates a sequence using beam search.
 
   Initially, the beam is filled with `beam_size` copies of the initial sequence.
@@ -112,36 +167,106 @@ def beam_search(initial_sequence, initial_state, generate_step_fn, num_steps,
     beam_size: The integer beam size to use.
     branch_factor: The integer branch factor to use.
     steps_per_iteration: The integer number of steps to take per iteration.
+    branch_fn: An optional function used to copy a sequence and its state
+        when branching. See `beam_search_batch`.
+    generate_steps_fn: An optional function that generates several steps at
+        once. See `beam_search_batch`.
+    sampled_pruning: Whether to prune the beam by sampling rather than by
+        score. See `beam_search_batch`.
 
   Returns:
     A tuple containing a) the highest-scoring sequence as computed by the beam
     search, b) the state corresponding to this sequence, and c) the score of
     this sequence.
   """
-  sequences = [copy.deepcopy(initial_sequence) for _ in range(beam_size)]
-  states = [copy.deepcopy(initial_state) for _ in range(beam_size)]
-  scores = [0] * beam_size
+  return beam_search_batch(
+      [initial_sequence], [initial_state], generate_step_fn, num_steps,
+      beam_size, branch_factor, steps_per_iteration,
+      branch_fn=branch_fn, generate_steps_fn=generate_steps_fn,
+      sampled_pruning=sampled_pruning)[0]
+
+
+def beam_search_batch(initial_sequences, initial_states, generate_step_fn,
+                      num_steps, beam_size, branch_factor, steps_per_iteration,
+                      branch_fn=None, generate_steps_fn=None,
+                      sampled_pruning=False):
+  """Generates several sequences using independent beam searches in lockstep.
+
+  Each initial sequence gets its own beam, and beams are pruned independently
+  exactly as in `beam_search`. Every call to `generate_step_fn` extends the
+  sequences of all beams at once, so a batched `generate_step_fn` can extend
+  many independent outputs in a single model evaluation.
+
+  Args:
+    initial_sequences: A list of initial sequences, each a Python list-like
+        object.
+    initial_states: A list of states corresponding to the initial sequences.
+    generate_step_fn: A function that takes three parameters: a list of
+        sequences, a list of states, and a list of scores, all of the same size.
+        The function should generate a single step for each of the sequences and
+        return the extended sequences, updated states, and updated (total)
+        scores, as three lists.
+    num_steps: The integer number of steps to generate for every sequence.
+    beam_size: The integer beam size to use.
+    branch_factor: The integer branch factor to use.
+    steps_per_iteration: The integer number of steps to take per iteration.
+    branch_fn: An optional function that takes a sequence and a state and
+        returns copies of both that can be extended independently of the
+        originals. Sequence types that share their common prefix between
+        branches can supply a function that avoids copying it. If None, the
+        sequence and state are deep-copied.
+    generate_steps_fn: An optional function like `generate_step_fn` that takes
+        the number of steps as a fourth parameter and generates that many steps
+        for each of the sequences, e.g. in a single model evaluation. If not
+        None, it is used instead of `generate_step_fn`.
+    sampled_pruning: If True, each pruning samples `beam_size` entries without
+        replacement, with probabilities proportional to their exponentiated
+        scores, rather than keeping the highest-scoring entries. The returned
+        sequence is sampled the same way. This requires scores to be
+        log-likelihoods. This is a heuristic for more diverse outputs, not the
+        stochastic beam search of Kool et al. (2019): the branches being pruned
+        were already sampled from the model, so selecting among them in
+        proportion to their likelihood weights each sequence by its likelihood
+        a second time, favoring likely sequences more than sampling does.
+
+  Returns:
+    A list containing, for each initial sequence, a tuple of a) the
+    highest-scoring sequence as computed by its beam search, b) the state
+    corresponding to this sequence, and c) the score of this sequence.
+  """
+  if branch_fn is None:
+    branch_fn = _deepcopy_branch
+
+  beams = [[BeamEntry(*branch_fn(initial_sequence, initial_state), score=0)
+            for _ in range(beam_size)]
+           for initial_sequence, initial_state
+           in zip(initial_sequences, initial_states)]
 
-  beam_entries = [BeamEntry(sequence, state, score)
-                  for sequence, state, score
-                  in zip(sequences, states, scores)]
+  if beam_size == 1 and branch_factor == 1:
+    # Pruning a beam with a single entry and no branches has no effect, so all
+    # steps can be taken in a single iteration.
+    steps_per_iteration = num_steps
 
   # Choose the number of steps for the first iteration such that subsequent
   # iterations can all take the same number of steps.
   first_iteration_num_steps = (num_steps - 1) % steps_per_iteration + 1
 
-  beam_entries = _generate_branches(
-      beam_entries, generate_step_fn, branch_factor, first_iteration_num_steps)
+  beams = _generate_branches(
+      beams, generate_step_fn, branch_factor, first_iteration_num_steps,
+      branch_fn, generate_steps_fn)
 
   num_iterations = (num_steps -
                     first_iteration_num_steps) // steps_per_iteration
 
   for _ in range(num_iterations):
-    beam_entries = _prune_branches(beam_entries, k=beam_size)
-    beam_entries = _generate_branches(
-        beam_entries, generate_step_fn, branch_factor, steps_per_iteration)
-
-  # Prune to the single best beam entry.
-  beam_entry = _prune_branches(beam_entries, k=1)[0]
+    beams = [_prune_branches(beam_entries, k=beam_size,
+                             sampled_pruning=sampled_pruning)
+             for beam_entries in beams]
+    beams = _generate_branches(
+        beams, generate_step_fn, branch_factor, steps_per_iteration,
+        branch_fn, generate_steps_fn)
 
-  return beam_entry.sequence, beam_entry.state, beam_entry.score
+  # Prune each beam to its single best beam entry.
+  return [tuple(_prune_branches(beam_entries, k=1,
+                                sampled_pruning=sampled_pruning)[0])
+          for beam_entries in beams]
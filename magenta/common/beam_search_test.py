@@ -14,6 +14,7 @@
 """Tests for beam search."""
 
 # internal imports
+import numpy as np
 import tensorflow as tf
 
 from magenta.common import beam_search
@@ -84,6 +85,147 @@ class BeamSearchTest(tf.test.TestCase):
     self.assertEqual(state, 1)
     self.assertEqual(score, 16)
 
+  def testBatchMatchesIndependentSearches(self):
+    def generate_step_fn(sequences, states, scores):
+      # Each sequence counts down from its state, scoring the values it emits.
+      for i in range(len(sequences)):
+        sequences[i].append(states[i])
+        scores[i] += states[i]
+        states[i] -= 1
+      return sequences, states, scores
+
+    results = beam_search.beam_search_batch(
+        initial_sequences=[[], [7]], initial_states=[3, 10],
+        generate_step_fn=generate_step_fn, num_steps=4, beam_size=2,
+        branch_factor=2, steps_per_iteration=3)
+
+    self.assertEqual(
+        [beam_search.beam_search(
+            initial_sequence=[], initial_state=3,
+            generate_step_fn=generate_step_fn, num_steps=4, beam_size=2,
+            branch_factor=2, steps_per_iteration=3),
+         beam_search.beam_search(
+             initial_sequence=[7], initial_state=10,
+             generate_step_fn=generate_step_fn, num_steps=4, beam_size=2,
+             branch_factor=2, steps_per_iteration=3)],
+        results)
+    self.assertEqual(([3, 2, 1, 0], -1, 6), results[0])
+    self.assertEqual(([7, 10, 9, 8, 7], 6, 34), results[1])
+
+
+  def testBranchFn(self):
+    branches = []
+    def branch_fn(sequence, state):
+      branches.append(len(sequence))
+      return list(sequence), state
+
+    result = beam_search.beam_search(
+        initial_sequence=[], initial_state=1,
+        generate_step_fn=self._generate_step_fn, num_steps=5, beam_size=2,
+        branch_factor=3, steps_per_iteration=2)
+    self.assertEqual(result, beam_search.beam_search(
+        initial_sequence=[], initial_state=1,
+        generate_step_fn=self._generate_step_fn, num_steps=5, beam_size=2,
+        branch_factor=3, steps_per_iteration=2, branch_fn=branch_fn))
+
+    # The beam is filled with two branches of the initial sequence. Each of
+    # the three iterations then keeps every entry as its first branch and makes
+    # two more branches of each of the two entries.
+    self.assertEqual([0] * 6 + [1] * 4 + [3] * 4, branches)
+
+
+  def testGenerateStepsFn(self):
+    calls = []
+    def generate_steps_fn(sequences, states, scores, num_steps):
+      calls.append(num_steps)
+      for _ in range(num_steps):
+        sequences, states, scores = self._generate_step_fn(
+            sequences, states, scores)
+      return sequences, states, scores
+
+    result = beam_search.beam_search(
+        initial_sequence=[], initial_state=1,
+        generate_step_fn=self._generate_step_fn, num_steps=5, beam_size=2,
+        branch_factor=3, steps_per_iteration=2)
+    self.assertEqual(result, beam_search.beam_search(
+        initial_sequence=[], initial_state=1,
+        generate_step_fn=self._generate_step_fn, num_steps=5, beam_size=2,
+        branch_factor=3, steps_per_iteration=2,
+        generate_steps_fn=generate_steps_fn))
+    self.assertEqual([1, 2, 2], calls)
+
+    # With a single beam entry and no branching, all steps are generated in a
+    # single iteration.
+    del calls[:]
+    sequence, _, _ = beam_search.beam_search(
+        initial_sequence=[], initial_state=1,
+        generate_step_fn=self._generate_step_fn, num_steps=5, beam_size=1,
+        branch_factor=1, steps_per_iteration=2,
+        generate_steps_fn=generate_steps_fn)
+    self.assertEqual([0, 0, 0, 0, 0], sequence)
+    self.assertEqual([5], calls)
+
+  def testSampledPruning(self):
+    np.random.seed(0)
+    beam_entries = [
+        beam_search.BeamEntry(sequence=[i], state=None, score=score)
+        for i, score in enumerate([0.0, -1000.0, 5.0, -1000.0])]
+
+    # Entries with much lower scores are practically never sampled.
+    pruned = beam_search._prune_branches(
+        beam_entries, k=2, sampled_pruning=True)
+    self.assertEqual([0, 2], sorted(entry.sequence[0] for entry in pruned))
+
+    # Entries are sampled in proportion to their exponentiated scores.
+    probs = [0.5, 0.3, 0.2]
+    beam_entries = [
+        beam_search.BeamEntry(sequence=[i], state=None, score=np.log(p))
+        for i, p in enumerate(probs)]
+    counts = [0] * 3
+    num_trials = 5000
+    for _ in range(num_trials):
+      entry = beam_search._prune_branches(
+          beam_entries, k=1, sampled_pruning=True)[0]
+      counts[entry.sequence[0]] += 1
+    self.assertAllClose(
+        probs, np.array(counts, dtype=np.float64) / num_trials, atol=0.02)
+
+  def testSampledPruningSelectionDistribution(self):
+    np.random.seed(0)
+    probs = [0.7, 0.3]
+
+    def generate_step_fn(sequences, states, scores):
+      # A toy model that samples each event from a fixed distribution.
+      for i in range(len(sequences)):
+        event = int(np.random.random_sample() >= probs[0])
+        sequences[i].append(event)
+        scores[i] += np.log(probs[event])
+      return sequences, states, scores
+
+    counts = [0, 0]
+    num_trials = 5000
+    for _ in range(num_trials):
+      sequence, _, _ = beam_search.beam_search(
+          initial_sequence=[], initial_state=None,
+          generate_step_fn=generate_step_fn, num_steps=1, beam_size=1,
+          branch_factor=2, steps_per_iteration=1, sampled_pruning=True)
+      counts[sequence[0]] += 1
+
+    # Both branches are sampled from the model and one of them is then
+    # selected in proportion to its likelihood, so the likely event is chosen
+    # more often than the model would sample it.
+    p = probs[0]
+    expected = p * p + 2 * p * (1 - p) * p
+    self.assertAllClose(expected, float(counts[0]) / num_trials, atol=0.02)
+    self.assertGreater(float(counts[0]) / num_trials, p + 0.05)
+
+  def testSampledPruningBeamSearch(self):
+    np.random.seed(0)
+    sequence, _, _ = beam_search.beam_search(
+        initial_sequence=[], initial_state=1,
+        generate_step_fn=self._generate_step_fn, num_steps=5, beam_size=4,
+        branch_factor=2, steps_per_iteration=1, sampled_pruning=True)
+    self.assertEqual(5, len(sequence))
 
 if __name__ == '__main__':
   tf.test.main()
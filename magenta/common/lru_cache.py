@@ -0,0 +1,104 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A least-recently-used cache with a memory budget."""
+
+import collections
+import threading
+
+# internal imports
+
+from magenta.common.concurrency import serialized
+
+
+class LruCache(object):
+  """A threadsafe least-recently-used cache with a memory budget.
+
+  The size of each value is measured in bytes by `size_fn`. When adding a value
+  would exceed the budget, the least recently used values are evicted until it
+  fits. Values larger than the entire budget are not cached.
+
+  Attributes:
+    max_bytes: The memory budget in bytes.
+    num_bytes: The total size in bytes of the cached values.
+    hits: The number of calls to `get` that found their key.
+    misses: The number of calls to `get` that did not find their key.
+  """
+
+  def __init__(self, max_bytes, size_fn):
+    """Constructs an LruCache.
+
+    Args:
+      max_bytes: The memory budget in bytes. If zero, nothing is cached.
+      size_fn: A function that takes a value and returns its size in bytes.
+    """
+    self._lock = threading.RLock()
+    self._entries = collections.OrderedDict()
+    self._size_fn = size_fn
+    self.max_bytes = max_bytes
+    self.num_bytes = 0
+    self.hits = 0
+    self.misses = 0
+
+  @serialized
+  def get(self, key, default=None):
+    """Returns the value cached for `key`, marking it as recently used.
+
+    Args:
+      key: The hashable key to look up.
+      default: The value to return if `key` is not in the cache.
+
+    Returns:
+      The cached value, or `default` if there is none.
+    """
+    if key not in self._entries:
+      self.misses += 1
+      return default
+    self.hits += 1
+    value, size = self._entries.pop(key)
+    self._entries[key] = (value, size)
+    return value
+
+  @serialized
+  def put(self, key, value):
+    """Caches `value` for `key`, evicting least recently used values to fit.
+
+    Args:
+      key: The hashable key to cache the value under.
+      value: The value to cache.
+    """
+    if key in self._entries:
+      _, size = self._entries.pop(key)
+      self.num_bytes -= size
+    size = self._size_fn(value)
+    if size > self.max_bytes:
+      return
+    while self.num_bytes + size > self.max_bytes:
+      _, (_, evicted_size) = self._entries.popitem(last=False)
+      self.num_bytes -= evicted_size
+    self._entries[key] = (value, size)
+    self.num_bytes += size
+
+  @serialized
+  def clear(self):
+    """Removes all values from the cache. Does not reset the counters."""
+    self._entries.clear()
+    self.num_bytes = 0
+
+  @serialized
+  def __contains__(self, key):
+    return key in self._entries
+
+  @serialized
+  def __len__(self):
+    return len(self._entries)
@@ -0,0 +1,72 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for lru_cache."""
+
+# internal imports
+import tensorflow as tf
+
+from magenta.common import lru_cache
+
+
+class LruCacheTest(tf.test.TestCase):
+
+  def testGetAndPut(self):
+    cache = lru_cache.LruCache(max_bytes=10, size_fn=len)
+    self.assertIsNone(cache.get('a'))
+    cache.put('a', 'xxx')
+    self.assertEqual('xxx', cache.get('a'))
+    self.assertEqual('default', cache.get('b', 'default'))
+    self.assertEqual(1, cache.hits)
+    self.assertEqual(2, cache.misses)
+    self.assertEqual(3, cache.num_bytes)
+
+    cache.put('a', 'xxxxx')
+    self.assertEqual('xxxxx', cache.get('a'))
+    self.assertEqual(5, cache.num_bytes)
+    self.assertEqual(1, len(cache))
+
+  def testEvictsLeastRecentlyUsed(self):
+    cache = lru_cache.LruCache(max_bytes=10, size_fn=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'xxxx')
+    cache.get('a')
+    cache.put('c', 'xxxx')
+
+    self.assertIn('a', cache)
+    self.assertNotIn('b', cache)
+    self.assertIn('c', cache)
+    self.assertEqual(8, cache.num_bytes)
+
+  def testValueLargerThanBudget(self):
+    cache = lru_cache.LruCache(max_bytes=10, size_fn=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'x' * 11)
+
+    self.assertIn('a', cache)
+    self.assertNotIn('b', cache)
+
+    cache = lru_cache.LruCache(max_bytes=0, size_fn=len)
+    cache.put('a', 'x')
+    self.assertEqual(0, len(cache))
+
+  def testClear(self):
+    cache = lru_cache.LruCache(max_bytes=10, size_fn=len)
+    cache.put('a', 'xxxx')
+    cache.clear()
+    self.assertNotIn('a', cache)
+    self.assertEqual(0, cache.num_bytes)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,247 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Sidecar indexes for TFRecord files.
+
+An index records the number of records in a TFRecord file along with the byte
+offset and size of each record and, for SequenceExamples, the number of steps
+in each sequence. It is stored as JSON next to the TFRecord file, in a hidden
+file named after it (see `get_index_path`), so that globs such as
+"name.tfrecord*" used to read sharded datasets do not match it.
+
+Indexes let readers count records without scanning the file, read individual
+records by position, and choose records by sequence length. An index is
+ignored if the size of the TFRecord file no longer matches the size recorded
+in the index.
+
+Only uncompressed TFRecord files can be indexed.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import json
+import os
+
+# internal imports
+import tensorflow as tf
+
+INDEX_SUFFIX = '.index'
+
+# Each record is framed by a uint64 length, a uint32 CRC of the length, and a
+# uint32 CRC of the data.
+_RECORD_HEADER_BYTES = 12
+_RECORD_FOOTER_BYTES = 4
+
+RecordIndex = collections.namedtuple(
+    'RecordIndex',
+    ['num_records', 'offsets', 'record_sizes', 'sequence_lengths'])
+
+
+def get_index_path(path):
+  """Returns the path of the index for the TFRecord file at `path`.
+
+  The index of "dir/name.tfrecord" is "dir/.name.tfrecord.index".
+
+  Args:
+    path: The path to the TFRecord file.
+
+  Returns:
+    The path to the index file.
+  """
+  dirname, basename = os.path.split(path)
+  return os.path.join(dirname, '.' + basename + INDEX_SUFFIX)
+
+
+def get_sequence_length(record):
+  """Returns the number of steps in a record, if it has a sequence length.
+
+  Args:
+    record: A protocol buffer message.
+
+  Returns:
+    The length of the longest feature list if `record` is a
+    tf.train.SequenceExample, or None otherwise.
+  """
+  if not isinstance(record, tf.train.SequenceExample):
+    return None
+  feature_lists = record.feature_lists.feature_list
+  return max([len(feature_list.feature)
+              for feature_list in feature_lists.values()] or [0])
+
+
+class RecordIndexBuilder(object):
+  """Accumulates the index of a TFRecord file as its records are written."""
+
+  def __init__(self):
+    self._offsets = []
+    self._record_sizes = []
+    self._sequence_lengths = []
+    self.num_bytes = 0
+
+  @property
+  def num_records(self):
+    return len(self._record_sizes)
+
+  def add(self, serialized_record, sequence_length=None):
+    """Adds a record written after all previously added records.
+
+    Args:
+      serialized_record: The serialized record bytes.
+      sequence_length: The number of steps in the record, or None if it has no
+          sequence length.
+    """
+    self._offsets.append(self.num_bytes)
+    self._record_sizes.append(len(serialized_record))
+    self._sequence_lengths.append(sequence_length)
+    self.num_bytes += (
+        _RECORD_HEADER_BYTES + len(serialized_record) + _RECORD_FOOTER_BYTES)
+
+  def extend(self, other):
+    """Adds the records of another builder, as if its file were appended."""
+    self._offsets.extend(self.num_bytes + offset for offset in other._offsets)
+    self._record_sizes.extend(other._record_sizes)
+    self._sequence_lengths.extend(other._sequence_lengths)
+    self.num_bytes += other.num_bytes
+
+  def build(self):
+    """Returns a RecordIndex for the records added so far."""
+    sequence_lengths = None
+    if all(length is not None for length in self._sequence_lengths):
+      sequence_lengths = list(self._sequence_lengths)
+    return RecordIndex(num_records=self.num_records,
+                       offsets=list(self._offsets),
+                       record_sizes=list(self._record_sizes),
+                       sequence_lengths=sequence_lengths)
+
+  def write(self, path):
+    """Writes the index for the TFRecord file at `path`.
+
+    The index is written to a temporary file and renamed into place, so
+    readers never see a partially written index.
+
+    Args:
+      path: The path to the TFRecord file the index describes.
+    """
+    index = self.build()
+    contents = {
+        'num_records': index.num_records,
+        'num_bytes': self.num_bytes,
+        'offsets': index.offsets,
+        'record_sizes': index.record_sizes,
+    }
+    if index.sequence_lengths is not None:
+      contents['sequence_lengths'] = index.sequence_lengths
+    index_path = get_index_path(path)
+    temp_path = index_path + '.tmp'
+    with tf.gfile.GFile(temp_path, 'w') as f:
+      f.write(json.dumps(contents, separators=(',', ':')))
+    tf.gfile.Rename(temp_path, index_path, overwrite=True)
+
+  @classmethod
+  def from_file(cls, path, record_type=None):
+    """Returns a builder for the records already in a TFRecord file.
+
+    The file's index is used if it is up to date; otherwise the file is
+    scanned.
+
+    Args:
+      path: The path to the TFRecord file.
+      record_type: Optional protocol buffer class of the records. If it is
+          tf.train.SequenceExample, sequence lengths are recorded as well when
+          scanning.
+
+    Returns:
+      A RecordIndexBuilder containing every record in the file.
+    """
+    builder = cls()
+    index = read_index(path)
+    if index is not None:
+      builder._offsets = list(index.offsets)
+      builder._record_sizes = list(index.record_sizes)
+      builder._sequence_lengths = (
+          list(index.sequence_lengths) if index.sequence_lengths is not None
+          else [None] * index.num_records)
+      builder.num_bytes = tf.gfile.Stat(path).length
+      return builder
+    return _scan_file(path, record_type)
+
+
+def _scan_file(path, record_type=None):
+  """Returns a RecordIndexBuilder for a TFRecord file by reading each record."""
+  builder = RecordIndexBuilder()
+  for serialized_record in tf.python_io.tf_record_iterator(path):
+    sequence_length = None
+    if record_type is tf.train.SequenceExample:
+      sequence_length = get_sequence_length(
+          tf.train.SequenceExample.FromString(serialized_record))
+    builder.add(serialized_record, sequence_length)
+  return builder
+
+
+def read_index(path):
+  """Returns the index for the TFRecord file at `path`, if it is up to date.
+
+  Args:
+    path: The path to the TFRecord file.
+
+  Returns:
+    A RecordIndex, or None if there is no index or the TFRecord file has
+    changed size since the index was written.
+  """
+  index_path = get_index_path(path)
+  if not tf.gfile.Exists(index_path) or not tf.gfile.Exists(path):
+    return None
+  with tf.gfile.GFile(index_path, 'r') as f:
+    contents = json.loads(f.read())
+  if contents['num_bytes'] != tf.gfile.Stat(path).length:
+    tf.logging.warning('Ignoring out of date index %s.', index_path)
+    return None
+  return RecordIndex(num_records=contents['num_records'],
+                     offsets=contents['offsets'],
+                     record_sizes=contents['record_sizes'],
+                     sequence_lengths=contents.get('sequence_lengths'))
+
+
+def build_index(path, record_type=None):
+  """Scans the TFRecord file at `path` and writes its index.
+
+  Args:
+    path: The path to the TFRecord file.
+    record_type: Optional protocol buffer class of the records. If it is
+        tf.train.SequenceExample, sequence lengths are indexed as well.
+
+  Returns:
+    The RecordIndex that was written.
+  """
+  builder = _scan_file(path, record_type)
+  builder.write(path)
+  return builder.build()
+
+
+def read_record(path, index, position):
+  """Reads a single serialized record from an indexed TFRecord file.
+
+  Args:
+    path: The path to the TFRecord file.
+    index: The RecordIndex of the file, as returned by `read_index`.
+    position: The zero-based position of the record in the file.
+
+  Returns:
+    The serialized record bytes. The record's CRCs are not checked.
+  """
+  with tf.gfile.GFile(path, 'rb') as f:
+    f.seek(index.offsets[position] + _RECORD_HEADER_BYTES)
+    return f.read(index.record_sizes[position])
@@ -0,0 +1,118 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for record_index."""
+
+import os
+
+# internal imports
+
+import tensorflow as tf
+
+from magenta.common import record_index
+
+
+def _make_sequence_example(length):
+  sequence_example = tf.train.SequenceExample()
+  labels = sequence_example.feature_lists.feature_list['labels']
+  for i in range(length):
+    labels.feature.add().int64_list.value.append(i)
+  return sequence_example
+
+
+class RecordIndexTest(tf.test.TestCase):
+
+  def setUp(self):
+    self.path = os.path.join(self.get_temp_dir(), 'records.tfrecord')
+    self.records = [b'hello world', b'12345', b'', b'success']
+
+  def _write_records(self, records, index=True):
+    builder = record_index.RecordIndexBuilder()
+    with tf.python_io.TFRecordWriter(self.path) as writer:
+      for record in records:
+        writer.write(record)
+        builder.add(record)
+    if index:
+      builder.write(self.path)
+    return builder
+
+  def testGetIndexPath(self):
+    self.assertEqual(
+        os.path.join('dir', '.name.tfrecord.index'),
+        record_index.get_index_path(os.path.join('dir', 'name.tfrecord')))
+
+  def testWriteAndReadIndex(self):
+    builder = self._write_records(self.records)
+    self.assertEqual(len(self.records), builder.num_records)
+    self.assertEqual(tf.gfile.Stat(self.path).length, builder.num_bytes)
+
+    index = record_index.read_index(self.path)
+    self.assertEqual(builder.build(), index)
+    self.assertEqual(4, index.num_records)
+    self.assertEqual([0, 27, 48, 64], index.offsets)
+    self.assertEqual([11, 5, 0, 7], index.record_sizes)
+    self.assertIsNone(index.sequence_lengths)
+
+  def testReadMissingIndex(self):
+    self._write_records(self.records, index=False)
+    self.assertIsNone(record_index.read_index(self.path))
+
+  def testReadOutOfDateIndex(self):
+    self._write_records(self.records)
+    self._write_records(self.records[:2], index=False)
+    self.assertIsNone(record_index.read_index(self.path))
+
+  def testReadRecord(self):
+    self._write_records(self.records)
+    index = record_index.read_index(self.path)
+    self.assertEqual(
+        self.records,
+        [record_index.read_record(self.path, index, i)
+         for i in range(index.num_records)])
+
+  def testExtend(self):
+    builder = record_index.RecordIndexBuilder()
+    builder.add(b'abc', 3)
+    other = record_index.RecordIndexBuilder()
+    other.add(b'de', 2)
+    other.add(b'f', 1)
+    builder.extend(other)
+    self.assertEqual(
+        record_index.RecordIndex(num_records=3, offsets=[0, 19, 37],
+                                 record_sizes=[3, 2, 1],
+                                 sequence_lengths=[3, 2, 1]),
+        builder.build())
+
+  def testBuildIndexWithSequenceLengths(self):
+    sequence_examples = [_make_sequence_example(length)
+                         for length in [3, 0, 5]]
+    self._write_records(
+        [sequence_example.SerializeToString()
+         for sequence_example in sequence_examples], index=False)
+
+    index = record_index.build_index(self.path, tf.train.SequenceExample)
+    self.assertEqual([3, 0, 5], index.sequence_lengths)
+    self.assertEqual(index, record_index.read_index(self.path))
+
+  def testFromFile(self):
+    self._write_records(self.records, index=False)
+    builder = record_index.RecordIndexBuilder.from_file(self.path)
+    self.assertEqual(tf.gfile.Stat(self.path).length, builder.num_bytes)
+    builder.write(self.path)
+    self.assertEqual(
+        builder.build(),
+        record_index.RecordIndexBuilder.from_file(self.path).build())
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,141 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Samplers that draw class indices from batches of probability vectors."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# internal imports
+
+import numpy as np
+
+
+class Sampler(object):
+  """Samples a class index from each row of a batch of probability vectors.
+
+  Samples are drawn by inverse transform sampling: one uniform sample per row
+  is located in the cumulative distribution of the row. Subclasses can
+  truncate the distributions before sampling by overriding `truncate`.
+  """
+
+  def truncate(self, probs):
+    """Returns the distributions to sample from for a batch of probabilities.
+
+    Args:
+      probs: A 2-D NumPy array with a probability vector in each row.
+
+    Returns:
+      A NumPy array of the same shape as `probs`, with a (possibly
+      unnormalized) distribution in each row.
+    """
+    return probs
+
+  def sample(self, probs):
+    """Samples a class index from each row of a batch of probabilities.
+
+    Args:
+      probs: A 2-D NumPy array with a probability vector in each row.
+
+    Returns:
+      A 1-D NumPy array of sampled integer class indices, one for each row.
+    """
+    cdf = np.cumsum(self.truncate(np.asarray(probs, dtype=np.float64)), axis=1)
+    cdf /= cdf[:, -1:]
+    uniform_samples = np.random.random_sample([len(cdf), 1])
+    return np.sum(cdf <= uniform_samples, axis=1)
+
+
+class TopKSampler(Sampler):
+  """Samples from only the `k` most probable classes of each row."""
+
+  def __init__(self, k):
+    """Constructs a TopKSampler.
+
+    Args:
+      k: The integer number of most probable classes to sample from.
+
+    Raises:
+      ValueError: If `k` is not positive.
+    """
+    if k < 1:
+      raise ValueError('k must be positive, got %d' % k)
+    self._k = k
+
+  def truncate(self, probs):
+    num_classes = probs.shape[1]
+    if self._k >= num_classes:
+      return probs
+    rows = np.arange(len(probs))[:, np.newaxis]
+    top_k = np.argpartition(-probs, self._k - 1, axis=1)[:, :self._k]
+    truncated = np.zeros_like(probs)
+    truncated[rows, top_k] = probs[rows, top_k]
+    return truncated
+
+
+class NucleusSampler(Sampler):
+  """Samples from the smallest set of classes with probability at least `p`.
+
+  Also known as top-p sampling. The most probable classes of each row are kept
+  until their total probability reaches `p`.
+  """
+
+  def __init__(self, p):
+    """Constructs a NucleusSampler.
+
+    Args:
+      p: The float minimum total probability of the classes to sample from.
+
+    Raises:
+      ValueError: If `p` is not in the interval (0, 1].
+    """
+    if not 0.0 < p <= 1.0:
+      raise ValueError('p must be in (0, 1], got %f' % p)
+    self._p = p
+
+  def truncate(self, probs):
+    rows = np.arange(len(probs))[:, np.newaxis]
+    order = np.argsort(-probs, axis=1)
+    sorted_probs = probs[rows, order]
+    # Keep each class whose more probable classes have total probability less
+    # than `p`. This always keeps the most probable class.
+    cumulative_probs = np.cumsum(sorted_probs, axis=1)
+    mass_before = cumulative_probs - sorted_probs
+    truncated = np.zeros_like(probs)
+    truncated[rows, order] = np.where(
+        mass_before < self._p * cumulative_probs[:, -1:], sorted_probs, 0.0)
+    return truncated
+
+
+def create_sampler(top_k=None, top_p=None):
+  """Returns a sampler for the given truncation options.
+
+  Args:
+    top_k: If not None, sample from only this many most probable classes.
+    top_p: If not None, sample from the smallest set of most probable classes
+        with at least this total probability.
+
+  Returns:
+    A Sampler object.
+
+  Raises:
+    ValueError: If both `top_k` and `top_p` are specified.
+  """
+  if top_k is not None and top_p is not None:
+    raise ValueError('at most one of top_k and top_p can be specified')
+  if top_k is not None:
+    return TopKSampler(top_k)
+  if top_p is not None:
+    return NucleusSampler(top_p)
+  return Sampler()
@@ -0,0 +1,79 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for sampling."""
+
+# internal imports
+
+import numpy as np
+import tensorflow as tf
+
+from magenta.common import sampling
+
+
+class SamplingTest(tf.test.TestCase):
+
+  def setUp(self):
+    self._probs = np.array([
+        [0.1, 0.5, 0.15, 0.25],
+        [0.4, 0.05, 0.3, 0.25]])
+
+  def testSamplerMatchesRandomChoice(self):
+    np.random.seed(0)
+    samples = sampling.Sampler().sample(self._probs)
+
+    np.random.seed(0)
+    expected_samples = [np.random.choice(4, p=probs) for probs in self._probs]
+    self.assertEqual(expected_samples, samples.tolist())
+
+  def testTopKTruncate(self):
+    truncated = sampling.TopKSampler(2).truncate(self._probs)
+    np.testing.assert_array_equal(
+        [[0.0, 0.5, 0.0, 0.25], [0.4, 0.0, 0.3, 0.0]], truncated)
+
+    # Asking for at least as many classes as there are keeps all of them.
+    np.testing.assert_array_equal(
+        self._probs, sampling.TopKSampler(4).truncate(self._probs))
+
+  def testNucleusTruncate(self):
+    truncated = sampling.NucleusSampler(0.7).truncate(self._probs)
+    np.testing.assert_array_equal(
+        [[0.0, 0.5, 0.0, 0.25], [0.4, 0.0, 0.3, 0.0]], truncated)
+
+    # The most probable class is always kept.
+    truncated = sampling.NucleusSampler(0.1).truncate(self._probs)
+    np.testing.assert_array_equal(
+        [[0.0, 0.5, 0.0, 0.0], [0.4, 0.0, 0.0, 0.0]], truncated)
+
+  def testTruncatedSamples(self):
+    np.random.seed(0)
+    for sampler in [sampling.TopKSampler(1), sampling.NucleusSampler(0.2)]:
+      for _ in range(10):
+        self.assertEqual([1, 0], sampler.sample(self._probs).tolist())
+
+  def testCreateSampler(self):
+    self.assertIsInstance(
+        sampling.create_sampler(top_k=5), sampling.TopKSampler)
+    self.assertIsInstance(
+        sampling.create_sampler(top_p=0.9), sampling.NucleusSampler)
+    self.assertIs(type(sampling.create_sampler()), sampling.Sampler)
+    with self.assertRaises(ValueError):
+      sampling.create_sampler(top_k=5, top_p=0.9)
+    with self.assertRaises(ValueError):
+      sampling.create_sampler(top_k=0)
+    with self.assertRaises(ValueError):
+      sampling.create_sampler(top_p=1.5)
+
+
+if __name__ == '__main__':
+  tf.test.main()
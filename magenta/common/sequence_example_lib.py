@@ -14,8 +14,14 @@
 """Utility functions for working with tf.train.SequenceExamples."""
 
 import math
+
+# internal imports
+
+import numpy as np
 import tensorflow as tf
 
+from magenta.common import record_index
+
 QUEUE_CAPACITY = 500
 SHUFFLE_MIN_AFTER_DEQUEUE = QUEUE_CAPACITY // 5
 
@@ -24,24 +30,122 @@ def make_sequence_example(inputs, labels):
   """Returns a SequenceExample for the given inputs and labels.
 
   Args:
-    inputs: A list of input vectors. Each input vector is a list of floats.
-    labels: A list of ints.
+    inputs: A list of input vectors, each a list of floats, or a 2-D NumPy
+        array of shape [num_steps, input_size].
+    labels: A list of ints, or a 1-D NumPy array of shape [num_steps].
 
   Returns:
     A tf.train.SequenceExample containing inputs and labels.
   """
-  input_features = [
-      tf.train.Feature(float_list=tf.train.FloatList(value=input_))
-      for input_ in inputs]
-  label_features = [
-      tf.train.Feature(int64_list=tf.train.Int64List(value=[label]))
-      for label in labels]
-  feature_list = {
-      'inputs': tf.train.FeatureList(feature=input_features),
-      'labels': tf.train.FeatureList(feature=label_features)
-  }
-  feature_lists = tf.train.FeatureLists(feature_list=feature_list)
-  return tf.train.SequenceExample(feature_lists=feature_lists)
+  # Converting whole arrays to nested lists at once is much faster than letting
+  # the protobuf library convert one NumPy scalar at a time.
+  if isinstance(inputs, np.ndarray):
+    inputs = inputs.tolist()
+  if isinstance(labels, np.ndarray):
+    labels = labels.tolist()
+
+  sequence_example = tf.train.SequenceExample()
+  feature_list = sequence_example.feature_lists.feature_list
+  input_features = feature_list['inputs'].feature
+  for input_ in inputs:
+    input_features.add().float_list.value.extend(input_)
+  label_features = feature_list['labels'].feature
+  for label in labels:
+    label_features.add().int64_list.value.append(label)
+  return sequence_example
+
+
+def make_sparse_sequence_example(input_indices, dense_inputs, labels):
+  """Returns a SequenceExample with inputs stored in the sparse format.
+
+  Instead of a dense input vector per step, the sparse format stores the
+  positions of the one-hot entries of each input vector ('input_indices') and
+  the values at a fixed set of other positions ('dense_inputs'). All remaining
+  input vector entries are zero. Feature lists with zero width are omitted.
+  Use `get_padded_batch` with a `sparse_input_layout` to read these
+  SequenceExamples back as dense input vectors.
+
+  Args:
+    input_indices: A 2-D NumPy array of ints of shape
+        [num_steps, num_input_indices]. Negative indices are ignored.
+    dense_inputs: A 2-D NumPy array of floats of shape
+        [num_steps, num_dense_inputs].
+    labels: A list of ints, or a 1-D NumPy array of shape [num_steps].
+
+  Returns:
+    A tf.train.SequenceExample containing sparse inputs and labels.
+  """
+  input_indices = np.asarray(input_indices)
+  dense_inputs = np.asarray(dense_inputs)
+  if isinstance(labels, np.ndarray):
+    labels = labels.tolist()
+
+  sequence_example = tf.train.SequenceExample()
+  feature_list = sequence_example.feature_lists.feature_list
+  if input_indices.shape[-1]:
+    index_features = feature_list['input_indices'].feature
+    for indices in input_indices.tolist():
+      index_features.add().int64_list.value.extend(indices)
+  if dense_inputs.shape[-1]:
+    dense_features = feature_list['dense_inputs'].feature
+    for dense_input in dense_inputs.tolist():
+      dense_features.add().float_list.value.extend(dense_input)
+  label_features = feature_list['labels'].feature
+  for label in labels:
+    label_features.add().int64_list.value.append(label)
+  return sequence_example
+
+
+def has_sparse_inputs(file_list):
+  """Returns whether SequenceExamples in `file_list` use the sparse format.
+
+  Only the first record found is inspected.
+
+  Args:
+    file_list: A list of paths to TFRecord files containing SequenceExamples.
+
+  Returns:
+    True if the first SequenceExample was written by
+    `make_sparse_sequence_example`, False otherwise or if there are no records.
+  """
+  for tfrecord_file in file_list:
+    for record in tf.python_io.tf_record_iterator(tfrecord_file):
+      sequence_example = tf.train.SequenceExample.FromString(record)
+      return 'inputs' not in sequence_example.feature_lists.feature_list
+  return False
+
+
+def _expand_sparse_inputs(input_indices, dense_inputs, input_size,
+                          dense_input_positions):
+  """Expands a batch of sparse inputs into dense input vectors.
+
+  Args:
+    input_indices: An int64 tensor of shape [batch_size, num_steps,
+        num_input_indices] of one-hot input positions, offset by one so that
+        zero (as used for padding) is ignored. None if there are no indices.
+    dense_inputs: A float32 tensor of shape [batch_size, num_steps,
+        len(dense_input_positions)]. None if there are no dense inputs.
+    input_size: The size of each input vector.
+    dense_input_positions: A list of input vector positions corresponding to
+        the last dimension of `dense_inputs`.
+
+  Returns:
+    A float32 tensor of shape [batch_size, num_steps, input_size].
+  """
+  components = []
+  if input_indices is not None:
+    components.append(tf.reduce_sum(
+        tf.one_hot(input_indices - 1, input_size, dtype=tf.float32), axis=2))
+  if dense_inputs is not None:
+    scatter = np.zeros([len(dense_input_positions), input_size],
+                       dtype=np.float32)
+    scatter[np.arange(len(dense_input_positions)), dense_input_positions] = 1.0
+    shape = tf.shape(dense_inputs)
+    dense_flat = tf.reshape(dense_inputs, [-1, len(dense_input_positions)])
+    components.append(tf.reshape(
+        tf.matmul(dense_flat, tf.constant(scatter)),
+        [shape[0], shape[1], input_size]))
+  return tf.add_n(components)
 
 
 def _shuffle_inputs(input_tensors, capacity, min_after_dequeue, num_threads):
@@ -61,7 +165,8 @@ def _shuffle_inputs(input_tensors, capacity, min_after_dequeue, num_threads):
 
 
 def get_padded_batch(file_list, batch_size, input_size,
-                     num_enqueuing_threads=4, shuffle=False):
+                     num_enqueuing_threads=4, shuffle=False,
+                     sparse_input_layout=None, bucket_boundaries=None):
   """Reads batches of SequenceExamples from TFRecords and pads them.
 
   Can deal with variable length SequenceExamples by padding each batch to the
@@ -75,6 +180,16 @@ def get_padded_batch(file_list, batch_size, input_size,
     num_enqueuing_threads: The number of threads to use for enqueuing
         SequenceExamples.
     shuffle: Whether to shuffle the batches.
+    sparse_input_layout: An optional (num_input_indices, dense_input_positions)
+        tuple. If given, the SequenceExamples are expected to be in the sparse
+        format written by `make_sparse_sequence_example`, and are expanded to
+        dense input vectors after batching so that only the compact form is
+        queued.
+    bucket_boundaries: An optional increasing list of sequence lengths. If
+        given, SequenceExamples are grouped by length into the buckets
+        [0, b_0), [b_0, b_1), ..., [b_n, inf) and each batch is drawn from a
+        single bucket, so it is only padded to the length of the longest
+        sequence in that bucket rather than the longest sequence read.
 
   Returns:
     inputs: A tensor of shape [batch_size, num_steps, input_size] of floats32s.
@@ -82,23 +197,49 @@ def get_padded_batch(file_list, batch_size, input_size,
     lengths: A tensor of shape [batch_size] of int32s. The lengths of each
         SequenceExample before padding.
   Raises:
-    ValueError: If `shuffle` is True and `num_enqueuing_threads` is less than 2.
+    ValueError: If `shuffle` is True and `num_enqueuing_threads` is less than 2,
+        or if `bucket_boundaries` is not strictly increasing.
   """
+  if bucket_boundaries and any(
+      b <= a for a, b in zip(bucket_boundaries, bucket_boundaries[1:])):
+    raise ValueError(
+        '`bucket_boundaries` must be strictly increasing: %s' %
+        bucket_boundaries)
+
   file_queue = tf.train.string_input_producer(file_list)
   reader = tf.TFRecordReader()
   _, serialized_example = reader.read(file_queue)
 
   sequence_features = {
-      'inputs': tf.FixedLenSequenceFeature(shape=[input_size],
-                                           dtype=tf.float32),
       'labels': tf.FixedLenSequenceFeature(shape=[],
                                            dtype=tf.int64)}
+  if sparse_input_layout is None:
+    input_keys = ['inputs']
+    sequence_features['inputs'] = tf.FixedLenSequenceFeature(
+        shape=[input_size], dtype=tf.float32)
+  else:
+    num_input_indices, dense_input_positions = sparse_input_layout
+    input_keys = []
+    if num_input_indices:
+      input_keys.append('input_indices')
+      sequence_features['input_indices'] = tf.FixedLenSequenceFeature(
+          shape=[num_input_indices], dtype=tf.int64)
+    if dense_input_positions:
+      input_keys.append('dense_inputs')
+      sequence_features['dense_inputs'] = tf.FixedLenSequenceFeature(
+          shape=[len(dense_input_positions)], dtype=tf.float32)
 
   _, sequence = tf.parse_single_sequence_example(
       serialized_example, sequence_features=sequence_features)
 
-  length = tf.shape(sequence['inputs'])[0]
-  input_tensors = [sequence['inputs'], sequence['labels'], length]
+  if 'input_indices' in sequence:
+    # Offset the indices by one so that zero padding added by batching does
+    # not expand to a one-hot entry.
+    sequence['input_indices'] += 1
+
+  length = tf.shape(sequence['labels'])[0]
+  input_tensors = (
+      [sequence[key] for key in input_keys] + [sequence['labels'], length])
 
   if shuffle:
     if num_enqueuing_threads < 2:
@@ -118,18 +259,47 @@ def get_padded_batch(file_list, batch_size, input_size,
     num_enqueuing_threads -= shuffle_threads
 
   tf.logging.info(input_tensors)
-  return tf.train.batch(
-      input_tensors,
-      batch_size=batch_size,
-      capacity=QUEUE_CAPACITY,
-      num_threads=num_enqueuing_threads,
-      dynamic_pad=True,
-      allow_smaller_final_batch=False)
+  if bucket_boundaries:
+    # Split the queue capacity between the buckets, but keep enough room in
+    # each for a full batch.
+    bucket_capacity = max(
+        batch_size, QUEUE_CAPACITY // (len(bucket_boundaries) + 1))
+    lengths, batch_tensors = tf.contrib.training.bucket_by_sequence_length(
+        input_tensors[-1],
+        input_tensors[:-1],
+        batch_size=batch_size,
+        bucket_boundaries=list(bucket_boundaries),
+        num_threads=num_enqueuing_threads,
+        capacity=bucket_capacity,
+        dynamic_pad=True,
+        allow_smaller_final_batch=False)
+    batch_tensors = list(batch_tensors) + [lengths]
+  else:
+    batch_tensors = tf.train.batch(
+        input_tensors,
+        batch_size=batch_size,
+        capacity=QUEUE_CAPACITY,
+        num_threads=num_enqueuing_threads,
+        dynamic_pad=True,
+        allow_smaller_final_batch=False)
+
+  if sparse_input_layout is None:
+    return batch_tensors
+
+  batch_inputs = dict(zip(input_keys, batch_tensors[:len(input_keys)]))
+  labels, lengths = batch_tensors[len(input_keys):]
+  inputs = _expand_sparse_inputs(
+      batch_inputs.get('input_indices'), batch_inputs.get('dense_inputs'),
+      input_size, dense_input_positions)
+  return inputs, labels, lengths
 
 
 def count_records(file_list, stop_at=None):
   """Counts number of records in files from `file_list` up to `stop_at`.
 
+  Files with an up to date `record_index` index are counted without reading
+  their records.
+
   Args:
     file_list: List of TFRecord files to count records in.
     stop_at: Optional number of records to stop counting at.
@@ -139,6 +309,13 @@ def count_records(file_list, stop_at=None):
   """
   num_records = 0
   for tfrecord_file in file_list:
+    index = record_index.read_index(tfrecord_file)
+    if index is not None:
+      num_records += index.num_records
+      if stop_at and num_records >= stop_at:
+        tf.logging.info('Number of records is at least %d.', stop_at)
+        return stop_at
+      continue
     tf.logging.info('Counting records in %s.', tfrecord_file)
     for _ in tf.python_io.tf_record_iterator(tfrecord_file):
       num_records += 1
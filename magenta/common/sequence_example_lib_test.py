@@ -0,0 +1,109 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for sequence_example_lib."""
+
+import os
+
+# internal imports
+
+import numpy as np
+import tensorflow as tf
+
+from magenta.common import record_index
+from magenta.common import sequence_example_lib
+
+
+class SequenceExampleLibTest(tf.test.TestCase):
+
+  def testMakeSequenceExampleFromArrays(self):
+    inputs = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+    labels = [1, 2, 0]
+    self.assertEqual(
+        sequence_example_lib.make_sequence_example(inputs, labels),
+        sequence_example_lib.make_sequence_example(
+            np.array(inputs, dtype=np.float32), np.array(labels)))
+
+  def testMakeSparseSequenceExample(self):
+    sequence_example = sequence_example_lib.make_sparse_sequence_example(
+        np.array([[0, 3], [2, 4]]), np.array([[1.0], [-1.0]]), [2, 1])
+    feature_list = sequence_example.feature_lists.feature_list
+    self.assertEqual(
+        [[0, 3], [2, 4]],
+        [list(feature.int64_list.value)
+         for feature in feature_list['input_indices'].feature])
+    self.assertEqual(
+        [[1.0], [-1.0]],
+        [list(feature.float_list.value)
+         for feature in feature_list['dense_inputs'].feature])
+    self.assertEqual(
+        [[2], [1]],
+        [list(feature.int64_list.value)
+         for feature in feature_list['labels'].feature])
+
+  def testMakeSparseSequenceExampleOmitsEmptyFeatures(self):
+    sequence_example = sequence_example_lib.make_sparse_sequence_example(
+        np.array([[0], [2]]), np.zeros([2, 0]), [2, 1])
+    self.assertEqual(
+        set(['input_indices', 'labels']),
+        set(sequence_example.feature_lists.feature_list.keys()))
+
+  def testHasSparseInputs(self):
+    dense_path = os.path.join(self.get_temp_dir(), 'dense.tfrecord')
+    sparse_path = os.path.join(self.get_temp_dir(), 'sparse.tfrecord')
+    empty_path = os.path.join(self.get_temp_dir(), 'empty.tfrecord')
+    with tf.python_io.TFRecordWriter(dense_path) as writer:
+      writer.write(sequence_example_lib.make_sequence_example(
+          [[1.0, 0.0]], [1]).SerializeToString())
+    with tf.python_io.TFRecordWriter(sparse_path) as writer:
+      writer.write(sequence_example_lib.make_sparse_sequence_example(
+          [[0]], np.zeros([1, 0]), [1]).SerializeToString())
+    with tf.python_io.TFRecordWriter(empty_path):
+      pass
+
+    self.assertFalse(sequence_example_lib.has_sparse_inputs([dense_path]))
+    self.assertTrue(
+        sequence_example_lib.has_sparse_inputs([empty_path, sparse_path]))
+    self.assertFalse(sequence_example_lib.has_sparse_inputs([empty_path]))
+
+  def testCountRecordsWithIndex(self):
+    indexed_path = os.path.join(self.get_temp_dir(), 'indexed.tfrecord')
+    unindexed_path = os.path.join(self.get_temp_dir(), 'unindexed.tfrecord')
+    builder = record_index.RecordIndexBuilder()
+    with tf.python_io.TFRecordWriter(indexed_path) as writer:
+      for _ in range(3):
+        record = sequence_example_lib.make_sequence_example(
+            [[1.0, 0.0]], [1]).SerializeToString()
+        writer.write(record)
+        builder.add(record)
+    builder.write(indexed_path)
+    with tf.python_io.TFRecordWriter(unindexed_path) as writer:
+      for _ in range(2):
+        writer.write(sequence_example_lib.make_sequence_example(
+            [[1.0, 0.0]], [1]).SerializeToString())
+
+    self.assertEqual(5, sequence_example_lib.count_records(
+        [indexed_path, unindexed_path]))
+    self.assertEqual(2, sequence_example_lib.count_records(
+        [indexed_path, unindexed_path], stop_at=2))
+    self.assertEqual(4, sequence_example_lib.count_records(
+        [indexed_path, unindexed_path], stop_at=4))
+
+  def testGetPaddedBatchInvalidBucketBoundaries(self):
+    with self.assertRaises(ValueError):
+      sequence_example_lib.get_padded_batch(
+          ['unused.tfrecord'], 8, 3, bucket_boundaries=[64, 32])
+
+
+if __name__ == '__main__':
+  tf.test.main()
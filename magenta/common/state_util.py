@@ -50,11 +50,112 @@ def extract_state(batched_states, i):
   return tf_nest.map_structure(lambda x: x[i], batched_states)
 
 
+class StateArena(object):
+  """A batch of nested states stored in contiguous per-leaf buffers.
+
+  Rather than splitting a batch into individual state structures, rows of the
+  arena can be referred to by `StateRow` objects. Batching rows with `batch`
+  then gathers them from the buffers with a single fancy index per leaf, and
+  no per-row arrays are ever materialized. The buffers must not be modified.
+  """
+
+  def __init__(self, batched_states):
+    """Constructs a StateArena.
+
+    Args:
+      batched_states: A nested structure with entries whose first dimensions
+        all equal the batch size.
+    """
+    self.batched_states = batched_states
+    self.leaves = tf_nest.flatten(batched_states)
+
+  def rows(self, num_rows):
+    """Returns a list of `StateRow` objects for the first `num_rows` rows."""
+    return [StateRow(self, i) for i in range(num_rows)]
+
+
+class StateRow(object):
+  """A reference to a single state stored in a `StateArena`.
+
+  Rows are immutable, so copying a row returns the row itself.
+  """
+
+  __slots__ = ['arena', 'index']
+
+  def __init__(self, arena, index):
+    self.arena = arena
+    self.index = index
+
+  def __copy__(self):
+    return self
+
+  def __deepcopy__(self, memo):
+    return self
+
+  def materialize(self):
+    """Returns the referenced state as a nested state structure."""
+    return extract_state(self.arena.batched_states, self.index)
+
+
+def unbatch_rows(batched_states, batch_size=1):
+  """Splits a state structure into a list of rows referring to it.
+
+  Like `unbatch`, but returns `StateRow` objects that share the batched
+  buffers rather than a nested structure of views for each state.
+
+  Args:
+    batched_states: A nested structure with entries whose first dimensions all
+      equal `batch_size`.
+    batch_size: The number of states in the batch.
+
+  Returns:
+    A list of `batch_size` StateRow objects, each representing a single state.
+  """
+  return StateArena(batched_states).rows(batch_size)
+
+
+def _batch_rows(rows, batch_size):
+  """Gathers a list of StateRow objects into a batch, padding if needed."""
+  arenas = []
+  positions = {}
+  for position, row in enumerate(rows):
+    if row.arena not in positions:
+      arenas.append(row.arena)
+      positions[row.arena] = ([], [])
+    positions[row.arena][0].append(position)
+    positions[row.arena][1].append(row.index)
+
+  if len(arenas) == 1 and (not batch_size or batch_size == len(rows)):
+    arena = arenas[0]
+    indices = np.array(positions[arena][1])
+    if (len(indices) == len(arena.leaves[0]) and
+        np.array_equal(indices, np.arange(len(indices)))):
+      # The rows are the whole arena in order, so no gather is needed.
+      return arena.batched_states
+    return tf_nest.pack_sequence_as(
+        arena.batched_states, [leaf[indices] for leaf in arena.leaves])
+
+  num_rows = batch_size or len(rows)
+  leaves = []
+  for leaf_index, first_leaf in enumerate(arenas[0].leaves):
+    batched_leaf = np.zeros(
+        [num_rows] + list(first_leaf.shape[1:]), dtype=first_leaf.dtype)
+    for arena in arenas:
+      row_positions, indices = positions[arena]
+      batched_leaf[row_positions] = arena.leaves[leaf_index][indices]
+    leaves.append(batched_leaf)
+  return tf_nest.pack_sequence_as(arenas[0].batched_states, leaves)
+
+
 def batch(states, batch_size=None):
   """Combines a collection of state structures into a batch, padding if needed.
 
+  If all states are `StateRow` objects, they are gathered directly from their
+  arenas' buffers.
+
   Args:
-    states: A collection of individual nested state structures.
+    states: A collection of individual nested state structures or StateRow
+        objects.
     batch_size: The desired final batch size. If the nested state structure
         that results from combining the states is smaller than this, it will be
         padded with zeros.
@@ -68,6 +169,11 @@ def batch(states, batch_size=None):
   if batch_size and len(states) > batch_size:
     raise ValueError('Combined state is larger than the requested batch size')
 
+  if states and all(isinstance(state, StateRow) for state in states):
+    return _batch_rows(states, batch_size)
+  states = [state.materialize() if isinstance(state, StateRow) else state
+            for state in states]
+
   def stack_and_pad(*states):
     stacked = np.stack(states)
     if batch_size:
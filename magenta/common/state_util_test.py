@@ -77,6 +77,38 @@ class StateUtilTest(tf.test.TestCase):
 
     self._assert_sructures_equal(self._unbatched_states[1], extracted_state)
 
+  def testUnbatchRows(self):
+    rows = state_util.unbatch_rows(self._batched_states, batch_size=2)
+
+    self.assertEqual(2, len(rows))
+    for row, unbatched_state in zip(rows, self._unbatched_states):
+      self._assert_sructures_equal(unbatched_state, row.materialize())
+
+  def testBatchRows(self):
+    rows = state_util.unbatch_rows(self._batched_states, batch_size=3)
+
+    # Batching all rows in order reuses the arena's buffers.
+    self.assertIs(self._batched_states, state_util.batch(rows, batch_size=3))
+
+    # Batching a permutation of the rows gathers them.
+    self._assert_sructures_equal(
+        state_util.batch(self._unbatched_states[::-1]),
+        state_util.batch([rows[1], rows[0]]))
+
+    # Rows from several arenas are gathered and padded.
+    other_rows = state_util.unbatch_rows(
+        state_util.batch(self._unbatched_states[::-1]), batch_size=2)
+    self._assert_sructures_equal(
+        self._batched_states,
+        state_util.batch([rows[0], other_rows[0]], batch_size=3))
+
+  def testBatchMixedRowsAndStates(self):
+    rows = state_util.unbatch_rows(self._batched_states, batch_size=2)
+    batched_states = state_util.batch(
+        [self._unbatched_states[0], rows[1]], batch_size=3)
+
+    self._assert_sructures_equal(self._batched_states, batched_states)
+
 
 if __name__ == '__main__':
   tf.test.main()
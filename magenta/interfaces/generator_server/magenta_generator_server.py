@@ -0,0 +1,227 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A local HTTP interface to the sequence generators.
+
+Loads one generator per bundle file and serves generate requests over HTTP,
+coalescing concurrent compatible requests into batched model evaluations.
+
+Endpoints:
+  POST /generate: The request body is a JSON object with a `generator_id`
+      string, an `input_sequence` NoteSequence and `generator_options`
+      GeneratorOptions, both in the proto3 JSON format. The response body is
+      the generated NoteSequence in the proto3 JSON format.
+  GET /metrics: Returns a JSON object mapping each generator id to its latency
+      and batch occupancy metrics.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+
+# internal imports
+from google.protobuf import json_format
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+import tensorflow as tf
+import magenta
+
+from magenta.models.drums_rnn import drums_rnn_sequence_generator
+from magenta.models.melody_rnn import melody_rnn_sequence_generator
+from magenta.models.performance_rnn import performance_sequence_generator
+from magenta.models.pianoroll_rnn_nade import pianoroll_rnn_nade_sequence_generator
+from magenta.models.polyphony_rnn import polyphony_sequence_generator
+from magenta.protobuf import generator_pb2
+from magenta.protobuf import music_pb2
+
+FLAGS = tf.app.flags.FLAGS
+
+tf.app.flags.DEFINE_string(
+    'bundle_files',
+    None,
+    'A comma-separated list of the location of the bundle files to serve.')
+tf.app.flags.DEFINE_string(
+    'host',
+    'localhost',
+    'The host name to listen on.')
+tf.app.flags.DEFINE_integer(
+    'port',
+    8000,
+    'The port to listen on.')
+tf.app.flags.DEFINE_integer(
+    'max_batch_size',
+    magenta.music.sequence_generator_server.DEFAULT_MAX_BATCH_SIZE,
+    'The maximum number of requests to coalesce into a single batch.')
+tf.app.flags.DEFINE_float(
+    'max_wait_seconds',
+    magenta.music.sequence_generator_server.DEFAULT_MAX_WAIT_SECONDS,
+    'The time in seconds to wait for more requests to coalesce after the first '
+    'request of a batch.')
+tf.app.flags.DEFINE_float(
+    'request_timeout_seconds',
+    None,
+    'The maximum time in seconds to wait for a generate request. If None, '
+    'waits indefinitely.')
+tf.app.flags.DEFINE_string(
+    'log',
+    'INFO',
+    'The threshold for what messages will be logged: DEBUG, INFO, WARN, ERROR, '
+    'or FATAL.')
+
+_GENERATOR_MAP = melody_rnn_sequence_generator.get_generator_map()
+_GENERATOR_MAP.update(drums_rnn_sequence_generator.get_generator_map())
+_GENERATOR_MAP.update(performance_sequence_generator.get_generator_map())
+_GENERATOR_MAP.update(pianoroll_rnn_nade_sequence_generator.get_generator_map())
+_GENERATOR_MAP.update(polyphony_sequence_generator.get_generator_map())
+
+
+class _ThreadedHTTPServer(socketserver.ThreadingMixIn,
+                          BaseHTTPServer.HTTPServer):
+  """An HTTP server that handles each connection in a new thread."""
+  daemon_threads = True
+
+
+def _make_request_handler(server):
+  """Returns a request handler class that serves requests with `server`.
+
+  Args:
+    server: A running SequenceGeneratorServer.
+
+  Returns:
+    A BaseHTTPRequestHandler subclass.
+  """
+
+  class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Handles generate and metrics HTTP requests."""
+
+    def _send_json(self, code, value):
+      body = json.dumps(value).encode('utf-8')
+      self.send_response(code)
+      self.send_header('Content-Type', 'application/json')
+      self.send_header('Content-Length', str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+      if self.path != '/metrics':
+        self._send_json(404, {'error': 'Unknown path: %s' % self.path})
+        return
+      self._send_json(200, dict(
+          (generator_id, server.metrics(generator_id).summary())
+          for generator_id in server.generator_ids))
+
+    def do_POST(self):  # pylint: disable=invalid-name
+      if self.path != '/generate':
+        self._send_json(404, {'error': 'Unknown path: %s' % self.path})
+        return
+
+      try:
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length).decode('utf-8'))
+        input_sequence = json_format.ParseDict(
+            request.get('input_sequence', {}), music_pb2.NoteSequence())
+        generator_options = json_format.ParseDict(
+            request.get('generator_options', {}),
+            generator_pb2.GeneratorOptions())
+        generator_id = request['generator_id']
+      except (ValueError, KeyError, json_format.ParseError) as e:
+        self._send_json(400, {'error': 'Malformed request: %s' % e})
+        return
+
+      try:
+        generated_sequence = server.generate(
+            generator_id, input_sequence, generator_options,
+            timeout=FLAGS.request_timeout_seconds)
+      except (magenta.music.SequenceGeneratorException,
+              magenta.music.SequenceGeneratorServerException) as e:
+        self._send_json(400, {'error': str(e)})
+        return
+      except Exception as e:  # pylint: disable=broad-except
+        self._send_json(500, {'error': str(e)})
+        return
+
+      self._send_json(200, json_format.MessageToDict(generated_sequence))
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+      tf.logging.debug(format, *args)
+
+  return RequestHandler
+
+
+def _load_generator_from_bundle_file(bundle_file):
+  """Returns an uninitialized generator from a bundle file path.
+
+  Args:
+    bundle_file: The path to the bundle file.
+
+  Returns:
+    A BaseSequenceGenerator, or None if the bundle could not be loaded.
+  """
+  try:
+    # A bundle file listed more than once is only parsed once.
+    bundle = magenta.music.read_bundle_file(bundle_file, use_cache=True)
+  except magenta.music.GeneratorBundleParseException:
+    tf.logging.error('Failed to parse bundle file: %s', bundle_file)
+    return None
+
+  generator_id = bundle.generator_details.id
+  if generator_id not in _GENERATOR_MAP:
+    tf.logging.error(
+        "Unrecognized SequenceGenerator ID '%s' in bundle file: %s",
+        generator_id, bundle_file)
+    return None
+
+  tf.logging.info("Loaded '%s' generator bundle from file '%s'.",
+                  generator_id, bundle_file)
+  return _GENERATOR_MAP[generator_id](checkpoint=None, bundle=bundle)
+
+
+def main(unused_argv):
+  tf.logging.set_verbosity(FLAGS.log)
+
+  if not FLAGS.bundle_files:
+    tf.logging.fatal('--bundle_files required')
+    return
+
+  generators = []
+  for bundle_file in FLAGS.bundle_files.split(','):
+    generator = _load_generator_from_bundle_file(bundle_file)
+    if generator is None:
+      return
+    generators.append(generator)
+
+  server = magenta.music.SequenceGeneratorServer(
+      generators, max_batch_size=FLAGS.max_batch_size,
+      max_wait_seconds=FLAGS.max_wait_seconds)
+  with server:
+    http_server = _ThreadedHTTPServer(
+        (FLAGS.host, FLAGS.port), _make_request_handler(server))
+    tf.logging.info('Serving generators %s on http://%s:%d',
+                    ', '.join(server.generator_ids), FLAGS.host, FLAGS.port)
+    try:
+      http_server.serve_forever()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      http_server.server_close()
+
+  tf.logging.info('Server stopped.')
+
+
+def console_entry_point():
+  tf.app.run(main)
+
+
+if __name__ == '__main__':
+  console_entry_point()
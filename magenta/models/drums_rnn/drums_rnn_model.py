@@ -25,7 +25,9 @@ class DrumsRnnModel(events_rnn_model.EventSequenceRnnModel):
   """Class for RNN drum track generation models."""
 
   def generate_drum_track(self, num_steps, primer_drums, temperature=1.0,
-                          beam_size=1, branch_factor=1, steps_per_iteration=1):
+                          beam_size=1, branch_factor=1, steps_per_iteration=1,
+                          top_k=None, top_p=None,
+                          sampled_pruning=False, fused_steps=False):
     """Generate a drum track from a primer drum track.
 
     Args:
@@ -40,13 +42,63 @@ class DrumsRnnModel(events_rnn_model.EventSequenceRnnModel):
       branch_factor: An integer, beam search branch factor to use.
       steps_per_iteration: An integer, number of steps to take per beam search
           iteration.
+      top_k: If not None, sample each step from only this many most probable
+          events.
+      top_p: If not None, sample each step from the smallest set of most
+          probable events with at least this total probability.
+      sampled_pruning: If True, prune the beam by sampling drum tracks in
+          proportion to their likelihood rather than keeping the most likely.
+      fused_steps: If True, sample several steps per session run when
+          possible. Faster, but gives different samples than per-step
+          generation for the same `np.random` seed.
 
     Returns:
       The generated DrumTrack object (which begins with the provided primer drum
           track).
     """
-    return self._generate_events(num_steps, primer_drums, temperature,
-                                 beam_size, branch_factor, steps_per_iteration)
+    return self._generate_events(
+        num_steps, primer_drums, temperature, beam_size, branch_factor,
+        steps_per_iteration, top_k=top_k, top_p=top_p,
+        sampled_pruning=sampled_pruning, fused_steps=fused_steps)
+
+  def generate_drum_tracks(self, num_steps, primer_drum_tracks,
+                           temperature=1.0, beam_size=1, branch_factor=1,
+                           steps_per_iteration=1, top_k=None, top_p=None,
+                           sampled_pruning=False, fused_steps=False):
+    """Generate several independent drum tracks from primer drum tracks.
+
+    The drum tracks are generated together, sharing each model evaluation.
+
+    Args:
+      num_steps: A list containing the integer length in steps of each final
+          drum track, after generation. Includes the primer.
+      primer_drum_tracks: A list of primer drum tracks, DrumTrack objects.
+      temperature: A float specifying how much to divide the logits by
+         before computing the softmax. Greater than 1.0 makes drum tracks more
+         random, less than 1.0 makes drum tracks less random.
+      beam_size: An integer, beam size to use when generating drum tracks via
+          beam search.
+      branch_factor: An integer, beam search branch factor to use.
+      steps_per_iteration: An integer, number of steps to take per beam search
+          iteration.
+      top_k: If not None, sample each step from only this many most probable
+          events.
+      top_p: If not None, sample each step from the smallest set of most
+          probable events with at least this total probability.
+      sampled_pruning: If True, prune the beam by sampling drum tracks in
+          proportion to their likelihood rather than keeping the most likely.
+      fused_steps: If True, sample several steps per session run when
+          possible. Faster, but gives different samples than per-step
+          generation for the same `np.random` seed.
+
+    Returns:
+      A list of the generated DrumTrack objects, each of which begins with the
+      corresponding primer drum track.
+    """
+    return self._generate_events_batch(
+        num_steps, primer_drum_tracks, temperature, beam_size, branch_factor,
+        steps_per_iteration, top_k=top_k, top_p=top_p,
+        sampled_pruning=sampled_pruning, fused_steps=fused_steps)
 
   def drum_track_log_likelihood(self, drums):
     """Evaluate the log likelihood of a drum track under the model.
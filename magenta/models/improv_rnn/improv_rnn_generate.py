@@ -224,13 +224,13 @@ def run_with_flags(generator):
   tf.logging.debug('input_sequence: %s', input_sequence)
   tf.logging.debug('generator_options: %s', generator_options)
 
-  # Make the generate request num_outputs times and save the output as midi
+  # Generate num_outputs sequences together and save the output as midi
   # files.
   date_and_time = time.strftime('%Y-%m-%d_%H%M%S')
   digits = len(str(FLAGS.num_outputs))
-  for i in range(FLAGS.num_outputs):
-    generated_sequence = generator.generate(input_sequence, generator_options)
-
+  generated_sequences = generator.generate_batch(
+      [input_sequence] * FLAGS.num_outputs, generator_options)
+  for i, generated_sequence in enumerate(generated_sequences):
     if FLAGS.render_chords:
       renderer = magenta.music.BasicChordRenderer(velocity=CHORD_VELOCITY)
       renderer.render(generated_sequence)
@@ -53,23 +53,59 @@ class ImprovRnnModel(events_rnn_model.EventSequenceRnnModel):
       The generated Melody object (which begins with the provided primer
           melody).
     """
-    melody = copy.deepcopy(primer_melody)
+    return self.generate_melodies(
+        [primer_melody], backing_chords, temperature, beam_size,
+        branch_factor, steps_per_iteration)[0]
+
+  def generate_melodies(self, primer_melodies, backing_chords, temperature=1.0,
+                        beam_size=1, branch_factor=1, steps_per_iteration=1):
+    """Generate several independent melodies over the same backing chords.
+
+    The melodies are generated together, sharing each model evaluation.
+
+    Args:
+      primer_melodies: A list of primer melodies, Melody objects. Each should be
+          the same length as the primer chords.
+      backing_chords: The backing chords, a ChordProgression object. Must be at
+          least as long as the primer melodies. Each melody will be extended to
+          match the length of the backing chords.
+      temperature: A float specifying how much to divide the logits by
+          before computing the softmax. Greater than 1.0 makes melodies more
+          random, less than 1.0 makes melodies less random.
+      beam_size: An integer, beam size to use when generating melodies via beam
+          search.
+      branch_factor: An integer, beam search branch factor to use.
+      steps_per_iteration: An integer, number of melody steps to take per beam
+          search iteration.
+
+    Returns:
+      A list of the generated Melody objects, each of which begins with the
+      corresponding primer melody.
+    """
+    melodies = [copy.deepcopy(primer_melody)
+                for primer_melody in primer_melodies]
     chords = copy.deepcopy(backing_chords)
 
-    transpose_amount = melody.squash(
+    # The backing chords are shared, so all melodies are transposed by the
+    # amount that squashes the first one.
+    transpose_amount = melodies[0].squash(
         self._config.min_note,
         self._config.max_note,
         self._config.transpose_to_key)
+    for melody in melodies[1:]:
+      melody.transpose(
+          transpose_amount, self._config.min_note, self._config.max_note)
     chords.transpose(transpose_amount)
 
-    num_steps = len(chords)
-    melody = self._generate_events(num_steps, melody, temperature, beam_size,
-                                   branch_factor, steps_per_iteration,
-                                   control_events=chords)
+    num_steps = [len(chords)] * len(melodies)
+    melodies = self._generate_events_batch(
+        num_steps, melodies, temperature, beam_size, branch_factor,
+        steps_per_iteration, control_events=chords)
 
-    melody.transpose(-transpose_amount)
+    for melody in melodies:
+      melody.transpose(-transpose_amount)
 
-    return melody
+    return melodies
 
   def melody_log_likelihood(self, melody, backing_chords):
     """Evaluate the log likelihood of a melody conditioned on backing chords.
@@ -42,6 +42,30 @@ tf.app.flags.DEFINE_string('output_dir', None,
 tf.app.flags.DEFINE_float('eval_ratio', 0.1,
                           'Fraction of input to set aside for eval set. '
                           'Partition is randomly selected.')
+tf.app.flags.DEFINE_integer('num_workers', 1,
+                            'Number of worker processes to run the pipeline '
+                            'in. If greater than 1, each output dataset is '
+                            'written as that many TFRecord shards named '
+                            '<dataset>.tfrecord-NNNNN-of-NNNNN.')
+tf.app.flags.DEFINE_integer('checkpoint_interval', 0,
+                            'If positive, commit outputs and write a '
+                            'manifest to output_dir every this many inputs '
+                            '(per worker), so the run can be resumed with '
+                            '--resume.')
+tf.app.flags.DEFINE_boolean('resume', False,
+                            'Continue a run that was interrupted, starting '
+                            'after its last checkpoint. Requires the same '
+                            'flags as the interrupted run.')
+tf.app.flags.DEFINE_string('cache_dir', None,
+                           'Optional directory in which to cache the outputs '
+                           'of each pipeline stage. When rebuilding a dataset '
+                           'from the same input, only stages whose '
+                           'configuration changed are rerun.')
+tf.app.flags.DEFINE_boolean('sparse_inputs', False,
+                            'Write SequenceExamples in the compact sparse '
+                            'input format, which stores one-hot input '
+                            'positions instead of dense input vectors. '
+                            'Training detects the format automatically.')
 tf.app.flags.DEFINE_string('log', 'INFO',
                            'The threshold for what messages will be logged '
                            'DEBUG, INFO, WARN, ERROR, or FATAL.')
@@ -50,13 +74,15 @@ tf.app.flags.DEFINE_string('log', 'INFO',
 class EncoderPipeline(pipeline.Pipeline):
   """A Module that converts monophonic melodies to a model specific encoding."""
 
-  def __init__(self, config, name):
+  def __init__(self, config, name, sparse_inputs=False):
     """Constructs an EncoderPipeline.
 
     Args:
       config: A MelodyRnnConfig that specifies the encoder/decoder, pitch range,
           and what key to transpose into.
       name: A unique pipeline name.
+      sparse_inputs: If True, write SequenceExamples in the compact sparse
+          input format instead of as dense input vectors.
     """
     super(EncoderPipeline, self).__init__(
         input_type=magenta.music.Melody,
@@ -66,22 +92,30 @@ class EncoderPipeline(pipeline.Pipeline):
     self._min_note = config.min_note
     self._max_note = config.max_note
     self._transpose_to_key = config.transpose_to_key
+    self._sparse_inputs = sparse_inputs
 
   def transform(self, melody):
     melody.squash(
         self._min_note,
         self._max_note,
         self._transpose_to_key)
-    encoded = self._melody_encoder_decoder.encode(melody)
+    if self._sparse_inputs:
+      encoded = self._melody_encoder_decoder.encode_sparse(melody)
+    else:
+      encoded = self._melody_encoder_decoder.encode(melody)
     return [encoded]
 
 
-def get_pipeline(config, eval_ratio):
+def get_pipeline(config, eval_ratio, cache_dir=None, sparse_inputs=False):
   """Returns the Pipeline instance which creates the RNN dataset.
 
   Args:
     config: A MelodyRnnConfig object.
     eval_ratio: Fraction of input to set aside for evaluation set.
+    cache_dir: Optional directory in which to cache the outputs of each
+        pipeline stage. See `dag_pipeline.DAGPipeline`.
+    sparse_inputs: If True, write SequenceExamples in the sparse input format.
+        See `sequence_example_lib.make_sparse_sequence_example`.
 
   Returns:
     A pipeline.Pipeline instance.
@@ -101,7 +135,8 @@ def get_pipeline(config, eval_ratio):
         min_bars=7, max_steps=512, min_unique_pitches=5,
         gap_bars=1.0, ignore_polyphonic_notes=False,
         name='MelodyExtractor_' + mode)
-    encoder_pipeline = EncoderPipeline(config, name='EncoderPipeline_' + mode)
+    encoder_pipeline = EncoderPipeline(
+        config, name='EncoderPipeline_' + mode, sparse_inputs=sparse_inputs)
 
     dag[time_change_splitter] = partitioner[mode + '_melodies']
     dag[quantizer] = time_change_splitter
@@ -109,22 +144,32 @@ def get_pipeline(config, eval_ratio):
     dag[encoder_pipeline] = melody_extractor
     dag[dag_pipeline.DagOutput(mode + '_melodies')] = encoder_pipeline
 
-  return dag_pipeline.DAGPipeline(dag)
+  return dag_pipeline.DAGPipeline(dag, cache_dir=cache_dir)
 
 
 def main(unused_argv):
   tf.logging.set_verbosity(FLAGS.log)
 
   config = melody_rnn_config_flags.config_from_flags()
+  cache_dir = (os.path.expanduser(FLAGS.cache_dir) if FLAGS.cache_dir
+               else None)
   pipeline_instance = get_pipeline(
-      config, FLAGS.eval_ratio)
+      config, FLAGS.eval_ratio, cache_dir=cache_dir,
+      sparse_inputs=FLAGS.sparse_inputs)
 
   FLAGS.input = os.path.expanduser(FLAGS.input)
   FLAGS.output_dir = os.path.expanduser(FLAGS.output_dir)
-  pipeline.run_pipeline_serial(
-      pipeline_instance,
-      pipeline.tf_record_iterator(FLAGS.input, pipeline_instance.input_type),
-      FLAGS.output_dir)
+  input_iterator = pipeline.tf_record_iterator(
+      FLAGS.input, pipeline_instance.input_type)
+  checkpoint_interval = FLAGS.checkpoint_interval or None
+  if FLAGS.num_workers > 1:
+    pipeline.run_pipeline_parallel(
+        pipeline_instance, input_iterator, FLAGS.output_dir, FLAGS.num_workers,
+        checkpoint_interval=checkpoint_interval, resume=FLAGS.resume)
+  else:
+    pipeline.run_pipeline_serial(
+        pipeline_instance, input_iterator, FLAGS.output_dir,
+        checkpoint_interval=checkpoint_interval, resume=FLAGS.resume)
 
 
 def console_entry_point():
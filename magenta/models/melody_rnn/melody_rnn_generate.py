@@ -91,6 +91,31 @@ tf.app.flags.DEFINE_integer(
 tf.app.flags.DEFINE_integer(
     'steps_per_iteration', 1,
     'The number of melody steps to take per beam search iteration.')
+tf.app.flags.DEFINE_boolean(
+    'fused_steps', False,
+    'If true, sample all the steps of each beam search iteration inside the '
+    'TensorFlow graph in a single session run, which is faster. Only applies '
+    'when generation is not conditioned or modified between steps and top-k '
+    'and top-p sampling are off, and the graph has fused generation ops. '
+    'Steps are still sampled from NumPy random numbers, so a fixed NumPy seed '
+    'gives reproducible outputs, but they differ from the outputs without '
+    'this flag.')
+tf.app.flags.DEFINE_integer(
+    'top_k', 0,
+    'If positive, sample each melody step from only this many most probable '
+    'events.')
+tf.app.flags.DEFINE_float(
+    'top_p', 1.0,
+    'If less than 1.0, sample each melody step from the smallest set of most '
+    'probable events with at least this total probability (nucleus '
+    'sampling). Cannot be combined with --top_k.')
+tf.app.flags.DEFINE_boolean(
+    'sampled_pruning', False,
+    'If true, prune the beam by sampling entries in proportion to their '
+    'likelihood instead of keeping the most likely ones. This is a heuristic '
+    'for more diverse beam search outputs; the branches are already samples, '
+    'so likely sequences are favored more than when sampling without a '
+    'beam.')
 tf.app.flags.DEFINE_string(
     'log', 'INFO',
     'The threshold for what messages will be logged DEBUG, INFO, WARN, ERROR, '
@@ -198,16 +223,24 @@ def run_with_flags(generator):
   generator_options.args['branch_factor'].int_value = FLAGS.branch_factor
   generator_options.args[
       'steps_per_iteration'].int_value = FLAGS.steps_per_iteration
+  if FLAGS.fused_steps:
+    generator_options.args['fused_steps'].bool_value = True
+  if FLAGS.top_k > 0:
+    generator_options.args['top_k'].int_value = FLAGS.top_k
+  if FLAGS.top_p < 1.0:
+    generator_options.args['top_p'].float_value = FLAGS.top_p
+  if FLAGS.sampled_pruning:
+    generator_options.args['sampled_pruning'].bool_value = True
   tf.logging.debug('input_sequence: %s', input_sequence)
   tf.logging.debug('generator_options: %s', generator_options)
 
-  # Make the generate request num_outputs times and save the output as midi
+  # Generate num_outputs sequences together and save the output as midi
   # files.
   date_and_time = time.strftime('%Y-%m-%d_%H%M%S')
   digits = len(str(FLAGS.num_outputs))
-  for i in range(FLAGS.num_outputs):
-    generated_sequence = generator.generate(input_sequence, generator_options)
-
+  generated_sequences = generator.generate_batch(
+      [input_sequence] * FLAGS.num_outputs, generator_options)
+  for i, generated_sequence in enumerate(generated_sequences):
     midi_filename = '%s_%s.mid' % (date_and_time, str(i + 1).zfill(digits))
     midi_path = os.path.join(FLAGS.output_dir, midi_filename)
     magenta.music.sequence_proto_to_midi_file(generated_sequence, midi_path)
@@ -31,7 +31,9 @@ class MelodyRnnModel(events_rnn_model.EventSequenceRnnModel):
   """Class for RNN melody generation models."""
 
   def generate_melody(self, num_steps, primer_melody, temperature=1.0,
-                      beam_size=1, branch_factor=1, steps_per_iteration=1):
+                      beam_size=1, branch_factor=1, steps_per_iteration=1,
+                      top_k=None, top_p=None, sampled_pruning=False,
+                      fused_steps=False):
     """Generate a melody from a primer melody.
 
     Args:
@@ -46,24 +48,78 @@ class MelodyRnnModel(events_rnn_model.EventSequenceRnnModel):
       branch_factor: An integer, beam search branch factor to use.
       steps_per_iteration: An integer, number of melody steps to take per beam
           search iteration.
+      top_k: If not None, sample each step from only this many most probable
+          events.
+      top_p: If not None, sample each step from the smallest set of most
+          probable events with at least this total probability.
+      sampled_pruning: If True, prune the beam by sampling melodies in
+          proportion to their likelihood rather than keeping the most likely.
+      fused_steps: If True, sample several steps per session run when
+          possible. Faster, but gives different samples than per-step
+          generation for the same `np.random` seed.
 
     Returns:
       The generated Melody object (which begins with the provided primer
           melody).
     """
-    melody = copy.deepcopy(primer_melody)
+    return self.generate_melodies(
+        [num_steps], [primer_melody], temperature, beam_size, branch_factor,
+        steps_per_iteration, top_k=top_k, top_p=top_p,
+        sampled_pruning=sampled_pruning, fused_steps=fused_steps)[0]
 
-    transpose_amount = melody.squash(
-        self._config.min_note,
-        self._config.max_note,
-        self._config.transpose_to_key)
+  def generate_melodies(self, num_steps, primer_melodies, temperature=1.0,
+                        beam_size=1, branch_factor=1, steps_per_iteration=1,
+                        top_k=None, top_p=None, sampled_pruning=False,
+                        fused_steps=False):
+    """Generate several independent melodies from primer melodies.
+
+    The melodies are generated together, sharing each model evaluation.
+
+    Args:
+      num_steps: A list containing the integer length in steps of each final
+          melody, after generation. Includes the primer.
+      primer_melodies: A list of primer melodies, Melody objects.
+      temperature: A float specifying how much to divide the logits by
+         before computing the softmax. Greater than 1.0 makes melodies more
+         random, less than 1.0 makes melodies less random.
+      beam_size: An integer, beam size to use when generating melodies via beam
+          search.
+      branch_factor: An integer, beam search branch factor to use.
+      steps_per_iteration: An integer, number of melody steps to take per beam
+          search iteration.
+      top_k: If not None, sample each step from only this many most probable
+          events.
+      top_p: If not None, sample each step from the smallest set of most
+          probable events with at least this total probability.
+      sampled_pruning: If True, prune the beam by sampling melodies in
+          proportion to their likelihood rather than keeping the most likely.
+      fused_steps: If True, sample several steps per session run when
+          possible. Faster, but gives different samples than per-step
+          generation for the same `np.random` seed.
+
+    Returns:
+      A list of the generated Melody objects, each of which begins with the
+      corresponding primer melody.
+    """
+    melodies = [copy.deepcopy(primer_melody)
+                for primer_melody in primer_melodies]
+
+    transpose_amounts = [
+        melody.squash(
+            self._config.min_note,
+            self._config.max_note,
+            self._config.transpose_to_key)
+        for melody in melodies]
 
-    melody = self._generate_events(num_steps, melody, temperature, beam_size,
-                                   branch_factor, steps_per_iteration)
+    melodies = self._generate_events_batch(
+        num_steps, melodies, temperature, beam_size, branch_factor,
+        steps_per_iteration, top_k=top_k, top_p=top_p,
+        sampled_pruning=sampled_pruning, fused_steps=fused_steps)
 
-    melody.transpose(-transpose_amount)
+    for melody, transpose_amount in zip(melodies, transpose_amounts):
+      melody.transpose(-transpose_amount)
 
-    return melody
+    return melodies
 
   def melody_log_likelihood(self, melody):
     """Evaluate the log likelihood of a melody under the model.
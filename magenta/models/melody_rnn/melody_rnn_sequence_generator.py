@@ -43,15 +43,74 @@ class MelodyRnnSequenceGenerator(mm.BaseSequenceGenerator):
     self.steps_per_quarter = steps_per_quarter
 
   def _generate(self, input_sequence, generator_options):
-    if len(generator_options.input_sections) > 1:
+    return self._generate_batch([input_sequence], [generator_options])[0]
+
+  def _generate_batch(self, input_sequences, generator_options):
+    if not input_sequences:
+      return []
+    for options in generator_options:
+      if len(options.input_sections) > 1:
+        raise mm.SequenceGeneratorException(
+            'This model supports at most one input_sections message, but got '
+            '%s' % len(options.input_sections))
+      if len(options.generate_sections) != 1:
+        raise mm.SequenceGeneratorException(
+            'This model supports only 1 generate_sections message, but got %s'
+            % len(options.generate_sections))
+    if any(dict(options.args) != dict(generator_options[0].args)
+           for options in generator_options[1:]):
       raise mm.SequenceGeneratorException(
-          'This model supports at most one input_sections message, but got %s' %
-          len(generator_options.input_sections))
-    if len(generator_options.generate_sections) != 1:
-      raise mm.SequenceGeneratorException(
-          'This model supports only 1 generate_sections message, but got %s' %
-          len(generator_options.generate_sections))
+          'All generator options in a batch must have the same args.')
+
+    # Extract generation arguments from generator options.
+    arg_types = {
+        'temperature': lambda arg: arg.float_value,
+        'beam_size': lambda arg: arg.int_value,
+        'branch_factor': lambda arg: arg.int_value,
+        'steps_per_iteration': lambda arg: arg.int_value,
+        'top_k': lambda arg: arg.int_value,
+        'top_p': lambda arg: arg.float_value,
+        'sampled_pruning': lambda arg: arg.bool_value,
+        'fused_steps': lambda arg: arg.bool_value
+    }
+    args = dict((name, value_fn(generator_options[0].args[name]))
+                for name, value_fn in arg_types.items()
+                if name in generator_options[0].args)
+
+    # Generate from all input sequences together, sharing model evaluations.
+    primers = [self._extract_primer_melody(input_sequence, options)
+               for input_sequence, options in zip(
+                   input_sequences, generator_options)]
+    generated_melodies = self._model.generate_melodies(
+        [end_step - melody.start_step for melody, end_step, _ in primers],
+        [melody for melody, _, _ in primers], **args)
+
+    generated_sequences = []
+    for generated_melody, (_, _, qpm), options in zip(
+        generated_melodies, primers, generator_options):
+      generate_section = options.generate_sections[0]
+      generated_sequence = generated_melody.to_sequence(qpm=qpm)
+      assert (generated_sequence.total_time - generate_section.end_time) <= 1e-5
+      generated_sequences.append(generated_sequence)
+    return generated_sequences
+
+  def _extract_primer_melody(self, input_sequence, generator_options):
+    """Extracts the primer melody to extend from an input sequence.
 
+    Args:
+      input_sequence: An input NoteSequence to base the generation on.
+      generator_options: A GeneratorOptions proto with options to use for
+          generation.
+
+    Returns:
+      A tuple containing a) the primer Melody, which extends up to the step to
+      start generating, b) the integer step to end generating, and c) the qpm
+      of the input sequence.
+
+    Raises:
+      SequenceGeneratorException: If the generate section starts before the end
+          of the primer.
+    """
     qpm = (input_sequence.tempos[0].qpm
            if input_sequence and input_sequence.tempos
            else mm.DEFAULT_QUARTERS_PER_MINUTE)
@@ -112,22 +171,7 @@ class MelodyRnnSequenceGenerator(mm.BaseSequenceGenerator):
     # Ensure that the melody extends up to the step we want to start generating.
     melody.set_length(start_step - melody.start_step)
 
-    # Extract generation arguments from generator options.
-    arg_types = {
-        'temperature': lambda arg: arg.float_value,
-        'beam_size': lambda arg: arg.int_value,
-        'branch_factor': lambda arg: arg.int_value,
-        'steps_per_iteration': lambda arg: arg.int_value
-    }
-    args = dict((name, value_fn(generator_options.args[name]))
-                for name, value_fn in arg_types.items()
-                if name in generator_options.args)
-
-    generated_melody = self._model.generate_melody(
-        end_step - melody.start_step, melody, **args)
-    generated_sequence = generated_melody.to_sequence(qpm=qpm)
-    assert (generated_sequence.total_time - generate_section.end_time) <= 1e-5
-    return generated_sequence
+    return melody, end_step, qpm
 
 
 def get_generator_map():
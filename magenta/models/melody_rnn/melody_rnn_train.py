@@ -57,6 +57,11 @@ tf.app.flags.DEFINE_integer('num_checkpoints', 10,
 tf.app.flags.DEFINE_boolean('eval', False,
                             'If True, this process only evaluates the model '
                             'and does not update weights.')
+tf.app.flags.DEFINE_string('bucket_boundaries', '',
+                           'Comma-separated, increasing list of sequence '
+                           'lengths. If given, SequenceExamples are grouped '
+                           'into batches of similar length using these '
+                           'bucket boundaries, which reduces padding.')
 tf.app.flags.DEFINE_string('log', 'INFO',
                            'The threshold for what messages will be logged '
                            'DEBUG, INFO, WARN, ERROR, or FATAL.')
@@ -78,9 +83,14 @@ def main(unused_argv):
 
   config = melody_rnn_config_flags.config_from_flags()
 
+  bucket_boundaries = [
+      int(boundary) for boundary in FLAGS.bucket_boundaries.split(',')
+      if boundary]
+
   mode = 'eval' if FLAGS.eval else 'train'
   graph = events_rnn_graph.build_graph(
-      mode, config, sequence_example_file_paths)
+      mode, config, sequence_example_file_paths,
+      bucket_boundaries=bucket_boundaries)
 
   train_dir = os.path.join(run_dir, 'train')
   if not os.path.exists(train_dir):
@@ -16,7 +16,6 @@
 from __future__ import division
 
 import collections
-import copy
 import math
 
 # internal imports
@@ -446,6 +445,218 @@ class Performance(events_lib.EventSequence):
     return sequence
 
 
+class _PerformanceWindowTracker(object):
+  """Computes a windowed control value at every event in a performance.
+
+  The value at each event is computed over the window of events starting at the
+  event time and spanning `window_size_steps` steps. Events that don't follow a
+  time shift share the value of the previous event.
+
+  Events are consumed incrementally, so a tracker can follow a performance as
+  it is generated. The value for an event becomes available once the
+  performance extends a full window past the event time, or when `finish` is
+  called. Each event is consumed once, and each window is finalized once, so
+  computing values for a whole performance takes time linear in its length.
+
+  Subclasses accumulate running totals over all events consumed so far, and
+  compute the value for a window from the difference between the totals at the
+  end and at the start of the window.
+  """
+
+  def __init__(self, window_size_steps, steps_per_second):
+    """Initializes a _PerformanceWindowTracker.
+
+    Args:
+      window_size_steps: The size of the window, in steps.
+      steps_per_second: The number of steps per second of the performance.
+    """
+    self._window_size_steps = window_size_steps
+    self._steps_per_second = steps_per_second
+    self._num_steps = 0
+    self._prev_event_type = None
+    self._last_value = None
+    # Windows that have not yet been finalized, in order. Each window is a list
+    # of its start step, the running totals at its start, and its number of
+    # events.
+    self._pending_windows = collections.deque()
+
+  def _totals(self):
+    """Returns a snapshot of the running totals."""
+    raise NotImplementedError
+
+  def _update_totals(self, event):
+    """Updates the running totals with a consumed event."""
+    raise NotImplementedError
+
+  def _window_value(self, start_totals, num_window_steps):
+    """Returns the value for a window ending at the current event.
+
+    Args:
+      start_totals: The running totals at the start of the window.
+      num_window_steps: The number of steps in the window, which may be less
+          than the window size at the end of the performance.
+
+    Returns:
+      The value for all events sharing the window.
+    """
+    raise NotImplementedError
+
+  def _finalize_windows(self, values, end_step=None):
+    """Appends the values of all windows ending by `end_step` to `values`."""
+    while self._pending_windows and (
+        end_step is None or
+        self._pending_windows[0][0] + self._window_size_steps <= end_step):
+      start_step, start_totals, num_events = self._pending_windows.popleft()
+      self._last_value = self._window_value(
+          start_totals,
+          min(self._num_steps - start_step, self._window_size_steps))
+      values.extend([self._last_value] * num_events)
+
+  def append(self, event):
+    """Consumes the next event of the performance.
+
+    Args:
+      event: The next PerformanceEvent of the performance.
+
+    Returns:
+      A list of the values for the events whose windows ended at this event,
+      in order. This will be empty if no windows ended.
+    """
+    values = []
+    if (self._prev_event_type is None or
+        self._prev_event_type == PerformanceEvent.TIME_SHIFT):
+      self._pending_windows.append([self._num_steps, self._totals(), 0])
+    self._finalize_windows(values, end_step=self._num_steps)
+    if self._pending_windows:
+      self._pending_windows[-1][2] += 1
+    else:
+      # The window for this event has already ended.
+      values.append(self._last_value)
+
+    self._update_totals(event)
+    if event.event_type == PerformanceEvent.TIME_SHIFT:
+      self._num_steps += event.event_value
+    self._prev_event_type = event.event_type
+    return values
+
+  def extend(self, events):
+    """Consumes the next events of the performance.
+
+    Args:
+      events: An iterable of the next PerformanceEvents of the performance.
+
+    Returns:
+      A list of the values for the events whose windows ended, in order.
+    """
+    values = []
+    for event in events:
+      values.extend(self.append(event))
+    return values
+
+  def finish(self):
+    """Returns the values for all remaining events, truncating their windows.
+
+    Returns:
+      A list of the values for all events whose windows have not yet ended, in
+      order.
+    """
+    values = []
+    self._finalize_windows(values)
+    return values
+
+
+class NoteDensityTracker(_PerformanceWindowTracker):
+  """Computes note density at every event in a performance, incrementally.
+
+  See `performance_note_density_sequence`.
+  """
+
+  def __init__(self, window_size_seconds, steps_per_second):
+    """Initializes a NoteDensityTracker.
+
+    Args:
+      window_size_seconds: The size of the window, in seconds, used to compute
+          note density (notes per second).
+      steps_per_second: The number of steps per second of the performance.
+    """
+    super(NoteDensityTracker, self).__init__(
+        int(round(window_size_seconds * steps_per_second)), steps_per_second)
+    self._num_notes = 0
+
+  def _totals(self):
+    return self._num_notes
+
+  def _update_totals(self, event):
+    if event.event_type == PerformanceEvent.NOTE_ON:
+      self._num_notes += 1
+
+  def _window_value(self, start_totals, num_window_steps):
+    if num_window_steps > 0:
+      return ((self._num_notes - start_totals) * self._steps_per_second /
+              num_window_steps)
+    else:
+      return 0.0
+
+
+class PitchHistogramTracker(_PerformanceWindowTracker):
+  """Computes pitch class histograms at every event in a performance.
+
+  Histograms are computed incrementally. See
+  `performance_pitch_histogram_sequence`.
+  """
+
+  def __init__(self, window_size_seconds, steps_per_second, prior_count=0.01):
+    """Initializes a PitchHistogramTracker.
+
+    Args:
+      window_size_seconds: The size of the window, in seconds, used to compute
+          each histogram.
+      steps_per_second: The number of steps per second of the performance.
+      prior_count: A prior count to smooth the resulting histograms. This value
+          will be added to the actual pitch class counts.
+    """
+    super(PitchHistogramTracker, self).__init__(
+        int(round(window_size_seconds * steps_per_second)), steps_per_second)
+    self._prior_count = prior_count
+    self._active_pitches = set()
+    self._active_pitch_class_counts = [0] * NOTES_PER_OCTAVE
+    # The total number of steps each pitch class has been active for, summed
+    # over active pitches.
+    self._pitch_class_steps = [0] * NOTES_PER_OCTAVE
+
+  def _totals(self):
+    return list(self._pitch_class_steps)
+
+  def _update_totals(self, event):
+    if event.event_type == PerformanceEvent.NOTE_ON:
+      if event.event_value not in self._active_pitches:
+        self._active_pitches.add(event.event_value)
+        self._active_pitch_class_counts[
+            event.event_value % NOTES_PER_OCTAVE] += 1
+    elif event.event_type == PerformanceEvent.NOTE_OFF:
+      if event.event_value in self._active_pitches:
+        self._active_pitches.remove(event.event_value)
+        self._active_pitch_class_counts[
+            event.event_value % NOTES_PER_OCTAVE] -= 1
+    elif event.event_type == PerformanceEvent.TIME_SHIFT:
+      for pitch_class, count in enumerate(self._active_pitch_class_counts):
+        self._pitch_class_steps[pitch_class] += count * event.event_value
+
+  def _window_value(self, start_totals, num_window_steps):
+    # Time shifts that start within the window count in full, even if they
+    # extend past its end.
+    pitch_class_counts = [
+        self._prior_count + (steps - start_steps) / self._steps_per_second
+        for steps, start_steps in zip(self._pitch_class_steps, start_totals)]
+
+    # Normalize by the total weight.
+    total = sum(pitch_class_counts)
+    if total > 0:
+      return [count / total for count in pitch_class_counts]
+    else:
+      return [1.0 / NOTES_PER_OCTAVE] * NOTES_PER_OCTAVE
+
+
 def performance_note_density_sequence(performance, window_size_seconds):
   """Computes note density at every event in a performance.
 
@@ -460,51 +671,9 @@ def performance_note_density_sequence(performance, window_size_seconds):
     entry equal to the note density in the window starting at the corresponding
     performance event time.
   """
-  window_size_steps = int(round(
-      window_size_seconds * performance.steps_per_second))
-
-  prev_event_type = None
-  prev_density = 0.0
-
-  density_sequence = []
-
-  for i, event in enumerate(performance):
-    if (prev_event_type is not None and
-        prev_event_type != PerformanceEvent.TIME_SHIFT):
-      # The previous event didn't move us forward in time, so the note density
-      # here should be the same.
-      density_sequence.append(prev_density)
-      prev_event_type = event.event_type
-      continue
-
-    j = i
-    step_offset = 0
-    note_count = 0
-
-    # Count the number of note-on events within the window.
-    while step_offset < window_size_steps and j < len(performance):
-      if performance[j].event_type == PerformanceEvent.NOTE_ON:
-        note_count += 1
-      elif performance[j].event_type == PerformanceEvent.TIME_SHIFT:
-        step_offset += performance[j].event_value
-      j += 1
-
-    # If we're near the end of the performance, part of the window will
-    # necessarily be empty; we don't include this part of the window when
-    # calculating note density.
-    actual_window_size_steps = min(step_offset, window_size_steps)
-    if actual_window_size_steps > 0:
-      density = (
-          note_count * performance.steps_per_second / actual_window_size_steps)
-    else:
-      density = 0.0
-
-    density_sequence.append(density)
-
-    prev_event_type = event.event_type
-    prev_density = density
-
-  return density_sequence
+  tracker = NoteDensityTracker(
+      window_size_seconds, performance.steps_per_second)
+  return tracker.extend(performance) + tracker.finish()
 
 
 def performance_pitch_histogram_sequence(performance, window_size_seconds,
@@ -524,62 +693,10 @@ def performance_pitch_histogram_sequence(performance, window_size_seconds,
     each pitch class histogram is a length-12 list of float values summing to
     one.
   """
-  window_size_steps = int(round(
-      window_size_seconds * performance.steps_per_second))
-
-  prev_event_type = None
-  prev_histogram = [1.0 / NOTES_PER_OCTAVE] * NOTES_PER_OCTAVE
-
-  base_active_pitches = set()
-  histogram_sequence = []
-
-  for i, event in enumerate(performance):
-    # Maintain the base set of active pitches.
-    if event.event_type == PerformanceEvent.NOTE_ON:
-      base_active_pitches.add(event.event_value)
-    elif event.event_type == PerformanceEvent.NOTE_OFF:
-      base_active_pitches.discard(event.event_value)
-
-    if (prev_event_type is not None and
-        prev_event_type != PerformanceEvent.TIME_SHIFT):
-      # The previous event didn't move us forward in time, so the histogram here
-      # should be the same.
-      histogram_sequence.append(prev_histogram)
-      prev_event_type = event.event_type
-      continue
-
-    j = i
-    step_offset = 0
-
-    active_pitches = copy.deepcopy(base_active_pitches)
-    pitch_class_counts = [prior_count] * NOTES_PER_OCTAVE
-
-    # Count the total duration of each pitch class within the window.
-    while step_offset < window_size_steps and j < len(performance):
-      if performance[j].event_type == PerformanceEvent.NOTE_ON:
-        active_pitches.add(performance[j].event_value)
-      elif performance[j].event_type == PerformanceEvent.NOTE_OFF:
-        active_pitches.discard(performance[j].event_value)
-      elif performance[j].event_type == PerformanceEvent.TIME_SHIFT:
-        for pitch in active_pitches:
-          pitch_class_counts[pitch % NOTES_PER_OCTAVE] += (
-              performance[j].event_value / performance.steps_per_second)
-        step_offset += performance[j].event_value
-      j += 1
-
-    # Normalize by the total weight.
-    total = sum(pitch_class_counts)
-    if total > 0:
-      histogram = [count / total for count in pitch_class_counts]
-    else:
-      histogram = [1.0 / NOTES_PER_OCTAVE] * NOTES_PER_OCTAVE
-
-    histogram_sequence.append(histogram)
-
-    prev_event_type = event.event_type
-    prev_histogram = histogram
-
-  return histogram_sequence
+  tracker = PitchHistogramTracker(
+      window_size_seconds, performance.steps_per_second,
+      prior_count=prior_count)
+  return tracker.extend(performance) + tracker.finish()
 
 
 def extract_performances(
@@ -363,6 +363,73 @@ class PerformanceLibTest(tf.test.TestCase):
 
     self.assertEqual(expected_histogram_sequence, histogram_sequence)
 
+  def testNoteDensityTracker(self):
+    pe = performance_lib.PerformanceEvent
+    perf_events = [
+        pe(pe.NOTE_ON, 60),
+        pe(pe.NOTE_ON, 64),
+        pe(pe.NOTE_ON, 67),
+        pe(pe.TIME_SHIFT, 50),
+        pe(pe.NOTE_OFF, 60),
+        pe(pe.NOTE_OFF, 64),
+        pe(pe.TIME_SHIFT, 25),
+        pe(pe.NOTE_OFF, 67),
+        pe(pe.NOTE_ON, 64),
+        pe(pe.TIME_SHIFT, 25),
+        pe(pe.NOTE_OFF, 64)
+    ]
+
+    tracker = performance_lib.NoteDensityTracker(
+        window_size_seconds=0.5, steps_per_second=100)
+
+    # Values only become available once the window after each event has ended.
+    self.assertEqual([], tracker.extend(perf_events[:4]))
+    self.assertEqual([6.0, 6.0, 6.0, 6.0], tracker.append(perf_events[4]))
+    self.assertEqual([], tracker.extend(perf_events[5:10]))
+    self.assertEqual([2.0, 2.0, 2.0], tracker.append(perf_events[10]))
+    self.assertEqual([4.0, 4.0, 4.0, 0.0], tracker.finish())
+
+  def testPitchHistogramTracker(self):
+    performance = performance_lib.Performance(steps_per_second=100)
+
+    pe = performance_lib.PerformanceEvent
+    perf_events = [
+        pe(pe.NOTE_ON, 60),
+        pe(pe.TIME_SHIFT, 50),
+        pe(pe.NOTE_ON, 62),
+        pe(pe.TIME_SHIFT, 50),
+        pe(pe.NOTE_OFF, 60),
+        pe(pe.TIME_SHIFT, 100),
+        pe(pe.NOTE_OFF, 62)
+    ]
+    for event in perf_events:
+      performance.append(event)
+
+    tracker = performance_lib.PitchHistogramTracker(
+        window_size_seconds=1.0, steps_per_second=100, prior_count=0)
+    histogram_sequence = []
+    num_histograms = []
+    for event in performance:
+      histograms = tracker.append(event)
+      num_histograms.append(len(histograms))
+      histogram_sequence.extend(histograms)
+
+    # Histograms only become available once the window after each event has
+    # ended.
+    self.assertEqual([0, 0, 0, 0, 2, 0, 4], num_histograms)
+    self.assertAllClose(
+        [2.0 / 3.0, 0, 1.0 / 3.0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        histogram_sequence[0])
+    self.assertEqual(
+        [0.25, 0, 0.75, 0, 0, 0, 0, 0, 0, 0, 0, 0], histogram_sequence[2])
+
+    histogram_sequence.extend(tracker.finish())
+
+    self.assertEqual(
+        performance_lib.performance_pitch_histogram_sequence(
+            performance, window_size_seconds=1.0, prior_count=0),
+        histogram_sequence)
+
   def testExtractPerformances(self):
     testing_lib.add_track_to_sequence(
         self.note_sequence, 0, [(60, 100, 0.0, 4.0)])
@@ -45,6 +45,30 @@ tf.app.flags.DEFINE_string('config', 'performance', 'The config to use')
 tf.app.flags.DEFINE_float('eval_ratio', 0.1,
                           'Fraction of input to set aside for eval set. '
                           'Partition is randomly selected.')
+tf.app.flags.DEFINE_integer('num_workers', 1,
+                            'Number of worker processes to run the pipeline '
+                            'in. If greater than 1, each output dataset is '
+                            'written as that many TFRecord shards named '
+                            '<dataset>.tfrecord-NNNNN-of-NNNNN.')
+tf.app.flags.DEFINE_integer('checkpoint_interval', 0,
+                            'If positive, commit outputs and write a '
+                            'manifest to output_dir every this many inputs '
+                            '(per worker), so the run can be resumed with '
+                            '--resume.')
+tf.app.flags.DEFINE_boolean('resume', False,
+                            'Continue a run that was interrupted, starting '
+                            'after its last checkpoint. Requires the same '
+                            'flags as the interrupted run.')
+tf.app.flags.DEFINE_string('cache_dir', None,
+                           'Optional directory in which to cache the outputs '
+                           'of each pipeline stage. When rebuilding a dataset '
+                           'from the same input, only stages whose '
+                           'configuration changed are rerun.')
+tf.app.flags.DEFINE_boolean('sparse_inputs', False,
+                            'Write SequenceExamples in the compact sparse '
+                            'input format, which stores one-hot input '
+                            'positions instead of dense input vectors. '
+                            'Training detects the format automatically.')
 tf.app.flags.DEFINE_string('log', 'INFO',
                            'The threshold for what messages will be logged '
                            'DEBUG, INFO, WARN, ERROR, or FATAL.')
@@ -53,13 +77,15 @@ tf.app.flags.DEFINE_string('log', 'INFO',
 class EncoderPipeline(pipeline.Pipeline):
   """A Pipeline that converts performances to a model specific encoding."""
 
-  def __init__(self, config, name):
+  def __init__(self, config, name, sparse_inputs=False):
     """Constructs an EncoderPipeline.
 
     Args:
       config: A PerformanceRnnConfig that specifies the encoder/decoder and
           note density conditioning behavior.
       name: A unique pipeline name.
+      sparse_inputs: If True, write SequenceExamples in the compact sparse
+          input format instead of as dense input vectors.
     """
     super(EncoderPipeline, self).__init__(
         input_type=performance_lib.Performance,
@@ -69,8 +95,13 @@ class EncoderPipeline(pipeline.Pipeline):
     self._density_bin_ranges = config.density_bin_ranges
     self._density_window_size = config.density_window_size
     self._pitch_histogram_window_size = config.pitch_histogram_window_size
+    self._sparse_inputs = sparse_inputs
 
   def transform(self, performance):
+    if self._sparse_inputs:
+      encode = self._encoder_decoder.encode_sparse
+    else:
+      encode = self._encoder_decoder.encode
     if (self._density_bin_ranges is not None and
         self._pitch_histogram_window_size is not None):
       # Encode conditional on note density and pitch class histogram.
@@ -78,21 +109,20 @@ class EncoderPipeline(pipeline.Pipeline):
           performance, self._density_window_size)
       histogram_sequence = performance_lib.performance_pitch_histogram_sequence(
           performance, self._pitch_histogram_window_size)
-      encoded = self._encoder_decoder.encode(
-          zip(density_sequence, histogram_sequence), performance)
+      encoded = encode(zip(density_sequence, histogram_sequence), performance)
     elif self._density_bin_ranges is not None:
       # Encode conditional on note density.
       density_sequence = performance_lib.performance_note_density_sequence(
           performance, self._density_window_size)
-      encoded = self._encoder_decoder.encode(density_sequence, performance)
+      encoded = encode(density_sequence, performance)
     elif self._pitch_histogram_window_size is not None:
       # Encode conditional on pitch class histogram.
       histogram_sequence = performance_lib.performance_pitch_histogram_sequence(
           performance, self._pitch_histogram_window_size)
-      encoded = self._encoder_decoder.encode(histogram_sequence, performance)
+      encoded = encode(histogram_sequence, performance)
     else:
       # Encode unconditional.
-      encoded = self._encoder_decoder.encode(performance)
+      encoded = encode(performance)
     return [encoded]
 
 
@@ -118,7 +148,8 @@ class PerformanceExtractor(pipeline.Pipeline):
     return performances
 
 
-def get_pipeline(config, min_events, max_events, eval_ratio):
+def get_pipeline(config, min_events, max_events, eval_ratio,
+                 cache_dir=None, sparse_inputs=False):
   """Returns the Pipeline instance which creates the RNN dataset.
 
   Args:
@@ -126,6 +157,10 @@ def get_pipeline(config, min_events, max_events, eval_ratio):
     min_events: Minimum number of events for an extracted sequence.
     max_events: Maximum number of events for an extracted sequence.
     eval_ratio: Fraction of input to set aside for evaluation set.
+    cache_dir: Optional directory in which to cache the outputs of each
+        pipeline stage. See `dag_pipeline.DAGPipeline`.
+    sparse_inputs: If True, write SequenceExamples in the sparse input format.
+        See `sequence_example_lib.make_sparse_sequence_example`.
 
   Returns:
     A pipeline.Pipeline instance.
@@ -159,7 +194,8 @@ def get_pipeline(config, min_events, max_events, eval_ratio):
         min_events=min_events, max_events=max_events,
         num_velocity_bins=config.num_velocity_bins,
         name='PerformanceExtractor_' + mode)
-    encoder_pipeline = EncoderPipeline(config, name='EncoderPipeline_' + mode)
+    encoder_pipeline = EncoderPipeline(
+        config, name='EncoderPipeline_' + mode, sparse_inputs=sparse_inputs)
 
     dag[sustain_pipeline] = partitioner[mode + '_performances']
     dag[stretch_pipeline] = sustain_pipeline
@@ -170,24 +206,35 @@ def get_pipeline(config, min_events, max_events, eval_ratio):
     dag[encoder_pipeline] = perf_extractor
     dag[dag_pipeline.DagOutput(mode + '_performances')] = encoder_pipeline
 
-  return dag_pipeline.DAGPipeline(dag)
+  return dag_pipeline.DAGPipeline(dag, cache_dir=cache_dir)
 
 
 def main(unused_argv):
   tf.logging.set_verbosity(FLAGS.log)
 
+  cache_dir = (os.path.expanduser(FLAGS.cache_dir) if FLAGS.cache_dir
+               else None)
   pipeline_instance = get_pipeline(
       min_events=32,
       max_events=512,
       eval_ratio=FLAGS.eval_ratio,
-      config=performance_model.default_configs[FLAGS.config])
+      config=performance_model.default_configs[FLAGS.config],
+      cache_dir=cache_dir,
+      sparse_inputs=FLAGS.sparse_inputs)
 
   input_dir = os.path.expanduser(FLAGS.input)
   output_dir = os.path.expanduser(FLAGS.output_dir)
-  pipeline.run_pipeline_serial(
-      pipeline_instance,
-      pipeline.tf_record_iterator(input_dir, pipeline_instance.input_type),
-      output_dir)
+  input_iterator = pipeline.tf_record_iterator(
+      input_dir, pipeline_instance.input_type)
+  checkpoint_interval = FLAGS.checkpoint_interval or None
+  if FLAGS.num_workers > 1:
+    pipeline.run_pipeline_parallel(
+        pipeline_instance, input_iterator, output_dir, FLAGS.num_workers,
+        checkpoint_interval=checkpoint_interval, resume=FLAGS.resume)
+  else:
+    pipeline.run_pipeline_serial(
+        pipeline_instance, input_iterator, output_dir,
+        checkpoint_interval=checkpoint_interval, resume=FLAGS.resume)
 
 
 def console_entry_point():
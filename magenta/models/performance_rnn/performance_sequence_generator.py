@@ -16,6 +16,7 @@
 from __future__ import division
 
 import ast
+import copy
 from functools import partial
 import math
 
@@ -88,6 +89,9 @@ class PerformanceRnnSequenceGenerator(mm.BaseSequenceGenerator):
     self.fill_generate_section = fill_generate_section
 
   def _generate(self, input_sequence, generator_options):
+    return self._generate_multiple(input_sequence, generator_options, 1)[0]
+
+  def _generate_multiple(self, input_sequence, generator_options, num_outputs):
     if len(generator_options.input_sections) > 1:
       raise mm.SequenceGeneratorException(
           'This model supports at most one input_sections message, but got %s' %
@@ -155,7 +159,8 @@ class PerformanceRnnSequenceGenerator(mm.BaseSequenceGenerator):
         'temperature': lambda arg: arg.float_value,
         'beam_size': lambda arg: arg.int_value,
         'branch_factor': lambda arg: arg.int_value,
-        'steps_per_iteration': lambda arg: arg.int_value
+        'steps_per_iteration': lambda arg: arg.int_value,
+        'fused_steps': lambda arg: arg.bool_value
     }
     args = dict((name, value_fn(generator_options.args[name]))
                 for name, value_fn in arg_types.items()
@@ -227,32 +232,48 @@ class PerformanceRnnSequenceGenerator(mm.BaseSequenceGenerator):
       # Primer is empty; let's just start with silence.
       performance.set_length(min(performance_lib.MAX_SHIFT_STEPS, total_steps))
 
-    while performance.num_steps < total_steps:
-      # Assume the average specified (or default) note density and 4 RNN steps
-      # per note. Can't know for sure until generation is finished because the
-      # number of notes per quantized step is variable.
-      note_density = max(1.0, mean_note_density)
-      steps_to_gen = total_steps - performance.num_steps
-      rnn_steps_to_gen = int(math.ceil(
-          4.0 * note_density * steps_to_gen / self.steps_per_second))
-      tf.logging.info(
-          'Need to generate %d more steps for this sequence, will try asking '
-          'for %d RNN steps' % (steps_to_gen, rnn_steps_to_gen))
-      performance = self._model.generate_performance(
-          len(performance) + rnn_steps_to_gen, performance, **args)
+    performances = [copy.deepcopy(performance) for _ in range(num_outputs)]
+    while True:
+      # Only the performances that are still too short are extended.
+      indices = [i for i, performance in enumerate(performances)
+                 if performance.num_steps < total_steps]
+      if not indices:
+        break
+
+      num_steps = []
+      for i in indices:
+        # Assume the average specified (or default) note density and 4 RNN
+        # steps per note. Can't know for sure until generation is finished
+        # because the number of notes per quantized step is variable.
+        note_density = max(1.0, mean_note_density)
+        steps_to_gen = total_steps - performances[i].num_steps
+        rnn_steps_to_gen = int(math.ceil(
+            4.0 * note_density * steps_to_gen / self.steps_per_second))
+        tf.logging.info(
+            'Need to generate %d more steps for this sequence, will try asking '
+            'for %d RNN steps' % (steps_to_gen, rnn_steps_to_gen))
+        num_steps.append(len(performances[i]) + rnn_steps_to_gen)
+
+      generated_performances = self._model.generate_performances(
+          num_steps, [performances[i] for i in indices], **args)
+      for i, performance in zip(indices, generated_performances):
+        performances[i] = performance
 
       if not self.fill_generate_section:
         # In the interest of speed just go through this loop once, which may not
         # entirely fill the generate section.
         break
 
-    performance.set_length(total_steps)
+    generated_sequences = []
+    for performance in performances:
+      performance.set_length(total_steps)
 
-    generated_sequence = performance.to_sequence(
-        max_note_duration=self.max_note_duration)
+      generated_sequence = performance.to_sequence(
+          max_note_duration=self.max_note_duration)
 
-    assert (generated_sequence.total_time - generate_section.end_time) <= 1e-5
-    return generated_sequence
+      assert (generated_sequence.total_time - generate_section.end_time) <= 1e-5
+      generated_sequences.append(generated_sequence)
+    return generated_sequences
 
 
 def _step_to_index(step, num_steps, num_segments):
@@ -43,6 +43,25 @@ tf.app.flags.DEFINE_float('eval_ratio', 0.1,
                           'Partition is randomly selected.')
 tf.app.flags.DEFINE_string('config', 'rnn-nade',
                            'Which config to use.')
+tf.app.flags.DEFINE_integer('num_workers', 1,
+                            'Number of worker processes to run the pipeline '
+                            'in. If greater than 1, each output dataset is '
+                            'written as that many TFRecord shards named '
+                            '<dataset>.tfrecord-NNNNN-of-NNNNN.')
+tf.app.flags.DEFINE_integer('checkpoint_interval', 0,
+                            'If positive, commit outputs and write a '
+                            'manifest to output_dir every this many inputs '
+                            '(per worker), so the run can be resumed with '
+                            '--resume.')
+tf.app.flags.DEFINE_boolean('resume', False,
+                            'Continue a run that was interrupted, starting '
+                            'after its last checkpoint. Requires the same '
+                            'flags as the interrupted run.')
+tf.app.flags.DEFINE_string('cache_dir', None,
+                           'Optional directory in which to cache the outputs '
+                           'of each pipeline stage. When rebuilding a dataset '
+                           'from the same input, only stages whose '
+                           'configuration changed are rerun.')
 tf.app.flags.DEFINE_string('log', 'INFO',
                            'The threshold for what messages will be logged '
                            'DEBUG, INFO, WARN, ERROR, or FATAL.')
@@ -68,7 +87,8 @@ class PianorollSequenceExtractor(pipeline.Pipeline):
     return pianoroll_seqs
 
 
-def get_pipeline(config, min_steps, max_steps, eval_ratio):
+def get_pipeline(config, min_steps, max_steps, eval_ratio,
+                 cache_dir=None):
   """Returns the Pipeline instance which creates the RNN dataset.
 
   Args:
@@ -76,6 +96,8 @@ def get_pipeline(config, min_steps, max_steps, eval_ratio):
     min_steps: Minimum number of steps for an extracted sequence.
     max_steps: Maximum number of steps for an extracted sequence.
     eval_ratio: Fraction of input to set aside for evaluation set.
+    cache_dir: Optional directory in which to cache the outputs of each
+        pipeline stage. See `dag_pipeline.DAGPipeline`.
 
   Returns:
     A pipeline.Pipeline instance.
@@ -110,24 +132,34 @@ def get_pipeline(config, min_steps, max_steps, eval_ratio):
     dag[encoder_pipeline] = pianoroll_extractor
     dag[dag_pipeline.DagOutput(mode + '_pianoroll_tracks')] = encoder_pipeline
 
-  return dag_pipeline.DAGPipeline(dag)
+  return dag_pipeline.DAGPipeline(dag, cache_dir=cache_dir)
 
 
 def main(unused_argv):
   tf.logging.set_verbosity(FLAGS.log)
 
+  cache_dir = (os.path.expanduser(FLAGS.cache_dir) if FLAGS.cache_dir
+               else None)
   pipeline_instance = get_pipeline(
       min_steps=80,  # 5 measures
       max_steps=2048,
       eval_ratio=FLAGS.eval_ratio,
-      config=pianoroll_rnn_nade_model.default_configs[FLAGS.config])
+      config=pianoroll_rnn_nade_model.default_configs[FLAGS.config],
+      cache_dir=cache_dir)
 
   input_dir = os.path.expanduser(FLAGS.input)
   output_dir = os.path.expanduser(FLAGS.output_dir)
-  pipeline.run_pipeline_serial(
-      pipeline_instance,
-      pipeline.tf_record_iterator(input_dir, pipeline_instance.input_type),
-      output_dir)
+  input_iterator = pipeline.tf_record_iterator(
+      input_dir, pipeline_instance.input_type)
+  checkpoint_interval = FLAGS.checkpoint_interval or None
+  if FLAGS.num_workers > 1:
+    pipeline.run_pipeline_parallel(
+        pipeline_instance, input_iterator, output_dir, FLAGS.num_workers,
+        checkpoint_interval=checkpoint_interval, resume=FLAGS.resume)
+  else:
+    pipeline.run_pipeline_serial(
+        pipeline_instance, input_iterator, output_dir,
+        checkpoint_interval=checkpoint_interval, resume=FLAGS.resume)
 
 
 def console_entry_point():
@@ -202,13 +202,13 @@ def run_with_flags(generator):
   tf.logging.info('primer_sequence: %s', primer_sequence)
   tf.logging.info('generator_options: %s', generator_options)
 
-  # Make the generate request num_outputs times and save the output as midi
+  # Generate num_outputs sequences together and save the output as midi
   # files.
   date_and_time = time.strftime('%Y-%m-%d_%H%M%S')
   digits = len(str(FLAGS.num_outputs))
-  for i in range(FLAGS.num_outputs):
-    generated_sequence = generator.generate(primer_sequence, generator_options)
-
+  generated_sequences = generator.generate_batch(
+      [primer_sequence] * FLAGS.num_outputs, generator_options)
+  for i, generated_sequence in enumerate(generated_sequences):
     midi_filename = '%s_%s.mid' % (date_and_time, str(i + 1).zfill(digits))
     midi_path = os.path.join(output_dir, midi_filename)
     magenta.music.sequence_proto_to_midi_file(generated_sequence, midi_path)
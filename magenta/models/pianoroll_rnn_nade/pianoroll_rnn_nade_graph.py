@@ -407,7 +407,8 @@ class RnnNade(object):
           zero_state)
 
 
-def build_graph(mode, config, sequence_example_file_paths=None):
+def build_graph(mode, config, sequence_example_file_paths=None,
+                bucket_boundaries=None):
   """Builds the TensorFlow graph.
 
   Args:
@@ -418,6 +419,9 @@ def build_graph(mode, config, sequence_example_file_paths=None):
     sequence_example_file_paths: A list of paths to TFRecord files containing
         tf.train.SequenceExample protos. Only needed for training and
         evaluation. May be a sharded file of the form.
+    bucket_boundaries: An optional increasing list of sequence lengths used to
+        group training and evaluation SequenceExamples into batches of similar
+        length. See `magenta.common.get_padded_batch`.
 
   Returns:
     A tf.Graph instance which contains the TF ops.
@@ -442,7 +446,7 @@ def build_graph(mode, config, sequence_example_file_paths=None):
     if mode == 'train' or mode == 'eval':
       inputs, _, lengths = magenta.common.get_padded_batch(
           sequence_example_file_paths, hparams.batch_size, input_size,
-          shuffle=mode == 'train')
+          shuffle=mode == 'train', bucket_boundaries=bucket_boundaries)
 
     elif mode == 'generate':
       inputs = tf.placeholder(tf.float32,
@@ -466,6 +470,11 @@ def build_graph(mode, config, sequence_example_file_paths=None):
           magenta.common.flatten_maybe_padded_sequences(inputs, lengths))
       predictions_flat = tf.to_float(tf.greater_equal(cond_probs, .5))
 
+      # The fraction of RNN steps in the batch that are not padding.
+      padding_efficiency = (
+          tf.to_float(tf.reduce_sum(lengths)) /
+          tf.to_float(tf.shape(inputs)[0] * tf.shape(inputs)[1]))
+
       if mode == 'train':
         loss = tf.reduce_mean(-log_probs)
         perplexity = tf.reduce_mean(tf.exp(log_probs))
@@ -489,6 +498,7 @@ def build_graph(mode, config, sequence_example_file_paths=None):
             'metrics/accuracy': accuracy,
             'metrics/precision': precision,
             'metrics/recall': recall,
+            'metrics/padding_efficiency': padding_efficiency,
         }
       elif mode == 'eval':
         vars_to_summarize, update_ops = tf.contrib.metrics.aggregate_metric_map(
@@ -501,6 +511,8 @@ def build_graph(mode, config, sequence_example_file_paths=None):
                     inputs_flat, predictions_flat),
                 'metrics/recall': tf.metrics.recall(
                     inputs_flat, predictions_flat),
+                'metrics/padding_efficiency': tf.metrics.mean(
+                    padding_efficiency),
             })
         for updates_op in update_ops.values():
           tf.add_to_collection('eval_ops', updates_op)
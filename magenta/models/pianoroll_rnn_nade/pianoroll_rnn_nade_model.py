@@ -14,6 +14,7 @@
 """RNN-NADE model."""
 
 # internal imports
+import numpy as np
 import tensorflow as tf
 
 import magenta
@@ -73,6 +74,42 @@ class PianorollRnnNadeModel(events_rnn_model.EventSequenceRnnModel):
 
     return final_state, loglik[:, 0]
 
+  def _prime_batch(self, pianoroll_sequences, inputs, initial_state,
+                   temperature):
+    """Feeds a batch of primer inputs through the RNN.
+
+    The RNN-NADE graph only computes the log-likelihood of its own samples, so
+    the log-likelihood of the primers is not evaluated.
+
+    Args:
+      pianoroll_sequences: A list of primer PianorollSequences. The list of
+          event sequences should have length equal to `self._batch_size()`.
+      inputs: A Python list of model inputs for all but the final event of each
+          primer, with length equal to `self._batch_size()`.
+      initial_state: A numpy array containing the initial RNN-NADE state, where
+          `initial_state.shape[0]` is equal to `self._batch_size()`.
+      temperature: Unused.
+
+    Returns:
+      final_state: The RNN-NADE state after the inputs, the same size as
+          `initial_state`.
+      loglik: A 1-D numpy array of zeros of length `self._batch_size()`.
+    """
+    graph_inputs = self._session.graph.get_collection('inputs')[0]
+    graph_initial_state = tuple(
+        self._session.graph.get_collection('initial_state'))
+    graph_final_state = tuple(
+        self._session.graph.get_collection('final_state'))
+
+    final_state = self._session.run(
+        graph_final_state,
+        {
+            graph_inputs: inputs,
+            graph_initial_state: initial_state,
+        })
+
+    return final_state, np.zeros(len(pianoroll_sequences))
+
   def generate_pianoroll_sequence(
       self, num_steps, primer_sequence, beam_size=1, branch_factor=1,
       steps_per_iteration=1):
@@ -96,6 +133,31 @@ class PianorollRnnNadeModel(events_rnn_model.EventSequenceRnnModel):
         beam_size=beam_size, branch_factor=branch_factor,
         steps_per_iteration=steps_per_iteration)
 
+  def generate_pianoroll_sequences(
+      self, num_steps, primer_sequences, beam_size=1, branch_factor=1,
+      steps_per_iteration=1):
+    """Generate several independent pianoroll tracks from primer tracks.
+
+    The tracks are generated together, sharing each model evaluation.
+
+    Args:
+      num_steps: A list containing the integer length in steps of each final
+          track, after generation. Includes the primer.
+      primer_sequences: A list of primer sequences, PianorollSequence objects.
+      beam_size: An integer, beam size to use when generating tracks via
+          beam search.
+      branch_factor: An integer, beam search branch factor to use.
+      steps_per_iteration: The number of steps to take per beam search
+          iteration.
+    Returns:
+      A list of the generated PianorollSequence objects, each of which begins
+      with the corresponding primer track.
+    """
+    return self._generate_events_batch(
+        num_steps=num_steps, primer_events=primer_sequences, temperature=None,
+        beam_size=beam_size, branch_factor=branch_factor,
+        steps_per_iteration=steps_per_iteration)
+
 
 default_configs = {
     'rnn-nade': events_rnn_model.EventSequenceRnnConfig(
@@ -43,6 +43,9 @@ class PianorollRnnNadeSequenceGenerator(mm.BaseSequenceGenerator):
     self.steps_per_quarter = steps_per_quarter
 
   def _generate(self, input_sequence, generator_options):
+    return self._generate_multiple(input_sequence, generator_options, 1)[0]
+
+  def _generate_multiple(self, input_sequence, generator_options, num_outputs):
     if len(generator_options.input_sections) > 1:
       raise mm.SequenceGeneratorException(
           'This model supports at most one input_sections message, but got %s' %
@@ -117,13 +120,16 @@ class PianorollRnnNadeSequenceGenerator(mm.BaseSequenceGenerator):
     total_steps = pianoroll_seq.num_steps + (
         generate_end_step - generate_start_step)
 
-    pianoroll_seq = self._model.generate_pianoroll_sequence(
-        total_steps, pianoroll_seq, **args)
-    pianoroll_seq.set_length(total_steps)
+    pianoroll_seqs = self._model.generate_pianoroll_sequences(
+        [total_steps] * num_outputs, [pianoroll_seq] * num_outputs, **args)
 
-    generated_sequence = pianoroll_seq.to_sequence(qpm=qpm)
-    assert (generated_sequence.total_time - generate_section.end_time) <= 1e-5
-    return generated_sequence
+    generated_sequences = []
+    for pianoroll_seq in pianoroll_seqs:
+      pianoroll_seq.set_length(total_steps)
+      generated_sequence = pianoroll_seq.to_sequence(qpm=qpm)
+      assert (generated_sequence.total_time - generate_section.end_time) <= 1e-5
+      generated_sequences.append(generated_sequence)
+    return generated_sequences
 
 
 def get_generator_map():
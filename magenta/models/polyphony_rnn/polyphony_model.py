@@ -26,7 +26,8 @@ class PolyphonyRnnModel(events_rnn_model.EventSequenceRnnModel):
 
   def generate_polyphonic_sequence(
       self, num_steps, primer_sequence, temperature=1.0, beam_size=1,
-      branch_factor=1, steps_per_iteration=1, modify_events_callback=None):
+      branch_factor=1, steps_per_iteration=1, modify_events_callback=None,
+      fused_steps=False):
     """Generate a polyphonic track from a primer polyphonic track.
 
     Args:
@@ -46,13 +47,51 @@ class PolyphonyRnnModel(events_rnn_model.EventSequenceRnnModel):
           None, will be called with 3 arguments after every event: the current
           EventSequenceEncoderDecoder, a list of current EventSequences, and a
           list of current encoded event inputs.
+      fused_steps: If True, sample several steps per session run when
+          possible. Faster, but gives different samples than per-step
+          generation for the same `np.random` seed.
     Returns:
       The generated PolyphonicSequence object (which begins with the provided
       primer track).
     """
     return self._generate_events(num_steps, primer_sequence, temperature,
                                  beam_size, branch_factor, steps_per_iteration,
-                                 modify_events_callback=modify_events_callback)
+                                 modify_events_callback=modify_events_callback,
+                                 fused_steps=fused_steps)
+
+  def generate_polyphonic_sequences(
+      self, num_steps, primer_sequences, temperature=1.0, beam_size=1,
+      branch_factor=1, steps_per_iteration=1, modify_events_callback=None,
+      fused_steps=False):
+    """Generate several independent polyphonic tracks from primer tracks.
+
+    The tracks are generated together, sharing each model evaluation.
+
+    Args:
+      num_steps: A list containing the integer length in steps of each final
+          track, after generation. Includes the primer.
+      primer_sequences: A list of primer sequences, PolyphonicSequence objects.
+      temperature: A float specifying how much to divide the logits by
+         before computing the softmax. Greater than 1.0 makes tracks more
+         random, less than 1.0 makes tracks less random.
+      beam_size: An integer, beam size to use when generating tracks via
+          beam search.
+      branch_factor: An integer, beam search branch factor to use.
+      steps_per_iteration: An integer, number of steps to take per beam search
+          iteration.
+      modify_events_callback: An optional callback for modifying the event list.
+          See `generate_polyphonic_sequence`.
+      fused_steps: If True, sample several steps per session run when
+          possible. Faster, but gives different samples than per-step
+          generation for the same `np.random` seed.
+    Returns:
+      A list of the generated PolyphonicSequence objects, each of which begins
+      with the corresponding primer track.
+    """
+    return self._generate_events_batch(
+        num_steps, primer_sequences, temperature, beam_size, branch_factor,
+        steps_per_iteration, modify_events_callback=modify_events_callback,
+        fused_steps=fused_steps)
 
   def polyphonic_sequence_log_likelihood(self, sequence):
     """Evaluate the log likelihood of a polyphonic sequence.
@@ -44,6 +44,30 @@ tf.app.flags.DEFINE_string('output_dir', None,
 tf.app.flags.DEFINE_float('eval_ratio', 0.1,
                           'Fraction of input to set aside for eval set. '
                           'Partition is randomly selected.')
+tf.app.flags.DEFINE_integer('num_workers', 1,
+                            'Number of worker processes to run the pipeline '
+                            'in. If greater than 1, each output dataset is '
+                            'written as that many TFRecord shards named '
+                            '<dataset>.tfrecord-NNNNN-of-NNNNN.')
+tf.app.flags.DEFINE_integer('checkpoint_interval', 0,
+                            'If positive, commit outputs and write a '
+                            'manifest to output_dir every this many inputs '
+                            '(per worker), so the run can be resumed with '
+                            '--resume.')
+tf.app.flags.DEFINE_boolean('resume', False,
+                            'Continue a run that was interrupted, starting '
+                            'after its last checkpoint. Requires the same '
+                            'flags as the interrupted run.')
+tf.app.flags.DEFINE_string('cache_dir', None,
+                           'Optional directory in which to cache the outputs '
+                           'of each pipeline stage. When rebuilding a dataset '
+                           'from the same input, only stages whose '
+                           'configuration changed are rerun.')
+tf.app.flags.DEFINE_boolean('sparse_inputs', False,
+                            'Write SequenceExamples in the compact sparse '
+                            'input format, which stores one-hot input '
+                            'positions instead of dense input vectors. '
+                            'Training detects the format automatically.')
 tf.app.flags.DEFINE_string('log', 'INFO',
                            'The threshold for what messages will be logged '
                            'DEBUG, INFO, WARN, ERROR, or FATAL.')
@@ -69,7 +93,8 @@ class PolyphonicSequenceExtractor(pipeline.Pipeline):
     return poly_seqs
 
 
-def get_pipeline(config, min_steps, max_steps, eval_ratio):
+def get_pipeline(config, min_steps, max_steps, eval_ratio,
+                 cache_dir=None, sparse_inputs=False):
   """Returns the Pipeline instance which creates the RNN dataset.
 
   Args:
@@ -77,6 +102,10 @@ def get_pipeline(config, min_steps, max_steps, eval_ratio):
     min_steps: Minimum number of steps for an extracted sequence.
     max_steps: Maximum number of steps for an extracted sequence.
     eval_ratio: Fraction of input to set aside for evaluation set.
+    cache_dir: Optional directory in which to cache the outputs of each
+        pipeline stage. See `dag_pipeline.DAGPipeline`.
+    sparse_inputs: If True, write SequenceExamples in the sparse input format.
+        See `sequence_example_lib.make_sparse_sequence_example`.
 
   Returns:
     A pipeline.Pipeline instance.
@@ -104,7 +133,7 @@ def get_pipeline(config, min_steps, max_steps, eval_ratio):
         min_steps=min_steps, max_steps=max_steps, name='PolyExtractor_' + mode)
     encoder_pipeline = encoder_decoder.EncoderPipeline(
         polyphony_lib.PolyphonicSequence, config.encoder_decoder,
-        name='EncoderPipeline_' + mode)
+        name='EncoderPipeline_' + mode, sparse_inputs=sparse_inputs)
 
     dag[time_change_splitter] = partitioner[mode + '_poly_tracks']
     dag[quantizer] = time_change_splitter
@@ -113,24 +142,35 @@ def get_pipeline(config, min_steps, max_steps, eval_ratio):
     dag[encoder_pipeline] = poly_extractor
     dag[dag_pipeline.DagOutput(mode + '_poly_tracks')] = encoder_pipeline
 
-  return dag_pipeline.DAGPipeline(dag)
+  return dag_pipeline.DAGPipeline(dag, cache_dir=cache_dir)
 
 
 def main(unused_argv):
   tf.logging.set_verbosity(FLAGS.log)
 
+  cache_dir = (os.path.expanduser(FLAGS.cache_dir) if FLAGS.cache_dir
+               else None)
   pipeline_instance = get_pipeline(
       min_steps=80,  # 5 measures
       max_steps=512,
       eval_ratio=FLAGS.eval_ratio,
-      config=polyphony_model.default_configs['polyphony'])
+      config=polyphony_model.default_configs['polyphony'],
+      cache_dir=cache_dir,
+      sparse_inputs=FLAGS.sparse_inputs)
 
   input_dir = os.path.expanduser(FLAGS.input)
   output_dir = os.path.expanduser(FLAGS.output_dir)
-  pipeline.run_pipeline_serial(
-      pipeline_instance,
-      pipeline.tf_record_iterator(input_dir, pipeline_instance.input_type),
-      output_dir)
+  input_iterator = pipeline.tf_record_iterator(
+      input_dir, pipeline_instance.input_type)
+  checkpoint_interval = FLAGS.checkpoint_interval or None
+  if FLAGS.num_workers > 1:
+    pipeline.run_pipeline_parallel(
+        pipeline_instance, input_iterator, output_dir, FLAGS.num_workers,
+        checkpoint_interval=checkpoint_interval, resume=FLAGS.resume)
+  else:
+    pipeline.run_pipeline_serial(
+        pipeline_instance, input_iterator, output_dir,
+        checkpoint_interval=checkpoint_interval, resume=FLAGS.resume)
 
 
 def console_entry_point():
@@ -49,6 +49,9 @@ class PolyphonyRnnSequenceGenerator(mm.BaseSequenceGenerator):
     self.steps_per_quarter = steps_per_quarter
 
   def _generate(self, input_sequence, generator_options):
+    return self._generate_multiple(input_sequence, generator_options, 1)[0]
+
+  def _generate_multiple(self, input_sequence, generator_options, num_outputs):
     if len(generator_options.input_sections) > 1:
       raise mm.SequenceGeneratorException(
           'This model supports at most one input_sections message, but got %s' %
@@ -125,7 +128,8 @@ class PolyphonyRnnSequenceGenerator(mm.BaseSequenceGenerator):
         'temperature': lambda arg: arg.float_value,
         'beam_size': lambda arg: arg.int_value,
         'branch_factor': lambda arg: arg.int_value,
-        'steps_per_iteration': lambda arg: arg.int_value
+        'steps_per_iteration': lambda arg: arg.int_value,
+        'fused_steps': lambda arg: arg.bool_value
     }
     args = dict((name, value_fn(generator_options.args[name]))
                 for name, value_fn in arg_types.items()
@@ -160,28 +164,45 @@ class PolyphonyRnnSequenceGenerator(mm.BaseSequenceGenerator):
     total_steps = poly_seq.num_steps + (
         generate_end_step - generate_start_step)
 
-    while poly_seq.num_steps < total_steps:
-      # Assume it takes ~5 rnn steps to generate one quantized step.
-      # Can't know for sure until generation is finished because the number of
-      # notes per quantized step is variable.
-      steps_to_gen = total_steps - poly_seq.num_steps
-      rnn_steps_to_gen = 5 * steps_to_gen
-      tf.logging.info(
-          'Need to generate %d more steps for this sequence, will try asking '
-          'for %d RNN steps' % (steps_to_gen, rnn_steps_to_gen))
-      poly_seq = self._model.generate_polyphonic_sequence(
-          len(poly_seq) + rnn_steps_to_gen, poly_seq, **args)
-    poly_seq.set_length(total_steps)
-
-    if generator_options.args['condition_on_primer'].bool_value:
-      generated_sequence = poly_seq.to_sequence(qpm=qpm)
-    else:
-      # Specify a base_note_sequence because the priming sequence was not
-      # included in poly_seq.
-      generated_sequence = poly_seq.to_sequence(
-          qpm=qpm, base_note_sequence=copy.deepcopy(primer_sequence))
-    assert (generated_sequence.total_time - generate_section.end_time) <= 1e-5
-    return generated_sequence
+    poly_seqs = [copy.deepcopy(poly_seq) for _ in range(num_outputs)]
+    while True:
+      # Only the sequences that are still too short are extended.
+      indices = [i for i, poly_seq in enumerate(poly_seqs)
+                 if poly_seq.num_steps < total_steps]
+      if not indices:
+        break
+
+      num_steps = []
+      for i in indices:
+        # Assume it takes ~5 rnn steps to generate one quantized step.
+        # Can't know for sure until generation is finished because the number
+        # of notes per quantized step is variable.
+        steps_to_gen = total_steps - poly_seqs[i].num_steps
+        rnn_steps_to_gen = 5 * steps_to_gen
+        tf.logging.info(
+            'Need to generate %d more steps for this sequence, will try asking '
+            'for %d RNN steps' % (steps_to_gen, rnn_steps_to_gen))
+        num_steps.append(len(poly_seqs[i]) + rnn_steps_to_gen)
+
+      generated_poly_seqs = self._model.generate_polyphonic_sequences(
+          num_steps, [poly_seqs[i] for i in indices], **args)
+      for i, poly_seq in zip(indices, generated_poly_seqs):
+        poly_seqs[i] = poly_seq
+
+    generated_sequences = []
+    for poly_seq in poly_seqs:
+      poly_seq.set_length(total_steps)
+
+      if generator_options.args['condition_on_primer'].bool_value:
+        generated_sequence = poly_seq.to_sequence(qpm=qpm)
+      else:
+        # Specify a base_note_sequence because the priming sequence was not
+        # included in poly_seq.
+        generated_sequence = poly_seq.to_sequence(
+            qpm=qpm, base_note_sequence=copy.deepcopy(primer_sequence))
+      assert (generated_sequence.total_time - generate_section.end_time) <= 1e-5
+      generated_sequences.append(generated_sequence)
+    return generated_sequences
 
 
 def _inject_melody(melody, start_step, encoder_decoder, event_sequences,
@@ -59,7 +59,67 @@ def make_rnn_cell(rnn_layer_sizes,
   return cell
 
 
-def build_graph(mode, config, sequence_example_file_paths=None):
+def _build_fused_generation(cell, initial_state, inputs, num_steps, temperature,
+                            uniforms, num_classes):
+  """Builds ops that generate several steps in a single session run.
+
+  Each step feeds the inputs to the RNN, samples a class from the softmax of
+  the logits divided by the temperature, and uses the one-hot vector of the
+  sampled class as the inputs for the next step. This requires the model inputs
+  for an event to be the one-hot vector of its class.
+
+  Classes are sampled by inverse transform sampling of uniform samples that are
+  fed to the graph, so that sampling is driven by the caller's random number
+  generator (e.g. a seeded `np.random`) rather than by TensorFlow's.
+
+  Args:
+    cell: The RNN cell, whose variables have already been created.
+    initial_state: The initial RNN state.
+    inputs: A float32 tensor of shape [batch_size, num_classes], the inputs for
+        the first step.
+    num_steps: A scalar int32 tensor, the number of steps to generate.
+    temperature: A scalar float32 tensor, the softmax temperature.
+    uniforms: A float32 tensor of shape [batch_size, num_steps] containing
+        uniform samples in [0, 1), one for each step of each sequence.
+    num_classes: The integer number of classes.
+
+  Returns:
+    samples: An int64 tensor of shape [batch_size, num_steps] containing the
+        sampled classes.
+    loglik: A float32 tensor of shape [batch_size] containing the total
+        log-likelihood of the sampled classes.
+    final_state: The RNN state after the final step.
+  """
+  batch_size = inputs.shape[0].value
+
+  def generate_step(i, step_inputs, state, samples, loglik):
+    with tf.variable_scope(tf.get_variable_scope(), reuse=True):
+      outputs, state = tf.nn.dynamic_rnn(
+          cell, tf.expand_dims(step_inputs, 1), initial_state=state)
+      logits = tf.contrib.layers.linear(
+          outputs[:, 0, :], num_classes, scope='fully_connected')
+    logits /= temperature
+    cdf = tf.cumsum(tf.nn.softmax(logits), axis=1)
+    sample = tf.minimum(
+        tf.reduce_sum(
+            tf.to_int64(cdf <= uniforms[:, i:i + 1] * cdf[:, -1:]), axis=1),
+        num_classes - 1)
+    sample_one_hot = tf.one_hot(sample, num_classes)
+    loglik += tf.reduce_sum(
+        tf.nn.log_softmax(logits) * sample_one_hot, axis=1)
+    return i + 1, sample_one_hot, state, samples.write(i, sample), loglik
+
+  _, _, final_state, samples, loglik = tf.while_loop(
+      lambda i, *unused_args: i < num_steps,
+      generate_step,
+      [tf.constant(0), inputs, initial_state,
+       tf.TensorArray(tf.int64, size=num_steps), tf.zeros([batch_size])])
+
+  return tf.transpose(samples.stack()), loglik, final_state
+
+
+def build_graph(mode, config, sequence_example_file_paths=None,
+                bucket_boundaries=None):
   """Builds the TensorFlow graph.
 
   Args:
@@ -70,6 +130,9 @@ def build_graph(mode, config, sequence_example_file_paths=None):
     sequence_example_file_paths: A list of paths to TFRecord files containing
         tf.train.SequenceExample protos. Only needed for training and
         evaluation.
+    bucket_boundaries: An optional increasing list of sequence lengths used to
+        group training and evaluation SequenceExamples into batches of similar
+        length. See `magenta.common.get_padded_batch`.
 
   Returns:
     A tf.Graph instance which contains the TF ops.
@@ -94,9 +157,14 @@ def build_graph(mode, config, sequence_example_file_paths=None):
     inputs, labels, lengths = None, None, None
 
     if mode == 'train' or mode == 'eval':
+      sparse_input_layout = None
+      if magenta.common.has_sparse_inputs(sequence_example_file_paths):
+        sparse_input_layout = (encoder_decoder.num_input_indices,
+                               encoder_decoder.dense_input_positions)
       inputs, labels, lengths = magenta.common.get_padded_batch(
           sequence_example_file_paths, hparams.batch_size, input_size,
-          shuffle=mode == 'train')
+          shuffle=mode == 'train', sparse_input_layout=sparse_input_layout,
+          bucket_boundaries=bucket_boundaries)
 
     elif mode == 'generate':
       inputs = tf.placeholder(tf.float32, [hparams.batch_size, None,
@@ -117,7 +185,8 @@ def build_graph(mode, config, sequence_example_file_paths=None):
 
     outputs_flat = magenta.common.flatten_maybe_padded_sequences(
         outputs, lengths)
-    logits_flat = tf.contrib.layers.linear(outputs_flat, num_classes)
+    logits_flat = tf.contrib.layers.linear(
+        outputs_flat, num_classes, scope='fully_connected')
 
     if mode == 'train' or mode == 'eval':
       labels_flat = magenta.common.flatten_maybe_padded_sequences(
@@ -143,6 +212,10 @@ def build_graph(mode, config, sequence_example_file_paths=None):
       num_steps = tf.py_func(
           batch_labels_to_num_steps, [labels, lengths], tf.float32)
 
+      # The fraction of RNN steps in the batch that are not padding.
+      padding_efficiency = (
+          tf.to_float(tf.reduce_sum(lengths)) / tf.to_float(tf.size(labels)))
+
       if mode == 'train':
         loss = tf.reduce_mean(softmax_cross_entropy)
         perplexity = tf.exp(loss)
@@ -171,6 +244,7 @@ def build_graph(mode, config, sequence_example_file_paths=None):
             'metrics/no_event_accuracy': no_event_accuracy,
             'metrics/loss_per_step': loss_per_step,
             'metrics/perplexity_per_step': perplexity_per_step,
+            'metrics/padding_efficiency': padding_efficiency,
         }
       elif mode == 'eval':
         vars_to_summarize, update_ops = tf.contrib.metrics.aggregate_metric_map(
@@ -188,6 +262,8 @@ def build_graph(mode, config, sequence_example_file_paths=None):
                 'metrics/loss_per_step': tf.metrics.mean(
                     tf.reduce_sum(softmax_cross_entropy) / num_steps,
                     weights=num_steps),
+                'metrics/padding_efficiency': tf.metrics.mean(
+                    padding_efficiency),
             })
         for updates_op in update_ops.values():
           tf.add_to_collection('eval_ops', updates_op)
@@ -217,4 +293,25 @@ def build_graph(mode, config, sequence_example_file_paths=None):
       for state in tf_nest.flatten(final_state):
         tf.add_to_collection('final_state', state)
 
+      if encoder_decoder.one_hot_class_inputs:
+        # Sampled classes can be fed back to the RNN without the
+        # encoder/decoder, so also add ops that generate several steps at once.
+        fused_inputs = tf.placeholder(
+            tf.float32, [hparams.batch_size, input_size])
+        fused_num_steps = tf.placeholder(tf.int32, [])
+        fused_uniforms = tf.placeholder(
+            tf.float32, [hparams.batch_size, None])
+        fused_samples, fused_loglik, fused_final_state = (
+            _build_fused_generation(
+                cell, initial_state, fused_inputs, fused_num_steps,
+                temperature, fused_uniforms, num_classes))
+
+        tf.add_to_collection('fused_inputs', fused_inputs)
+        tf.add_to_collection('fused_num_steps', fused_num_steps)
+        tf.add_to_collection('fused_uniforms', fused_uniforms)
+        tf.add_to_collection('fused_samples', fused_samples)
+        tf.add_to_collection('fused_loglik', fused_loglik)
+        for state in tf_nest.flatten(fused_final_state):
+          tf.add_to_collection('fused_final_state', state)
+
   return graph
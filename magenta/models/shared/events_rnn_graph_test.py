@@ -16,6 +16,7 @@
 import tempfile
 
 # internal imports
+import numpy as np
 import tensorflow as tf
 import magenta
 
@@ -52,10 +53,44 @@ class EventSequenceRNNGraphTest(tf.test.TestCase):
         sequence_example_file_paths=[self._sequence_file.name])
     self.assertTrue(isinstance(g, tf.Graph))
 
+  def testBuildTrainGraphWithBucketing(self):
+    g = events_rnn_graph.build_graph(
+        'train', self.config,
+        sequence_example_file_paths=[self._sequence_file.name],
+        bucket_boundaries=[32, 64, 128])
+    self.assertTrue(isinstance(g, tf.Graph))
+    with g.as_default():
+      self.assertEqual(
+          1, len(tf.get_collection('metrics/padding_efficiency')))
+
   def testBuildGenerateGraph(self):
     g = events_rnn_graph.build_graph('generate', self.config)
     self.assertTrue(isinstance(g, tf.Graph))
 
+  def testBuildGenerateGraphWithFusedGeneration(self):
+    self.config.hparams.batch_size = 2
+    g = events_rnn_graph.build_graph('generate', self.config)
+    with g.as_default():
+      (fused_inputs,) = tf.get_collection('fused_inputs')
+      (fused_num_steps,) = tf.get_collection('fused_num_steps')
+      (fused_uniforms,) = tf.get_collection('fused_uniforms')
+      (fused_samples,) = tf.get_collection('fused_samples')
+      (fused_loglik,) = tf.get_collection('fused_loglik')
+      (temperature,) = tf.get_collection('temperature')
+      with self.test_session() as sess:
+        sess.run(tf.global_variables_initializer())
+        feed_dict = {
+            fused_inputs: [[1.0] + [0.0] * 11, [0.0] * 11 + [1.0]],
+            fused_num_steps: 5, temperature: 1.0,
+            fused_uniforms: np.random.random_sample([2, 5])}
+        samples, loglik = sess.run([fused_samples, fused_loglik], feed_dict)
+        # The same uniform samples give the same classes.
+        samples_again = sess.run(fused_samples, feed_dict)
+    self.assertEqual((2, 5), samples.shape)
+    self.assertTrue(((samples >= 0) & (samples < 12)).all())
+    self.assertTrue((loglik < 0).all())
+    self.assertAllEqual(samples, samples_again)
+
   def testBuildGraphWithAttention(self):
     self.config.hparams.attn_length = 10
     g = events_rnn_graph.build_graph(
@@ -16,6 +16,7 @@
 import collections
 import copy
 import functools
+import hashlib
 
 # internal imports
 
@@ -23,17 +24,26 @@ import numpy as np
 from six.moves import range  # pylint: disable=redefined-builtin
 import tensorflow as tf
 
-from magenta.common import beam_search
+from magenta.common import beam_search_batch
+from magenta.common import LruCache
+from magenta.common import sampling
 from magenta.common import state_util
 from magenta.models.shared import events_rnn_graph
 import magenta.music as mm
 
+from tensorflow.python.util import nest as tf_nest
+
+# Default memory budget, in bytes, for caching the RNN state after each primer.
+DEFAULT_PRIMER_CACHE_BYTES = 32 * 1024 * 1024
+
 
 # Model state when generating event sequences, consisting of the next inputs to
 # feed the model, the current RNN state, the current control sequence (if
-# applicable), and state for the current control sequence (if applicable).
+# applicable), state for the current control sequence (if applicable), and the
+# encoder/decoder's incremental encoding state for the event sequence.
 ModelState = collections.namedtuple(
-    'ModelState', ['inputs', 'rnn_state', 'control_events', 'control_state'])
+    'ModelState', ['inputs', 'rnn_state', 'control_events', 'control_state',
+                   'encoder_state'])
 
 
 class EventSequenceRnnModelException(Exception):
@@ -61,6 +71,34 @@ def _extend_control_events_default(control_events, events, state):
   return state
 
 
+def _branch_event_sequence(event_sequence, model_state):
+  """Branches an event sequence and its model state for beam search.
+
+  Model inputs, RNN states, and encoding states are never modified in place,
+  so branches can share them. The event sequence and control event sequence are
+  BranchedEventSequences, which share their events with the new branches.
+
+  Args:
+    event_sequence: The BranchedEventSequence to branch.
+    model_state: The ModelState for `event_sequence`.
+
+  Returns:
+    A tuple containing the new event sequence branch and its model state.
+  """
+  control_events = model_state.control_events
+  if control_events is not None:
+    control_events = control_events.branch()
+  return event_sequence.branch(), model_state._replace(
+      control_events=control_events,
+      control_state=copy.deepcopy(model_state.control_state))
+
+
+def _primer_cache_entry_size(entry):
+  """Returns the size in bytes of a primer cache entry's RNN state."""
+  rnn_state, _ = entry
+  return sum(value.nbytes for value in tf_nest.flatten(rnn_state))
+
+
 class EventSequenceRnnModel(mm.BaseModel):
   """Class for RNN event sequence generation models.
 
@@ -69,15 +107,25 @@ class EventSequenceRnnModel(mm.BaseModel):
   at a later time.
   """
 
-  def __init__(self, config):
+  def __init__(self, config, primer_cache_bytes=DEFAULT_PRIMER_CACHE_BYTES):
     """Initialize the EventSequenceRnnModel.
 
     Args:
       config: An EventSequenceRnnConfig containing the encoder/decoder and
         HParams to use.
+      primer_cache_bytes: The memory budget in bytes for caching the RNN state
+        and log-likelihood after each primer, so that generating again from
+        the same primer doesn't feed it through the RNN again. If zero, nothing
+        is cached.
     """
     super(EventSequenceRnnModel, self).__init__()
     self._config = config
+    self._primer_cache = LruCache(primer_cache_bytes, _primer_cache_entry_size)
+
+  @property
+  def primer_cache(self):
+    """The LruCache of RNN states after primers, with hit/miss counters."""
+    return self._primer_cache
 
   def _build_graph_for_generation(self):
     return events_rnn_graph.build_graph('generate', self._config)
@@ -87,7 +135,7 @@ class EventSequenceRnnModel(mm.BaseModel):
     return self._session.graph.get_collection('inputs')[0].shape[0].value
 
   def _generate_step_for_batch(self, event_sequences, inputs, initial_state,
-                               temperature):
+                               temperature, sampler=None):
     """Extends a batch of event sequences by a single step each.
 
     This method modifies the event sequences in place.
@@ -101,6 +149,8 @@ class EventSequenceRnnModel(mm.BaseModel):
       initial_state: A numpy array containing the initial RNN state, where
           `initial_state.shape[0]` is equal to `self._batch_size()`.
       temperature: The softmax temperature.
+      sampler: An optional magenta.common.sampling.Sampler to sample the
+          softmax with.
 
     Returns:
       final_state: The final RNN state, a numpy array the same size as
@@ -138,22 +188,138 @@ class EventSequenceRnnModel(mm.BaseModel):
       loglik = np.zeros(len(event_sequences))
 
     indices = self._config.encoder_decoder.extend_event_sequences(
-        event_sequences, softmax)
+        event_sequences, softmax, sampler)
     p = softmax[range(len(event_sequences)), -1, indices]
 
     return final_state, loglik + np.log(p)
 
+  def _prime_batch(self, event_sequences, inputs, initial_state, temperature):
+    """Feeds a batch of primer inputs through the RNN.
+
+    Args:
+      event_sequences: A list of primer event sequences, each of which is a
+          Python list-like object. The list of event sequences should have
+          length equal to `self._batch_size()`.
+      inputs: A Python list of model inputs for all but the final event of each
+          primer, with length equal to `self._batch_size()`.
+      initial_state: A numpy array containing the initial RNN state, where
+          `initial_state.shape[0]` is equal to `self._batch_size()`.
+      temperature: The softmax temperature.
+
+    Returns:
+      final_state: The RNN state after the inputs, a numpy array the same size
+          as `initial_state`.
+      loglik: The log-likelihood of each primer event sequence, a 1-D numpy
+          array of length `self._batch_size()`.
+    """
+    graph_inputs = self._session.graph.get_collection('inputs')[0]
+    graph_initial_state = self._session.graph.get_collection('initial_state')
+    graph_final_state = self._session.graph.get_collection('final_state')
+    graph_softmax = self._session.graph.get_collection('softmax')[0]
+    graph_temperature = self._session.graph.get_collection('temperature')
+
+    feed_dict = {graph_inputs: inputs,
+                 tuple(graph_initial_state): initial_state}
+    # For backwards compatibility, we only try to pass temperature if the
+    # placeholder exists in the graph.
+    if graph_temperature:
+      feed_dict[graph_temperature[0]] = temperature
+    final_state, softmax = self._session.run(
+        [graph_final_state, graph_softmax], feed_dict)
+
+    loglik = self._config.encoder_decoder.evaluate_log_likelihood(
+        event_sequences, softmax)
+    return final_state, np.array(loglik)
+
+  def _primer_cache_key(self, primer_inputs, temperature):
+    """Returns the primer cache key for a primer's full-length inputs.
+
+    The model inputs encode the primer events and, for conditional models, the
+    control events, so together with the checkpoint and the softmax temperature
+    (which affects the log-likelihood) they determine the cached values.
+
+    Args:
+      primer_inputs: A list of model inputs for every event of the primer.
+      temperature: The softmax temperature.
+
+    Returns:
+      A hashable cache key.
+    """
+    primer_inputs = np.asarray(primer_inputs, dtype=np.float32)
+    return (self._checkpoint_id, primer_inputs.shape,
+            hashlib.sha1(primer_inputs.tobytes()).hexdigest(), temperature)
+
+  def _prime(self, event_sequences, inputs, temperature):
+    """Returns the RNN state and log-likelihood after each primer.
+
+    All but the final input of each primer are fed through the RNN, leaving the
+    final input to be fed by the first generation step. Results are cached, so
+    primers that were seen before are not fed through the RNN again, and
+    identical primers are only fed once.
+
+    Args:
+      event_sequences: A list of primer event sequences.
+      inputs: A list containing the full-length model inputs for each primer.
+      temperature: The softmax temperature.
+
+    Returns:
+      rnn_states: A list containing the RNN state after each primer.
+      logliks: A list containing the log-likelihood of each primer.
+    """
+    batch_size = self._batch_size()
+    graph_initial_state = self._session.graph.get_collection('initial_state')
+    zero_state = self._session.run(graph_initial_state)
+    rnn_states = state_util.unbatch(zero_state)[:1] * len(event_sequences)
+    logliks = [0.0] * len(event_sequences)
+
+    # Group the uncached primers by length, so they can be fed in batches.
+    uncached_primers = collections.OrderedDict()
+    for i, primer_inputs in enumerate(inputs):
+      if len(primer_inputs) < 2:
+        # A single event primer leaves the RNN in its zero state.
+        continue
+      key = self._primer_cache_key(primer_inputs, temperature)
+      cached = self._primer_cache.get(key)
+      if cached is not None:
+        rnn_states[i], logliks[i] = cached
+      else:
+        uncached_primers.setdefault(len(primer_inputs), {}).setdefault(
+            key, []).append(i)
+
+    for primers in uncached_primers.values():
+      keys = list(primers)
+      for start in range(0, len(keys), batch_size):
+        batch_keys = keys[start:start + batch_size]
+        # Feed the first instance of each primer, padding to fill the batch.
+        batch_indices = [primers[key][0] for key in batch_keys]
+        batch_indices += [batch_indices[-1]] * (batch_size - len(batch_keys))
+        batch_final_state, batch_loglik = self._prime_batch(
+            [event_sequences[i] for i in batch_indices],
+            [inputs[i][:-1] for i in batch_indices],
+            zero_state, temperature)
+        batch_rnn_states = state_util.unbatch(batch_final_state, batch_size)
+        for key, rnn_state, loglik in zip(
+            batch_keys, batch_rnn_states, batch_loglik):
+          # Copy the state so that the cache doesn't keep the whole batch.
+          rnn_state = tf_nest.map_structure(np.copy, rnn_state)
+          self._primer_cache.put(key, (rnn_state, loglik))
+          for i in primers[key]:
+            rnn_states[i] = rnn_state
+            logliks[i] = loglik
+
+    return rnn_states, logliks
+
   def _generate_step(self, event_sequences, model_states, logliks, temperature,
                      extend_control_events_callback=None,
-                     modify_events_callback=None):
+                     modify_events_callback=None, sampler=None):
     """Extends a list of event sequences by a single step each.
 
     This method modifies the event sequences in place. It also returns the
     modified event sequences and updated model states and log-likelihoods.
 
     Args:
-      event_sequences: A list of event sequence objects, which are extended by
-          this method.
+      event_sequences: A list of BranchedEventSequence objects, which are
+          extended by this method.
       model_states: A list of model states, each of which contains model inputs
           and initial RNN states.
       logliks: A list containing the current log-likelihood for each event
@@ -170,6 +336,8 @@ class EventSequenceRnnModel(mm.BaseModel):
           None, will be called with 3 arguments after every event: the current
           EventSequenceEncoderDecoder, a list of current EventSequences, and a
           list of current encoded event inputs.
+      sampler: An optional magenta.common.sampling.Sampler to sample the
+          softmax with.
 
     Returns:
       event_sequences: A list of extended event sequences. These are modified in
@@ -193,6 +361,8 @@ class EventSequenceRnnModel(mm.BaseModel):
         model_state.control_events for model_state in model_states]
     control_states = [
         model_state.control_state for model_state in model_states]
+    encoder_states = [
+        model_state.encoder_state for model_state in model_states]
 
     final_states = []
     logliks = np.array(logliks, dtype=np.float32)
@@ -200,7 +370,7 @@ class EventSequenceRnnModel(mm.BaseModel):
     # Add padding to fill the final batch.
     pad_amt = -len(event_sequences) % batch_size
     padded_event_sequences = event_sequences + [
-        copy.deepcopy(event_sequences[-1]) for _ in range(pad_amt)]
+        event_sequences[-1].branch() for _ in range(pad_amt)]
     padded_inputs = inputs + [inputs[-1]] * pad_amt
     padded_initial_states = initial_states + [initial_states[-1]] * pad_amt
 
@@ -212,12 +382,13 @@ class EventSequenceRnnModel(mm.BaseModel):
           padded_event_sequences[i:j],
           padded_inputs[i:j],
           state_util.batch(padded_initial_states[i:j], batch_size),
-          temperature)
-      final_states += state_util.unbatch(
+          temperature, sampler)
+      final_states += state_util.unbatch_rows(
           batch_final_state, batch_size)[:j - i - pad_amt]
       logliks[i:j - pad_amt] += batch_loglik[:j - i - pad_amt]
 
-    # Construct inputs for next step.
+    # Construct inputs for next step, encoding only the new event of each
+    # sequence.
     if extend_control_events_callback is not None:
       # We are conditioning on control sequences.
       for idx in range(len(control_sequences)):
@@ -225,11 +396,13 @@ class EventSequenceRnnModel(mm.BaseModel):
         # corresponding event sequence.
         control_states[idx] = extend_control_events_callback(
             control_sequences[idx], event_sequences[idx], control_states[idx])
-      next_inputs = self._config.encoder_decoder.get_inputs_batch(
-          control_sequences, event_sequences)
+      next_inputs, encoder_states = (
+          self._config.encoder_decoder.get_next_inputs_batch(
+              control_sequences, event_sequences, encoder_states))
     else:
-      next_inputs = self._config.encoder_decoder.get_inputs_batch(
-          event_sequences)
+      next_inputs, encoder_states = (
+          self._config.encoder_decoder.get_next_inputs_batch(
+              event_sequences, encoder_states))
 
     if modify_events_callback:
       # Modify event sequences and inputs for next step.
@@ -238,10 +411,114 @@ class EventSequenceRnnModel(mm.BaseModel):
 
     model_states = [ModelState(inputs=inputs, rnn_state=final_state,
                                control_events=control_events,
-                               control_state=control_state)
-                    for inputs, final_state, control_events, control_state
-                    in zip(next_inputs, final_states,
-                           control_sequences, control_states)]
+                               control_state=control_state,
+                               encoder_state=encoder_state)
+                    for (inputs, final_state, control_events, control_state,
+                         encoder_state)
+                    in zip(next_inputs, final_states, control_sequences,
+                           control_states, encoder_states)]
+
+    return event_sequences, model_states, logliks
+
+  def _can_generate_fused(self):
+    """Returns whether the graph has ops for generating several steps at once.
+
+    These ops are only built for encoder/decoders whose inputs are the one-hot
+    vectors of the sampled classes; graphs from older bundles may lack them.
+    """
+    return bool(self._session.graph.get_collection('fused_uniforms'))
+
+  def _generate_steps_fused(self, event_sequences, model_states, logliks,
+                            num_steps, temperature):
+    """Extends a list of event sequences by several steps each.
+
+    All steps are sampled inside the graph, so each batch of event sequences is
+    extended with a single session run rather than one per step. Only usable
+    when no events need to be modified or conditioned on between steps. The
+    graph samples from uniform samples drawn with `np.random`, so seeding
+    `np.random` makes generation reproducible, although the samples differ from
+    those of per-step generation with the same seed.
+
+    This method modifies the event sequences in place. It also returns the
+    modified event sequences and updated model states and log-likelihoods.
+
+    Args:
+      event_sequences: A list of BranchedEventSequence objects, which are
+          extended by this method.
+      model_states: A list of model states, each of which contains model inputs
+          and initial RNN states.
+      logliks: A list containing the current log-likelihood for each event
+          sequence.
+      num_steps: The integer number of steps to generate.
+      temperature: The softmax temperature.
+
+    Returns:
+      event_sequences: A list of extended event sequences. These are modified in
+          place but also returned.
+      final_states: A list of resulting model states, containing model inputs
+          for the next step along with RNN states for each event sequence.
+      logliks: A list containing the updated log-likelihood for each event
+          sequence.
+    """
+    graph = self._session.graph
+    graph_initial_state = graph.get_collection('initial_state')
+    graph_temperature = graph.get_collection('temperature')[0]
+    graph_fused_inputs = graph.get_collection('fused_inputs')[0]
+    graph_fused_num_steps = graph.get_collection('fused_num_steps')[0]
+    graph_fused_uniforms = graph.get_collection('fused_uniforms')[0]
+    graph_fused_samples = graph.get_collection('fused_samples')[0]
+    graph_fused_loglik = graph.get_collection('fused_loglik')[0]
+    graph_fused_final_state = graph.get_collection('fused_final_state')
+
+    batch_size = self._batch_size()
+    num_seqs = len(event_sequences)
+
+    # Only the final input of each sequence is fed, as the inputs for later
+    # steps are computed inside the graph.
+    inputs = [model_state.inputs[-1] for model_state in model_states]
+    initial_states = [model_state.rnn_state for model_state in model_states]
+    encoder_states = [
+        model_state.encoder_state for model_state in model_states]
+
+    final_states = []
+    logliks = np.array(logliks, dtype=np.float32)
+
+    # Add padding to fill the final batch.
+    pad_amt = -num_seqs % batch_size
+    padded_inputs = inputs + [inputs[-1]] * pad_amt
+    padded_initial_states = initial_states + [initial_states[-1]] * pad_amt
+
+    for i in range(0, num_seqs, batch_size):
+      j = min(i + batch_size, num_seqs)
+      feed_dict = {
+          graph_fused_inputs: padded_inputs[i:i + batch_size],
+          tuple(graph_initial_state): state_util.batch(
+              padded_initial_states[i:i + batch_size], batch_size),
+          graph_temperature: temperature,
+          graph_fused_num_steps: num_steps,
+          graph_fused_uniforms: np.random.random_sample(
+              [batch_size, num_steps])}
+      samples, batch_loglik, batch_final_state = self._session.run(
+          [graph_fused_samples, graph_fused_loglik, graph_fused_final_state],
+          feed_dict)
+      final_states += state_util.unbatch_rows(
+          batch_final_state, batch_size)[:j - i]
+      logliks[i:j] += batch_loglik[:j - i]
+      for events, class_indices in zip(
+          event_sequences[i:j], samples.tolist()):
+        for class_index in class_indices:
+          events.append(self._config.encoder_decoder.class_index_to_event(
+              class_index, events))
+
+    next_inputs, encoder_states = (
+        self._config.encoder_decoder.get_next_inputs_batch(
+            event_sequences, encoder_states))
+
+    model_states = [
+        model_state._replace(inputs=next_input, rnn_state=final_state,
+                             encoder_state=encoder_state)
+        for model_state, next_input, final_state, encoder_state
+        in zip(model_states, next_inputs, final_states, encoder_states)]
 
     return event_sequences, model_states, logliks
 
@@ -250,7 +527,8 @@ class EventSequenceRnnModel(mm.BaseModel):
                        control_events=None, control_state=None,
                        extend_control_events_callback=(
                            _extend_control_events_default),
-                       modify_events_callback=None):
+                       modify_events_callback=None, top_k=None, top_p=None,
+                       sampled_pruning=False, fused_steps=False):
     """Generate an event sequence from a primer sequence.
 
     Args:
@@ -285,13 +563,100 @@ class EventSequenceRnnModel(mm.BaseModel):
           None, will be called with 3 arguments after every event: the current
           EventSequenceEncoderDecoder, a list of current EventSequences, and a
           list of current encoded event inputs.
+      top_k: If not None, sample each event from only this many most probable
+          events.
+      top_p: If not None, sample each event from the smallest set of most
+          probable events with at least this total probability. At most one of
+          `top_k` and `top_p` can be specified.
+      sampled_pruning: If True, prune each beam by sampling entries in
+          proportion to their likelihood rather than keeping the most likely
+          entries. This is a heuristic; see `beam_search.beam_search_batch`.
+      fused_steps: If True and the graph supports it, sample all the steps of
+          each beam search iteration inside the graph with a single session
+          run, when no events are modified or conditioned on and neither
+          `top_k` nor `top_p` is specified. This is faster, but the samples
+          differ from those of per-step generation with the same `np.random`
+          seed.
 
     Returns:
       The generated event sequence (which begins with the provided primer).
 
     Raises:
       EventSequenceRnnModelException: If the primer sequence has zero length or
-          is not shorter than num_steps.
+          is not shorter than num_steps, or if both `top_k` and `top_p` are
+          specified.
+    """
+    return self._generate_events_batch(
+        [num_steps], [primer_events], temperature, beam_size, branch_factor,
+        steps_per_iteration, control_events=control_events,
+        control_state=control_state,
+        extend_control_events_callback=extend_control_events_callback,
+        modify_events_callback=modify_events_callback, top_k=top_k,
+        top_p=top_p, sampled_pruning=sampled_pruning,
+        fused_steps=fused_steps)[0]
+
+  def _generate_events_batch(self, num_steps, primer_events, temperature=1.0,
+                             beam_size=1, branch_factor=1,
+                             steps_per_iteration=1, control_events=None,
+                             control_state=None,
+                             extend_control_events_callback=(
+                                 _extend_control_events_default),
+                             modify_events_callback=None, top_k=None,
+                             top_p=None, sampled_pruning=False,
+                             fused_steps=False):
+    """Generate several independent event sequences from primer sequences.
+
+    Runs a separate beam search for each primer sequence, but extends the
+    sequences of all beam searches together so that each model evaluation is
+    shared by as many sequences as the model batch size allows. Primers with
+    the same number of steps to generate are searched together. Each primer is
+    first fed through the RNN, unless its resulting state is in the primer
+    cache.
+
+    If `fused_steps` is True, no events are modified or conditioned on during
+    generation, and the graph supports it, each beam search iteration samples
+    all of its steps inside the graph. Otherwise the model is evaluated once
+    per step.
+
+    Args:
+      num_steps: A list containing, for each primer sequence, the integer
+          length in steps of the final event sequence, after generation.
+          Includes the primer.
+      primer_events: A list of primer event sequences, each a Python list-like
+          object.
+      temperature: A float specifying how much to divide the logits by
+         before computing the softmax. Greater than 1.0 makes events more
+         random, less than 1.0 makes events less random.
+      beam_size: An integer, beam size to use when generating event sequences
+          via beam search.
+      branch_factor: An integer, beam search branch factor to use.
+      steps_per_iteration: An integer, number of steps to take per beam search
+          iteration.
+      control_events: A sequence of control events upon which to condition the
+          generation of every event sequence, or None. Each event sequence is
+          conditioned on its own copy. See `_generate_events`.
+      control_state: Initial state used by `extend_control_events_callback`.
+      extend_control_events_callback: A function that extends a control event
+          sequence. See `_generate_events`.
+      modify_events_callback: An optional callback for modifying the event list.
+          See `_generate_events`.
+      top_k: If not None, sample each event from only this many most probable
+          events. See `_generate_events`.
+      top_p: If not None, sample each event from the most probable events with
+          at least this total probability. See `_generate_events`.
+      sampled_pruning: Whether to prune beams by sampling. See
+          `_generate_events`.
+      fused_steps: Whether to sample several steps inside the graph when
+          possible. See `_generate_events`.
+
+    Returns:
+      A list of the generated event sequences, in the order of
+      `primer_events`. Each begins with its primer.
+
+    Raises:
+      EventSequenceRnnModelException: If any primer sequence has zero length or
+          is not shorter than its number of steps, or if the sampling options
+          are invalid.
     """
     if (control_events is not None and
         not isinstance(self._config.encoder_decoder,
@@ -304,66 +669,121 @@ class EventSequenceRnnModel(mm.BaseModel):
           'must provide callback for extending control sequence (or use'
           'default)')
 
-    if not primer_events:
-      raise EventSequenceRnnModelException(
-          'primer sequence must have non-zero length')
-    if len(primer_events) >= num_steps:
-      raise EventSequenceRnnModelException(
-          'primer sequence must be shorter than `num_steps`')
-
-    if len(primer_events) >= num_steps:
-      # Sequence is already long enough, no need to generate.
-      return primer_events
-
-    event_sequences = [copy.deepcopy(primer_events)]
-
-    # Construct inputs for first step after primer.
-    if control_events is not None:
-      # We are conditioning on a control sequence. Make sure it is longer than
-      # the primer sequence.
-      control_state = extend_control_events_callback(
-          control_events, primer_events, control_state)
-      inputs = self._config.encoder_decoder.get_inputs_batch(
-          [control_events], event_sequences, full_length=True)
-    else:
-      inputs = self._config.encoder_decoder.get_inputs_batch(
-          event_sequences, full_length=True)
-
-    if modify_events_callback:
-      # Modify event sequences and inputs for first step after primer.
-      modify_events_callback(
-          self._config.encoder_decoder, event_sequences, inputs)
-
-    graph_initial_state = self._session.graph.get_collection('initial_state')
-    initial_states = state_util.unbatch(self._session.run(graph_initial_state))
-
-    # Beam search will maintain a state for each sequence consisting of the next
-    # inputs to feed the model, and the current RNN state. We start out with the
-    # initial full inputs batch and the zero state.
-    initial_state = ModelState(
-        inputs=inputs[0], rnn_state=initial_states[0],
-        control_events=control_events, control_state=control_state)
-
-    events, _, loglik = beam_search(
-        initial_sequence=event_sequences[0],
-        initial_state=initial_state,
-        generate_step_fn=functools.partial(
-            self._generate_step,
-            temperature=temperature,
-            extend_control_events_callback=(
-                extend_control_events_callback
-                if control_events is not None
-                else None),
-            modify_events_callback=modify_events_callback),
-        num_steps=num_steps - len(primer_events),
-        beam_size=beam_size,
-        branch_factor=branch_factor,
-        steps_per_iteration=steps_per_iteration)
-
-    tf.logging.info('Beam search yields sequence with log-likelihood: %f ',
-                    loglik)
-
-    return events
+    for events, steps in zip(primer_events, num_steps):
+      if not events:
+        raise EventSequenceRnnModelException(
+            'primer sequence must have non-zero length')
+      if len(events) >= steps:
+        raise EventSequenceRnnModelException(
+            'primer sequence must be shorter than `num_steps`')
+
+    # Group the primers that can be searched together, i.e. those with the same
+    # number of steps to generate.
+    groups = collections.OrderedDict()
+    for i, (events, steps) in enumerate(zip(primer_events, num_steps)):
+      groups.setdefault(steps - len(events), []).append(i)
+
+    try:
+      sampler = sampling.create_sampler(top_k=top_k, top_p=top_p)
+    except ValueError as e:
+      raise EventSequenceRnnModelException(e)
+
+    # Sampling several steps inside the graph skips the Python-side encoding
+    # between steps, so it can't be used when events are modified or control
+    # events are extended along the way. The graph also only samples from the
+    # full softmax.
+    generate_steps_fn = None
+    if (fused_steps and control_events is None and
+        modify_events_callback is None and top_k is None and top_p is None and
+        self._can_generate_fused()):
+      generate_steps_fn = functools.partial(
+          self._generate_steps_fused, temperature=temperature)
+
+    generated_events = [None] * len(primer_events)
+    for num_generate_steps, indices in groups.items():
+      event_sequences = [copy.deepcopy(primer_events[i]) for i in indices]
+
+      # Construct inputs for first step after primer.
+      if control_events is not None:
+        # We are conditioning on a control sequence. Make sure each copy is
+        # longer than the primer sequence.
+        control_sequences = [copy.deepcopy(control_events) for _ in indices]
+        control_states = [
+            extend_control_events_callback(
+                control_sequence, events, copy.deepcopy(control_state))
+            for control_sequence, events
+            in zip(control_sequences, event_sequences)]
+        inputs = self._config.encoder_decoder.get_inputs_batch(
+            control_sequences, event_sequences, full_length=True)
+      else:
+        control_sequences = [None] * len(indices)
+        control_states = [control_state] * len(indices)
+        inputs = self._config.encoder_decoder.get_inputs_batch(
+            event_sequences, full_length=True)
+
+      if modify_events_callback:
+        # Modify event sequences and inputs for first step after primer.
+        modify_events_callback(
+            self._config.encoder_decoder, event_sequences, inputs)
+
+      # Beam search branches the event and control sequences without copying
+      # them, sharing the events generated so far between branches.
+      event_sequences = [
+          mm.BranchedEventSequence(events) for events in event_sequences]
+      control_sequences = [
+          mm.BranchedEventSequence(control_sequence)
+          if control_sequence is not None else None
+          for control_sequence in control_sequences]
+
+      # Feed all but the final input of each primer through the RNN, or look
+      # up the resulting state in the primer cache.
+      primer_rnn_states, primer_logliks = self._prime(
+          event_sequences, inputs, temperature)
+
+      # Beam search will maintain a state for each sequence consisting of the
+      # next inputs to feed the model, the current RNN state, and the encoding
+      # state. We start out with the final primer input, the RNN state after
+      # the rest of the primer, and the encoding state after the primer.
+      initial_states = [
+          ModelState(inputs=sequence_inputs[-1:], rnn_state=rnn_state,
+                     control_events=control_sequence,
+                     control_state=sequence_control_state,
+                     encoder_state=(
+                         self._config.encoder_decoder.get_encoder_state(
+                             events)))
+          for (sequence_inputs, rnn_state, control_sequence,
+               sequence_control_state, events)
+          in zip(inputs, primer_rnn_states, control_sequences, control_states,
+                 event_sequences)]
+
+      results = beam_search_batch(
+          initial_sequences=event_sequences,
+          initial_states=initial_states,
+          generate_step_fn=functools.partial(
+              self._generate_step,
+              temperature=temperature,
+              extend_control_events_callback=(
+                  extend_control_events_callback
+                  if control_events is not None
+                  else None),
+              modify_events_callback=modify_events_callback,
+              sampler=sampler),
+          num_steps=num_generate_steps,
+          beam_size=beam_size,
+          branch_factor=branch_factor,
+          steps_per_iteration=steps_per_iteration,
+          branch_fn=_branch_event_sequence,
+          generate_steps_fn=generate_steps_fn,
+          sampled_pruning=sampled_pruning)
+
+      for i, primer_loglik, (events, _, loglik) in zip(
+          indices, primer_logliks, results):
+        tf.logging.info(
+            'Beam search yields sequence with log-likelihood: %f ',
+            primer_loglik + loglik)
+        generated_events[i] = events.materialize()
+
+    return generated_events
 
   def _evaluate_batch_log_likelihood(self, event_sequences, inputs,
                                      initial_state):
@@ -465,8 +885,8 @@ class EventSequenceRnnModel(mm.BaseModel):
       pad_size = batch_size - num_extra
       batch_indices = range(offset, len(event_sequences))
       batch_loglik = self._evaluate_batch_log_likelihood(
-          [event_sequences[i] for i in batch_indices] + [
-              copy.deepcopy(event_sequences[-1]) for _ in range(pad_size)],
+          [event_sequences[i] for i in batch_indices] +
+          [event_sequences[-1]] * pad_size,
           [inputs[i] for i in batch_indices] + inputs[-1] * pad_size,
           np.append(initial_state[batch_indices],
                     np.tile(inputs[-1, :], (pad_size, 1)),
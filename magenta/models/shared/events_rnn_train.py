@@ -48,6 +48,9 @@ def run_training(graph, train_dir, num_training_steps=None,
         'Perplexity': perplexity,
         'Accuracy': accuracy
     }
+    padding_efficiency = tf.get_collection('metrics/padding_efficiency')
+    if padding_efficiency:
+      logging_dict['Padding Efficiency'] = padding_efficiency[0]
     hooks = [
         tf.train.NanTensorHook(loss),
         tf.train.LoggingTensorHook(
@@ -48,6 +48,7 @@ from magenta.music.encoder_decoder import MultipleEventSequenceEncoder
 from magenta.music.encoder_decoder import OneHotEncoding
 from magenta.music.encoder_decoder import OneHotEventSequenceEncoderDecoder
 
+from magenta.music.events_lib import BranchedEventSequence
 from magenta.music.events_lib import NonIntegerStepsPerBarException
 
 from magenta.music.lead_sheets_lib import extract_lead_sheet_fragments
@@ -80,6 +81,8 @@ from magenta.music.musicxml_reader import musicxml_file_to_sequence_proto
 from magenta.music.musicxml_reader import musicxml_to_sequence_proto
 from magenta.music.musicxml_reader import MusicXMLConversionError
 
+from magenta.music.note_array import NoteArray
+
 from magenta.music.notebook_utils import play_sequence
 from magenta.music.notebook_utils import plot_sequence
 
@@ -95,6 +98,9 @@ from magenta.music.sequence_generator import SequenceGeneratorException
 from magenta.music.sequence_generator_bundle import GeneratorBundleParseException
 from magenta.music.sequence_generator_bundle import read_bundle_file
 
+from magenta.music.sequence_generator_server import SequenceGeneratorServer
+from magenta.music.sequence_generator_server import SequenceGeneratorServerException
+
 from magenta.music.sequences_lib import apply_sustain_control_changes
 from magenta.music.sequences_lib import BadTimeSignatureException
 from magenta.music.sequences_lib import extract_subsequence
@@ -48,6 +48,7 @@ from __future__ import division
 from __future__ import print_function
 
 import abc
+import collections
 
 # internal imports
 
@@ -55,6 +56,7 @@ import numpy as np
 from six.moves import range  # pylint: disable=redefined-builtin
 import tensorflow as tf
 
+from magenta.common import sampling
 from magenta.common import sequence_example_lib
 from magenta.music import constants
 from magenta.pipelines import pipeline
@@ -64,6 +66,65 @@ DEFAULT_STEPS_PER_BAR = constants.DEFAULT_STEPS_PER_BAR
 DEFAULT_LOOKBACK_DISTANCES = [DEFAULT_STEPS_PER_BAR, DEFAULT_STEPS_PER_BAR * 2]
 
 
+def _concatenate_sparse_inputs(encoders, sparse_inputs):
+  """Concatenates sparse inputs from multiple encoders.
+
+  Args:
+    encoders: A list of encoders whose input vectors are concatenated, in
+        order.
+    sparse_inputs: A list of (input_indices, dense_inputs) tuples, one for each
+        encoder, as returned by `events_to_sparse_input_array`.
+
+  Returns:
+    A tuple (input_indices, dense_inputs) for the concatenated input vectors.
+  """
+  all_input_indices = []
+  all_dense_inputs = []
+  offset = 0
+  for encoder, (input_indices, dense_inputs) in zip(encoders, sparse_inputs):
+    all_input_indices.append(
+        np.where(input_indices >= 0, input_indices + offset, input_indices))
+    all_dense_inputs.append(dense_inputs)
+    offset += encoder.input_size
+  return (np.concatenate(all_input_indices, axis=1),
+          np.concatenate(all_dense_inputs, axis=1))
+
+
+def _concatenate_dense_input_positions(encoders):
+  """Returns the dense input positions of concatenated encoder inputs."""
+  dense_input_positions = []
+  offset = 0
+  for encoder in encoders:
+    dense_input_positions.extend(
+        offset + position for position in encoder.dense_input_positions)
+    offset += encoder.input_size
+  return dense_input_positions
+
+
+def _sample_final_softmax(softmax, sampler=None):
+  """Samples a class index from the final softmax vector of each sequence.
+
+  Draws all samples at once from the batch of final softmax vectors. By default
+  this is done by inverse transform sampling: one uniform sample per sequence is
+  located in the cumulative distribution of its final softmax vector. This
+  consumes the same random numbers as calling `np.random.choice` for each
+  sequence in turn, and gives the same results.
+
+  Args:
+    softmax: A list (or NumPy array) of softmax probability vector sequences,
+        one for each event sequence. Only the final vector of each is used.
+    sampler: An optional magenta.common.sampling.Sampler to draw the samples
+        with, e.g. to sample from only the most probable classes.
+
+  Returns:
+    A Python list of sampled integer class indices, one for each sequence.
+  """
+  if sampler is None:
+    sampler = sampling.Sampler()
+  final_softmax = np.array([probs[-1] for probs in softmax], dtype=np.float64)
+  return sampler.sample(final_softmax).tolist()
+
+
 class OneHotEncoding(object):
   """An interface for specifying a one-hot encoding of individual events."""
   __metaclass__ = abc.ABCMeta
@@ -240,6 +301,58 @@ class EventSequenceEncoderDecoder(object):
     """
     return len(labels)
 
+  def events_to_input_array(self, events):
+    """Returns the input vectors for every position in the event sequence.
+
+    Subclasses that can encode a whole sequence at once should override this
+    method; the default implementation calls self.events_to_input for each
+    position.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      A float32 NumPy array of shape [len(events), self.input_size] whose row
+      `i` is the input vector for position `i`.
+    """
+    inputs = np.zeros([len(events), self.input_size], dtype=np.float32)
+    for i in range(len(events)):
+      inputs[i] = self.events_to_input(events, i)
+    return inputs
+
+  def events_to_label_array(self, events):
+    """Returns the labels for every position in the event sequence.
+
+    Subclasses that can encode a whole sequence at once should override this
+    method; the default implementation calls self.events_to_label for each
+    position.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      An int64 NumPy array of shape [len(events)] whose element `i` is the label
+      for position `i`.
+    """
+    return np.array([self.events_to_label(events, i)
+                     for i in range(len(events))], dtype=np.int64)
+
+  def encode_array(self, events):
+    """Returns NumPy arrays of inputs and labels for the given event sequence.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      inputs: A float32 NumPy array of shape [len(events) - 1, self.input_size]
+          containing the input vector for each event but the last.
+      labels: An int64 NumPy array of shape [len(events) - 1] containing the
+          label for each event but the first.
+    """
+    inputs = self.events_to_input_array(events)
+    labels = self.events_to_label_array(events)
+    return inputs[:-1], labels[1:]
+
   def encode(self, events):
     """Returns a SequenceExample for the given event sequence.
 
@@ -249,13 +362,95 @@ class EventSequenceEncoderDecoder(object):
     Returns:
       A tf.train.SequenceExample containing inputs and labels.
     """
-    inputs = []
-    labels = []
-    for i in range(len(events) - 1):
-      inputs.append(self.events_to_input(events, i))
-      labels.append(self.events_to_label(events, i + 1))
+    inputs, labels = self.encode_array(events)
     return sequence_example_lib.make_sequence_example(inputs, labels)
 
+  @property
+  def one_hot_class_inputs(self):
+    """Whether the input vector for each event is the one-hot of its label.
+
+    When True, the model can feed each sampled class straight back to itself
+    as the next input without decoding it, so generation can take several
+    steps per model evaluation. The default implementation returns False.
+
+    Returns:
+      A boolean.
+    """
+    return False
+
+  @property
+  def num_input_indices(self):
+    """The number of one-hot input indices per step in the sparse format.
+
+    In the sparse input format, each input vector is stored as the positions
+    of its one-hot entries plus the values at self.dense_input_positions. The
+    default implementation stores every input value densely.
+
+    Returns:
+      An integer, the number of one-hot positions stored per step.
+    """
+    return 0
+
+  @property
+  def dense_input_positions(self):
+    """The input vector positions stored densely in the sparse format.
+
+    Returns:
+      A sorted list of integers in the range [0, self.input_size). All other
+      input vector positions are zero except those given by the one-hot input
+      indices.
+    """
+    return list(range(self.input_size))
+
+  def events_to_sparse_input_array(self, events):
+    """Returns sparse input vectors for every position in the event sequence.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      input_indices: An int64 NumPy array of shape
+          [len(events), self.num_input_indices] containing the positions of the
+          one-hot input vector entries. Negative indices are ignored.
+      dense_inputs: A float32 NumPy array of shape
+          [len(events), len(self.dense_input_positions)] containing the input
+          vector values at self.dense_input_positions.
+    """
+    inputs = self.events_to_input_array(events)
+    return (np.zeros([len(events), 0], dtype=np.int64),
+            inputs[:, self.dense_input_positions])
+
+  def encode_sparse_array(self, events):
+    """Returns NumPy arrays of sparse inputs and labels for the sequence.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      input_indices: An int64 NumPy array of shape
+          [len(events) - 1, self.num_input_indices].
+      dense_inputs: A float32 NumPy array of shape
+          [len(events) - 1, len(self.dense_input_positions)].
+      labels: An int64 NumPy array of shape [len(events) - 1].
+    """
+    input_indices, dense_inputs = self.events_to_sparse_input_array(events)
+    labels = self.events_to_label_array(events)
+    return input_indices[:-1], dense_inputs[:-1], labels[1:]
+
+  def encode_sparse(self, events):
+    """Returns a SequenceExample in the sparse format for the event sequence.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      A tf.train.SequenceExample containing sparse inputs and labels, as
+      written by sequence_example_lib.make_sparse_sequence_example.
+    """
+    input_indices, dense_inputs, labels = self.encode_sparse_array(events)
+    return sequence_example_lib.make_sparse_sequence_example(
+        input_indices, dense_inputs, labels)
+
   def get_inputs_batch(self, event_sequences, full_length=False):
     """Returns an inputs batch for the given event sequences.
 
@@ -285,24 +480,91 @@ class EventSequenceEncoderDecoder(object):
       inputs_batch.append(inputs)
     return inputs_batch
 
-  def extend_event_sequences(self, event_sequences, softmax):
+  def get_encoder_state(self, events):
+    """Returns the incremental encoding state for an event sequence.
+
+    Incremental encoding lets generation encode only the newly appended event
+    of each sequence rather than revisiting its history. The state summarizes
+    whatever history `events_to_next_input` needs, and is never modified in
+    place, so branches of a sequence can share it.
+
+    Subclasses that can encode incrementally should override this method along
+    with `events_to_next_input`; the default encoder has no state.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      The encoding state after all of `events`, or None.
+    """
+    return None
+
+  def events_to_next_input(self, events, encoder_state):
+    """Returns the input vector for the final event of a sequence.
+
+    This is equivalent to `self.events_to_input(events, len(events) - 1)`, but
+    can use `encoder_state` to avoid revisiting earlier events. The default
+    implementation ignores the state and calls self.events_to_input.
+
+    Args:
+      events: A list-like sequence of events.
+      encoder_state: The encoding state returned for `events` without its final
+          event, either by `get_encoder_state` or by the previous call to this
+          method. If the state doesn't match, e.g. because several events were
+          appended since, it is recomputed from `events`.
+
+    Returns:
+      input_: A float32 NumPy array of shape [self.input_size], the input vector
+          for the final event.
+      encoder_state: The encoding state after all of `events`.
+    """
+    input_ = np.array(self.events_to_input(events, len(events) - 1),
+                      dtype=np.float32)
+    return input_, encoder_state
+
+  def get_next_inputs_batch(self, event_sequences, encoder_states):
+    """Returns a last-event inputs batch, encoding each sequence incrementally.
+
+    This is equivalent to `self.get_inputs_batch(event_sequences)`, but uses
+    `events_to_next_input` so each sequence's input is computed from its
+    encoding state.
+
+    Args:
+      event_sequences: A list of list-like event sequences.
+      encoder_states: A list of encoding states, one for each event sequence,
+          as returned by `get_encoder_state` or a previous call to this method.
+
+    Returns:
+      inputs_batch: An inputs batch of shape [len(event_sequences), 1,
+          INPUT_SIZE], as a list of lists of NumPy input vectors.
+      encoder_states: A list of the updated encoding states.
+    """
+    inputs_batch = []
+    next_encoder_states = []
+    for events, encoder_state in zip(event_sequences, encoder_states):
+      input_, encoder_state = self.events_to_next_input(events, encoder_state)
+      inputs_batch.append([input_])
+      next_encoder_states.append(encoder_state)
+    return inputs_batch, next_encoder_states
+
+  def extend_event_sequences(self, event_sequences, softmax, sampler=None):
     """Extends the event sequences by sampling the softmax probabilities.
 
     Args:
       event_sequences: A list of EventSequence objects.
       softmax: A list of softmax probability vectors. The list of softmaxes
           should be the same length as the list of event sequences.
+      sampler: An optional magenta.common.sampling.Sampler to sample the
+          softmax probabilities with. By default the full distributions are
+          sampled.
 
     Returns:
       A Python list of chosen class indices, one for each event sequence.
     """
-    num_classes = len(softmax[0][0])
-    chosen_classes = []
-    for i in range(len(event_sequences)):
-      chosen_class = np.random.choice(num_classes, p=softmax[i][-1])
-      event = self.class_index_to_event(chosen_class, event_sequences[i])
-      event_sequences[i].append(event)
-      chosen_classes.append(chosen_class)
+    chosen_classes = _sample_final_softmax(softmax, sampler)
+    for event_sequence, chosen_class in zip(event_sequences, chosen_classes):
+      event = self.class_index_to_event(chosen_class, event_sequence)
+      event_sequence.append(event)
     return chosen_classes
 
   def evaluate_log_likelihood(self, event_sequences, softmax):
@@ -333,13 +595,16 @@ class EventSequenceEncoderDecoder(object):
             'event sequence must be longer than softmax vector (%d events but '
             'softmax vector has length %d)' % (len(event_sequences[i]),
                                                len(softmax[i])))
-      end_pos = len(event_sequences[i])
-      start_pos = end_pos - len(softmax[i])
-      loglik = 0.0
-      for softmax_pos, position in enumerate(range(start_pos, end_pos)):
-        index = self.events_to_label(event_sequences[i], position)
-        loglik += np.log(softmax[i][softmax_pos][index])
-      all_loglik.append(loglik)
+      num_positions = len(softmax[i])
+      if num_positions > 1:
+        # Encode all labels at once and keep the ones at the end.
+        labels = self.events_to_label_array(
+            event_sequences[i])[-num_positions:]
+      else:
+        labels = [self.events_to_label(
+            event_sequences[i], len(event_sequences[i]) - num_positions)]
+      probs = np.asarray(softmax[i])[np.arange(num_positions), labels]
+      all_loglik.append(np.sum(np.log(probs)))
     return all_loglik
 
 
@@ -400,6 +665,57 @@ class OneHotEventSequenceEncoderDecoder(EventSequenceEncoderDecoder):
     """
     return self._one_hot_encoding.encode_event(events[position])
 
+  def _event_indices(self, events):
+    """Returns an int64 array of the one-hot index of each event."""
+    return np.array([self._one_hot_encoding.encode_event(event)
+                     for event in events], dtype=np.int64)
+
+  def _indices_to_inputs(self, indices):
+    """Returns a float32 array of one-hot input vectors for `indices`."""
+    inputs = np.zeros([len(indices), self.input_size], dtype=np.float32)
+    inputs[np.arange(len(indices)), indices] = 1.0
+    return inputs
+
+  def events_to_input_array(self, events):
+    return self._indices_to_inputs(self._event_indices(events))
+
+  def events_to_next_input(self, events, encoder_state):
+    input_ = np.zeros([self.input_size], dtype=np.float32)
+    input_[self._one_hot_encoding.encode_event(events[-1])] = 1.0
+    return input_, encoder_state
+
+  def events_to_label_array(self, events):
+    return self._event_indices(events)
+
+  def encode_array(self, events):
+    # Encode each event only once and share the indices between the inputs and
+    # the labels.
+    indices = self._event_indices(events)
+    return self._indices_to_inputs(indices)[:-1], indices[1:]
+
+  @property
+  def one_hot_class_inputs(self):
+    return True
+
+  @property
+  def num_input_indices(self):
+    return 1
+
+  @property
+  def dense_input_positions(self):
+    return []
+
+  def events_to_sparse_input_array(self, events):
+    indices = self._event_indices(events)
+    return (indices[:, np.newaxis],
+            np.zeros([len(indices), 0], dtype=np.float32))
+
+  def encode_sparse_array(self, events):
+    indices = self._event_indices(events)
+    return (indices[:-1, np.newaxis],
+            np.zeros([max(len(indices) - 1, 0), 0], dtype=np.float32),
+            indices[1:])
+
   def class_index_to_event(self, class_index, events):
     """Returns the event for the given class index.
 
@@ -433,6 +749,13 @@ class OneHotEventSequenceEncoderDecoder(EventSequenceEncoderDecoder):
                for event in events)
 
 
+# Incremental encoding state for LookbackEventSequenceEncoderDecoder, consisting
+# of the number of events encoded and a tuple of the most recent events, enough
+# to cover the longest lookback.
+_LookbackEncoderState = collections.namedtuple(
+    '_LookbackEncoderState', ['num_events', 'recent_events'])
+
+
 class LookbackEventSequenceEncoderDecoder(EventSequenceEncoderDecoder):
   """An EventSequenceEncoderDecoder that encodes repeated events and meter."""
 
@@ -581,6 +904,184 @@ class LookbackEventSequenceEncoderDecoder(EventSequenceEncoderDecoder):
     # specific event.
     return self._one_hot_encoding.encode_event(events[position])
 
+  def _num_recent_events(self):
+    """Returns how many recent events the incremental encoding state keeps."""
+    return max(self._lookback_distances or [0]) + 1
+
+  def get_encoder_state(self, events):
+    num_events = len(events)
+    start = max(num_events - self._num_recent_events(), 0)
+    return _LookbackEncoderState(
+        num_events=num_events,
+        recent_events=tuple(events[i] for i in range(start, num_events)))
+
+  def events_to_next_input(self, events, encoder_state):
+    num_events = len(events)
+    if encoder_state is None or encoder_state.num_events != num_events - 1:
+      encoder_state = self.get_encoder_state(events)
+    else:
+      recent_events = encoder_state.recent_events + (events[-1],)
+      encoder_state = _LookbackEncoderState(
+          num_events=num_events,
+          recent_events=recent_events[-self._num_recent_events():])
+
+    # The event `distance` positions before the final event is
+    # `recent_events[-1 - distance]`.
+    recent_events = encoder_state.recent_events
+    position = num_events - 1
+    one_hot_size = self._one_hot_encoding.num_classes
+    input_ = np.zeros([self.input_size], dtype=np.float32)
+
+    # Last event.
+    input_[self._one_hot_encoding.encode_event(recent_events[-1])] = 1.0
+    offset = one_hot_size
+
+    # Next event if repeating N positions ago.
+    for lookback_distance in self._lookback_distances:
+      if position - lookback_distance + 1 < 0:
+        event = self._one_hot_encoding.default_event
+      else:
+        event = recent_events[-lookback_distance]
+      input_[offset + self._one_hot_encoding.encode_event(event)] = 1.0
+      offset += one_hot_size
+
+    # Binary time counter giving the metric location of the *next* event.
+    bits = ((position + 1) // 2 ** np.arange(self._binary_counter_bits)) % 2
+    input_[offset:offset + self._binary_counter_bits] = 2.0 * bits - 1.0
+    offset += self._binary_counter_bits
+
+    # Last event is repeating N bars ago.
+    for i, lookback_distance in enumerate(self._lookback_distances):
+      if (position - lookback_distance >= 0 and
+          recent_events[-1] == recent_events[-1 - lookback_distance]):
+        input_[offset + i] = 1.0
+
+    return input_, encoder_state
+
+  def _lookback_repeats(self, events):
+    """Returns a boolean array marking lookback repeats in the event sequence.
+
+    Args:
+      events: A Python list of events.
+
+    Returns:
+      A boolean NumPy array of shape [len(self._lookback_distances),
+      len(events)] where element `(i, j)` is True if the event at position `j`
+      is the same as the event `self._lookback_distances[i]` steps earlier.
+    """
+    repeats = np.zeros([len(self._lookback_distances), len(events)],
+                       dtype=bool)
+    for i, lookback_distance in enumerate(self._lookback_distances):
+      if lookback_distance < len(events):
+        repeats[i, lookback_distance:] = [
+            event == lookback_event for event, lookback_event in zip(
+                events[lookback_distance:],
+                events[:len(events) - lookback_distance])]
+    return repeats
+
+  def _encode_sparse_arrays(self, events):
+    """Returns sparse inputs and labels for every position in the sequence.
+
+    This is the bulk equivalent of calling self.events_to_input and
+    self.events_to_label for each position, sharing the one-hot indices and
+    lookback comparisons between the two.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      input_indices: An int64 NumPy array of shape
+          [len(events), self.num_input_indices] containing the input vector
+          position of each one-hot block (current event and next event for
+          each lookback).
+      dense_inputs: A float32 NumPy array of shape
+          [len(events), len(self.dense_input_positions)] containing the binary
+          counters and lookback repeat flags.
+      labels: An int64 NumPy array of shape [len(events)].
+    """
+    events = list(events)
+    num_events = len(events)
+    one_hot_size = self._one_hot_encoding.num_classes
+    default_index = self._one_hot_encoding.encode_event(
+        self._one_hot_encoding.default_event)
+    indices = np.array([self._one_hot_encoding.encode_event(event)
+                        for event in events], dtype=np.int64)
+    repeats = self._lookback_repeats(events)
+    positions = np.arange(num_events)
+
+    # Last event.
+    input_indices = [indices]
+    offset = one_hot_size
+
+    # Next event if repeating N positions ago.
+    for lookback_distance in self._lookback_distances:
+      lookback_indices = np.concatenate([
+          np.full([max(lookback_distance - 1, 0)], default_index,
+                  dtype=np.int64),
+          indices])[:num_events]
+      input_indices.append(offset + lookback_indices)
+      offset += one_hot_size
+
+    # Binary time counter giving the metric location of the *next* event.
+    bits = ((positions[:, np.newaxis] + 1) //
+            2 ** np.arange(self._binary_counter_bits)) % 2
+
+    # Last event is repeating N bars ago.
+    dense_inputs = np.concatenate(
+        [2.0 * bits - 1.0, repeats.T], axis=1).astype(np.float32)
+
+    # More distant repeats take precedence, so they are assigned last.
+    labels = indices.copy()
+    for i in range(len(self._lookback_distances)):
+      labels[repeats[i]] = one_hot_size + i
+    if self._lookback_distances:
+      is_default = np.array(
+          [event == self._one_hot_encoding.default_event for event in events],
+          dtype=bool)
+      labels[is_default & (positions < self._lookback_distances[-1])] = (
+          one_hot_size + len(self._lookback_distances) - 1)
+
+    return np.stack(input_indices, axis=1), dense_inputs, labels
+
+  def _encode_arrays(self, events):
+    """Returns dense (inputs, labels) arrays for every position."""
+    input_indices, dense_inputs, labels = self._encode_sparse_arrays(events)
+    inputs = np.zeros([len(labels), self.input_size], dtype=np.float32)
+    inputs[np.arange(len(labels))[:, np.newaxis], input_indices] = 1.0
+    inputs[:, self.dense_input_positions] = dense_inputs
+    return inputs, labels
+
+  @property
+  def num_input_indices(self):
+    return 1 + len(self._lookback_distances)
+
+  @property
+  def dense_input_positions(self):
+    one_hot_end = (self._one_hot_encoding.num_classes *
+                   (1 + len(self._lookback_distances)))
+    return list(range(one_hot_end, self.input_size))
+
+  def events_to_sparse_input_array(self, events):
+    input_indices, dense_inputs, _ = self._encode_sparse_arrays(events)
+    return input_indices, dense_inputs
+
+  def encode_sparse_array(self, events):
+    input_indices, dense_inputs, labels = self._encode_sparse_arrays(events)
+    return input_indices[:-1], dense_inputs[:-1], labels[1:]
+
+  def events_to_input_array(self, events):
+    inputs, _ = self._encode_arrays(events)
+    return inputs
+
+  def events_to_label_array(self, events):
+    # Labels don't need the dense input vectors.
+    _, _, labels = self._encode_sparse_arrays(events)
+    return labels
+
+  def encode_array(self, events):
+    inputs, labels = self._encode_arrays(events)
+    return inputs[:-1], labels[1:]
+
   def class_index_to_event(self, class_index, events):
     """Returns the event for the given class index.
 
@@ -755,6 +1256,38 @@ class ConditionalEventSequenceEncoderDecoder(object):
     """
     return self._target_encoder_decoder.labels_to_num_steps(labels)
 
+  def encode_array(self, control_events, target_events):
+    """Returns NumPy arrays of inputs and labels for the sequence pair.
+
+    Args:
+      control_events: A list-like sequence of control events.
+      target_events: A list-like sequence of target events, the same length as
+          `control_events`.
+
+    Returns:
+      inputs: A float32 NumPy array of shape
+          [len(target_events) - 1, self.input_size] where row `i` is the
+          concatenation of the control input vector at position `i + 1` and
+          the target input vector at position `i`.
+      labels: An int64 NumPy array of shape [len(target_events) - 1]
+          containing the label for each target event but the first.
+
+    Raises:
+      ValueError: If the control and target event sequences have different
+          length.
+    """
+    if len(control_events) != len(target_events):
+      raise ValueError('must have the same number of control and target events '
+                       '(%d control events but %d target events)' % (
+                           len(control_events), len(target_events)))
+
+    control_inputs = self._control_encoder_decoder.events_to_input_array(
+        control_events)
+    target_inputs, labels = self._target_encoder_decoder.encode_array(
+        target_events)
+    inputs = np.concatenate([control_inputs[1:], target_inputs], axis=1)
+    return inputs, labels
+
   def encode(self, control_events, target_events):
     """Returns a SequenceExample for the given event sequence pair.
 
@@ -766,6 +1299,57 @@ class ConditionalEventSequenceEncoderDecoder(object):
     Returns:
       A tf.train.SequenceExample containing inputs and labels.
 
+    Raises:
+      ValueError: If the control and target event sequences have different
+          length.
+    """
+    inputs, labels = self.encode_array(control_events, target_events)
+    return sequence_example_lib.make_sequence_example(inputs, labels)
+
+  @property
+  def one_hot_class_inputs(self):
+    """Whether the input vector for each event is the one-hot of its label.
+
+    Returns:
+      False, since the inputs also encode the control events.
+    """
+    return False
+
+  @property
+  def num_input_indices(self):
+    """The number of one-hot input indices per step in the sparse format.
+
+    Returns:
+      An integer, the total number of control and target one-hot indices.
+    """
+    return (self._control_encoder_decoder.num_input_indices +
+            self._target_encoder_decoder.num_input_indices)
+
+  @property
+  def dense_input_positions(self):
+    """The input vector positions stored densely in the sparse format.
+
+    Returns:
+      A sorted list of integers in the range [0, self.input_size).
+    """
+    return _concatenate_dense_input_positions(
+        [self._control_encoder_decoder, self._target_encoder_decoder])
+
+  def encode_sparse_array(self, control_events, target_events):
+    """Returns NumPy arrays of sparse inputs and labels for the sequence pair.
+
+    Args:
+      control_events: A list-like sequence of control events.
+      target_events: A list-like sequence of target events, the same length as
+          `control_events`.
+
+    Returns:
+      input_indices: An int64 NumPy array of shape
+          [len(target_events) - 1, self.num_input_indices].
+      dense_inputs: A float32 NumPy array of shape
+          [len(target_events) - 1, len(self.dense_input_positions)].
+      labels: An int64 NumPy array of shape [len(target_events) - 1].
+
     Raises:
       ValueError: If the control and target event sequences have different
           length.
@@ -775,12 +1359,37 @@ class ConditionalEventSequenceEncoderDecoder(object):
                        '(%d control events but %d target events)' % (
                            len(control_events), len(target_events)))
 
-    inputs = []
-    labels = []
-    for i in range(len(target_events) - 1):
-      inputs.append(self.events_to_input(control_events, target_events, i))
-      labels.append(self.events_to_label(target_events, i + 1))
-    return sequence_example_lib.make_sequence_example(inputs, labels)
+    control_indices, control_dense_inputs = (
+        self._control_encoder_decoder.events_to_sparse_input_array(
+            control_events))
+    target_indices, target_dense_inputs, labels = (
+        self._target_encoder_decoder.encode_sparse_array(target_events))
+    input_indices, dense_inputs = _concatenate_sparse_inputs(
+        [self._control_encoder_decoder, self._target_encoder_decoder],
+        [(control_indices[1:], control_dense_inputs[1:]),
+         (target_indices, target_dense_inputs)])
+    return input_indices, dense_inputs, labels
+
+  def encode_sparse(self, control_events, target_events):
+    """Returns a SequenceExample in the sparse format for the sequence pair.
+
+    Args:
+      control_events: A list-like sequence of control events.
+      target_events: A list-like sequence of target events, the same length as
+          `control_events`.
+
+    Returns:
+      A tf.train.SequenceExample containing sparse inputs and labels, as
+      written by sequence_example_lib.make_sparse_sequence_example.
+
+    Raises:
+      ValueError: If the control and target event sequences have different
+          length.
+    """
+    input_indices, dense_inputs, labels = self.encode_sparse_array(
+        control_events, target_events)
+    return sequence_example_lib.make_sparse_sequence_example(
+        input_indices, dense_inputs, labels)
 
   def get_inputs_batch(self, control_event_sequences, target_event_sequences,
                        full_length=False):
@@ -832,19 +1441,71 @@ class ConditionalEventSequenceEncoderDecoder(object):
       inputs_batch.append(inputs)
     return inputs_batch
 
-  def extend_event_sequences(self, target_event_sequences, softmax):
+  def get_encoder_state(self, target_events):
+    """Returns the incremental encoding state for a target event sequence.
+
+    Only the target event sequence is encoded incrementally. See
+    `EventSequenceEncoderDecoder.get_encoder_state`.
+
+    Args:
+      target_events: A list-like sequence of target events.
+
+    Returns:
+      The target encoder/decoder's encoding state after all of `target_events`.
+    """
+    return self._target_encoder_decoder.get_encoder_state(target_events)
+
+  def get_next_inputs_batch(self, control_event_sequences,
+                            target_event_sequences, encoder_states):
+    """Returns a last-event inputs batch, encoding targets incrementally.
+
+    This is equivalent to `self.get_inputs_batch(control_event_sequences,
+    target_event_sequences)`, but encodes each target event sequence from its
+    encoding state.
+
+    Args:
+      control_event_sequences: A list of list-like control event sequences.
+      target_event_sequences: A list of list-like target event sequences, the
+          same length as `control_event_sequences`. Each target event sequence
+          must be shorter than the corresponding control event sequence.
+      encoder_states: A list of target encoding states, one for each target
+          event sequence.
+
+    Returns:
+      inputs_batch: An inputs batch of shape [len(target_event_sequences), 1,
+          INPUT_SIZE], as a list of lists of NumPy input vectors.
+      encoder_states: A list of the updated target encoding states.
+    """
+    inputs_batch = []
+    next_encoder_states = []
+    for control_events, target_events, encoder_state in zip(
+        control_event_sequences, target_event_sequences, encoder_states):
+      control_input = self._control_encoder_decoder.events_to_input(
+          control_events, len(target_events))
+      target_input, encoder_state = (
+          self._target_encoder_decoder.events_to_next_input(
+              target_events, encoder_state))
+      inputs_batch.append([np.concatenate([
+          np.asarray(control_input, dtype=np.float32), target_input])])
+      next_encoder_states.append(encoder_state)
+    return inputs_batch, next_encoder_states
+
+  def extend_event_sequences(self, target_event_sequences, softmax,
+                             sampler=None):
     """Extends the event sequences by sampling the softmax probabilities.
 
     Args:
       target_event_sequences: A list of target EventSequence objects.
       softmax: A list of softmax probability vectors. The list of softmaxes
           should be the same length as the list of event sequences.
+      sampler: An optional magenta.common.sampling.Sampler to sample the
+          softmax probabilities with.
 
     Returns:
       A Python list of chosen class indices, one for each target event sequence.
     """
     return self._target_encoder_decoder.extend_event_sequences(
-        target_event_sequences, softmax)
+        target_event_sequences, softmax, sampler)
 
   def evaluate_log_likelihood(self, target_event_sequences, softmax):
     """Evaluate the log likelihood of multiple target event sequences.
@@ -919,6 +1580,43 @@ class MultipleEventSequenceEncoder(EventSequenceEncoderDecoder):
         input_ += encoder.events_to_input(event_sequence, position)
     return input_
 
+  def _component_event_sequences(self, events):
+    """Returns the event sequence to encode with each component encoder."""
+    if self._encode_single_sequence:
+      # Apply all encoders to the event sequence.
+      return [events] * len(self._encoders)
+    # The event sequence is a list of tuples. Apply each encoder to the
+    # elements in the corresponding tuple position.
+    event_sequences = list(zip(*events))
+    if not event_sequences:
+      event_sequences = [()] * len(self._encoders)
+    if len(event_sequences) != len(self._encoders):
+      raise ValueError(
+          'Event tuple size must be the same as the number of encoders.')
+    return event_sequences
+
+  def events_to_input_array(self, events):
+    event_sequences = self._component_event_sequences(events)
+    return np.concatenate(
+        [encoder.events_to_input_array(event_sequence)
+         for encoder, event_sequence in zip(self._encoders, event_sequences)],
+        axis=1)
+
+  @property
+  def num_input_indices(self):
+    return sum(encoder.num_input_indices for encoder in self._encoders)
+
+  @property
+  def dense_input_positions(self):
+    return _concatenate_dense_input_positions(self._encoders)
+
+  def events_to_sparse_input_array(self, events):
+    event_sequences = self._component_event_sequences(events)
+    return _concatenate_sparse_inputs(
+        self._encoders,
+        [encoder.events_to_sparse_input_array(event_sequence)
+         for encoder, event_sequence in zip(self._encoders, event_sequences)])
+
   def events_to_label(self, events, position):
     raise NotImplementedError
 
@@ -929,20 +1627,27 @@ class MultipleEventSequenceEncoder(EventSequenceEncoderDecoder):
 class EncoderPipeline(pipeline.Pipeline):
   """A pipeline that converts an EventSequence to a model encoding."""
 
-  def __init__(self, input_type, encoder_decoder, name=None):
+  def __init__(self, input_type, encoder_decoder, name=None,
+               sparse_inputs=False):
     """Constructs an EncoderPipeline.
 
     Args:
       input_type: The type this pipeline expects as input.
       encoder_decoder: An EventSequenceEncoderDecoder.
       name: A unique pipeline name.
+      sparse_inputs: If True, write SequenceExamples in the compact sparse
+          input format instead of as dense input vectors.
     """
     super(EncoderPipeline, self).__init__(
         input_type=input_type,
         output_type=tf.train.SequenceExample,
         name=name)
     self._encoder_decoder = encoder_decoder
+    self._sparse_inputs = sparse_inputs
 
   def transform(self, seq):
-    encoded = self._encoder_decoder.encode(seq)
+    if self._sparse_inputs:
+      encoded = self._encoder_decoder.encode_sparse(seq)
+    else:
+      encoded = self._encoder_decoder.encode(seq)
     return [encoded]
@@ -26,6 +26,14 @@ from magenta.music import encoder_decoder
 from magenta.music import testing_lib
 
 
+def _sparse_to_dense_inputs(enc, input_indices, dense_inputs):
+  inputs = np.zeros([len(input_indices), enc.input_size])
+  for i, indices in enumerate(input_indices):
+    inputs[i, [index for index in indices if index >= 0]] = 1.0
+  inputs[:, enc.dense_input_positions] = dense_inputs
+  return inputs
+
+
 class OneHotEventSequenceEncoderDecoderTest(tf.test.TestCase):
 
   def setUp(self):
@@ -38,6 +46,9 @@ class OneHotEventSequenceEncoderDecoderTest(tf.test.TestCase):
   def testNumClasses(self):
     self.assertEqual(3, self.enc.num_classes)
 
+  def testOneHotClassInputs(self):
+    self.assertTrue(self.enc.one_hot_class_inputs)
+
   def testEventsToInput(self):
     events = [0, 1, 0, 2, 0]
     self.assertEqual([1.0, 0.0, 0.0], self.enc.events_to_input(events, 0))
@@ -76,6 +87,36 @@ class OneHotEventSequenceEncoderDecoderTest(tf.test.TestCase):
         expected_inputs, expected_labels)
     self.assertEqual(sequence_example, expected_sequence_example)
 
+  def testEncodeArray(self):
+    events = [0, 1, 0, 2, 0]
+    inputs, labels = self.enc.encode_array(events)
+    self.assertEqual(np.float32, inputs.dtype)
+    self.assertEqual(np.int64, labels.dtype)
+    self.assertAllEqual([[1.0, 0.0, 0.0],
+                         [0.0, 1.0, 0.0],
+                         [1.0, 0.0, 0.0],
+                         [0.0, 0.0, 1.0]], inputs)
+    self.assertAllEqual([1, 0, 2, 0], labels)
+
+    inputs, labels = self.enc.encode_array([])
+    self.assertEqual((0, 3), inputs.shape)
+    self.assertEqual((0,), labels.shape)
+
+  def testEncodeSparseArray(self):
+    events = [0, 1, 0, 2, 0]
+    input_indices, dense_inputs, labels = self.enc.encode_sparse_array(events)
+    self.assertAllEqual([[0], [1], [0], [2]], input_indices)
+    self.assertEqual((4, 0), dense_inputs.shape)
+    self.assertAllEqual([1, 0, 2, 0], labels)
+
+  def testEncodeSparse(self):
+    events = [0, 1, 0, 2, 0]
+    sequence_example = self.enc.encode_sparse(events)
+    expected_sequence_example = (
+        sequence_example_lib.make_sparse_sequence_example(
+            [[0], [1], [0], [2]], np.zeros([4, 0]), [1, 0, 2, 0]))
+    self.assertEqual(sequence_example, expected_sequence_example)
+
   def testGetInputsBatch(self):
     event_sequences = [[0, 1, 0, 2, 0], [0, 1, 2]]
     expected_inputs_1 = [[1.0, 0.0, 0.0],
@@ -96,6 +137,15 @@ class OneHotEventSequenceEncoderDecoderTest(tf.test.TestCase):
         expected_last_event_inputs_batch,
         self.enc.get_inputs_batch(event_sequences))
 
+  def testGetNextInputsBatch(self):
+    event_sequences = [[0, 1, 0, 2, 0], [0, 1, 2]]
+    inputs_batch, encoder_states = self.enc.get_next_inputs_batch(
+        event_sequences,
+        [self.enc.get_encoder_state(events[:-1]) for events in event_sequences])
+    self.assertAllEqual(
+        self.enc.get_inputs_batch(event_sequences), inputs_batch)
+    self.assertEqual([None, None], encoder_states)
+
   def testExtendEventSequences(self):
     events1 = [0]
     events2 = [0]
@@ -117,6 +167,26 @@ class OneHotEventSequenceEncoderDecoderTest(tf.test.TestCase):
     self.assertListEqual([np.log(0.5) + np.log(0.3),
                           np.log(0.4) + np.log(0.6)], p)
 
+  def testEvaluateLogLikelihoodFinalEvents(self):
+    event_sequences = [[0, 1, 0], [1, 2, 2]]
+    softmax = np.array([[[0.3, 0.4, 0.3]], [[0.0, 0.4, 0.6]]])
+    p = self.enc.evaluate_log_likelihood(event_sequences, softmax)
+    self.assertAllClose([np.log(0.3), np.log(0.6)], p)
+
+  def testExtendEventSequencesMatchesRandomChoice(self):
+    softmax = np.random.dirichlet(np.ones(3), size=[16, 2]).astype(np.float32)
+    event_sequences = [[0] for _ in range(16)]
+
+    np.random.seed(7)
+    chosen_classes = self.enc.extend_event_sequences(event_sequences, softmax)
+    np.random.seed(7)
+    expected_classes = [np.random.choice(3, p=probs[-1]) for probs in softmax]
+
+    self.assertListEqual(expected_classes, chosen_classes)
+    self.assertListEqual(
+        [[0, chosen_class] for chosen_class in chosen_classes],
+        event_sequences)
+
 
 class LookbackEventSequenceEncoderDecoderTest(tf.test.TestCase):
 
@@ -130,6 +200,9 @@ class LookbackEventSequenceEncoderDecoderTest(tf.test.TestCase):
   def testNumClasses(self):
     self.assertEqual(5, self.enc.num_classes)
 
+  def testOneHotClassInputs(self):
+    self.assertFalse(self.enc.one_hot_class_inputs)
+
   def testEventsToInput(self):
     events = [0, 1, 0, 2, 0]
     self.assertEqual([1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0,
@@ -191,6 +264,46 @@ class LookbackEventSequenceEncoderDecoderTest(tf.test.TestCase):
     labels = [0, 1, 3, 2, 4]
     self.assertEqual(5, self.enc.labels_to_num_steps(labels))
 
+  def testEncodeArray(self):
+    events = [0, 1, 0, 2, 0, 0, 1, 1, 2, 1, 0, 0]
+    inputs, labels = self.enc.encode_array(events)
+    self.assertAllEqual(
+        [self.enc.events_to_input(events, i) for i in range(len(events) - 1)],
+        inputs)
+    self.assertAllEqual(
+        [self.enc.events_to_label(events, i) for i in range(1, len(events))],
+        labels)
+
+  def testEncodeSparseArray(self):
+    events = [0, 1, 0, 2, 0, 0, 1, 1, 2, 1, 0, 0]
+    self.assertEqual(3, self.enc.num_input_indices)
+    self.assertEqual([9, 10, 11, 12], self.enc.dense_input_positions)
+    input_indices, dense_inputs, labels = self.enc.encode_sparse_array(events)
+    inputs, expected_labels = self.enc.encode_array(events)
+    self.assertAllEqual(
+        inputs,
+        _sparse_to_dense_inputs(self.enc, input_indices, dense_inputs))
+    self.assertAllEqual(expected_labels, labels)
+
+  def testEventsToNextInput(self):
+    events = [0, 1, 0, 2, 0, 0, 1, 0]
+    encoder_state = self.enc.get_encoder_state([])
+    for position in range(len(events)):
+      input_, encoder_state = self.enc.events_to_next_input(
+          events[:position + 1], encoder_state)
+      self.assertAllEqual(self.enc.events_to_input(events, position), input_)
+      self.assertEqual(self.enc.get_encoder_state(events[:position + 1]),
+                       encoder_state)
+
+  def testEventsToNextInputStaleState(self):
+    # Events appended without updating the encoding state are taken into
+    # account.
+    events = [0, 1, 0, 2, 0, 0, 1, 0]
+    input_, encoder_state = self.enc.events_to_next_input(
+        events, self.enc.get_encoder_state(events[:3]))
+    self.assertAllEqual(self.enc.events_to_input(events, 7), input_)
+    self.assertEqual(self.enc.get_encoder_state(events), encoder_state)
+
   def testEmptyLookback(self):
     enc = encoder_decoder.LookbackEventSequenceEncoderDecoder(
         testing_lib.TrivialOneHotEncoding(3), [], 2)
@@ -216,6 +329,12 @@ class LookbackEventSequenceEncoderDecoderTest(tf.test.TestCase):
     self.assertEqual(2, enc.events_to_label(events, 3))
     self.assertEqual(0, enc.events_to_label(events, 4))
 
+    inputs, labels = enc.encode_array(events)
+    self.assertAllEqual(
+        [enc.events_to_input(events, i) for i in range(len(events) - 1)],
+        inputs)
+    self.assertAllEqual([1, 0, 2, 0], labels)
+
     self.assertEqual(0, self.enc.class_index_to_event(0, events[:1]))
     self.assertEqual(1, self.enc.class_index_to_event(1, events[:1]))
     self.assertEqual(2, self.enc.class_index_to_event(2, events[:1]))
@@ -291,6 +410,30 @@ class ConditionalEventSequenceEncoderDecoderTest(tf.test.TestCase):
         expected_inputs, expected_labels)
     self.assertEqual(sequence_example, expected_sequence_example)
 
+  def testEncodeArray(self):
+    control_events = [1, 1, 1, 0, 0]
+    target_events = [0, 1, 0, 2, 0]
+    inputs, labels = self.enc.encode_array(control_events, target_events)
+    self.assertAllEqual([[0.0, 1.0, 1.0, 0.0, 0.0],
+                         [0.0, 1.0, 0.0, 1.0, 0.0],
+                         [1.0, 0.0, 1.0, 0.0, 0.0],
+                         [1.0, 0.0, 0.0, 0.0, 1.0]], inputs)
+    self.assertAllEqual([1, 0, 2, 0], labels)
+
+    with self.assertRaises(ValueError):
+      self.enc.encode_array(control_events[:-1], target_events)
+
+  def testEncodeSparseArray(self):
+    control_events = [1, 1, 1, 0, 0]
+    target_events = [0, 1, 0, 2, 0]
+    self.assertEqual(2, self.enc.num_input_indices)
+    self.assertEqual([], self.enc.dense_input_positions)
+    input_indices, dense_inputs, labels = self.enc.encode_sparse_array(
+        control_events, target_events)
+    self.assertAllEqual([[1, 2], [1, 3], [0, 2], [0, 4]], input_indices)
+    self.assertEqual((4, 0), dense_inputs.shape)
+    self.assertAllEqual([1, 0, 2, 0], labels)
+
   def testGetInputsBatch(self):
     control_event_sequences = [[1, 1, 1, 0, 0], [1, 1, 1, 0, 0]]
     target_event_sequences = [[0, 1, 0, 2], [0, 1]]
@@ -312,6 +455,18 @@ class ConditionalEventSequenceEncoderDecoderTest(tf.test.TestCase):
         self.enc.get_inputs_batch(
             control_event_sequences, target_event_sequences))
 
+  def testGetNextInputsBatch(self):
+    control_event_sequences = [[1, 1, 1, 0, 0], [1, 1, 1, 0, 0]]
+    target_event_sequences = [[0, 1, 0, 2], [0, 1]]
+    inputs_batch, _ = self.enc.get_next_inputs_batch(
+        control_event_sequences, target_event_sequences,
+        [self.enc.get_encoder_state(target_events[:-1])
+         for target_events in target_event_sequences])
+    self.assertAllEqual(
+        self.enc.get_inputs_batch(
+            control_event_sequences, target_event_sequences),
+        inputs_batch)
+
   def testExtendEventSequences(self):
     target_events_1 = [0]
     target_events_2 = [0]
@@ -364,6 +519,26 @@ class MultipleEventSequenceEncoderTest(tf.test.TestCase):
         [1.0, 0.0, 1.0, 0.0, 0.0],
         self.enc.events_to_input(events, 4))
 
+  def testEventsToInputArray(self):
+    events = [(1, 0), (1, 1), (1, 0), (0, 2), (0, 0)]
+    self.assertAllEqual(
+        [self.enc.events_to_input(events, i) for i in range(len(events))],
+        self.enc.events_to_input_array(events))
+
+  def testEventsToSparseInputArray(self):
+    enc = encoder_decoder.MultipleEventSequenceEncoder([
+        encoder_decoder.LookbackEventSequenceEncoderDecoder(
+            testing_lib.TrivialOneHotEncoding(2), [1], 1),
+        encoder_decoder.OneHotEventSequenceEncoderDecoder(
+            testing_lib.TrivialOneHotEncoding(3))])
+    self.assertEqual(3, enc.num_input_indices)
+    self.assertEqual([4, 5], enc.dense_input_positions)
+    events = [(1, 0), (1, 1), (1, 0), (0, 2), (0, 0)]
+    input_indices, dense_inputs = enc.events_to_sparse_input_array(events)
+    self.assertAllEqual(
+        [enc.events_to_input(events, i) for i in range(len(events))],
+        _sparse_to_dense_inputs(enc, input_indices, dense_inputs))
+
 
 if __name__ == '__main__':
   tf.test.main()
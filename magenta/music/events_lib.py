@@ -15,7 +15,8 @@
 
 The abstract `EventSequence` class is an interface for a sequence of musical
 events. The `SimpleEventSequence` class is a basic implementation of this
-interface.
+interface. The `BranchedEventSequence` class extends another event sequence
+without copying it, sharing events between branches.
 """
 
 import abc
@@ -295,3 +296,165 @@ class SimpleEventSequence(EventSequence):
     self._end_step *= k
     self._steps_per_bar *= k
     self._steps_per_quarter *= k
+
+
+class _BranchNode(object):
+  """An event appended to a BranchedEventSequence.
+
+  Nodes are never modified once created. Each links to the node of the
+  previous appended event, so branches that share a prefix share its nodes.
+  """
+  __slots__ = ['event', 'parent', 'num_events']
+
+  def __init__(self, event, parent):
+    self.event = event
+    self.parent = parent
+    self.num_events = parent.num_events + 1 if parent is not None else 1
+
+
+class BranchedEventSequence(EventSequence):
+  """An event sequence that shares its events with the branches it came from.
+
+  A BranchedEventSequence extends a base sequence, which it never modifies,
+  with a persistent chain of appended events. `branch` returns a new sequence
+  that shares all current events in constant time, and appending to a branch
+  allocates only the new event, so many continuations of a common prefix (e.g.
+  the entries of a beam search) can be extended without copying it.
+
+  The base sequence can be any list-like object, e.g. an EventSequence or a
+  list of control events. Indexing into the appended events walks back from
+  the last event, so it is cheapest near the end of the sequence. Use
+  `materialize` to get an ordinary sequence of the base sequence's type.
+  """
+
+  def __init__(self, base_sequence):
+    """Construct a BranchedEventSequence.
+
+    Args:
+      base_sequence: The list-like sequence of events to extend. It will not
+          be modified.
+    """
+    self._base_sequence = base_sequence
+    self._num_base_events = len(base_sequence)
+    self._tail = None
+
+  @property
+  def base_sequence(self):
+    return self._base_sequence
+
+  @property
+  def start_step(self):
+    return self._base_sequence.start_step
+
+  @property
+  def end_step(self):
+    # The end step depends on how the base sequence type counts steps, so
+    # compute it from the materialized sequence.
+    return self.materialize().end_step
+
+  def branch(self):
+    """Returns a new sequence sharing this sequence's events.
+
+    Events appended to the returned sequence are not seen by this sequence, and
+    vice versa.
+
+    Returns:
+      A new BranchedEventSequence with the same base sequence and events.
+    """
+    branch = BranchedEventSequence(self._base_sequence)
+    branch._tail = self._tail  # pylint: disable=protected-access
+    return branch
+
+  def _appended_events(self):
+    """Returns a list of the events appended to the base sequence, in order."""
+    events = []
+    node = self._tail
+    while node is not None:
+      events.append(node.event)
+      node = node.parent
+    events.reverse()
+    return events
+
+  def materialize(self):
+    """Returns a copy of the base sequence extended with the appended events.
+
+    Events are appended with the base sequence's own `append` method, so the
+    result is an ordinary sequence of the base sequence's type.
+
+    Returns:
+      The materialized sequence.
+    """
+    sequence = copy.deepcopy(self._base_sequence)
+    for event in self._appended_events():
+      sequence.append(event)
+    return sequence
+
+  def append(self, event):
+    """Appends event to the end of this branch of the sequence.
+
+    Args:
+      event: The event to append to the end.
+    """
+    self._tail = _BranchNode(event, self._tail)
+
+  def set_length(self, steps, from_left=False):
+    """Truncates the appended events to leave the specified number of steps.
+
+    Args:
+      steps: How many steps long the event sequence should be.
+      from_left: Must be False.
+
+    Raises:
+      NotImplementedError: If `from_left` is True, or `steps` is longer than
+          the sequence or shorter than the base sequence.
+    """
+    if from_left or not self._num_base_events <= steps <= len(self):
+      raise NotImplementedError(
+          'BranchedEventSequence can only be truncated to between the base '
+          'sequence length and its current length')
+    for _ in range(len(self) - steps):
+      self._tail = self._tail.parent
+
+  def __getitem__(self, i):
+    """Returns the event at the given index, or a list for a slice."""
+    if isinstance(i, slice):
+      return list(self)[i]
+    length = len(self)
+    if i < 0:
+      i += length
+    if not 0 <= i < length:
+      raise IndexError('BranchedEventSequence index out of range')
+    if i < self._num_base_events:
+      return self._base_sequence[i]
+    node = self._tail
+    for _ in range(length - 1 - i):
+      node = node.parent
+    return node.event
+
+  def __iter__(self):
+    """Returns an iterator over the events."""
+    for event in self._base_sequence:
+      yield event
+    for event in self._appended_events():
+      yield event
+
+  def __len__(self):
+    """How many events are in this BranchedEventSequence.
+
+    Returns:
+      Number of events as an integer.
+    """
+    num_appended_events = (
+        self._tail.num_events if self._tail is not None else 0)
+    return self._num_base_events + num_appended_events
+
+  def __copy__(self):
+    return self.branch()
+
+  def __deepcopy__(self, memo=None):
+    # Copy iteratively; the default deep copy would recurse once per node.
+    sequence = BranchedEventSequence(
+        copy.deepcopy(self._base_sequence, memo))
+    for event in self._appended_events():
+      sequence.append(copy.deepcopy(event, memo))
+    return sequence
@@ -90,5 +90,49 @@ class EventsLibTest(tf.test.TestCase):
     self.assertListEqual([1, 0, 0, 0, 1, 0, 0, 0], list(events))
 
 
+  def testBranchedEventSequence(self):
+    base = events_lib.SimpleEventSequence(
+        pad_event=0, events=[0, 1, 2], start_step=4)
+    events = events_lib.BranchedEventSequence(base)
+    events.append(3)
+    branch = events.branch()
+    events.append(4)
+    branch.append(5)
+    branch.append(6)
+
+    self.assertListEqual([0, 1, 2, 3, 4], list(events))
+    self.assertListEqual([0, 1, 2, 3, 5, 6], list(branch))
+    self.assertListEqual([0, 1, 2], list(base))
+    self.assertEqual(6, len(branch))
+    self.assertEqual(1, branch[1])
+    self.assertEqual(3, branch[3])
+    self.assertEqual(5, branch[-2])
+    self.assertListEqual([2, 3, 5], branch[2:5])
+    with self.assertRaises(IndexError):
+      _ = branch[6]
+
+    self.assertEqual(4, events.start_step)
+    self.assertEqual(9, events.end_step)
+    materialized = events.materialize()
+    self.assertEqual(
+        events_lib.SimpleEventSequence(
+            pad_event=0, events=[0, 1, 2, 3, 4], start_step=4),
+        materialized)
+    self.assertListEqual([0, 1, 2], list(base))
+
+    branch.set_length(4)
+    self.assertListEqual([0, 1, 2, 3], list(branch))
+    with self.assertRaises(NotImplementedError):
+      branch.set_length(2)
+
+  def testBranchedEventSequenceDeepcopy(self):
+    events = events_lib.BranchedEventSequence([0, 1])
+    for i in range(2, 5000):
+      events.append(i)
+    events_copy = copy.deepcopy(events)
+    events.append(5000)
+    self.assertListEqual(list(range(5000)), list(events_copy))
+
+
 if __name__ == '__main__':
   tf.test.main()
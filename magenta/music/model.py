@@ -34,6 +34,8 @@ class BaseModel(object):
   def __init__(self):
     """Constructs a BaseModel."""
     self._session = None
+    # Identifies the checkpoint the session was restored from.
+    self._checkpoint_id = None
 
   @abc.abstractmethod
   def _build_graph_for_generation(self):
@@ -61,6 +63,7 @@ class BaseModel(object):
       self._session = tf.Session()
       tf.logging.info('Checkpoint used: %s', checkpoint_file)
       saver.restore(self._session, checkpoint_file)
+    self._checkpoint_id = checkpoint_file
 
   def initialize_with_checkpoint_and_metagraph(self, checkpoint_filename,
                                                metagraph_filename):
@@ -68,12 +71,14 @@ class BaseModel(object):
 
     Args:
       checkpoint_filename: The path to the checkpoint file that should be used.
-      metagraph_filename: The path to the metagraph file that should be used.
+      metagraph_filename: The path to the metagraph file that should be used,
+          or an already parsed MetaGraphDef proto.
     """
     with tf.Graph().as_default():
       self._session = tf.Session()
       new_saver = tf.train.import_meta_graph(metagraph_filename)
       new_saver.restore(self._session, checkpoint_filename)
+    self._checkpoint_id = checkpoint_filename
 
   def write_checkpoint_with_metagraph(self, checkpoint_filename):
     """Writes the checkpoint and metagraph.
@@ -90,3 +95,4 @@ class BaseModel(object):
     """Closes the TF session."""
     self._session.close()
     self._session = None
+    self._checkpoint_id = None
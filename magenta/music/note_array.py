@@ -0,0 +1,251 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A columnar representation of the notes of a NoteSequence.
+
+A NoteArray holds one NumPy array per NoteSequence.Note field, so transforms
+that touch every note (quantizing, stretching, shifting, trimming) are single
+vectorized operations rather than loops over protobuf messages. Conversion to
+and from NoteSequence protos is lossless.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# internal imports
+
+import numpy as np
+
+from magenta.protobuf import music_pb2
+
+# The NoteSequence.Note fields stored by a NoteArray, and their column dtypes.
+NOTE_FIELDS = (
+    ('pitch', np.int32),
+    ('pitch_name', np.int32),
+    ('velocity', np.int32),
+    ('start_time', np.float64),
+    ('quantized_start_step', np.int64),
+    ('end_time', np.float64),
+    ('quantized_end_step', np.int64),
+    ('numerator', np.int32),
+    ('denominator', np.int32),
+    ('instrument', np.int32),
+    ('program', np.int32),
+    ('is_drum', np.bool_),
+    ('part', np.int32),
+    ('voice', np.int32),
+)
+
+
+class NoteArray(object):
+  """The notes of a NoteSequence, stored as one NumPy array per note field.
+
+  Columns are accessed as attributes, e.g. `note_array.pitch`. Columns are
+  never modified in place: every transform returns a new NoteArray, which
+  shares the columns it does not change with the original.
+  """
+
+  def __init__(self, num_notes=None, **columns):
+    """Constructs a NoteArray.
+
+    Args:
+      num_notes: The number of notes. Can be omitted if any columns are given.
+      **columns: Arrays of values for any of the fields in `NOTE_FIELDS`, all of
+          length `num_notes`. Fields without a column are all zero.
+
+    Raises:
+      ValueError: If the number of notes cannot be determined, the columns
+          differ in length, or a column does not name a note field.
+    """
+    unknown_fields = set(columns) - set(name for name, _ in NOTE_FIELDS)
+    if unknown_fields:
+      raise ValueError('Unknown note fields: %s' % sorted(unknown_fields))
+    if num_notes is None:
+      if not columns:
+        raise ValueError('Either num_notes or a column must be specified.')
+      num_notes = len(next(iter(columns.values())))
+
+    for name, dtype in NOTE_FIELDS:
+      if name in columns:
+        column = np.asarray(columns[name], dtype=dtype)
+        if column.shape != (num_notes,):
+          raise ValueError(
+              'Column %s has shape %s, expected (%d,)' % (
+                  name, column.shape, num_notes))
+      else:
+        column = np.zeros(num_notes, dtype=dtype)
+      setattr(self, name, column)
+    self._num_notes = num_notes
+
+  def __len__(self):
+    return self._num_notes
+
+  def replace(self, **columns):
+    """Returns a new NoteArray with some columns replaced.
+
+    Args:
+      **columns: Arrays of new values for any of the fields in `NOTE_FIELDS`.
+
+    Returns:
+      A new NoteArray sharing all other columns with this one.
+    """
+    for name, _ in NOTE_FIELDS:
+      columns.setdefault(name, getattr(self, name))
+    return NoteArray(len(self), **columns)
+
+  def take(self, indices):
+    """Returns a new NoteArray containing only some of the notes.
+
+    Args:
+      indices: An array of integer note indices, or a boolean mask over notes.
+
+    Returns:
+      A new NoteArray with the selected notes, in the order selected.
+    """
+    return NoteArray(**dict(
+        (name, getattr(self, name)[indices]) for name, _ in NOTE_FIELDS))
+
+  @classmethod
+  def from_sequence(cls, sequence):
+    """Creates a NoteArray from the notes of a NoteSequence.
+
+    Args:
+      sequence: The NoteSequence proto, or a repeated field of Note protos.
+
+    Returns:
+      A NoteArray containing the notes, in order.
+    """
+    notes = getattr(sequence, 'notes', sequence)
+    num_notes = len(notes)
+    return cls(num_notes, **dict(
+        (name, np.fromiter((getattr(note, name) for note in notes),
+                           dtype=dtype, count=num_notes))
+        for name, dtype in NOTE_FIELDS))
+
+  def to_notes(self, notes):
+    """Appends the notes to a repeated field of Note protos.
+
+    Args:
+      notes: The repeated field to append the notes to, e.g.
+          `sequence.notes`.
+    """
+    names = [name for name, _ in NOTE_FIELDS]
+    for values in zip(*[getattr(self, name).tolist() for name in names]):
+      notes.add(**dict(zip(names, values)))
+
+  def to_sequence(self, sequence=None):
+    """Returns a NoteSequence containing the notes.
+
+    Args:
+      sequence: An optional NoteSequence proto whose fields other than its
+          notes are copied to the result. Its notes are not copied.
+
+    Returns:
+      A new NoteSequence proto with these notes.
+    """
+    new_sequence = music_pb2.NoteSequence()
+    if sequence is not None:
+      for field, value in sequence.ListFields():
+        if field.name == 'notes':
+          continue
+        if field.label == field.LABEL_REPEATED:
+          getattr(new_sequence, field.name).extend(value)
+        elif field.type == field.TYPE_MESSAGE:
+          getattr(new_sequence, field.name).CopyFrom(value)
+        else:
+          setattr(new_sequence, field.name, value)
+    self.to_notes(new_sequence.notes)
+    return new_sequence
+
+  @property
+  def total_time(self):
+    """The latest note end time, or zero if there are no notes."""
+    return float(self.end_time.max()) if len(self) else 0.0
+
+  @property
+  def total_quantized_steps(self):
+    """The latest quantized note end step, or zero if there are no notes."""
+    return int(self.quantized_end_step.max()) if len(self) else 0
+
+  def quantize(self, steps_per_second, quantize_cutoff):
+    """Returns the notes with start and end times snapped to quantized steps.
+
+    Quantizes exactly like `sequences_lib.quantize_to_step`, and extends notes
+    that would have zero quantized length to a single step.
+
+    Args:
+      steps_per_second: Each second will be divided into this many quantized
+          time steps.
+      quantize_cutoff: The quantizing cutoff, as a fraction of a step. See
+          `sequences_lib.QUANTIZE_CUTOFF`.
+
+    Returns:
+      A new NoteArray with the quantized step columns set.
+    """
+    offset = 1 - quantize_cutoff
+    start_steps = np.trunc(
+        self.start_time * steps_per_second + offset).astype(np.int64)
+    end_steps = np.trunc(
+        self.end_time * steps_per_second + offset).astype(np.int64)
+    end_steps[end_steps == start_steps] += 1
+    return self.replace(
+        quantized_start_step=start_steps, quantized_end_step=end_steps)
+
+  def stretch(self, stretch_factor):
+    """Returns the notes with times multiplied by `stretch_factor`."""
+    return self.replace(start_time=self.start_time * stretch_factor,
+                        end_time=self.end_time * stretch_factor)
+
+  def shift(self, shift_seconds):
+    """Returns the notes with `shift_seconds` added to their times."""
+    return self.replace(start_time=self.start_time + shift_seconds,
+                        end_time=self.end_time + shift_seconds)
+
+  def transpose(self, amount):
+    """Returns the notes with `amount` added to their pitches."""
+    return self.replace(pitch=self.pitch + amount)
+
+  def trim(self, start_time, end_time):
+    """Returns the notes that start within a time range, truncated to it.
+
+    Like `sequences_lib.trim_note_sequence`, notes starting before
+    `start_time` or at or after `end_time` are removed, and notes ending after
+    `end_time` are truncated.
+
+    Args:
+      start_time: The float time in seconds after which all notes should begin.
+      end_time: The float time in seconds before which all notes should end.
+
+    Returns:
+      A new NoteArray with the trimmed notes.
+    """
+    mask = (self.start_time >= start_time) & (self.start_time < end_time)
+    trimmed = self.take(mask)
+    return trimmed.replace(end_time=np.minimum(trimmed.end_time, end_time))
+
+  def extract(self, start_time, end_time):
+    """Returns the notes of a subsequence, shifted to start at time zero.
+
+    Selects and truncates notes like `sequences_lib.extract_subsequence`.
+
+    Args:
+      start_time: The float time in seconds to start the subsequence.
+      end_time: The float time in seconds to end the subsequence.
+
+    Returns:
+      A new NoteArray with the notes of the subsequence.
+    """
+    trimmed = self.trim(start_time, end_time)
+    return trimmed.replace(start_time=trimmed.start_time - start_time,
+                           end_time=trimmed.end_time - start_time)
@@ -0,0 +1,128 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for note_array."""
+
+# internal imports
+import numpy as np
+import tensorflow as tf
+
+from magenta.common import testing_lib as common_testing_lib
+from magenta.music import note_array
+from magenta.music import sequences_lib
+from magenta.music import testing_lib
+from magenta.protobuf import music_pb2
+
+
+class NoteArrayTest(tf.test.TestCase):
+
+  def setUp(self):
+    self.note_sequence = common_testing_lib.parse_test_proto(
+        music_pb2.NoteSequence,
+        """
+        time_signatures: {
+          numerator: 4
+          denominator: 4}
+        tempos: {
+          qpm: 60}""")
+    testing_lib.add_track_to_sequence(
+        self.note_sequence, 0,
+        [(12, 100, 0.01, 10.0), (11, 55, 0.22, 0.50), (40, 45, 2.50, 3.50),
+         (55, 120, 4.0, 4.01), (52, 99, 4.75, 5.0)])
+    testing_lib.add_track_to_sequence(
+        self.note_sequence, 9, [(36, 80, 1.0, 1.1)], is_drum=True)
+    self.note_sequence.notes[0].program = 5
+    self.note_sequence.notes[1].part = 2
+    self.note_sequence.notes[2].voice = 3
+    self.note_sequence.notes[3].numerator = 1
+    self.note_sequence.notes[3].denominator = 4
+
+  def testRoundTrip(self):
+    notes = note_array.NoteArray.from_sequence(self.note_sequence)
+    self.assertEqual(6, len(notes))
+    np.testing.assert_array_equal([12, 11, 40, 55, 52, 36], notes.pitch)
+    np.testing.assert_array_equal(
+        [False, False, False, False, False, True], notes.is_drum)
+    self.assertEqual(10.0, notes.total_time)
+
+    self.assertProtoEquals(
+        self.note_sequence, notes.to_sequence(self.note_sequence))
+
+  def testToSequenceWithoutBase(self):
+    notes = note_array.NoteArray(pitch=[60, 62], end_time=[1.0, 2.0])
+    expected_sequence = music_pb2.NoteSequence()
+    expected_sequence.notes.add(pitch=60, end_time=1.0)
+    expected_sequence.notes.add(pitch=62, end_time=2.0)
+
+    self.assertProtoEquals(expected_sequence, notes.to_sequence())
+
+  def testInvalidColumns(self):
+    with self.assertRaises(ValueError):
+      note_array.NoteArray()
+    with self.assertRaises(ValueError):
+      note_array.NoteArray(pitch=[60, 62], velocity=[100])
+    with self.assertRaises(ValueError):
+      note_array.NoteArray(pitches=[60])
+
+  def testReplaceSharesColumns(self):
+    notes = note_array.NoteArray.from_sequence(self.note_sequence)
+    transposed = notes.transpose(3)
+
+    np.testing.assert_array_equal(notes.pitch + 3, transposed.pitch)
+    self.assertIs(notes.velocity, transposed.velocity)
+
+  def testQuantize(self):
+    sequence = self.note_sequence
+    quantized_sequence = sequences_lib.quantize_note_sequence_absolute(
+        sequence, steps_per_second=4)
+
+    notes = note_array.NoteArray.from_sequence(sequence).quantize(
+        4, sequences_lib.QUANTIZE_CUTOFF)
+    self.assertEqual(
+        list(quantized_sequence.notes), list(notes.to_sequence(sequence).notes))
+    self.assertEqual(
+        quantized_sequence.total_quantized_steps, notes.total_quantized_steps)
+
+  def testStretchAndShift(self):
+    notes = note_array.NoteArray.from_sequence(self.note_sequence)
+
+    stretched_sequence = sequences_lib.stretch_note_sequence(
+        self.note_sequence, 2.0)
+    self.assertEqual(
+        list(stretched_sequence.notes),
+        list(notes.stretch(2.0).to_sequence(self.note_sequence).notes))
+
+    shifted_sequence = sequences_lib.shift_sequence_times(
+        self.note_sequence, 1.5)
+    self.assertEqual(
+        list(shifted_sequence.notes),
+        list(notes.shift(1.5).to_sequence(self.note_sequence).notes))
+
+  def testTrimAndExtract(self):
+    notes = note_array.NoteArray.from_sequence(self.note_sequence)
+
+    trimmed_sequence = sequences_lib.trim_note_sequence(
+        self.note_sequence, 2.5, 4.75)
+    self.assertEqual(
+        list(trimmed_sequence.notes),
+        list(notes.trim(2.5, 4.75).to_sequence(self.note_sequence).notes))
+
+    subsequence = sequences_lib.extract_subsequence(
+        self.note_sequence, 1.0, 4.75)
+    self.assertEqual(
+        list(subsequence.notes),
+        list(notes.extract(1.0, 4.75).to_sequence(self.note_sequence).notes))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -18,6 +18,7 @@ import hashlib
 # internal imports
 import tensorflow as tf
 
+from magenta.common import record_index
 from magenta.protobuf import music_pb2
 
 
@@ -62,17 +63,54 @@ class NoteSequenceRecordWriter(tf.python_io.TFRecordWriter):
   """A class to write serialized NoteSequence protos to a TFRecord file.
 
   This class implements `__enter__` and `__exit__`, and can be used in `with`
-  blocks like a normal file.
+  blocks like a normal file. When the file is uncompressed, a
+  `record_index` sidecar index is written next to it on close.
 
   @@__init__
   @@write
+  @@write_serialized
   @@close
   """
 
+  def __init__(self, path, options=None):
+    """Opens the TFRecord file for writing.
+
+    Args:
+      path: The path to the TFRecord file.
+      options: Optional tf.python_io.TFRecordOptions. No index is written for
+          compressed files.
+    """
+    tf.python_io.TFRecordWriter.__init__(self, path, options)
+    self._path = path
+    self._index_builder = (
+        record_index.RecordIndexBuilder() if options is None else None)
+
   def write(self, note_sequence):
     """Serializes a NoteSequence proto and writes it to the file.
 
     Args:
       note_sequence: A NoteSequence proto to write.
     """
-    tf.python_io.TFRecordWriter.write(self, note_sequence.SerializeToString())
+    self.write_serialized(note_sequence.SerializeToString())
+
+  def write_serialized(self, serialized_sequence):
+    """Writes an already serialized NoteSequence proto to the file.
+
+    Args:
+      serialized_sequence: A serialized NoteSequence proto, as a string.
+    """
+    tf.python_io.TFRecordWriter.write(self, serialized_sequence)
+    if self._index_builder is not None:
+      self._index_builder.add(serialized_sequence)
+
+  def close(self):
+    """Closes the file and writes its index."""
+    tf.python_io.TFRecordWriter.close(self)
+    if self._index_builder is not None:
+      self._index_builder.write(self._path)
+      self._index_builder = None
+
+  def __exit__(self, unused_type, unused_value, unused_traceback):
+    # Some TFRecordWriter implementations close the file without calling the
+    # overridden `close`, which would skip writing the index.
+    self.close()
@@ -17,12 +17,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
 import tempfile
 
 # internal imports
 from six.moves import range  # pylint: disable=redefined-builtin
 import tensorflow as tf
 
+from magenta.common import record_index
 from magenta.music import note_sequence_io
 from magenta.protobuf import music_pb2
 
@@ -60,5 +62,20 @@ class NoteSequenceIoTest(tf.test.TestCase):
           note_sequence_io.note_sequence_record_iterator(temp_file.name)):
         self.assertEquals(sequence, sequences[i])
 
+  def testNoteSequenceRecordWriterIndex(self):
+    path = os.path.join(self.get_temp_dir(), 'sequences.tfrecord')
+    with note_sequence_io.NoteSequenceRecordWriter(path) as writer:
+      for i in range(3):
+        sequence = music_pb2.NoteSequence()
+        sequence.id = str(i)
+        writer.write(sequence)
+
+    index = record_index.read_index(path)
+    self.assertEqual(3, index.num_records)
+    self.assertEqual(
+        ['0', '1', '2'],
+        [music_pb2.NoteSequence.FromString(
+            record_index.read_record(path, index, i)).id for i in range(3)])
+
 if __name__ == '__main__':
   tf.test.main()
@@ -19,13 +19,19 @@ Provides a uniform interface for interacting with generators for any model.
 import abc
 import os
 import tempfile
+import time
 
 # internal imports
 
 import tensorflow as tf
 
+from google.protobuf import message
 from magenta.protobuf import generator_pb2
 
+# Memory-backed directory to write bundle checkpoints to for restoring, if it
+# exists.
+_MEMORY_TEMP_DIR = '/dev/shm'
+
 
 class SequenceGeneratorException(Exception):
   """Generic exception for sequence generation errors."""
@@ -39,6 +45,41 @@ def _checkpoint_file_exists(checkpoint_file_or_prefix):
           tf.gfile.Exists(checkpoint_file_or_prefix + '.index'))
 
 
+def _write_temp_checkpoint(checkpoint):
+  """Writes a serialized checkpoint to a new temp dir.
+
+  The memory-backed `_MEMORY_TEMP_DIR` is tried first if it exists. It is often
+  small (e.g. 64 MB in containers), so if the checkpoint cannot be written
+  there, it is written to the default temp location instead.
+
+  Args:
+    checkpoint: The contents of the checkpoint file.
+
+  Returns:
+    A tuple of the temp dir, which the caller must delete, and the path of the
+    checkpoint file within it.
+  """
+  temp_parent_dirs = [None]
+  if os.path.isdir(_MEMORY_TEMP_DIR):
+    temp_parent_dirs.insert(0, _MEMORY_TEMP_DIR)
+  for i, temp_parent_dir in enumerate(temp_parent_dirs):
+    tempdir = None
+    try:
+      tempdir = tempfile.mkdtemp(dir=temp_parent_dir)
+      checkpoint_filename = os.path.join(tempdir, 'model.ckpt')
+      with tf.gfile.Open(checkpoint_filename, 'wb') as f:
+        f.write(checkpoint)
+      return tempdir, checkpoint_filename
+    except (IOError, OSError, tf.errors.OpError) as e:
+      if tempdir is not None:
+        tf.gfile.DeleteRecursively(tempdir)
+      if i == len(temp_parent_dirs) - 1:
+        raise
+      tf.logging.warning(
+          'Could not write checkpoint to %s, using the default temp dir '
+          'instead: %s', temp_parent_dir, e)
+
+
 class BaseSequenceGenerator(object):
   """Abstract class for generators."""
 
@@ -108,17 +149,80 @@ class BaseSequenceGenerator(object):
     """
     pass
 
+  def _generate_multiple(self, input_sequence, generator_options, num_outputs):
+    """Generates several independent sequences from the same input.
+
+    Generators that can generate several sequences at once, e.g. by batching
+    them in the model, should override this method. By default `_generate` is
+    called once per output.
+
+    The implementation can assume that _initialize has been called before this
+    method is called.
+
+    Args:
+      input_sequence: An input NoteSequence to base the generation on.
+      generator_options: A GeneratorOptions proto with options to use for
+          generation.
+      num_outputs: The number of sequences to generate.
+    Returns:
+      A list of `num_outputs` generated NoteSequence protos.
+    """
+    return [self._generate(input_sequence, generator_options)
+            for _ in range(num_outputs)]
+
+  def _generate_batch(self, input_sequences, generator_options):
+    """Generates one sequence for each of several input sequences.
+
+    Generators that can generate from several different input sequences at
+    once should override this method. By default identical pairs of input
+    sequence and generator options are grouped, and `_generate_multiple` is
+    called once per group.
+
+    The implementation can assume that _initialize has been called before this
+    method is called.
+
+    Args:
+      input_sequences: A list of input NoteSequences to base the generation on.
+      generator_options: A list of GeneratorOptions protos with options to use
+          for generation, one per input sequence.
+    Returns:
+      A list of generated NoteSequence protos, one per input sequence and in the
+      same order.
+    """
+    # Group the positions of identical input sequences and options.
+    unique_inputs = []
+    positions = []
+    for i, unique_input in enumerate(zip(input_sequences, generator_options)):
+      for other_input, unique_positions in zip(unique_inputs, positions):
+        if other_input == unique_input:
+          unique_positions.append(i)
+          break
+      else:
+        unique_inputs.append(unique_input)
+        positions.append([i])
+
+    generated_sequences = [None] * len(input_sequences)
+    for (input_sequence, options), unique_positions in zip(
+        unique_inputs, positions):
+      outputs = self._generate_multiple(
+          input_sequence, options, len(unique_positions))
+      for i, generated_sequence in zip(unique_positions, outputs):
+        generated_sequences[i] = generated_sequence
+    return generated_sequences
+
   def initialize(self):
     """Builds the TF graph and loads the checkpoint.
 
     If the graph has already been initialized, this is a no-op.
 
     Raises:
-      SequenceGeneratorException: If the checkpoint cannot be found.
+      SequenceGeneratorException: If the checkpoint cannot be found, or the
+          bundle metagraph cannot be parsed.
     """
     if self._initialized:
       return
 
+    start_time = time.time()
     # Either self._checkpoint or self._bundle should be set.
     # This is enforced by the constructor.
     if self._checkpoint is not None:
@@ -140,26 +244,27 @@ class BaseSequenceGenerator(object):
                 checkpoint_file, self._checkpoint))
       self._model.initialize_with_checkpoint(checkpoint_file)
     else:
-      # Write checkpoint and metagraph files to a temp dir.
-      tempdir = None
+      # The metagraph is imported directly from the bundle, but TF can only
+      # restore variables from a file, so write the checkpoint to a temp dir.
+      metagraph_def = tf.MetaGraphDef()
+      try:
+        metagraph_def.ParseFromString(self._bundle.metagraph_file)
+      except message.DecodeError as e:
+        raise SequenceGeneratorException(
+            'Could not parse bundle metagraph: %s' % e)
+      # For now, we support only 1 checkpoint file.
+      # If needed, we can later change this to support sharded checkpoints.
+      tempdir, checkpoint_filename = _write_temp_checkpoint(
+          self._bundle.checkpoint_file[0])
       try:
-        tempdir = tempfile.mkdtemp()
-        checkpoint_filename = os.path.join(tempdir, 'model.ckpt')
-        with tf.gfile.Open(checkpoint_filename, 'wb') as f:
-          # For now, we support only 1 checkpoint file.
-          # If needed, we can later change this to support sharded checkpoints.
-          f.write(self._bundle.checkpoint_file[0])
-        metagraph_filename = os.path.join(tempdir, 'model.ckpt.meta')
-        with tf.gfile.Open(metagraph_filename, 'wb') as f:
-          f.write(self._bundle.metagraph_file)
-
         self._model.initialize_with_checkpoint_and_metagraph(
-            checkpoint_filename, metagraph_filename)
+            checkpoint_filename, metagraph_def)
       finally:
         # Clean up the temp dir.
-        if tempdir is not None:
-          tf.gfile.DeleteRecursively(tempdir)
+        tf.gfile.DeleteRecursively(tempdir)
     self._initialized = True
+    tf.logging.info('Initialized generator %s in %.3f seconds.',
+                    self.details.id, time.time() - start_time)
 
   def close(self):
     """Closes the TF session.
@@ -195,6 +300,41 @@ class BaseSequenceGenerator(object):
     self.initialize()
     return self._generate(input_sequence, generator_options)
 
+  def generate_batch(self, input_sequences, generator_options):
+    """Generates one sequence for each of several input sequences.
+
+    Identical input sequences are generated from together, so that generators
+    which support it can produce many independent outputs for the same input
+    (e.g. for a `--num_outputs` flag) in a few batched model evaluations. Some
+    generators can also batch different input sequences together, including
+    input sequences with different input and generate sections.
+
+    Also initializes the TF graph if not yet initialized.
+
+    Args:
+      input_sequences: A list of input NoteSequences to base the generation on.
+      generator_options: A GeneratorOptions proto with options to use for
+          generation, or a list of GeneratorOptions protos, one per input
+          sequence. Generators that batch different input sequences together
+          may require the `args` of all the options to be the same.
+
+    Returns:
+      A list of generated NoteSequence protos, one per input sequence and in the
+      same order.
+
+    Raises:
+      SequenceGeneratorException: If a list of generator options is given with
+          a different length than `input_sequences`.
+    """
+    if isinstance(generator_options, generator_pb2.GeneratorOptions):
+      generator_options = [generator_options] * len(input_sequences)
+    elif len(generator_options) != len(input_sequences):
+      raise SequenceGeneratorException(
+          'Got %d generator options for %d input sequences.' % (
+              len(generator_options), len(input_sequences)))
+    self.initialize()
+    return self._generate_batch(input_sequences, list(generator_options))
+
   def create_bundle_file(self, bundle_file, bundle_description=None):
     """Writes a generator_pb2.GeneratorBundle file in the specified location.
 
@@ -13,11 +13,14 @@
 # limitations under the License.
 """Utility functions for handling bundle files."""
 
+import time
+
 # internal imports
 
 import tensorflow as tf
 
 from google.protobuf import message
+from magenta.common import LruCache
 from magenta.protobuf import generator_pb2
 
 
@@ -26,12 +29,62 @@ class GeneratorBundleParseException(Exception):
   pass
 
 
-def read_bundle_file(bundle_file):
+# The maximum total serialized size of the bundles held in the cache.
+_BUNDLE_CACHE_MAX_BYTES = 2 ** 30
+
+# Parsed bundles, keyed by path, along with the modification time and length of
+# the file they were parsed from. Only used when requested by the caller.
+_bundle_cache = LruCache(
+    max_bytes=_BUNDLE_CACHE_MAX_BYTES,
+    size_fn=lambda cached: cached[1].ByteSize())
+
+
+def read_bundle_file(bundle_file, use_cache=False):
+  """Reads and parses a generator_pb2.GeneratorBundle file.
+
+  Long-running processes that load the same bundle repeatedly, such as a
+  generator server, can set `use_cache` to skip reparsing it. Cached bundles
+  are keyed by path, reparsed if the file changes, and evicted least recently
+  used first once their total size exceeds `_BUNDLE_CACHE_MAX_BYTES`.
+
+  Args:
+    bundle_file: The path to the bundle file.
+    use_cache: Whether to return a copy of the cached bundle for this path if
+        the file is unchanged since it was parsed, and to cache the parsed
+        bundle.
+
+  Returns:
+    The parsed GeneratorBundle proto. It is never shared with other callers,
+    so may be modified.
+
+  Raises:
+    GeneratorBundleParseException: If the bundle file cannot be parsed.
+  """
+  if use_cache:
+    stat = tf.gfile.Stat(bundle_file)
+    file_version = (stat.mtime_nsec, stat.length)
+    cached = _bundle_cache.get(bundle_file)
+    if cached is not None and cached[0] == file_version:
+      return _copy_bundle(cached[1])
+
   # Read in bundle file.
+  start_time = time.time()
   bundle = generator_pb2.GeneratorBundle()
   with tf.gfile.Open(bundle_file, 'rb') as f:
     try:
       bundle.ParseFromString(f.read())
     except message.DecodeError as e:
       raise GeneratorBundleParseException(e)
+  tf.logging.info('Read bundle file %s in %.3f seconds.',
+                  bundle_file, time.time() - start_time)
+
+  if use_cache:
+    _bundle_cache.put(bundle_file, (file_version, _copy_bundle(bundle)))
   return bundle
+
+
+def _copy_bundle(bundle):
+  """Returns a copy of a GeneratorBundle proto."""
+  bundle_copy = generator_pb2.GeneratorBundle()
+  bundle_copy.CopyFrom(bundle)
+  return bundle_copy
@@ -0,0 +1,86 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for sequence_generator_bundle."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+# internal imports
+
+import tensorflow as tf
+
+from magenta.music import sequence_generator_bundle
+from magenta.protobuf import generator_pb2
+
+
+class SequenceGeneratorBundleTest(tf.test.TestCase):
+
+  def _write_bundle(self, bundle_file, generator_id):
+    bundle = generator_pb2.GeneratorBundle(
+        generator_details=generator_pb2.GeneratorDetails(id=generator_id),
+        checkpoint_file=[b'checkpoint'],
+        metagraph_file=b'')
+    with tf.gfile.Open(bundle_file, 'wb') as f:
+      f.write(bundle.SerializeToString())
+
+  def testReadBundleFileCachesParsedBundle(self):
+    bundle_file = os.path.join(self.get_temp_dir(), 'cached.mag')
+    self._write_bundle(bundle_file, 'generator_a')
+
+    bundle = sequence_generator_bundle.read_bundle_file(
+        bundle_file, use_cache=True)
+    self.assertEqual('generator_a', bundle.generator_details.id)
+    self.assertEqual([b'checkpoint'], list(bundle.checkpoint_file))
+    self.assertIn(bundle_file, sequence_generator_bundle._bundle_cache)
+
+    # Modifying a returned bundle does not affect the cached one.
+    bundle.generator_details.id = 'modified'
+    cached_bundle = sequence_generator_bundle.read_bundle_file(
+        bundle_file, use_cache=True)
+    self.assertIsNot(bundle, cached_bundle)
+    self.assertEqual('generator_a', cached_bundle.generator_details.id)
+
+  def testReadBundleFileDoesNotCacheByDefault(self):
+    bundle_file = os.path.join(self.get_temp_dir(), 'uncached.mag')
+    self._write_bundle(bundle_file, 'generator_a')
+
+    bundle = sequence_generator_bundle.read_bundle_file(bundle_file)
+    self.assertEqual('generator_a', bundle.generator_details.id)
+    self.assertNotIn(bundle_file, sequence_generator_bundle._bundle_cache)
+
+  def testReadBundleFileReparsesChangedFile(self):
+    bundle_file = os.path.join(self.get_temp_dir(), 'changed.mag')
+    self._write_bundle(bundle_file, 'generator_a')
+    sequence_generator_bundle.read_bundle_file(bundle_file, use_cache=True)
+
+    self._write_bundle(bundle_file, 'generator_bb')
+    bundle = sequence_generator_bundle.read_bundle_file(
+        bundle_file, use_cache=True)
+    self.assertEqual('generator_bb', bundle.generator_details.id)
+
+  def testReadBundleFileParseError(self):
+    bundle_file = os.path.join(self.get_temp_dir(), 'bad.mag')
+    with tf.gfile.Open(bundle_file, 'wb') as f:
+      f.write(b'not a bundle')
+
+    with self.assertRaises(
+        sequence_generator_bundle.GeneratorBundleParseException):
+      sequence_generator_bundle.read_bundle_file(bundle_file)
+
+
+if __name__ == '__main__':
+  tf.test.main()
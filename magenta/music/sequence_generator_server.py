@@ -0,0 +1,391 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A long-lived server for sequence generators.
+
+Holds one initialized generator per bundle and serves generate requests from
+any number of threads. Requests are queued per generator, and compatible
+requests that arrive close together are coalesced into a single call to
+`generate_batch`, so that they share batched model evaluations.
+"""
+
+import collections
+import threading
+import time
+
+# internal imports
+
+from six.moves import queue
+import tensorflow as tf
+
+from magenta.common.concurrency import serialized
+
+# Default maximum number of requests to coalesce into one batch.
+DEFAULT_MAX_BATCH_SIZE = 64
+
+# Default time in seconds to wait for more requests to coalesce after the first.
+DEFAULT_MAX_WAIT_SECONDS = 0.01
+
+
+class SequenceGeneratorServerException(Exception):
+  """Generic exception for sequence generator server errors."""
+  pass
+
+
+def _args_key(generator_options):
+  """Returns a hashable key for the generation args of `generator_options`.
+
+  The key covers the args (e.g. temperature, beam search settings, and steps
+  per iteration) but not the input and generate sections, which may differ
+  between the requests of a batch. Unlike the serialized options, the key does
+  not depend on the order of the args map.
+
+  Args:
+    generator_options: A GeneratorOptions proto.
+
+  Returns:
+    A tuple of (name, kind, value) tuples, sorted by name.
+  """
+  key = []
+  for name, arg in generator_options.args.items():
+    kind = arg.WhichOneof('kind')
+    key.append((name, kind, getattr(arg, kind) if kind else None))
+  return tuple(sorted(key))
+
+
+class _GenerateRequest(object):
+  """A queued generate request and, once done, its result or error."""
+
+  def __init__(self, input_sequence, generator_options):
+    self.input_sequence = input_sequence
+    self.generator_options = generator_options
+    # Only requests with the same generation args can share a `generate_batch`
+    # call.
+    self.options_key = _args_key(generator_options)
+    self.submit_time = time.time()
+    self.done = threading.Event()
+    self.result = None
+    self.error = None
+
+
+def _percentile(sorted_values, fraction):
+  """Returns the value at `fraction` of the way through `sorted_values`."""
+  if not sorted_values:
+    return 0.0
+  return sorted_values[
+      min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class ServerMetrics(object):
+  """Threadsafe latency and batch occupancy metrics for a served generator.
+
+  Latency is measured for each request from when it is submitted until its
+  result is ready, so it includes the time spent waiting in the queue. Batch
+  occupancy is the number of requests coalesced into a batch divided by the
+  maximum batch size. Percentiles are computed over the most recent requests
+  and batches.
+
+  Attributes:
+    max_batch_size: The maximum number of requests per batch.
+    num_requests: The total number of completed requests.
+    num_batches: The total number of batches.
+    num_errors: The total number of requests that failed.
+  """
+
+  def __init__(self, max_batch_size, window_size=1000):
+    """Constructs a ServerMetrics.
+
+    Args:
+      max_batch_size: The maximum number of requests per batch.
+      window_size: The number of most recent requests and batches to compute
+          percentiles and means over.
+    """
+    self._lock = threading.RLock()
+    self._latencies = collections.deque(maxlen=window_size)
+    self._batch_sizes = collections.deque(maxlen=window_size)
+    self.max_batch_size = max_batch_size
+    self.num_requests = 0
+    self.num_batches = 0
+    self.num_errors = 0
+
+  @serialized
+  def record_batch(self, latencies, num_errors=0):
+    """Records a completed batch of requests.
+
+    Args:
+      latencies: A list containing the latency in seconds of each request in
+          the batch.
+      num_errors: The number of requests in the batch that failed.
+    """
+    self.num_requests += len(latencies)
+    self.num_batches += 1
+    self.num_errors += num_errors
+    self._latencies.extend(latencies)
+    self._batch_sizes.append(len(latencies))
+
+  @serialized
+  def summary(self):
+    """Returns a dictionary of the current metric values."""
+    latencies = sorted(self._latencies)
+    batch_sizes = list(self._batch_sizes)
+    mean_batch_size = (
+        float(sum(batch_sizes)) / len(batch_sizes) if batch_sizes else 0.0)
+    return {
+        'num_requests': self.num_requests,
+        'num_batches': self.num_batches,
+        'num_errors': self.num_errors,
+        'mean_batch_size': mean_batch_size,
+        'mean_batch_occupancy': mean_batch_size / self.max_batch_size,
+        'latency_mean': (
+            sum(latencies) / len(latencies) if latencies else 0.0),
+        'latency_p50': _percentile(latencies, 0.5),
+        'latency_p95': _percentile(latencies, 0.95),
+        'latency_max': latencies[-1] if latencies else 0.0,
+    }
+
+
+class SequenceGeneratorServer(object):
+  """Serves concurrent generate requests to several sequence generators.
+
+  Each generator is served by its own worker thread, which takes requests from
+  the generator's queue. After taking a request, the worker waits up to
+  `max_wait_seconds` for more, then calls `generate_batch` once for each set of
+  requests with the same generation args, i.e. with the same temperature, beam
+  search settings, and steps per iteration. The input and generate sections of
+  the requests may differ. Generators that batch different input sequences
+  together (as well as identical ones) then extend all the coalesced requests
+  in a single batched RNN step loop.
+
+  If generation fails for a batch of several requests, each request is retried
+  on its own, so that only the requests that fail by themselves get an error.
+
+  Usable as a context manager, which starts and stops the server.
+  """
+
+  def __init__(self, generators, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+               max_wait_seconds=DEFAULT_MAX_WAIT_SECONDS):
+    """Constructs a SequenceGeneratorServer.
+
+    Args:
+      generators: A list of BaseSequenceGenerator objects, e.g. each created
+          from a different bundle. Requests specify a generator by its
+          details.id.
+      max_batch_size: The maximum number of requests to coalesce into a single
+          batch.
+      max_wait_seconds: The time in seconds to wait for more requests to
+          coalesce after taking the first request of a batch.
+
+    Raises:
+      SequenceGeneratorServerException: If two generators have the same id.
+    """
+    self._generators = collections.OrderedDict()
+    for generator in generators:
+      generator_id = generator.details.id
+      if generator_id in self._generators:
+        raise SequenceGeneratorServerException(
+            'Multiple generators with id: %s' % generator_id)
+      self._generators[generator_id] = generator
+    self._max_batch_size = max_batch_size
+    self._max_wait_seconds = max_wait_seconds
+    self._queues = dict(
+        (generator_id, queue.Queue()) for generator_id in self._generators)
+    self._metrics = dict(
+        (generator_id, ServerMetrics(max_batch_size))
+        for generator_id in self._generators)
+    self._lock = threading.RLock()
+    self._threads = []
+
+  @property
+  def generator_ids(self):
+    """A list of the ids of the served generators."""
+    return list(self._generators)
+
+  def metrics(self, generator_id):
+    """Returns the ServerMetrics for the generator with the given id."""
+    return self._metrics[generator_id]
+
+  @property
+  @serialized
+  def running(self):
+    """Whether the server is started and not yet stopped."""
+    return bool(self._threads)
+
+  @serialized
+  def start(self):
+    """Initializes the generators and starts serving requests.
+
+    If the server is already running, this is a no-op.
+    """
+    if self._threads:
+      return
+    for generator_id, generator in self._generators.items():
+      generator.initialize()
+      thread = threading.Thread(target=self._serve, args=(generator_id,))
+      thread.daemon = True
+      thread.start()
+      self._threads.append(thread)
+
+  @serialized
+  def stop(self):
+    """Finishes the queued requests, stops serving and closes the generators.
+
+    If the server is not running, this is a no-op.
+    """
+    if not self._threads:
+      return
+    for request_queue in self._queues.values():
+      request_queue.put(None)
+    for thread in self._threads:
+      thread.join()
+    self._threads = []
+    for generator in self._generators.values():
+      generator.close()
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *args):
+    self.stop()
+
+  def generate(self, generator_id, input_sequence, generator_options,
+               timeout=None):
+    """Generates a sequence, blocking until the coalesced batch is done.
+
+    Args:
+      generator_id: The id of the generator to use.
+      input_sequence: An input NoteSequence to base the generation on.
+      generator_options: A GeneratorOptions proto with options to use for
+          generation.
+      timeout: The maximum time in seconds to wait for the result, or None to
+          wait indefinitely.
+
+    Returns:
+      The generated NoteSequence proto.
+
+    Raises:
+      SequenceGeneratorServerException: If there is no generator with the given
+          id, the server is not running, or the request times out.
+      Exception: Any exception raised by the generator for the request.
+    """
+    if generator_id not in self._generators:
+      raise SequenceGeneratorServerException(
+          'Unknown generator id: %s' % generator_id)
+
+    request = _GenerateRequest(input_sequence, generator_options)
+    with self._lock:
+      # Holding the lock ensures the request is queued before `stop` is called.
+      if not self._threads:
+        raise SequenceGeneratorServerException('Server is not running.')
+      self._queues[generator_id].put(request)
+    if not request.done.wait(timeout):
+      raise SequenceGeneratorServerException(
+          'Timed out waiting for generator: %s' % generator_id)
+    if request.error is not None:
+      raise request.error
+    return request.result
+
+  def _next_requests(self, request_queue):
+    """Takes the next requests to serve from a generator's queue.
+
+    Blocks until a request is available, then takes any others that arrive
+    within `max_wait_seconds`, up to `max_batch_size` requests.
+
+    Args:
+      request_queue: The generator's queue of _GenerateRequest objects.
+
+    Returns:
+      A list of _GenerateRequest objects, or None if the server is stopping.
+    """
+    request = request_queue.get()
+    if request is None:
+      return None
+    requests = [request]
+    deadline = time.time() + self._max_wait_seconds
+    while len(requests) < self._max_batch_size:
+      try:
+        request = request_queue.get(timeout=max(0.0, deadline - time.time()))
+      except queue.Empty:
+        break
+      if request is None:
+        # Serve the requests already taken, then stop.
+        request_queue.put(None)
+        break
+      requests.append(request)
+    return requests
+
+  def _serve(self, generator_id):
+    """Serves requests for a single generator until the server is stopped."""
+    generator = self._generators[generator_id]
+    metrics = self._metrics[generator_id]
+    while True:
+      requests = self._next_requests(self._queues[generator_id])
+      if requests is None:
+        return
+
+      batches = collections.OrderedDict()
+      for request in requests:
+        batches.setdefault(request.options_key, []).append(request)
+
+      for batch in batches.values():
+        num_errors = self._generate_batch(generator_id, generator, batch)
+        end_time = time.time()
+        latencies = [end_time - request.submit_time for request in batch]
+        metrics.record_batch(latencies, num_errors=num_errors)
+        tf.logging.info(
+            'Generator %s served a batch of %d requests, max latency %.3fs.',
+            generator_id, len(batch), max(latencies))
+        for request in batch:
+          request.done.set()
+
+  def _generate_batch(self, generator_id, generator, batch):
+    """Generates the results of a batch of requests with the same args.
+
+    If generation fails for the batch as a whole, each request is retried on
+    its own, so that one bad request does not fail the others.
+
+    Args:
+      generator_id: The id of the generator.
+      generator: The BaseSequenceGenerator to generate with.
+      batch: A list of _GenerateRequest objects, whose result or error is set.
+
+    Returns:
+      The number of requests that failed.
+    """
+    try:
+      results = generator.generate_batch(
+          [request.input_sequence for request in batch],
+          [request.generator_options for request in batch])
+    except Exception as e:  # pylint: disable=broad-except
+      if len(batch) == 1:
+        tf.logging.error('Generator %s failed: %s', generator_id, e)
+        batch[0].error = e
+        return 1
+      tf.logging.warning(
+          'Generator %s failed for a batch of %d requests, retrying each '
+          'request separately: %s', generator_id, len(batch), e)
+    else:
+      for request, result in zip(batch, results):
+        request.result = result
+      return 0
+
+    num_errors = 0
+    for request in batch:
+      try:
+        request.result = generator.generate(
+            request.input_sequence, request.generator_options)
+      except Exception as e:  # pylint: disable=broad-except
+        tf.logging.error('Generator %s failed: %s', generator_id, e)
+        request.error = e
+        num_errors += 1
+    return num_errors
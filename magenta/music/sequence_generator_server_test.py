@@ -0,0 +1,192 @@
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for sequence_generator_server."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+
+# internal imports
+
+import tensorflow as tf
+
+from magenta.music import model
+from magenta.music import sequence_generator
+from magenta.music import sequence_generator_server
+from magenta.protobuf import generator_pb2
+from magenta.protobuf import music_pb2
+
+
+class TestModel(model.BaseModel):
+
+  def _build_graph_for_generation(self):
+    pass
+
+  def initialize_with_checkpoint_and_metagraph(self, checkpoint_filename,
+                                               metagraph_filename):
+    pass
+
+  def close(self):
+    pass
+
+
+class TestSequenceGenerator(sequence_generator.BaseSequenceGenerator):
+
+  def __init__(self, generator_id):
+    details = generator_pb2.GeneratorDetails(id=generator_id)
+    bundle = generator_pb2.GeneratorBundle(
+        generator_details=details,
+        checkpoint_file=[b'foo.ckpt'],
+        metagraph_file=b'')
+    super(TestSequenceGenerator, self).__init__(
+        TestModel(), details, checkpoint=None, bundle=bundle)
+    self.batches = []
+
+  def _generate(self, input_sequence, generator_options):
+    return self._generate_batch([input_sequence], [generator_options])[0]
+
+  def _generate_batch(self, input_sequences, generator_options):
+    if any(options.args['fail'].bool_value for options in generator_options):
+      raise ValueError('failed')
+    if any(sequence.id == 'bad' for sequence in input_sequences):
+      raise ValueError('bad input')
+    self.batches.append([sequence.id for sequence in input_sequences])
+    return [music_pb2.NoteSequence(id=sequence.id + '_out')
+            for sequence in input_sequences]
+
+
+class SequenceGeneratorServerTest(tf.test.TestCase):
+
+  def _generate_concurrently(self, server, requests):
+    results = [None] * len(requests)
+
+    def generate(i, generator_id, sequence_id, generator_options):
+      results[i] = server.generate(
+          generator_id, music_pb2.NoteSequence(id=sequence_id),
+          generator_options).id
+
+    threads = [threading.Thread(target=generate, args=(i,) + request)
+               for i, request in enumerate(requests)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    return results
+
+  def testCoalesceRequests(self):
+    generator = TestSequenceGenerator('test_generator')
+    options_a = generator_pb2.GeneratorOptions()
+    options_a.args['temperature'].float_value = 1.0
+    options_a.generate_sections.add(start_time=1.0, end_time=2.0)
+    options_b = generator_pb2.GeneratorOptions()
+    options_b.args['temperature'].float_value = 0.5
+    options_c = generator_pb2.GeneratorOptions()
+    options_c.args['temperature'].float_value = 1.0
+    options_c.generate_sections.add(start_time=3.0, end_time=5.0)
+
+    with sequence_generator_server.SequenceGeneratorServer(
+        [generator], max_batch_size=4, max_wait_seconds=5.0) as server:
+      results = self._generate_concurrently(server, [
+          ('test_generator', 'a', options_a),
+          ('test_generator', 'b', options_b),
+          ('test_generator', 'c', options_c),
+          ('test_generator', 'd', options_a)])
+
+    self.assertEqual(['a_out', 'b_out', 'c_out', 'd_out'], results)
+    # The requests with the same args are generated together, even though
+    # their generate sections differ.
+    self.assertEqual(
+        [['a', 'c', 'd'], ['b']],
+        sorted(sorted(batch) for batch in generator.batches))
+
+    summary = server.metrics('test_generator').summary()
+    self.assertEqual(4, summary['num_requests'])
+    self.assertEqual(2, summary['num_batches'])
+    self.assertEqual(0, summary['num_errors'])
+    self.assertEqual(0.5, summary['mean_batch_occupancy'])
+    self.assertGreater(summary['latency_max'], 0.0)
+
+  def testMultipleGenerators(self):
+    generator_a = TestSequenceGenerator('generator_a')
+    generator_b = TestSequenceGenerator('generator_b')
+    options = generator_pb2.GeneratorOptions()
+
+    with sequence_generator_server.SequenceGeneratorServer(
+        [generator_a, generator_b], max_wait_seconds=0.0) as server:
+      self.assertEqual(['generator_a', 'generator_b'], server.generator_ids)
+      self.assertEqual('x_out', server.generate(
+          'generator_b', music_pb2.NoteSequence(id='x'), options).id)
+      with self.assertRaises(
+          sequence_generator_server.SequenceGeneratorServerException):
+        server.generate('generator_c', music_pb2.NoteSequence(), options)
+
+    self.assertEqual([], generator_a.batches)
+    self.assertEqual([['x']], generator_b.batches)
+
+  def testDuplicateGeneratorIds(self):
+    with self.assertRaises(
+        sequence_generator_server.SequenceGeneratorServerException):
+      sequence_generator_server.SequenceGeneratorServer(
+          [TestSequenceGenerator('test_generator'),
+           TestSequenceGenerator('test_generator')])
+
+  def testGenerateError(self):
+    options = generator_pb2.GeneratorOptions()
+    options.args['fail'].bool_value = True
+    server = sequence_generator_server.SequenceGeneratorServer(
+        [TestSequenceGenerator('test_generator')], max_wait_seconds=0.0)
+
+    with self.assertRaises(
+        sequence_generator_server.SequenceGeneratorServerException):
+      server.generate('test_generator', music_pb2.NoteSequence(), options)
+
+    with server:
+      with self.assertRaises(ValueError):
+        server.generate('test_generator', music_pb2.NoteSequence(), options)
+    self.assertEqual(1, server.metrics('test_generator').num_errors)
+
+  def testGenerateErrorOnlyFailsBadRequests(self):
+    generator = TestSequenceGenerator('test_generator')
+    options = generator_pb2.GeneratorOptions()
+    errors = {}
+
+    def generate(sequence_id):
+      try:
+        server.generate(
+            'test_generator', music_pb2.NoteSequence(id=sequence_id), options)
+      except ValueError as e:
+        errors[sequence_id] = e
+
+    with sequence_generator_server.SequenceGeneratorServer(
+        [generator], max_batch_size=3, max_wait_seconds=5.0) as server:
+      threads = [threading.Thread(target=generate, args=(sequence_id,))
+                 for sequence_id in ['a', 'bad', 'c']]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+
+    # The batch failed, so each request was retried on its own.
+    self.assertEqual(['bad'], list(errors))
+    self.assertEqual([['a'], ['c']], sorted(generator.batches))
+    summary = server.metrics('test_generator').summary()
+    self.assertEqual(3, summary['num_requests'])
+    self.assertEqual(1, summary['num_batches'])
+    self.assertEqual(1, summary['num_errors'])
+
+
+if __name__ == '__main__':
+  tf.test.main()
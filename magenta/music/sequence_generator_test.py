@@ -17,6 +17,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import errno
+import os
+
 # internal imports
 
 import tensorflow as tf
@@ -24,16 +27,23 @@ import tensorflow as tf
 from magenta.music import model
 from magenta.music import sequence_generator
 from magenta.protobuf import generator_pb2
+from magenta.protobuf import music_pb2
 
 
 class TestModel(model.BaseModel):
 
   def __init__(self):
     super(TestModel, self).__init__()
+    self.checkpoint = None
 
   def _build_graph_for_generation(self):
     pass
 
+  def initialize_with_checkpoint_and_metagraph(self, checkpoint_filename,
+                                               metagraph_filename):
+    with tf.gfile.Open(checkpoint_filename, 'rb') as f:
+      self.checkpoint = f.read()
+
 
 class TestSequenceGenerator(sequence_generator.BaseSequenceGenerator):
 
@@ -50,6 +60,18 @@ class TestSequenceGenerator(sequence_generator.BaseSequenceGenerator):
     pass
 
 
+class BatchTestSequenceGenerator(TestSequenceGenerator):
+
+  def __init__(self, bundle):
+    super(BatchTestSequenceGenerator, self).__init__(bundle=bundle)
+    self.calls = []
+
+  def _generate_multiple(self, input_sequence, generator_options, num_outputs):
+    self.calls.append((input_sequence.id, num_outputs))
+    return [music_pb2.NoteSequence(id='%s_%d' % (input_sequence.id, i))
+            for i in range(num_outputs)]
+
+
 class SequenceGeneratorTest(tf.test.TestCase):
 
   def testSpecifyEitherCheckPointOrBundle(self):
@@ -98,6 +120,78 @@ class SequenceGeneratorTest(tf.test.TestCase):
     seq_gen = TestSequenceGenerator(bundle=bundle)
     self.assertEquals(bundle_details, seq_gen.bundle_details)
 
+  def testGenerateBatchGroupsIdenticalInputs(self):
+    bundle = generator_pb2.GeneratorBundle(
+        generator_details=generator_pb2.GeneratorDetails(
+            id='test_generator'),
+        checkpoint_file=[b'foo.ckpt'],
+        metagraph_file=b'')
+    seq_gen = BatchTestSequenceGenerator(bundle=bundle)
+
+    sequence_a = music_pb2.NoteSequence(id='a')
+    sequence_b = music_pb2.NoteSequence(id='b')
+    generated_sequences = seq_gen.generate_batch(
+        [sequence_a, sequence_b, sequence_a, sequence_a],
+        generator_pb2.GeneratorOptions())
+
+    self.assertEqual([('a', 3), ('b', 1)], seq_gen.calls)
+    self.assertEqual(
+        ['a_0', 'b_0', 'a_1', 'a_2'],
+        [sequence.id for sequence in generated_sequences])
+
+  def testGenerateBatchWithOptionsPerInput(self):
+    bundle = generator_pb2.GeneratorBundle(
+        generator_details=generator_pb2.GeneratorDetails(
+            id='test_generator'),
+        checkpoint_file=[b'foo.ckpt'],
+        metagraph_file=b'')
+    seq_gen = BatchTestSequenceGenerator(bundle=bundle)
+
+    sequence_a = music_pb2.NoteSequence(id='a')
+    options_1 = generator_pb2.GeneratorOptions()
+    options_1.generate_sections.add(start_time=1.0, end_time=2.0)
+    options_2 = generator_pb2.GeneratorOptions()
+    options_2.generate_sections.add(start_time=1.0, end_time=3.0)
+    generated_sequences = seq_gen.generate_batch(
+        [sequence_a, sequence_a, sequence_a], [options_1, options_2, options_1])
+
+    # Only inputs with identical options are grouped.
+    self.assertEqual([('a', 2), ('a', 1)], seq_gen.calls)
+    self.assertEqual(
+        ['a_0', 'a_0', 'a_1'],
+        [sequence.id for sequence in generated_sequences])
+
+    with self.assertRaises(sequence_generator.SequenceGeneratorException):
+      seq_gen.generate_batch([sequence_a, sequence_a], [options_1])
+
+  def testInitializeFallsBackWhenMemoryTempDirIsFull(self):
+    memory_temp_dir = os.path.join(self.get_temp_dir(), 'shm')
+    tf.gfile.MakeDirs(memory_temp_dir)
+    original_memory_temp_dir = sequence_generator._MEMORY_TEMP_DIR
+    original_open = tf.gfile.Open
+
+    def open_fn(name, mode='r'):
+      if name.startswith(memory_temp_dir) and 'w' in mode:
+        raise IOError(errno.ENOSPC, 'No space left on device', name)
+      return original_open(name, mode)
+
+    sequence_generator._MEMORY_TEMP_DIR = memory_temp_dir
+    tf.gfile.Open = open_fn
+    try:
+      bundle = generator_pb2.GeneratorBundle(
+          generator_details=generator_pb2.GeneratorDetails(
+              id='test_generator'),
+          checkpoint_file=[b'checkpoint'],
+          metagraph_file=b'')
+      seq_gen = TestSequenceGenerator(bundle=bundle)
+      seq_gen.initialize()
+    finally:
+      sequence_generator._MEMORY_TEMP_DIR = original_memory_temp_dir
+      tf.gfile.Open = original_open
+
+    self.assertEqual(b'checkpoint', seq_gen._model.checkpoint)
+    self.assertEqual([], tf.gfile.ListDirectory(memory_temp_dir))
+
 
 if __name__ == '__main__':
   tf.test.main()
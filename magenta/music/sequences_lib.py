@@ -13,10 +13,11 @@
 # limitations under the License.
 """Defines sequence of notes objects for creating datasets."""
 
+import bisect
 import collections
 import copy
 import itertools
-from operator import itemgetter
+from operator import attrgetter
 
 # internal imports
 import numpy as np
@@ -25,6 +26,7 @@ import tensorflow as tf
 
 from magenta.music import chord_symbols_lib
 from magenta.music import constants
+from magenta.music import note_array
 from magenta.protobuf import music_pb2
 
 # Set the quantization cutoff.
@@ -541,6 +543,136 @@ def steps_per_bar_in_quantized_sequence(note_sequence):
   return steps_per_bar_float
 
 
+def _extract_subsequences(sequence, split_times, sustain_control_number=64):
+  """Extracts consecutive subsequences from a NoteSequence in a single pass.
+
+  Equivalent to calling `extract_subsequence` for each pair of consecutive
+  times in `split_times`, but the notes, sustain pedal events, and time
+  signatures, key signatures, tempos and chord changes are each sorted once
+  and partitioned into all subsequences together, rather than rescanned for
+  each subsequence.
+
+  Args:
+    sequence: The NoteSequence to extract subsequences from.
+    split_times: A sorted list of float times in seconds. A subsequence is
+        extracted between each pair of consecutive times.
+    sustain_control_number: The MIDI control number for sustain pedal.
+
+  Returns:
+    A Python list of the extracted NoteSequences, each shifted to start at time
+    zero.
+
+  Raises:
+    QuantizationStatusException: If the sequence has already been quantized.
+    ValueError: If a subsequence would start past the end of `sequence`.
+  """
+  if is_quantized_sequence(sequence):
+    raise QuantizationStatusException(
+        'Can only extract subsequence from unquantized NoteSequence.')
+
+  start_times = split_times[:-1]
+  end_times = split_times[1:]
+  if any(start_time >= sequence.total_time for start_time in start_times):
+    raise ValueError('Cannot extract subsequence past end of sequence.')
+
+  # All subsequences start from a copy of the sequence without the fields that
+  # get partitioned.
+  template = music_pb2.NoteSequence()
+  template.CopyFrom(sequence)
+  for field_name in ['notes', 'time_signatures', 'key_signatures', 'tempos',
+                     'text_annotations', 'control_changes', 'pitch_bends']:
+    template.ClearField(field_name)
+  template.total_time = 0.0
+  subsequences = []
+  for _ in start_times:
+    subsequence = music_pb2.NoteSequence()
+    subsequence.CopyFrom(template)
+    subsequences.append(subsequence)
+
+  # Assign each note to the subsequence it starts in. A stable sort by
+  # subsequence keeps the notes of each subsequence in their original order.
+  note_start_times = np.array(
+      [note.start_time for note in sequence.notes], dtype=np.float64)
+  note_indices = np.searchsorted(
+      np.array(start_times, dtype=np.float64), note_start_times,
+      side='right') - 1
+  note_order = np.argsort(note_indices, kind='mergesort')
+  note_indices = note_indices.tolist()
+  for note_pos in note_order.tolist():
+    i = note_indices[note_pos]
+    if i < 0:
+      continue
+    note = sequence.notes[note_pos]
+    if note.start_time >= end_times[i]:
+      continue
+    subsequence = subsequences[i]
+    new_note = subsequence.notes.add()
+    new_note.CopyFrom(note)
+    new_note.start_time -= start_times[i]
+    new_note.end_time = min(note.end_time, end_times[i]) - start_times[i]
+    if new_note.end_time > subsequence.total_time:
+      subsequence.total_time = new_note.end_time
+
+  # Partition time signatures, key signatures, tempos, and chord changes (other
+  # text annotations are deleted). Each subsequence starts with the most recent
+  # event of each type at or before its start time.
+  events_by_type = [
+      sequence.time_signatures, sequence.key_signatures, sequence.tempos,
+      [annotation for annotation in sequence.text_annotations
+       if annotation.annotation_type == CHORD_SYMBOL]]
+  container_names = [
+      'time_signatures', 'key_signatures', 'tempos', 'text_annotations']
+  for events, container_name in zip(events_by_type, container_names):
+    events = sorted(events, key=lambda event: event.time)
+    event_times = [event.time for event in events]
+    for subsequence, start_time, end_time in zip(
+        subsequences, start_times, end_times):
+      container = getattr(subsequence, container_name)
+      first = bisect.bisect_right(event_times, start_time)
+      last = bisect.bisect_left(event_times, end_time, lo=first)
+      if first > 0:
+        initial_event = container.add()
+        initial_event.CopyFrom(events[first - 1])
+        initial_event.time = 0.0
+      for event in events[first:last]:
+        new_event = container.add()
+        new_event.CopyFrom(event)
+        new_event.time -= start_time
+
+  # Partition sustain pedal events (other control changes are deleted). Sustain
+  # pedal state prior to each subsequence is maintained per-instrument, by
+  # sweeping through the sustain events once.
+  sustain_events = sorted(
+      [cc for cc in sequence.control_changes
+       if cc.control_number == sustain_control_number],
+      key=lambda event: event.time)
+  sustain_times = [event.time for event in sustain_events]
+  initial_sustain_events = collections.OrderedDict()
+  next_event = 0
+  for subsequence, start_time, end_time in zip(
+      subsequences, start_times, end_times):
+    first = bisect.bisect_right(sustain_times, start_time, lo=next_event)
+    for sustain_event in sustain_events[next_event:first]:
+      initial_sustain_events[sustain_event.instrument] = sustain_event
+    next_event = first
+    for sustain_event in initial_sustain_events.values():
+      initial_sustain_event = subsequence.control_changes.add()
+      initial_sustain_event.CopyFrom(sustain_event)
+      initial_sustain_event.time = 0.0
+    last = bisect.bisect_left(sustain_times, end_time, lo=first)
+    for sustain_event in sustain_events[first:last]:
+      new_sustain_event = subsequence.control_changes.add()
+      new_sustain_event.CopyFrom(sustain_event)
+      new_sustain_event.time -= start_time
+
+  for subsequence, start_time in zip(subsequences, start_times):
+    subsequence.subsequence_info.start_time_offset = start_time
+    subsequence.subsequence_info.end_time_offset = (
+        sequence.total_time - start_time - subsequence.total_time)
+
+  return subsequences
+
+
 def split_note_sequence(note_sequence, hop_size_seconds,
                         skip_splits_inside_notes=False):
   """Split one NoteSequence into many at specified time intervals.
@@ -575,7 +707,7 @@ def split_note_sequence(note_sequence, hop_size_seconds,
   note_idx = 0
   notes_crossing_split = []
 
-  subsequences = []
+  subsequence_times = [prev_split_time]
 
   if isinstance(hop_size_seconds, list):
     split_times = sorted(hop_size_seconds)
@@ -593,20 +725,16 @@ def split_note_sequence(note_sequence, hop_size_seconds,
                             if note.end_time > split_time]
 
     if not (skip_splits_inside_notes and notes_crossing_split):
-      # Extract the subsequence between the previous split time and this split
-      # time.
-      subsequence = extract_subsequence(
-          note_sequence, prev_split_time, split_time)
-      subsequences.append(subsequence)
+      # Split between the previous split time and this split time.
+      subsequence_times.append(split_time)
       prev_split_time = split_time
 
   # Handle the final subsequence.
   if note_sequence.total_time > prev_split_time:
-    subsequence = extract_subsequence(note_sequence, prev_split_time,
-                                      note_sequence.total_time)
-    subsequences.append(subsequence)
+    subsequence_times.append(note_sequence.total_time)
 
-  return subsequences
+  # Extract all subsequences in a single pass over the sequence.
+  return _extract_subsequences(note_sequence, subsequence_times)
 
 
 def split_note_sequence_on_time_changes(note_sequence,
@@ -645,7 +773,7 @@ def split_note_sequence_on_time_changes(note_sequence,
   note_idx = 0
   notes_crossing_split = []
 
-  subsequences = []
+  subsequence_times = [prev_change_time]
 
   for time_change in time_signatures_and_tempos:
     if isinstance(time_change, music_pb2.NoteSequence.TimeSignature):
@@ -668,11 +796,8 @@ def split_note_sequence_on_time_changes(note_sequence,
 
     if time_change.time > prev_change_time:
       if not (skip_splits_inside_notes and notes_crossing_split):
-        # Extract the subsequence between the previous time change and this
-        # time change.
-        subsequence = extract_subsequence(note_sequence, prev_change_time,
-                                          time_change.time)
-        subsequences.append(subsequence)
+        # Split between the previous time change and this time change.
+        subsequence_times.append(time_change.time)
         prev_change_time = time_change.time
 
     # Even if we didn't split here, update the current time signature or tempo.
@@ -684,11 +809,10 @@ def split_note_sequence_on_time_changes(note_sequence,
 
   # Handle the final subsequence.
   if note_sequence.total_time > prev_change_time:
-    subsequence = extract_subsequence(note_sequence, prev_change_time,
-                                      note_sequence.total_time)
-    subsequences.append(subsequence)
+    subsequence_times.append(note_sequence.total_time)
 
-  return subsequences
+  # Extract all subsequences in a single pass over the sequence.
+  return _extract_subsequences(note_sequence, subsequence_times)
 
 
 def quantize_to_step(unquantized_seconds, steps_per_second,
@@ -732,24 +856,35 @@ def _quantize_notes(note_sequence, steps_per_second):
   Raises:
     NegativeTimeException: If a note or chord occurs at a negative time.
   """
-  for note in note_sequence.notes:
-    # Quantize the start and end times of the note.
-    note.quantized_start_step = quantize_to_step(
-        note.start_time, steps_per_second)
-    note.quantized_end_step = quantize_to_step(
-        note.end_time, steps_per_second)
-    if note.quantized_end_step == note.quantized_start_step:
-      note.quantized_end_step += 1
-
-    # Do not allow notes to start or end in negative time.
-    if note.quantized_start_step < 0 or note.quantized_end_step < 0:
-      raise NegativeTimeException(
-          'Got negative note time: start_step = %s, end_step = %s' %
-          (note.quantized_start_step, note.quantized_end_step))
-
-    # Extend quantized sequence if necessary.
-    if note.quantized_end_step > note_sequence.total_quantized_steps:
-      note_sequence.total_quantized_steps = note.quantized_end_step
+  # Quantize the start and end times of all notes at once.
+  num_notes = len(note_sequence.notes)
+  notes = note_array.NoteArray(
+      num_notes,
+      start_time=np.fromiter(
+          (note.start_time for note in note_sequence.notes), dtype=np.float64,
+          count=num_notes),
+      end_time=np.fromiter(
+          (note.end_time for note in note_sequence.notes), dtype=np.float64,
+          count=num_notes)).quantize(steps_per_second, QUANTIZE_CUTOFF)
+
+  # Do not allow notes to start or end in negative time.
+  negative = np.flatnonzero(
+      (notes.quantized_start_step < 0) | (notes.quantized_end_step < 0))
+  if negative.size:
+    raise NegativeTimeException(
+        'Got negative note time: start_step = %s, end_step = %s' %
+        (notes.quantized_start_step[negative[0]],
+         notes.quantized_end_step[negative[0]]))
+
+  for note, start_step, end_step in zip(
+      note_sequence.notes, notes.quantized_start_step.tolist(),
+      notes.quantized_end_step.tolist()):
+    note.quantized_start_step = start_step
+    note.quantized_end_step = end_step
+
+  # Extend quantized sequence if necessary.
+  note_sequence.total_quantized_steps = max(
+      note_sequence.total_quantized_steps, notes.total_quantized_steps)
 
   # Also quantize control changes and text annotations.
   for event in itertools.chain(
@@ -959,14 +1094,23 @@ def stretch_note_sequence(note_sequence, stretch_factor):
   return stretched_sequence
 
 
-# Constants for processing the note/sustain stream.
-# The order here matters because we we want to process 'on' events before we
-# process 'off' events, and we want to process sustain events before note
-# events.
-_SUSTAIN_ON = 0
-_SUSTAIN_OFF = 1
-_NOTE_ON = 2
-_NOTE_OFF = 3
+def _is_sustained(sustain_times, sustain_on, query_times):
+  """Returns whether sustain is on just before each of a set of times.
+
+  Args:
+    sustain_times: A sorted NumPy array of sustain event times.
+    sustain_on: A boolean NumPy array, True for each sustain ON event.
+    query_times: A NumPy array of times to query.
+
+  Returns:
+    A boolean NumPy array, True for each query time at which the latest
+    earlier sustain event is a sustain ON event.
+  """
+  if not len(sustain_times):
+    return np.zeros(len(query_times), dtype=np.bool_)
+  num_prior = np.searchsorted(sustain_times, query_times, side='left')
+  return np.where(
+      num_prior > 0, sustain_on[np.maximum(num_prior - 1, 0)], False)
 
 
 def apply_sustain_control_changes(note_sequence, sustain_control_number=64):
@@ -977,6 +1121,11 @@ def apply_sustain_control_changes(note_sequence, sustain_control_number=64):
   is done on a per instrument basis, so notes are only affected by sustain
   events for the same instrument.
 
+  Events are ordered by time and, at equal times, note onsets come before note
+  offsets, which come before sustain events. The end of each note is found with
+  array searches over the sustain events and the onsets of notes of the same
+  instrument and pitch, rather than by simulating the event stream.
+
   Args:
     note_sequence: The NoteSequence for which to apply sustain. This object will
         not be modified.
@@ -997,95 +1146,123 @@ def apply_sustain_control_changes(note_sequence, sustain_control_number=64):
     raise QuantizationStatusException(
         'Can only apply sustain to unquantized NoteSequence.')
 
-  sequence = copy.deepcopy(note_sequence)
+  sequence = music_pb2.NoteSequence()
+  sequence.CopyFrom(note_sequence)
 
-  # Sort all note on/off and sustain on/off events.
-  events = []
-  events.extend([(note.start_time, _NOTE_ON, note)
-                 for note in sequence.notes])
-  events.extend([(note.end_time, _NOTE_OFF, note)
-                 for note in sequence.notes])
-
-  for cc in sequence.control_changes:
-    if cc.control_number != sustain_control_number:
-      continue
-    value = cc.control_value
-    if value < 0 or value > 127:
+  sustain_events = [cc for cc in sequence.control_changes
+                    if cc.control_number == sustain_control_number]
+  for cc in sustain_events:
+    if cc.control_value < 0 or cc.control_value > 127:
       tf.logging.warn(
-          'Sustain control change has out of range value: %d', value)
-    if value >= 64:
-      events.append((cc.time, _SUSTAIN_ON, cc))
-    elif value < 64:
-      events.append((cc.time, _SUSTAIN_OFF, cc))
-
-  # Sort, using the event type constants to ensure the order events are
-  # processed.
-  events.sort(key=itemgetter(0))
-
-  # Lists of active notes, keyed by instrument.
-  active_notes = collections.defaultdict(list)
-  # Whether sustain is active for a given instrument.
-  sus_active = collections.defaultdict(lambda: False)
-
-  # Iterate through all sustain on/off and note on/off events in order.
-  time = 0
-  for time, event_type, event in events:
-    if event_type == _SUSTAIN_ON:
-      sus_active[event.instrument] = True
-    elif event_type == _SUSTAIN_OFF:
-      sus_active[event.instrument] = False
-      # End all notes for the instrument that were being extended.
-      new_active_notes = []
-      for note in active_notes[event.instrument]:
-        if note.end_time < time:
-          # This note was being extended because of sustain.
-          # Update the end time and don't keep it in the list.
-          note.end_time = time
-          if time > sequence.total_time:
-            sequence.total_time = time
-        else:
-          # This note is actually still active, keep it.
-          new_active_notes.append(note)
-      active_notes[event.instrument] = new_active_notes
-    elif event_type == _NOTE_ON:
-      if sus_active[event.instrument]:
-        # If sustain is on, end all previous notes with the same pitch.
-        new_active_notes = []
-        for note in active_notes[event.instrument]:
-          if note.pitch == event.pitch:
-            note.end_time = time
-            if note.start_time == note.end_time:
-              # This note now has no duration because another note of the same
-              # pitch started at the same time. Only one of these notes should
-              # be preserved, so delete this one.
-              # TODO(fjord): A more correct solution would probably be to
-              # preserve both notes and make the same duration, but that is a
-              # little more complicated to implement. Will keep this solution
-              # until we find that we need the more complex one.
-              sequence.notes.remove(note)
-          else:
-            new_active_notes.append(note)
-        active_notes[event.instrument] = new_active_notes
-      # Add this new note to the list of active notes.
-      active_notes[event.instrument].append(event)
-    elif event_type == _NOTE_OFF:
-      if sus_active[event.instrument]:
-        # Note continues until another note of the same pitch or sustain ends.
-        pass
-      else:
-        # Remove this particular note from the active list.
-        # It may have already been removed if a note of the same pitch was
-        # played when sustain was active.
-        if event in active_notes[event.instrument]:
-          active_notes[event.instrument].remove(event)
-    else:
-      raise AssertionError('Invalid event_type: %s' % event_type)
-
-  # End any notes that were still active due to sustain.
-  for instrument in active_notes.values():
-    for note in instrument:
-      note.end_time = time
-      sequence.total_time = time
+          'Sustain control change has out of range value: %d',
+          cc.control_value)
+  num_sustain_events = len(sustain_events)
+  sustain_times = np.fromiter((cc.time for cc in sustain_events),
+                              dtype=np.float64, count=num_sustain_events)
+  sustain_instruments = np.fromiter(
+      (cc.instrument for cc in sustain_events), dtype=np.int64,
+      count=num_sustain_events)
+  sustain_on = np.fromiter(
+      (cc.control_value >= 64 for cc in sustain_events), dtype=np.bool_,
+      count=num_sustain_events)
+
+  num_notes = len(sequence.notes)
+  if not num_notes:
+    return sequence
+  # Read all the needed note fields in a single pass over the notes.
+  note_fields = np.array(
+      list(map(attrgetter('pitch', 'instrument', 'start_time', 'end_time'),
+               sequence.notes)),
+      dtype=np.float64)
+  note_pitches = note_fields[:, 0].astype(np.int64)
+  note_instruments = note_fields[:, 1].astype(np.int64)
+  note_start_times = note_fields[:, 2]
+  note_end_times = note_fields[:, 3]
+
+  # Notes that are still held at the end of all events are ended at the time of
+  # the last event.
+  last_event_time = float(max(
+      note_start_times.max(), note_end_times.max(),
+      sustain_times.max() if num_sustain_events else 0.0))
+
+  new_end_times = note_end_times.copy()
+  # Notes cut to zero duration by an identical onset, which are deleted.
+  deleted = np.zeros(num_notes, dtype=np.bool_)
+  # Notes ended by a sustain release, and notes held until the last event.
+  released = np.zeros(num_notes, dtype=np.bool_)
+  held = np.zeros(num_notes, dtype=np.bool_)
+
+  for instrument in np.unique(note_instruments).tolist():
+    note_indices = np.flatnonzero(note_instruments == instrument)
+    start_times = note_start_times[note_indices]
+    end_times = note_end_times[note_indices]
+
+    # The sustain events for this instrument, in processing order.
+    sustain_mask = sustain_instruments == instrument
+    order = np.argsort(sustain_times[sustain_mask], kind='mergesort')
+    times = sustain_times[sustain_mask][order]
+    on = sustain_on[sustain_mask][order]
+    off_times = times[~on]
+
+    # Without another onset of the same pitch, a note ends at its own offset
+    # unless sustain is on at that point. Then it is held until the first
+    # sustain release after its offset, or until the last event if there is
+    # none. A note whose offset precedes its onset never ends at its offset.
+    well_formed = end_times >= start_times
+    release_indices = np.where(
+        well_formed,
+        np.searchsorted(off_times, end_times, side='right'),
+        np.searchsorted(off_times, start_times, side='left'))
+    has_release = release_indices < len(off_times)
+    release_times = (
+        off_times[np.minimum(release_indices, len(off_times) - 1)]
+        if len(off_times) else np.zeros(len(note_indices)))
+    extended = _is_sustained(times, on, end_times) | ~well_formed
+    candidate_end_times = np.where(
+        extended, np.where(has_release, release_times, last_event_time),
+        end_times)
+
+    # A note is cut short by the next onset of the same pitch made while
+    # sustain is on. Sort notes by pitch then onset, keeping the original note
+    # order for simultaneous onsets, and find the next sustained onset within
+    # each pitch.
+    pitches = note_pitches[note_indices]
+    by_pitch = np.lexsort((start_times, pitches))
+    sorted_pitches = pitches[by_pitch]
+    sorted_start_times = start_times[by_pitch]
+    num_instrument_notes = len(by_pitch)
+    sustained_onset_positions = np.where(
+        _is_sustained(times, on, sorted_start_times),
+        np.arange(num_instrument_notes), num_instrument_notes)
+    next_positions = np.append(
+        np.minimum.accumulate(sustained_onset_positions[::-1])[::-1][1:],
+        num_instrument_notes)
+    has_next = next_positions < num_instrument_notes
+    has_next[has_next] = (
+        sorted_pitches[next_positions[has_next]] == sorted_pitches[has_next])
+    next_onset_times = np.full(num_instrument_notes, np.inf)
+    next_onset_times[has_next] = sorted_start_times[next_positions[has_next]]
+    next_onset_times = next_onset_times[np.argsort(by_pitch)]
+
+    truncated = next_onset_times <= candidate_end_times
+    new_end_times[note_indices] = np.where(
+        truncated, next_onset_times, candidate_end_times)
+    deleted[note_indices] = truncated & (next_onset_times == start_times)
+    released[note_indices] = ~truncated & extended & has_release
+    held[note_indices] = ~truncated & extended & ~has_release
+
+  changed = np.flatnonzero(new_end_times != note_end_times)
+  for i, end_time in zip(changed.tolist(), new_end_times[changed].tolist()):
+    sequence.notes[i].end_time = end_time
+
+  if held.any():
+    sequence.total_time = last_event_time
+  elif released.any():
+    sequence.total_time = max(
+        sequence.total_time, float(new_end_times[released].max()))
+
+  for i in reversed(np.flatnonzero(deleted).tolist()):
+    del sequence.notes[i]
 
   return sequence
 
@@ -14,6 +14,8 @@
 """Tests for sequences_lib."""
 
 import copy
+import random
+import time
 
 # internal imports
 import tensorflow as tf
@@ -168,6 +170,49 @@ class SequencesLibTest(tf.test.TestCase):
     self.assertProtoEquals(expected_subsequence_2, subsequences[1])
     self.assertProtoEquals(expected_subsequence_3, subsequences[2])
 
+  def testSplitNoteSequenceMatchesExtractSubsequence(self):
+    # Tests that splitting a NoteSequence produces the same subsequences as
+    # extracting each one individually.
+    sequence = common_testing_lib.parse_test_proto(
+        music_pb2.NoteSequence,
+        """
+        time_signatures: {
+          numerator: 4
+          denominator: 4}
+        time_signatures: {
+          time: 4.5
+          numerator: 3
+          denominator: 4}
+        tempos: {
+          qpm: 60}
+        key_signatures: {
+          time: 2.0
+          key: D}""")
+    testing_lib.add_track_to_sequence(
+        sequence, 0,
+        [(12, 100, 0.01, 8.0), (11, 55, 0.22, 0.50), (40, 45, 2.50, 3.50),
+         (55, 120, 4.0, 4.01), (52, 99, 4.75, 5.0)])
+    testing_lib.add_track_to_sequence(
+        sequence, 1, [(60, 80, 3.0, 4.0), (62, 80, 1.0, 6.5)])
+    testing_lib.add_chords_to_sequence(
+        sequence, [('C', 1.0), ('G7', 2.0), ('F', 4.0)])
+    testing_lib.add_control_changes_to_sequence(
+        sequence, 0, [(0.5, 64, 127), (2.0, 64, 0), (3.0, 64, 127),
+                      (5.0, 1, 10)])
+    testing_lib.add_control_changes_to_sequence(
+        sequence, 1, [(1.0, 64, 127), (6.0, 64, 0)])
+    testing_lib.add_pitch_bends_to_sequence(sequence, 0, 0, [(1.5, 200)])
+
+    split_times = [0.0, 2.0, 3.0, 4.5, 6.0, sequence.total_time]
+    subsequences = sequences_lib.split_note_sequence(
+        sequence, hop_size_seconds=split_times[1:-1])
+    self.assertEquals(len(split_times) - 1, len(subsequences))
+    for start_time, end_time, subsequence in zip(
+        split_times[:-1], split_times[1:], subsequences):
+      self.assertProtoEquals(
+          sequences_lib.extract_subsequence(sequence, start_time, end_time),
+          subsequence)
+
   def testSplitNoteSequenceAtTimes(self):
     # Tests splitting a NoteSequence at specified times, truncating notes.
     sequence = common_testing_lib.parse_test_proto(
@@ -996,6 +1041,31 @@ class SequencesLibTest(tf.test.TestCase):
     sus_sequence = sequences_lib.apply_sustain_control_changes(sequence)
     self.assertProtoEquals(expected_sequence, sus_sequence)
 
+  def testApplySustainControlChangesMultipleInstruments(self):
+    """Verify that each instrument is only affected by its own sustain."""
+    sequence = copy.copy(self.note_sequence)
+    testing_lib.add_control_changes_to_sequence(
+        sequence, 0, [(1.0, 64, 127), (3.0, 64, 0)])
+    testing_lib.add_control_changes_to_sequence(
+        sequence, 1, [(2.0, 64, 127), (5.0, 64, 0)])
+    expected_sequence = copy.copy(sequence)
+    testing_lib.add_track_to_sequence(
+        sequence, 0,
+        [(60, 100, 0.50, 1.50), (60, 100, 2.00, 2.50)])
+    testing_lib.add_track_to_sequence(
+        sequence, 1,
+        [(60, 100, 1.50, 2.50), (64, 100, 0.50, 1.00)])
+    testing_lib.add_track_to_sequence(
+        expected_sequence, 0,
+        [(60, 100, 0.50, 2.00), (60, 100, 2.00, 3.00)])
+    testing_lib.add_track_to_sequence(
+        expected_sequence, 1,
+        [(60, 100, 1.50, 5.00), (64, 100, 0.50, 1.00)])
+    expected_sequence.total_time = 5.0
+
+    sus_sequence = sequences_lib.apply_sustain_control_changes(sequence)
+    self.assertProtoEquals(expected_sequence, sus_sequence)
+
   def testInferChordsForSequence(self):
     # Test non-quantized sequence.
     sequence = copy.copy(self.note_sequence)
@@ -1214,5 +1284,35 @@ class SequencesLibTest(tf.test.TestCase):
 
     self.assertEqual(sequence, expanded)
 
+
+class SequencesLibBenchmark(tf.test.Benchmark):
+
+  def benchmarkApplySustainControlChanges(self):
+    """Times applying sustain to a long, pedal-heavy piano performance."""
+    rand = random.Random(0)
+    sequence = music_pb2.NoteSequence()
+    notes = []
+    for i in range(20000):
+      start_time = i * 0.05 + rand.uniform(0.0, 0.1)
+      notes.append((rand.randint(36, 84), rand.randint(40, 100), start_time,
+                    start_time + rand.uniform(0.05, 0.5)))
+    testing_lib.add_track_to_sequence(sequence, 0, notes)
+    # Hold the sustain pedal for most of every ten seconds.
+    control_changes = []
+    for i in range(int(sequence.total_time / 10.0)):
+      control_changes.append((i * 10.0, 64, 127))
+      control_changes.append((i * 10.0 + 9.8, 64, 0))
+    testing_lib.add_control_changes_to_sequence(sequence, 0, control_changes)
+
+    num_iters = 5
+    start = time.time()
+    for _ in range(num_iters):
+      sequences_lib.apply_sustain_control_changes(sequence)
+    self.report_benchmark(
+        iters=num_iters, wall_time=(time.time() - start) / num_iters,
+        extras={'num_notes': len(sequence.notes),
+                'num_control_changes': len(sequence.control_changes)})
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -33,10 +33,16 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+import hashlib
 import itertools
+import os
 
 # internal imports
 import six
+from six.moves import cPickle as pickle
+import tensorflow as tf
+
 from magenta.pipelines import pipeline
 
 
@@ -124,6 +130,41 @@ def _all_are_type(elements, target_type):
   return all(isinstance(elem, target_type) for elem in elements)
 
 
+def _sha1_hex(data):
+  """Returns the hex SHA-1 digest of a string or bytes."""
+  if isinstance(data, six.text_type):
+    data = data.encode('utf-8')
+  return hashlib.sha1(data).hexdigest()
+
+
+def _serialize_input(input_object):
+  """Serializes a DAG input so that it can be fingerprinted for the cache."""
+  if isinstance(input_object, dict):
+    return b''.join(
+        name.encode('utf-8') + b'\0' + _serialize_input(value)
+        for name, value in sorted(input_object.items()))
+  if hasattr(input_object, 'SerializeToString'):
+    return input_object.SerializeToString()
+  return pickle.dumps(input_object, 2)
+
+
+def _read_cache_file(path):
+  """Returns the cached unit outputs in `path`, or an empty dict if missing."""
+  if not tf.gfile.Exists(path):
+    return {}
+  with tf.gfile.GFile(path, 'rb') as f:
+    return pickle.loads(f.read())
+
+
+def _write_cache_file(path, cache):
+  """Atomically writes the dict of cached unit outputs to `path`."""
+  tf.gfile.MakeDirs(os.path.dirname(path))
+  temp_path = '%s.tmp-%d' % (path, os.getpid())
+  with tf.gfile.GFile(temp_path, 'wb') as f:
+    f.write(pickle.dumps(cache, pickle.HIGHEST_PROTOCOL))
+  tf.gfile.Rename(temp_path, path, overwrite=True)
+
+
 class InvalidDAGException(Exception):
   """Thrown when the DAG dictionary is not well formatted.
 
@@ -201,17 +242,29 @@ class DAGPipeline(pipeline.Pipeline):
   Use DAGPipeline to compose multiple smaller pipelines together.
   """
 
-  def __init__(self, dag, pipeline_name='DAGPipeline'):
+  def __init__(self, dag, pipeline_name='DAGPipeline', cache_dir=None):
     """Constructs a DAGPipeline.
 
     A DAG (direct acyclic graph) is given which fully specifies what the
     DAGPipeline runs.
 
+    If `cache_dir` is given, the outputs and statistics of every unit are
+    cached on disk, keyed by a fingerprint of the DAG input, the unit name, and
+    the configuration fingerprints (see `Pipeline.config_fingerprint`) of the
+    unit and every unit upstream of it. On later runs over the same inputs,
+    only units whose configuration or upstream configuration changed are
+    rerun. Units are assumed to be deterministic; the outputs of randomized
+    units such as `RandomPartition` are frozen by the cache. Units whose
+    configuration cannot be fingerprinted are not cached, and neither are the
+    units downstream of them.
+
     Args:
       dag: A dictionary mapping `Pipeline` or `DagOutput` instances to any of
          `Pipeline`, `PipelineKey`, `DagInput`. `dag` defines a directed acyclic
          graph.
       pipeline_name: String name of this Pipeline object.
+      cache_dir: Optional path to a directory where unit outputs are cached.
+          Unit outputs must be picklable.
 
     Raises:
       InvalidDAGException: If each key value pair in the `dag` dictionary is
@@ -383,6 +436,9 @@ class DAGPipeline(pipeline.Pipeline):
     call_list.reverse()
     assert call_list[0] == self.input
 
+    self.cache_dir = cache_dir
+    self._unit_fingerprints = None
+
   def _expand_dag_shorthands(self, dag):
     """Expand DAG shorthand.
 
@@ -475,10 +531,68 @@ class DAGPipeline(pipeline.Pipeline):
     return dict([(name, sub_dep.output_type)
                  for name, sub_dep in dependency.items()])
 
+  def _get_unit_fingerprints(self):
+    """Returns a dict mapping each unit to a fingerprint of its lineage.
+
+    The fingerprint of a unit covers its name, its configuration, and the
+    fingerprints of the units it depends on, so it changes whenever anything
+    upstream of the unit is reconfigured. Units whose configuration cannot be
+    fingerprinted, and all units downstream of them, map to None and are never
+    cached.
+    """
+    if self._unit_fingerprints is None:
+      fingerprints = {self.input: _sha1_hex(repr(self.input))}
+      for unit in self.call_list[1:]:
+        dependency = self.dag[unit]
+        if isinstance(dependency, dict):
+          dep_items = sorted(dependency.items())
+        else:
+          dep_items = [(None, dependency)]
+        parts = [unit.name]
+        if isinstance(unit, pipeline.Pipeline):
+          try:
+            parts.append(unit.config_fingerprint())
+          except pipeline.ConfigFingerprintException as e:
+            tf.logging.warning('Not caching outputs of %s: %s', unit.name, e)
+            parts = None
+        for name, subordinate in dep_items:
+          key = None
+          if isinstance(subordinate, pipeline.PipelineKey):
+            key = subordinate.key
+          dep_fingerprint = fingerprints[
+              self._validate_subordinate(subordinate)]
+          if dep_fingerprint is None:
+            parts = None
+          if parts is not None:
+            parts.append('%s=%s[%s]' % (name, dep_fingerprint, key))
+        fingerprints[unit] = (
+            None if parts is None else _sha1_hex('\n'.join(parts)))
+      self._unit_fingerprints = fingerprints
+    return self._unit_fingerprints
+
+  def config_fingerprint(self):
+    """Returns a fingerprint covering every unit in the DAG.
+
+    Raises:
+      ConfigFingerprintException: If any unit cannot be fingerprinted.
+    """
+    fingerprints = self._get_unit_fingerprints()
+    if any(fingerprints[output] is None for output in self.outputs):
+      raise pipeline.ConfigFingerprintException(
+          '%s contains units that cannot be fingerprinted.' % self.name)
+    return _sha1_hex('\n'.join(
+        sorted(fingerprints[output] for output in self.outputs)))
+
+  def _get_cache_path(self, input_object):
+    """Returns the path of the cache file for the given DAG input."""
+    digest = _sha1_hex(_serialize_input(input_object))
+    return os.path.join(self.cache_dir, digest[:2], digest + '.pkl')
+
   def transform(self, input_object):
     """Runs the DAG on the given input.
 
-    All pipelines in the DAG will run.
+    All pipelines in the DAG will run, except those whose outputs for this
+    input are found in the cache when `cache_dir` is set.
 
     Args:
       input_object: Any object. The required type depends on implementation.
@@ -488,34 +602,107 @@ class DAGPipeline(pipeline.Pipeline):
       depend on implementation. Each output name corresponds to an output
       collection. See get_output_names method.
     """
-    def stats_accumulator(unit, unit_inputs, cumulative_stats):
-      for single_input in unit_inputs:
-        results_ = unit.transform(single_input)
-        stats = unit.get_stats()
-        cumulative_stats.extend(stats)
-        yield results_
+    return self.transform_batch([input_object])[0]
+
+  def transform_batch(self, input_objects):
+    """Runs the DAG on a batch of inputs.
+
+    Units are run in topological order, and each unit is called once via
+    `transform_batch` with the inputs derived from every DAG input in the
+    batch. This lets units that override `transform_batch` amortize their
+    per-call overhead. When `cache_dir` is set, each unit is instead called
+    once per DAG input that missed the cache, so that statistics can be
+    cached per input.
+
+    Args:
+      input_objects: A list of objects. The required type depends on
+          implementation.
+
+    Returns:
+      A list containing, for each input, a dictionary mapping output names to
+      lists of objects.
+
+    Raises:
+      InvalidTransformOutputException: If a unit's `transform_batch` does not
+          return one result per input.
+    """
+    caches = None
+    if self.cache_dir is not None:
+      fingerprints = self._get_unit_fingerprints()
+      cache_paths = [self._get_cache_path(input_object)
+                     for input_object in input_objects]
+      caches = [_read_cache_file(path) for path in cache_paths]
+      cache_updated = [False] * len(input_objects)
 
     stats = []
-    results = {self.input: [input_object]}
+    # One database of computed unit outputs per DAG input.
+    results = [{self.input: [input_object]} for input_object in input_objects]
     for unit in self.call_list[1:]:
       # Compute transformation.
 
       if isinstance(unit, DagOutput):
-        unit_outputs = self._get_outputs_as_signature(self.dag[unit], results)
-      else:
-        unit_inputs = self._get_inputs_for_unit(unit, results)
-        if not unit_inputs:
-          # If this unit has no inputs don't run it.
-          results[unit] = []
+        for input_results in results:
+          input_results[unit] = self._get_outputs_as_signature(
+              self.dag[unit], input_results)
+        continue
+
+      # Gather inputs for this unit across the whole batch, remembering which
+      # DAG input each one came from.
+      unit_inputs = []
+      owners = []
+      for i, input_results in enumerate(results):
+        if (caches is not None and fingerprints[unit] is not None and
+            fingerprints[unit] in caches[i]):
+          input_results[unit], unit_stats = caches[i][fingerprints[unit]]
+          stats.extend(unit_stats)
           continue
+        single_unit_inputs = self._get_inputs_for_unit(unit, input_results)
+        # If this unit has no inputs don't run it.
+        input_results[unit] = []
+        unit_inputs.extend(single_unit_inputs)
+        owners.extend([i] * len(single_unit_inputs))
+      if not unit_inputs:
+        continue
 
-        unjoined_outputs = list(
-            stats_accumulator(unit, unit_inputs, stats))
-        unit_outputs = self._join_lists_or_dicts(unjoined_outputs, unit)
-      results[unit] = unit_outputs
+      if caches is None:
+        unjoined_outputs = self._transform_unit_batch(unit, unit_inputs)
+        stats.extend(unit.get_stats())
+        grouped_outputs = collections.defaultdict(list)
+        for owner, outputs in zip(owners, unjoined_outputs):
+          grouped_outputs[owner].append(outputs)
+        for owner, owner_outputs in grouped_outputs.items():
+          results[owner][unit] = self._join_lists_or_dicts(owner_outputs, unit)
+      else:
+        for owner, group in itertools.groupby(
+            zip(owners, unit_inputs), key=lambda pair: pair[0]):
+          unjoined_outputs = self._transform_unit_batch(
+              unit, [unit_input for _, unit_input in group])
+          unit_stats = unit.get_stats()
+          stats.extend(unit_stats)
+          unit_outputs = self._join_lists_or_dicts(unjoined_outputs, unit)
+          results[owner][unit] = unit_outputs
+          if fingerprints[unit] is not None:
+            caches[owner][fingerprints[unit]] = (unit_outputs, unit_stats)
+            cache_updated[owner] = True
+
+    if caches is not None:
+      for path, cache, updated in zip(cache_paths, caches, cache_updated):
+        if updated:
+          _write_cache_file(path, cache)
 
     self._set_stats(stats)
-    return dict([(output.name, results[output]) for output in self.outputs])
+    return [dict([(output.name, input_results[output])
+                  for output in self.outputs])
+            for input_results in results]
+
+  def _transform_unit_batch(self, unit, unit_inputs):
+    """Calls `unit.transform_batch` and checks the number of results."""
+    unjoined_outputs = unit.transform_batch(unit_inputs)
+    if len(unjoined_outputs) != len(unit_inputs):
+      raise InvalidTransformOutputException(
+          '%s returned %d results from transform_batch for %d inputs.'
+          % (unit, len(unjoined_outputs), len(unit_inputs)))
+    return unjoined_outputs
 
   def _get_outputs_as_signature(self, dependency, outputs):
     """Returns a list or dict which matches the type signature of dependency.
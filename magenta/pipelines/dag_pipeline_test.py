@@ -18,6 +18,7 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import tempfile
 
 # internal imports
 import tensorflow as tf
@@ -454,6 +455,115 @@ class DAGPipelineTest(tf.test.TestCase):
         else:
           self.assertEqual(stat.count, 1)
 
+  def testTransformBatch(self):
+
+    class UnitT(pipeline.Pipeline):
+
+      def __init__(self):
+        pipeline.Pipeline.__init__(self, Type0, Type1)
+        self.batch_sizes = []
+
+      def transform(self, input_object):
+        self._set_stats([statistics.Counter('output_count', input_object.z)])
+        return [Type1(x=input_object.x + i, y=input_object.y)
+                for i in range(input_object.z)]
+
+      def transform_batch(self, input_objects):
+        self.batch_sizes.append(len(input_objects))
+        return super(UnitT, self).transform_batch(input_objects)
+
+    class UnitU(UnitT):
+
+      def __init__(self):
+        pipeline.Pipeline.__init__(self, Type1, Type2)
+        self.batch_sizes = []
+
+      def transform(self, input_object):
+        return [Type2(z=input_object.x * 10)]
+
+    t, u = UnitT(), UnitU()
+    dag = {t: dag_pipeline.DagInput(Type0),
+           u: t,
+           dag_pipeline.DagOutput('output'): u}
+    dag_pipe_obj = dag_pipeline.DAGPipeline(dag)
+    results = dag_pipe_obj.transform_batch(
+        [Type0(1, 0, 2), Type0(5, 0, 0), Type0(7, 0, 1)])
+    self.assertEqual(
+        [{'output': [Type2(10), Type2(20)]},
+         {'output': []},
+         {'output': [Type2(70)]}],
+        results)
+    # Each unit is called once for the whole batch.
+    self.assertEqual([3], t.batch_sizes)
+    self.assertEqual([3], u.batch_sizes)
+    self.assertEqual(
+        [2, 0, 1],
+        [stat.count for stat in dag_pipe_obj.get_stats()
+         if stat.name == 'DAGPipeline_UnitT_output_count'])
+
+  def testCache(self):
+
+    class UnitS(pipeline.Pipeline):
+
+      def __init__(self, offset, name):
+        pipeline.Pipeline.__init__(self, Type1, Type1, name)
+        self.offset = offset
+        self.num_calls = 0
+
+      def transform(self, input_object):
+        self.num_calls += 1
+        self._set_stats([statistics.Counter('calls', 1)])
+        return [Type1(x=input_object.x + self.offset, y=input_object.y)]
+
+    cache_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+
+    def make_dag_pipeline(offset_1, offset_2):
+      s1, s2 = UnitS(offset_1, 'S1'), UnitS(offset_2, 'S2')
+      dag = {s1: dag_pipeline.DagInput(Type1),
+             s2: s1,
+             dag_pipeline.DagOutput('output'): s2}
+      return (dag_pipeline.DAGPipeline(dag, cache_dir=cache_dir), s1, s2)
+
+    dag_pipe_obj, s1, s2 = make_dag_pipeline(10, 100)
+    self.assertEqual({'output': [Type1(x=111, y=2)]},
+                     dag_pipe_obj.transform(Type1(x=1, y=2)))
+    self.assertEqual((1, 1), (s1.num_calls, s2.num_calls))
+
+    # Same configuration: everything is read from the cache.
+    dag_pipe_obj, s1, s2 = make_dag_pipeline(10, 100)
+    self.assertEqual({'output': [Type1(x=111, y=2)]},
+                     dag_pipe_obj.transform(Type1(x=1, y=2)))
+    self.assertEqual((0, 0), (s1.num_calls, s2.num_calls))
+    self.assertEqual(
+        sorted(['DAGPipeline_S1_calls', 'DAGPipeline_S2_calls']),
+        sorted(stat.name for stat in dag_pipe_obj.get_stats()))
+
+    # Only the reconfigured suffix of the DAG is rerun.
+    dag_pipe_obj, s1, s2 = make_dag_pipeline(10, 200)
+    self.assertEqual({'output': [Type1(x=211, y=2)]},
+                     dag_pipe_obj.transform(Type1(x=1, y=2)))
+    self.assertEqual((0, 1), (s1.num_calls, s2.num_calls))
+
+    # Reconfiguring the prefix invalidates everything downstream of it.
+    dag_pipe_obj, s1, s2 = make_dag_pipeline(20, 200)
+    self.assertEqual({'output': [Type1(x=221, y=2)]},
+                     dag_pipe_obj.transform(Type1(x=1, y=2)))
+    self.assertEqual((1, 1), (s1.num_calls, s2.num_calls))
+
+    # A different input is not in the cache.
+    dag_pipe_obj, s1, s2 = make_dag_pipeline(10, 100)
+    dag_pipe_obj.transform(Type1(x=5, y=2))
+    self.assertEqual((1, 1), (s1.num_calls, s2.num_calls))
+
+    # Units that cannot be fingerprinted, and the units downstream of them,
+    # are never cached.
+    dag_pipe_obj, s1, s2 = make_dag_pipeline(10, 100)
+    s1.unfingerprintable = object()
+    for _ in range(2):
+      self.assertEqual({'output': [Type1(x=111, y=2)]},
+                       dag_pipe_obj.transform(Type1(x=1, y=2)))
+    self.assertEqual((2, 2), (s1.num_calls, s2.num_calls))
+
   def testInvalidDAGException(self):
     class UnitQ(pipeline.Pipeline):
 
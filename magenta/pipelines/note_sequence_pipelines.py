@@ -13,12 +13,12 @@
 # limitations under the License.
 """NoteSequence processing pipelines."""
 
-import copy
-
 # internal imports
+import numpy as np
 import tensorflow as tf
 
 from magenta.music import constants
+from magenta.music import note_array
 from magenta.music import sequences_lib
 from magenta.pipelines import pipeline
 from magenta.pipelines import statistics
@@ -143,8 +143,20 @@ class StretchPipeline(NoteSequencePipeline):
     self._stretch_factors = stretch_factors
 
   def transform(self, note_sequence):
-    return [sequences_lib.stretch_note_sequence(note_sequence, stretch_factor)
-            for stretch_factor in self._stretch_factors]
+    # Stretch the notes as columns, and the remaining events on a copy of the
+    # sequence without notes, so that each output copies the notes only once.
+    notes = note_array.NoteArray.from_sequence(note_sequence)
+    base_sequence = music_pb2.NoteSequence()
+    base_sequence.CopyFrom(note_sequence)
+    del base_sequence.notes[:]
+
+    stretched_sequences = []
+    for stretch_factor in self._stretch_factors:
+      stretched_sequence = sequences_lib.stretch_note_sequence(
+          base_sequence, stretch_factor)
+      notes.stretch(stretch_factor).to_notes(stretched_sequence.notes)
+      stretched_sequences.append(stretched_sequence)
+    return stretched_sequences
 
 
 class TranspositionPipeline(NoteSequencePipeline):
@@ -183,31 +195,42 @@ class TranspositionPipeline(NoteSequencePipeline):
         tf.logging.warn('Chord symbols ignored by TranspositionPipeline.')
         break
 
+    notes = note_array.NoteArray.from_sequence(sequence)
     transposed = []
     for amount in self._transposition_range:
       # Note that transpose is called even with a transpose amount of zero, to
       # ensure that out-of-range pitches are handled correctly.
-      ts = self._transpose(sequence, amount, stats)
-      if ts is not None:
-        transposed.append(ts)
+      transposed_notes = self._transpose(notes, amount, stats)
+      if transposed_notes is not None:
+        transposed.append(transposed_notes.to_sequence(sequence))
 
     stats['transpositions_generated'].increment(len(transposed))
     self._set_stats(stats.values())
     return transposed
 
-  def _transpose(self, ns, amount, stats):
-    """Transposes a note sequence by the specified amount."""
-    ts = copy.deepcopy(ns)
-    del ts.notes[:]
-    for note in copy.deepcopy(ns.notes):
-      if not note.is_drum:
-        note.pitch += amount
-        if note.pitch < self._min_pitch or note.pitch > self._max_pitch:
-          if self._ignore_out_of_range_notes:
-            stats['notes_dropped_due_to_range_exceeded'].increment()
-            continue
-          else:
-            stats['skipped_due_to_range_exceeded'].increment()
-            return None
-      ts.notes.extend([note])
-    return ts
+  def _transpose(self, notes, amount, stats):
+    """Transposes the notes of a note sequence by the specified amount.
+
+    Args:
+      notes: A NoteArray of the notes to transpose.
+      amount: The integer number of pitch steps to transpose by.
+      stats: A dictionary of statistics to update.
+
+    Returns:
+      A NoteArray of the transposed notes, or None if the transposition should
+      be skipped.
+    """
+    pitched = ~notes.is_drum
+    pitches = np.where(pitched, notes.pitch + amount, notes.pitch)
+    out_of_range = pitched & (
+        (pitches < self._min_pitch) | (pitches > self._max_pitch))
+    transposed_notes = notes.replace(pitch=pitches)
+    if out_of_range.any():
+      if self._ignore_out_of_range_notes:
+        stats['notes_dropped_due_to_range_exceeded'].increment(
+            int(out_of_range.sum()))
+        transposed_notes = transposed_notes.take(~out_of_range)
+      else:
+        stats['skipped_due_to_range_exceeded'].increment()
+        return None
+    return transposed_notes
@@ -212,6 +212,41 @@ class PipelineUnitsCommonTest(tf.test.TestCase):
     self.assertEqual(12, transposed[1].notes[1].pitch)
     self.assertEqual(12, transposed[0].notes[2].pitch)
 
+    stats = dict((stat.name.split('_', 1)[1], stat.count)
+                 for stat in tp.get_stats())
+    self.assertEqual(3, stats['notes_dropped_due_to_range_exceeded'])
+    self.assertEqual(0, stats['skipped_due_to_range_exceeded'])
+    self.assertEqual(3, stats['transpositions_generated'])
+
+  def testTranspositionPipelinePreservesSequence(self):
+    note_sequence = common_testing_lib.parse_test_proto(
+        music_pb2.NoteSequence,
+        """
+        time_signatures: {
+          numerator: 4
+          denominator: 4}
+        tempos: {
+          qpm: 60}
+        total_time: 5.0""")
+    testing_lib.add_track_to_sequence(
+        note_sequence, 0,
+        [(10, 100, 1.0, 2.0), (12, 90, 2.0, 4.0), (13, 80, 4.0, 5.0)])
+    testing_lib.add_control_changes_to_sequence(
+        note_sequence, 0, [(0.0, 64, 127), (3.0, 64, 0)])
+    original_sequence = music_pb2.NoteSequence()
+    original_sequence.CopyFrom(note_sequence)
+
+    tp = note_sequence_pipelines.TranspositionPipeline([0, 2])
+    transposed = tp.transform(note_sequence)
+    self.assertProtoEquals(original_sequence, note_sequence)
+    self.assertProtoEquals(original_sequence, transposed[0])
+
+    expected_sequence = music_pb2.NoteSequence()
+    expected_sequence.CopyFrom(original_sequence)
+    for note in expected_sequence.notes:
+      note.pitch += 2
+    self.assertProtoEquals(expected_sequence, transposed[1])
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -18,15 +18,41 @@ from __future__ import division
 from __future__ import print_function
 
 import abc
+import binascii
+import functools
+import hashlib
 import inspect
-import os.path
+import itertools
+import json
+import multiprocessing
+import os
+import random
 
 # internal imports
+import numpy as np
 import six
+from six.moves import cPickle as pickle
 import tensorflow as tf
 
+from magenta import version
+from magenta.common import record_index
 from magenta.pipelines import statistics
 
+# Maximum number of pending inputs per worker in `run_pipeline_parallel`.
+_WORKER_QUEUE_SIZE = 100
+
+# Suffix for outputs that have not been committed by a checkpoint yet.
+_PENDING_SUFFIX = '.pending'
+
+# Size of the chunks used when copying output files.
+_COPY_CHUNK_BYTES = 16 * 1024 * 1024
+
+# Maximum nesting depth described when fingerprinting pipeline configurations.
+_MAX_STABLE_REPR_DEPTH = 20
+
+# How often `run_pipeline_parallel` checks for failed workers while blocked.
+_WORKER_POLL_SECONDS = 1.0
+
 
 class InvalidTypeSignatureException(Exception):
   """Thrown when `Pipeline.input_type` or `Pipeline.output_type` is not valid.
@@ -39,6 +65,11 @@ class InvalidStatisticsException(Exception):
   pass
 
 
+class ConfigFingerprintException(Exception):
+  """Thrown when a `Pipeline` configuration cannot be fingerprinted."""
+  pass
+
+
 class PipelineKey(object):
   """Represents a get operation on a Pipeline type signature.
 
@@ -128,6 +159,11 @@ class Pipeline(object):
 
   __metaclass__ = abc.ABCMeta
 
+  # Version of the outputs of this class, included in `config_fingerprint`.
+  # Increment it whenever a change to the class changes its outputs, so that
+  # outputs cached by `DAGPipeline` are invalidated.
+  CACHE_VERSION = 0
+
   def __init__(self, input_type, output_type, name=None):
     """Constructs a `Pipeline` object.
 
@@ -222,6 +258,32 @@ class Pipeline(object):
     """
     pass
 
+  def transform_batch(self, input_objects):
+    """Runs the pipeline on each of the given inputs.
+
+    The default implementation calls `transform` once per input. Pipelines
+    that can amortize work across many inputs may override this method, as
+    long as the results are the same as calling `transform` on each input.
+
+    After `transform_batch` returns, `get_stats` returns the Statistics
+    collected across all of the inputs.
+
+    Args:
+      input_objects: A list of objects or dictionaries mapping names to
+          objects. The object types must match `input_type`.
+
+    Returns:
+      A list containing the return value of `transform` for each input, in the
+      same order as `input_objects`.
+    """
+    outputs = []
+    stats = []
+    for input_object in input_objects:
+      outputs.append(self.transform(input_object))
+      stats.extend(self._stats)
+    self._stats = stats
+    return outputs
+
   def _set_stats(self, stats):
     """Overwrites the current Statistics returned by `get_stats`.
 
@@ -248,6 +310,31 @@ class Pipeline(object):
     stat_copy.name = self._name + '_' + stat_copy.name
     return stat_copy
 
+  def config_fingerprint(self):
+    """Returns a string fingerprint of this pipeline's configuration.
+
+    Two pipelines with the same fingerprint are expected to produce the same
+    outputs for the same inputs. `DAGPipeline` uses the fingerprint to decide
+    whether cached outputs of this pipeline are still valid.
+
+    The default implementation hashes the Magenta version, the class and its
+    `CACHE_VERSION`, and the attributes of the instance. Subclasses should
+    increment `CACHE_VERSION` whenever they change their outputs, and
+    subclasses whose outputs depend on state that is not stored in their
+    attributes should override this method.
+
+    Returns:
+      A hex digest string.
+
+    Raises:
+      ConfigFingerprintException: If an attribute cannot be described
+          precisely enough to fingerprint it.
+    """
+    attributes = dict((k, v) for k, v in vars(self).items() if k != '_stats')
+    return hashlib.sha1(_stable_repr(
+        (version.__version__, type(self), type(self).CACHE_VERSION,
+         attributes)).encode('utf-8')).hexdigest()
+
   def get_stats(self):
     """Returns Statistics about pipeline runs.
 
@@ -260,6 +347,127 @@ class Pipeline(object):
     return list(self._stats)
 
 
+def _stable_repr(value, depth=0, seen=None):
+  """Returns a string describing `value` that is stable across processes.
+
+  Unlike `repr`, the result never contains memory addresses, so it can be used
+  to fingerprint configuration objects. Values that cannot be described
+  completely raise an exception rather than being described by their type
+  alone, so that distinct configurations never share a fingerprint.
+
+  Args:
+    value: Any object.
+    depth: Current recursion depth.
+    seen: Set of ids of the objects currently being described, used to break
+        reference cycles.
+
+  Returns:
+    A string.
+
+  Raises:
+    ConfigFingerprintException: If `value` cannot be described, or is nested
+        more than `_MAX_STABLE_REPR_DEPTH` levels deep.
+  """
+  if seen is None:
+    seen = set()
+  if value is None or isinstance(
+      value, (bool, float, six.integer_types, six.string_types, bytes)):
+    return repr(value)
+  if inspect.isclass(value):
+    return '%s.%s' % (value.__module__,
+                      getattr(value, '__qualname__', value.__name__))
+  if id(value) in seen:
+    # A reference back to an object that is already being described.
+    return '<cycle %s>' % type(value).__name__
+  if depth > _MAX_STABLE_REPR_DEPTH:
+    raise ConfigFingerprintException(
+        '%s is nested too deeply to fingerprint.' % type(value).__name__)
+  seen = seen | set([id(value)])
+
+  def recurse(v):
+    return _stable_repr(v, depth + 1, seen)
+
+  if isinstance(value, functools.partial):
+    return 'partial(%s, %s, %s)' % (
+        recurse(value.func), recurse(value.args), recurse(value.keywords or {}))
+  if inspect.ismethod(value) and not inspect.isclass(value.__self__):
+    return 'method(%s, %s)' % (recurse(value.__self__),
+                               recurse(value.__func__))
+  if inspect.isroutine(value):
+    name = '%s.%s' % (getattr(value, '__module__', ''),
+                      getattr(value, '__qualname__',
+                              getattr(value, '__name__', '')))
+    code = getattr(value, '__code__', None)
+    if code is None:
+      # Builtin methods are bound to the object they operate on.
+      bound_self = getattr(value, '__self__', None)
+      if bound_self is None or inspect.ismodule(bound_self):
+        return name
+      return 'method(%s, %s)' % (recurse(bound_self), name)
+    # Lambdas and nested functions are not identified by their names alone,
+    # so describe their code and the values they close over as well.
+    closure = [cell.cell_contents for cell in value.__closure__ or ()]
+    return 'function(%s, %s, %s, %s)' % (
+        name, _code_repr(code), recurse(value.__defaults__),
+        recurse(closure))
+  if isinstance(value, dict):
+    items = sorted((recurse(k), recurse(v)) for k, v in value.items())
+    return '{%s}' % ', '.join('%s: %s' % item for item in items)
+  if isinstance(value, (list, tuple)):
+    return '%s(%s)' % (type(value).__name__,
+                       ', '.join(recurse(v) for v in value))
+  if isinstance(value, (set, frozenset)):
+    return 'set(%s)' % ', '.join(sorted(recurse(v) for v in value))
+  if hasattr(value, 'SerializeToString'):
+    return '%s(%s)' % (type(value).__name__,
+                       hashlib.sha1(value.SerializeToString()).hexdigest())
+  if hasattr(value, 'tolist'):
+    return '%s(%s)' % (type(value).__name__, recurse(value.tolist()))
+  attributes = _get_attributes(value)
+  if attributes is None:
+    raise ConfigFingerprintException(
+        'Cannot fingerprint %s object.' % type(value).__name__)
+  return '%s(%s)' % (recurse(type(value)), recurse(attributes))
+
+
+def _code_repr(code):
+  """Returns a string describing a code object, stable across processes."""
+  def const_repr(const):
+    if inspect.iscode(const):
+      return _code_repr(const)
+    if isinstance(const, frozenset):
+      return 'frozenset(%s)' % ','.join(sorted(repr(v) for v in const))
+    return repr(const)
+
+  consts = ','.join(const_repr(const) for const in code.co_consts)
+  return hashlib.sha1(b'\0'.join([
+      code.co_code, consts.encode('utf-8'),
+      ','.join(code.co_names).encode('utf-8')])).hexdigest()
+
+
+def _get_attributes(value):
+  """Returns a dict of the attributes of `value`, or None if it has none.
+
+  Attributes stored in `__slots__` are included along with those in
+  `__dict__`.
+  """
+  attributes = dict(getattr(value, '__dict__', {}))
+  has_slots = False
+  for cls in type(value).__mro__:
+    slots = cls.__dict__.get('__slots__', ())
+    if isinstance(slots, six.string_types):
+      slots = [slots]
+    for slot in slots:
+      if slot in ('__dict__', '__weakref__'):
+        continue
+      has_slots = True
+      if hasattr(value, slot):
+        attributes[slot] = getattr(value, slot)
+  if not has_slots and not hasattr(value, '__dict__'):
+    return None
+  return attributes
+
+
 def file_iterator(root_dir, extension=None, recurse=True):
   """Generator that iterates over all files in the given directory.
 
@@ -312,10 +520,258 @@ def tf_record_iterator(tfrecord_file, proto):
     yield proto.FromString(raw_bytes)
 
 
+def _assert_serializable_output_type(pipeline):
+  """Checks that every output type of `pipeline` can be written to TFRecord.
+
+  Args:
+    pipeline: A Pipeline instance.
+
+  Raises:
+    ValueError: If any of `pipeline`'s output types do not have a
+        SerializeToString method.
+  """
+  if isinstance(pipeline.output_type, dict):
+    for name, type_ in pipeline.output_type.items():
+      if not hasattr(type_, 'SerializeToString'):
+        raise ValueError(
+            'Pipeline output "%s" does not have method SerializeToString. '
+            'Output type = %s' % (name, pipeline.output_type))
+  else:
+    if not hasattr(pipeline.output_type, 'SerializeToString'):
+      raise ValueError(
+          'Pipeline output type %s does not have method SerializeToString.'
+          % pipeline.output_type)
+
+
+def _get_output_paths(output_names, output_dir, output_file_base=None):
+  """Returns the TFRecord path for each dataset name."""
+  if output_file_base is None:
+    return [os.path.join(output_dir, name + '.tfrecord')
+            for name in output_names]
+  else:
+    return [os.path.join(output_dir,
+                         '%s_%s.tfrecord' % (output_file_base, name))
+            for name in output_names]
+
+
+def _batch_iterator(iterator, batch_size):
+  """Yields lists of up to `batch_size` consecutive items from `iterator`."""
+  if batch_size < 1:
+    raise ValueError('`batch_size` must be at least 1. Got %d.' % batch_size)
+  iterator = iter(iterator)
+  while True:
+    batch = list(itertools.islice(iterator, batch_size))
+    if not batch:
+      return
+    yield batch
+
+
+def _crossed_multiple(previous_count, count, interval):
+  """Returns True if a multiple of `interval` is in (previous_count, count]."""
+  return count // interval > previous_count // interval
+
+
+class _DatasetWriter(object):
+  """Writes serialized pipeline outputs to one TFRecord file per dataset.
+
+  If `manifest_path` is given, outputs are first written to pending
+  ".pending" files. Each call to `checkpoint` appends the pending records to
+  the committed TFRecord files and then records the number of inputs
+  processed, the committed byte length of every file, and the merged
+  statistics in a JSON manifest. A later `_DatasetWriter` constructed with
+  `resume=True` truncates the committed files back to the lengths in the
+  manifest and continues from there, so no output is duplicated.
+
+  TFRecord files are sequences of self-delimiting records, so appending the
+  bytes of one TFRecord file to another yields a valid TFRecord file.
+
+  Every committed TFRecord file gets an up to date `record_index` sidecar
+  index, written when the file is closed or checkpointed.
+  """
+
+  def __init__(self, output_names, output_paths, manifest_path=None,
+               resume=False, output_types=None):
+    """Opens the output files.
+
+    Args:
+      output_names: List of dataset names.
+      output_paths: List of TFRecord paths, one per dataset name.
+      manifest_path: Optional path to the checkpoint manifest. If None,
+          outputs are written directly and `checkpoint` cannot be called.
+      resume: If True and the manifest at `manifest_path` exists, continue
+          from the last checkpoint recorded in it.
+      output_types: Optional list of output protocol buffer classes, one per
+          dataset name. Used to index sequence lengths of already committed
+          outputs when resuming.
+
+    Raises:
+      ValueError: If the manifest does not match `output_paths`, or a
+          committed file is shorter than the manifest says.
+    """
+    self._paths = dict(zip(output_names, output_paths))
+    self._types = dict(zip(output_names, output_types or []))
+    self._manifest_path = manifest_path
+    self.num_inputs = 0
+    self.num_outputs = 0
+    self.stats = statistics.StatisticsAccumulator()
+    self._index_builders = dict(
+        (name, record_index.RecordIndexBuilder()) for name in self._paths)
+
+    if manifest_path is None:
+      self._writers = dict(
+          [(name, tf.python_io.TFRecordWriter(path))
+           for name, path in self._paths.items()])
+      return
+
+    self._committed_index_builders = dict(
+        (name, record_index.RecordIndexBuilder()) for name in self._paths)
+    manifest = _read_manifest(manifest_path) if resume else None
+    if manifest is None:
+      for path in self._paths.values():
+        with tf.gfile.GFile(path, 'wb'):
+          pass
+      self._committed_bytes = dict((name, 0) for name in self._paths)
+    else:
+      if sorted(manifest['outputs']) != sorted(self._paths.values()):
+        raise ValueError(
+            'Manifest %s does not match outputs %s.'
+            % (manifest_path, sorted(self._paths.values())))
+      self.num_inputs = manifest['num_inputs']
+      self.num_outputs = manifest['num_outputs']
+      self.stats.add(pickle.loads(
+          binascii.unhexlify(manifest['statistics'].encode('ascii'))))
+      self._committed_bytes = {}
+      for name, path in self._paths.items():
+        _truncate_file(path, manifest['outputs'][path])
+        self._committed_bytes[name] = manifest['outputs'][path]
+        self._committed_index_builders[name] = (
+            record_index.RecordIndexBuilder.from_file(
+                path, self._types.get(name)))
+      tf.logging.info('Resuming from %s after %d inputs.',
+                      manifest_path, self.num_inputs)
+    self._writers = self._open_pending_writers()
+
+  def _open_pending_writers(self):
+    self._index_builders = dict(
+        (name, record_index.RecordIndexBuilder()) for name in self._paths)
+    return dict(
+        [(name, tf.python_io.TFRecordWriter(path + _PENDING_SUFFIX))
+         for name, path in self._paths.items()])
+
+  def write(self, name, outputs):
+    """Writes a list of outputs to the dataset with the given name."""
+    for output in outputs:
+      serialized_output = output.SerializeToString()
+      self._writers[name].write(serialized_output)
+      self._index_builders[name].add(
+          serialized_output, record_index.get_sequence_length(output))
+    self.num_outputs += len(outputs)
+
+  def checkpoint(self):
+    """Commits all outputs written so far and updates the manifest."""
+    self._commit()
+    self._writers = self._open_pending_writers()
+
+  def _commit(self):
+    """Closes the pending files, appends them, and writes the manifest."""
+    for writer in self._writers.values():
+      writer.close()
+    for name, path in self._paths.items():
+      pending_path = path + _PENDING_SUFFIX
+      self._committed_bytes[name] += _append_file(pending_path, path)
+      tf.gfile.Remove(pending_path)
+      self._committed_index_builders[name].extend(self._index_builders[name])
+      self._committed_index_builders[name].write(path)
+
+    manifest = {
+        'num_inputs': self.num_inputs,
+        'num_outputs': self.num_outputs,
+        'outputs': dict((self._paths[name], num_bytes)
+                        for name, num_bytes in self._committed_bytes.items()),
+        'statistics': binascii.hexlify(
+            pickle.dumps(self.stats.snapshot(),
+                         pickle.HIGHEST_PROTOCOL)).decode('ascii'),
+    }
+    temp_path = self._manifest_path + _PENDING_SUFFIX
+    with tf.gfile.GFile(temp_path, 'w') as f:
+      f.write(json.dumps(manifest, indent=2, sort_keys=True))
+    tf.gfile.Rename(temp_path, self._manifest_path, overwrite=True)
+
+  def close(self):
+    """Closes all files, committing outputs if checkpointing is enabled."""
+    if self._manifest_path is None:
+      for writer in self._writers.values():
+        writer.close()
+      for name, path in self._paths.items():
+        self._index_builders[name].write(path)
+    else:
+      self._commit()
+
+
+def _read_manifest(manifest_path):
+  """Returns the parsed manifest at `manifest_path`, or None if missing."""
+  if not tf.gfile.Exists(manifest_path):
+    return None
+  with tf.gfile.GFile(manifest_path, 'r') as f:
+    return json.loads(f.read())
+
+
+def _append_file(src_path, dst_path):
+  """Appends the contents of `src_path` to `dst_path`.
+
+  Returns:
+    The number of bytes appended.
+  """
+  num_bytes = 0
+  with tf.gfile.GFile(src_path, 'rb') as src:
+    with tf.gfile.GFile(dst_path, 'ab') as dst:
+      while True:
+        chunk = src.read(_COPY_CHUNK_BYTES)
+        if not chunk:
+          break
+        dst.write(chunk)
+        num_bytes += len(chunk)
+  return num_bytes
+
+
+def _truncate_file(path, length):
+  """Truncates the file at `path` to `length` bytes.
+
+  Raises:
+    ValueError: If the file is shorter than `length`.
+  """
+  file_length = tf.gfile.Stat(path).length
+  if file_length < length:
+    raise ValueError(
+        'Cannot resume: %s has %d bytes but the manifest expects %d.'
+        % (path, file_length, length))
+  if file_length == length:
+    return
+  temp_path = path + _PENDING_SUFFIX
+  with tf.gfile.GFile(path, 'rb') as src:
+    with tf.gfile.GFile(temp_path, 'wb') as dst:
+      remaining = length
+      while remaining:
+        chunk = src.read(min(remaining, _COPY_CHUNK_BYTES))
+        dst.write(chunk)
+        remaining -= len(chunk)
+  tf.gfile.Rename(temp_path, path, overwrite=True)
+
+
+def _get_manifest_path(output_dir, output_file_base=None):
+  """Returns the checkpoint manifest path for a pipeline run."""
+  if output_file_base is None:
+    return os.path.join(output_dir, 'manifest.json')
+  return os.path.join(output_dir, '%s_manifest.json' % output_file_base)
+
+
 def run_pipeline_serial(pipeline,
                         input_iterator,
                         output_dir,
-                        output_file_base=None):
+                        output_file_base=None,
+                        checkpoint_interval=None,
+                        resume=False,
+                        batch_size=1):
   """Runs the a pipeline on a data source and writes to a directory.
 
   Run the the pipeline on each input from the iterator one at a time.
@@ -326,6 +782,12 @@ def run_pipeline_serial(pipeline,
   The output type or types given by `pipeline.output_type` must be protocol
   buffers or objects that have a SerializeToString method.
 
+  If `checkpoint_interval` is given, the outputs are committed and a
+  "manifest.json" file recording the progress is written to `output_dir`
+  every `checkpoint_interval` inputs. A run interrupted after a checkpoint can
+  be continued by calling this function again with the same arguments,
+  the same input order, and `resume=True`.
+
   Args:
     pipeline: A Pipeline instance. `pipeline.output_type` must be a protocol
         buffer or a dictionary mapping names to protocol buffers.
@@ -336,61 +798,263 @@ def run_pipeline_serial(pipeline,
         directory does not exist, it will be created.
     output_file_base: An optional string prefix for all datasets output by this
         run. The prefix will also be followed by an underscore.
+    checkpoint_interval: An optional number of inputs between checkpoints. If
+        None, no checkpoints are written.
+    resume: If True, skip the inputs processed before the last checkpoint of
+        a previous run and append to its outputs. Requires
+        `checkpoint_interval`. If there is no previous checkpoint, the run
+        starts from the beginning.
+    batch_size: The number of inputs passed to each call of
+        `pipeline.transform_batch`.
 
   Raises:
     ValueError: If any of `pipeline`'s output types do not have a
-        SerializeToString method.
+        SerializeToString method, or if `resume` is True without a
+        `checkpoint_interval`.
   """
-  if isinstance(pipeline.output_type, dict):
-    for name, type_ in pipeline.output_type.items():
-      if not hasattr(type_, 'SerializeToString'):
-        raise ValueError(
-            'Pipeline output "%s" does not have method SerializeToString. '
-            'Output type = %s' % (name, pipeline.output_type))
-  else:
-    if not hasattr(pipeline.output_type, 'SerializeToString'):
-      raise ValueError(
-          'Pipeline output type %s does not have method SerializeToString.'
-          % pipeline.output_type)
+  _assert_serializable_output_type(pipeline)
+  if resume and not checkpoint_interval:
+    raise ValueError('`resume` requires a `checkpoint_interval`.')
 
   if not tf.gfile.Exists(output_dir):
     tf.gfile.MakeDirs(output_dir)
 
-  output_names = pipeline.output_type_as_dict.keys()
+  output_names = list(pipeline.output_type_as_dict.keys())
+  output_paths = _get_output_paths(output_names, output_dir, output_file_base)
+  manifest_path = (_get_manifest_path(output_dir, output_file_base)
+                   if checkpoint_interval else None)
+  writer = _DatasetWriter(
+      output_names, output_paths, manifest_path, resume,
+      output_types=[pipeline.output_type_as_dict[name]
+                    for name in output_names])
+
+  for inputs in _batch_iterator(
+      itertools.islice(input_iterator, writer.num_inputs, None), batch_size):
+    previous_num_inputs = writer.num_inputs
+    writer.num_inputs += len(inputs)
+    for result in pipeline.transform_batch(inputs):
+      for name, outputs in _guarantee_dict(result, output_names[0]).items():
+        writer.write(name, outputs)
+    writer.stats.add(pipeline.get_stats())
+    if checkpoint_interval and _crossed_multiple(
+        previous_num_inputs, writer.num_inputs, checkpoint_interval):
+      writer.checkpoint()
+    if _crossed_multiple(previous_num_inputs, writer.num_inputs, 500):
+      tf.logging.info('Processed %d inputs so far. Produced %d outputs.',
+                      writer.num_inputs, writer.num_outputs)
+      statistics.log_statistics_list(writer.stats.snapshot(), tf.logging.info)
+  writer.close()
+  tf.logging.info('\n\nCompleted.\n')
+  tf.logging.info('Processed %d inputs total. Produced %d outputs.',
+                  writer.num_inputs, writer.num_outputs)
+  statistics.log_statistics_list(writer.stats.snapshot(), tf.logging.info)
 
-  if output_file_base is None:
-    output_paths = [os.path.join(output_dir, name + '.tfrecord')
-                    for name in output_names]
-  else:
-    output_paths = [os.path.join(output_dir,
-                                 '%s_%s.tfrecord' % (output_file_base, name))
-                    for name in output_names]
 
-  writers = dict([(name, tf.python_io.TFRecordWriter(path))
-                  for name, path in zip(output_names, output_paths)])
+def _run_pipeline_worker(pipeline, worker_index, input_queue, result_queue,
+                         output_names, output_paths, manifest_path,
+                         checkpoint_interval, resume):
+  """Runs `pipeline` on inputs from `input_queue` in a worker process.
+
+  Outputs are written to this worker's own TFRecord shards. When a `None`
+  input is received, the shards are closed and a tuple of
+  (worker_index, total_inputs, total_outputs, stats) is put on
+  `result_queue`.
+
+  Args:
+    pipeline: A Pipeline instance.
+    worker_index: Integer index of this worker.
+    input_queue: A multiprocessing.Queue of pipeline inputs, terminated by
+        `None`.
+    result_queue: A multiprocessing.Queue that the worker's totals and merged
+        statistics are put on.
+    output_names: List of dataset names.
+    output_paths: List of shard paths for this worker, one per dataset name.
+    manifest_path: Path to this worker's checkpoint manifest, or None.
+    checkpoint_interval: Number of inputs between checkpoints, or None.
+    resume: Whether to continue from this worker's last checkpoint.
+  """
+  # Forked workers inherit the parent's random state. Reseed them so that
+  # random choices, e.g. in RandomPartition, are independent across workers.
+  seed = (int(binascii.hexlify(os.urandom(4)), 16) + worker_index) % 2 ** 32
+  random.seed(seed)
+  np.random.seed(seed)
+
+  writer = _DatasetWriter(
+      output_names, output_paths, manifest_path, resume,
+      output_types=[pipeline.output_type_as_dict[name]
+                    for name in output_names])
+
+  while True:
+    input_ = input_queue.get()
+    if input_ is None:
+      break
+    writer.num_inputs += 1
+    for name, outputs in _guarantee_dict(pipeline.transform(input_),
+                                         output_names[0]).items():
+      writer.write(name, outputs)
+    writer.stats.add(pipeline.get_stats())
+    if checkpoint_interval and writer.num_inputs % checkpoint_interval == 0:
+      writer.checkpoint()
+    if writer.num_inputs % 500 == 0:
+      tf.logging.info('Worker %d processed %d inputs so far. '
+                      'Produced %d outputs.',
+                      worker_index, writer.num_inputs, writer.num_outputs)
+
+  writer.close()
+  result_queue.put((worker_index, writer.num_inputs, writer.num_outputs,
+                    writer.stats.snapshot()))
+
+
+def run_pipeline_parallel(pipeline,
+                          input_iterator,
+                          output_dir,
+                          num_workers,
+                          output_file_base=None,
+                          checkpoint_interval=None,
+                          resume=False):
+  """Runs a pipeline on a data source using a pool of worker processes.
+
+  Inputs from the iterator are distributed round-robin across `num_workers`
+  processes, each of which runs its own copy of the pipeline. Every worker
+  writes to its own shard of each dataset, so a dataset named "name" is
+  written to the files "name.tfrecord-00000-of-0000N" through
+  "name.tfrecord-0000(N-1)-of-0000N". A glob pattern such as "name.tfrecord*"
+  can be used to read all shards. Statistics from all workers are merged once
+  every worker has finished.
+
+  The output type or types given by `pipeline.output_type` must be protocol
+  buffers or objects that have a SerializeToString method, and inputs must be
+  picklable.
 
+  If `checkpoint_interval` is given, each worker commits its shards and writes
+  its own "manifest.json-0000i-of-0000N" file every `checkpoint_interval`
+  inputs. Because inputs are assigned to workers deterministically, a run
+  interrupted after a checkpoint can be continued by calling this function
+  again with the same arguments, the same input order, and `resume=True`.
+
+  Args:
+    pipeline: A Pipeline instance. `pipeline.output_type` must be a protocol
+        buffer or a dictionary mapping names to protocol buffers.
+    input_iterator: Iterates over the input data. Items returned by it are fed
+        directly into the pipeline's `transform` method.
+    output_dir: Path to directory where datasets will be written. If the
+        directory does not exist, it will be created.
+    num_workers: The number of worker processes to run the pipeline in.
+    output_file_base: An optional string prefix for all datasets output by this
+        run. The prefix will also be followed by an underscore.
+    checkpoint_interval: An optional number of inputs per worker between
+        checkpoints. If None, no checkpoints are written.
+    resume: If True, skip the inputs each worker processed before its last
+        checkpoint in a previous run and append to its shards. Requires
+        `checkpoint_interval`.
+
+  Raises:
+    ValueError: If any of `pipeline`'s output types do not have a
+        SerializeToString method, if `num_workers` is less than 1, or if
+        `resume` is True without a `checkpoint_interval`.
+    RuntimeError: If any worker process exits abnormally. The remaining
+        workers are terminated.
+  """
+  _assert_serializable_output_type(pipeline)
+  if num_workers < 1:
+    raise ValueError('`num_workers` must be at least 1. Got %d.' % num_workers)
+  if resume and not checkpoint_interval:
+    raise ValueError('`resume` requires a `checkpoint_interval`.')
+
+  if not tf.gfile.Exists(output_dir):
+    tf.gfile.MakeDirs(output_dir)
+
+  output_names = list(pipeline.output_type_as_dict.keys())
+  output_paths = _get_output_paths(output_names, output_dir, output_file_base)
+
+  def shard(path, i):
+    return '%s-%05d-of-%05d' % (path, i, num_workers)
+
+  input_queues = []
+  result_queue = multiprocessing.Queue()
+  workers = []
+  skip_counts = []
+  for i in range(num_workers):
+    manifest_path = None
+    skip_count = 0
+    if checkpoint_interval:
+      manifest_path = shard(
+          _get_manifest_path(output_dir, output_file_base), i)
+      manifest = _read_manifest(manifest_path) if resume else None
+      if manifest is not None:
+        skip_count = manifest['num_inputs']
+    input_queue = multiprocessing.Queue(maxsize=_WORKER_QUEUE_SIZE)
+    worker = multiprocessing.Process(
+        target=_run_pipeline_worker,
+        args=(pipeline, i, input_queue, result_queue, output_names,
+              [shard(path, i) for path in output_paths], manifest_path,
+              checkpoint_interval, resume))
+    worker.daemon = True
+    worker.start()
+    input_queues.append(input_queue)
+    workers.append(worker)
+    skip_counts.append(skip_count)
+
+  def check_workers():
+    for worker in workers:
+      if worker.exitcode:
+        # Stop the other workers so that none of them is still writing to its
+        # shards when this run is resumed.
+        for other_worker in workers:
+          if other_worker.is_alive():
+            other_worker.terminate()
+          other_worker.join()
+        raise RuntimeError(
+            'Pipeline worker exited with code %d.' % worker.exitcode)
+
+  def put_input(input_queue, input_):
+    while True:
+      try:
+        input_queue.put(input_, timeout=_WORKER_POLL_SECONDS)
+        return
+      except six.moves.queue.Full:
+        check_workers()
+
+  total_dispatched = 0
+  for i, input_ in enumerate(input_iterator):
+    worker_index = i % num_workers
+    if i // num_workers < skip_counts[worker_index]:
+      continue
+    put_input(input_queues[worker_index], input_)
+    total_dispatched += 1
+    if total_dispatched % 500 == 0:
+      tf.logging.info('Dispatched %d inputs so far.', total_dispatched)
+  for input_queue in input_queues:
+    put_input(input_queue, None)
+
+  # Results must be drained before joining, otherwise a worker can block
+  # while flushing its result to the queue.
   total_inputs = 0
   total_outputs = 0
-  stats = []
-  for input_ in input_iterator:
-    total_inputs += 1
-    for name, outputs in _guarantee_dict(pipeline.transform(input_),
-                                         list(output_names)[0]).items():
-      for output in outputs:
-        writers[name].write(output.SerializeToString())
-      total_outputs += len(outputs)
-    stats = statistics.merge_statistics(stats + pipeline.get_stats())
-    if total_inputs % 500 == 0:
-      tf.logging.info('Processed %d inputs so far. Produced %d outputs.',
-                      total_inputs, total_outputs)
-      statistics.log_statistics_list(stats, tf.logging.info)
+  stats = statistics.StatisticsAccumulator()
+  num_results = 0
+  while num_results < num_workers:
+    try:
+      _, worker_inputs, worker_outputs, worker_stats = result_queue.get(
+          timeout=_WORKER_POLL_SECONDS)
+    except six.moves.queue.Empty:
+      check_workers()
+      continue
+    num_results += 1
+    total_inputs += worker_inputs
+    total_outputs += worker_outputs
+    stats.add(worker_stats)
+  for worker in workers:
+    worker.join()
+  check_workers()
+
   tf.logging.info('\n\nCompleted.\n')
   tf.logging.info('Processed %d inputs total. Produced %d outputs.',
                   total_inputs, total_outputs)
-  statistics.log_statistics_list(stats, tf.logging.info)
+  statistics.log_statistics_list(stats.snapshot(), tf.logging.info)
 
 
-def load_pipeline(pipeline, input_iterator):
+def load_pipeline(pipeline, input_iterator, batch_size=1):
   """Runs a pipeline saving the output into memory.
 
   Use this instead of `run_pipeline_serial` to build a dataset on the fly
@@ -400,6 +1064,8 @@ def load_pipeline(pipeline, input_iterator):
     pipeline: A Pipeline instance.
     input_iterator: Iterates over the input data. Items returned by it are fed
         directly into the pipeline's `transform` method.
+    batch_size: The number of inputs passed to each call of
+        `pipeline.transform_batch`.
 
   Returns:
     The aggregated return values of pipeline.transform. Specifically a
@@ -410,21 +1076,22 @@ def load_pipeline(pipeline, input_iterator):
       [(name, []) for name in pipeline.output_type_as_dict])
   total_inputs = 0
   total_outputs = 0
-  stats = []
-  for input_object in input_iterator:
-    total_inputs += 1
-    outputs = _guarantee_dict(pipeline.transform(input_object),
-                              list(aggregated_outputs.keys())[0])
-    for name, output_list in outputs.items():
-      aggregated_outputs[name].extend(output_list)
-      total_outputs += len(output_list)
-    stats = statistics.merge_statistics(stats + pipeline.get_stats())
-    if total_inputs % 500 == 0:
+  stats = statistics.StatisticsAccumulator()
+  for input_objects in _batch_iterator(input_iterator, batch_size):
+    previous_total_inputs = total_inputs
+    total_inputs += len(input_objects)
+    for result in pipeline.transform_batch(input_objects):
+      outputs = _guarantee_dict(result, list(aggregated_outputs.keys())[0])
+      for name, output_list in outputs.items():
+        aggregated_outputs[name].extend(output_list)
+        total_outputs += len(output_list)
+    stats.add(pipeline.get_stats())
+    if _crossed_multiple(previous_total_inputs, total_inputs, 500):
       tf.logging.info('Processed %d inputs so far. Produced %d outputs.',
                       total_inputs, total_outputs)
-      statistics.log_statistics_list(stats, tf.logging.info)
+      statistics.log_statistics_list(stats.snapshot(), tf.logging.info)
   tf.logging.info('\n\nCompleted.\n')
   tf.logging.info('Processed %d inputs total. Produced %d outputs.',
                   total_inputs, total_outputs)
-  statistics.log_statistics_list(stats, tf.logging.info)
+  statistics.log_statistics_list(stats.snapshot(), tf.logging.info)
   return aggregated_outputs
@@ -17,14 +17,20 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import os
+import random
 import tempfile
 
 # internal imports
+import numpy as np
 import tensorflow as tf
 
+from magenta.common import record_index
 from magenta.common import testing_lib
+from magenta.pipelines import dag_pipeline
 from magenta.pipelines import pipeline
+from magenta.pipelines import pipelines_common
 from magenta.pipelines import statistics
 
 
@@ -129,6 +135,166 @@ class PipelineTest(tf.test.TestCase):
         set([('serialized:%s_C' % s).encode('utf-8') for s in strings]),
         set(dataset_2_reader))
 
+    self.assertEqual(6, record_index.read_index(dataset_1_dir).num_records)
+    self.assertEqual(3, record_index.read_index(dataset_2_dir).num_records)
+
+  def testRunPipelineSerialResume(self):
+    strings = ['abcdefg', 'helloworld!', 'qwerty', 'zxcvb', '12345']
+    root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+
+    class FailingPipeline(MockPipeline):
+
+      def transform(self, input_object):
+        if input_object == 'zxcvb':
+          raise ValueError('Simulated failure.')
+        return super(FailingPipeline, self).transform(input_object)
+
+    with self.assertRaises(ValueError):
+      pipeline.run_pipeline_serial(
+          FailingPipeline(), iter(strings), root_dir, checkpoint_interval=2,
+          resume=True)
+    self.assertTrue(
+        tf.gfile.Exists(os.path.join(root_dir, 'manifest.json')))
+
+    pipeline.run_pipeline_serial(
+        MockPipeline(), iter(strings), root_dir, checkpoint_interval=2,
+        resume=True)
+
+    dataset_1_reader = tf.python_io.tf_record_iterator(
+        os.path.join(root_dir, 'dataset_1.tfrecord'))
+    self.assertEqual(
+        sorted([('serialized:%s_A' % s).encode('utf-8') for s in strings] +
+               [('serialized:%s_B' % s).encode('utf-8') for s in strings]),
+        sorted(dataset_1_reader))
+    dataset_2_reader = tf.python_io.tf_record_iterator(
+        os.path.join(root_dir, 'dataset_2.tfrecord'))
+    self.assertEqual(
+        [('serialized:%s_C' % s).encode('utf-8') for s in strings],
+        list(dataset_2_reader))
+
+    index = record_index.read_index(
+        os.path.join(root_dir, 'dataset_2.tfrecord'))
+    self.assertEqual(5, index.num_records)
+    self.assertEqual([('serialized:%s_C' % s).encode('utf-8') for s in strings],
+                     [record_index.read_record(
+                         os.path.join(root_dir, 'dataset_2.tfrecord'), index, i)
+                      for i in range(index.num_records)])
+
+  def testRunPipelineParallel(self):
+    strings = ['abcdefg', 'helloworld!', 'qwerty', 'zxcvb', '12345']
+    root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    pipeline.run_pipeline_parallel(
+        MockPipeline(), iter(strings), root_dir, num_workers=2)
+
+    dataset_1_shards = tf.gfile.Glob(
+        os.path.join(root_dir, 'dataset_1.tfrecord*'))
+    dataset_2_shards = tf.gfile.Glob(
+        os.path.join(root_dir, 'dataset_2.tfrecord*'))
+    self.assertEqual(
+        [os.path.join(root_dir, 'dataset_1.tfrecord-%05d-of-00002' % i)
+         for i in range(2)],
+        sorted(dataset_1_shards))
+    self.assertEqual(2, len(dataset_2_shards))
+
+    dataset_1_records = [
+        record for shard in dataset_1_shards
+        for record in tf.python_io.tf_record_iterator(shard)]
+    self.assertEqual(
+        sorted([('serialized:%s_A' % s).encode('utf-8') for s in strings] +
+               [('serialized:%s_B' % s).encode('utf-8') for s in strings]),
+        sorted(dataset_1_records))
+
+    dataset_2_records = [
+        record for shard in dataset_2_shards
+        for record in tf.python_io.tf_record_iterator(shard)]
+    self.assertEqual(
+        sorted([('serialized:%s_C' % s).encode('utf-8') for s in strings]),
+        sorted(dataset_2_records))
+
+  def testRunPipelineParallelResume(self):
+    strings = ['abcdefg', 'helloworld!', 'qwerty', 'zxcvb', '12345', 'asdf',
+               'uiop', 'ghjkl', 'vbnm']
+    root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+
+    class FailingPipeline(MockPipeline):
+
+      def transform(self, input_object):
+        if input_object == 'ghjkl':
+          raise ValueError('Simulated failure.')
+        return super(FailingPipeline, self).transform(input_object)
+
+    # Worker 0 gets inputs 0, 2, 4, 6, 8 and worker 1 gets inputs 1, 3, 5, 7.
+    # Worker 1 fails on its 4th input, after checkpointing its first 2.
+    with self.assertRaises(RuntimeError):
+      pipeline.run_pipeline_parallel(
+          FailingPipeline(), iter(strings), root_dir, num_workers=2,
+          checkpoint_interval=2, resume=True)
+    for i in range(2):
+      self.assertTrue(tf.gfile.Exists(
+          os.path.join(root_dir, 'manifest.json-%05d-of-00002' % i)))
+
+    class CommittedInputsFailPipeline(MockPipeline):
+
+      def transform(self, input_object):
+        # Worker 1 committed these inputs before failing, so they must not be
+        # dispatched to it again.
+        if input_object in strings[1:4:2]:
+          raise ValueError('Reprocessed committed input.')
+        return super(CommittedInputsFailPipeline, self).transform(
+            input_object)
+
+    pipeline.run_pipeline_parallel(
+        CommittedInputsFailPipeline(), iter(strings), root_dir, num_workers=2,
+        checkpoint_interval=2, resume=True)
+
+    dataset_2_shards = [
+        os.path.join(root_dir, 'dataset_2.tfrecord-%05d-of-00002' % i)
+        for i in range(2)]
+    for i, shard in enumerate(dataset_2_shards):
+      self.assertEqual(
+          [('serialized:%s_C' % s).encode('utf-8') for s in strings[i::2]],
+          list(tf.python_io.tf_record_iterator(shard)))
+      index = record_index.read_index(shard)
+      self.assertEqual(len(strings[i::2]), index.num_records)
+
+    dataset_1_records = [
+        record for i in range(2)
+        for record in tf.python_io.tf_record_iterator(
+            os.path.join(root_dir, 'dataset_1.tfrecord-%05d-of-00002' % i))]
+    self.assertEqual(
+        sorted([('serialized:%s_A' % s).encode('utf-8') for s in strings] +
+               [('serialized:%s_B' % s).encode('utf-8') for s in strings]),
+        sorted(dataset_1_records))
+
+  def testRunPipelineParallelRandomPartition(self):
+    num_workers = 4
+    num_inputs = 400
+    for rand_func in [random.random, np.random.random_sample]:
+      partitioner = pipelines_common.RandomPartition(
+          MockStringProto, ['eval', 'training'], [0.5])
+      partitioner.rand_func = rand_func
+      dag = {partitioner: dag_pipeline.DagInput(MockStringProto),
+             dag_pipeline.DagOutput(): partitioner}
+      root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+      pipeline.run_pipeline_parallel(
+          dag_pipeline.DAGPipeline(dag),
+          (MockStringProto(str(i)) for i in range(num_inputs)), root_dir,
+          num_workers=num_workers)
+
+      eval_inputs = set(
+          int(record.decode('utf-8')[len('serialized:'):])
+          for shard in tf.gfile.Glob(os.path.join(root_dir, 'eval.tfrecord*'))
+          for record in tf.python_io.tf_record_iterator(shard))
+      # Each block of `num_workers` consecutive inputs is split across
+      # workers. If the workers drew the same random numbers, every block
+      # would land in a single partition. Independently, 1 in 8 blocks do.
+      num_single_partition_blocks = sum(
+          1 for block in range(0, num_inputs, num_workers)
+          if len(set(i in eval_inputs
+                     for i in range(block, block + num_workers))) == 1)
+      self.assertLess(
+          num_single_partition_blocks, num_inputs // num_workers // 2)
+
   def testPipelineIterator(self):
     strings = ['abcdefg', 'helloworld!', 'qwerty']
     result = pipeline.load_pipeline(MockPipeline(), iter(strings))
@@ -141,6 +307,23 @@ class PipelineTest(tf.test.TestCase):
         set([MockStringProto(s + '_C') for s in strings]),
         set(result['dataset_2']))
 
+  def testTransformBatch(self):
+
+    class TestPipeline(pipeline.Pipeline):
+
+      def __init__(self):
+        super(TestPipeline, self).__init__(str, str)
+
+      def transform(self, input_object):
+        self._set_stats([statistics.Counter('length', len(input_object))])
+        return [input_object.upper()]
+
+    pipe = TestPipeline()
+    self.assertEqual([['AB'], ['CDE']], pipe.transform_batch(['ab', 'cde']))
+    self.assertEqual(
+        [('TestPipeline_length', 2), ('TestPipeline_length', 3)],
+        [(stat.name, stat.count) for stat in pipe.get_stats()])
+
   def testPipelineKey(self):
     # This happens if PipelineKey() is used on a pipeline with out a dictionary
     # output, or the key is not in the output_type dict.
@@ -262,6 +445,56 @@ class PipelineTest(tf.test.TestCase):
     with self.assertRaises(pipeline.InvalidStatisticsException):
       tp2.transform('hello')
 
+  def testConfigFingerprint(self):
+
+    class TestPipeline(pipeline.Pipeline):
+
+      def __init__(self, config):
+        super(TestPipeline, self).__init__(object, object)
+        self.config = config
+
+      def transform(self, input_object):
+        return [input_object]
+
+    class SlotsConfig(object):
+      __slots__ = ['value']
+
+      def __init__(self, value):
+        self.value = value
+
+    def fingerprint(config):
+      return TestPipeline(config).config_fingerprint()
+
+    def make_adder(amount):
+      return lambda x: x + amount
+
+    self.assertEqual(fingerprint({'a': [1, 2]}), fingerprint({'a': [1, 2]}))
+    self.assertNotEqual(fingerprint({'a': [1, 2]}), fingerprint({'a': [1, 3]}))
+    self.assertNotEqual(fingerprint(functools.partial(max, 1)),
+                        fingerprint(functools.partial(max, 2)))
+    self.assertNotEqual(fingerprint(functools.partial(sorted, reverse=True)),
+                        fingerprint(functools.partial(sorted, reverse=False)))
+    self.assertNotEqual(fingerprint(lambda x: x + 1),
+                        fingerprint(lambda x: x * 2))
+    self.assertEqual(fingerprint(make_adder(1)), fingerprint(make_adder(1)))
+    self.assertNotEqual(fingerprint(make_adder(1)), fingerprint(make_adder(2)))
+    self.assertNotEqual(fingerprint(SlotsConfig(1)),
+                        fingerprint(SlotsConfig(2)))
+
+    # The fingerprint changes with the version of the pipeline class.
+    original_fingerprint = fingerprint(1)
+    TestPipeline.CACHE_VERSION = 1
+    self.assertNotEqual(original_fingerprint, fingerprint(1))
+
+    # Values that cannot be described are not given a fingerprint.
+    with self.assertRaises(pipeline.ConfigFingerprintException):
+      fingerprint(object())
+    nested = []
+    for _ in range(100):
+      nested = [nested]
+    with self.assertRaises(pipeline.ConfigFingerprintException):
+      fingerprint(nested)
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -129,6 +129,54 @@ def merge_statistics(stats_list):
   return list(name_map.values())
 
 
+class StatisticsAccumulator(object):
+  """Merges a running stream of Statistics in place, keyed by name.
+
+  `merge_statistics` rebuilds its merged list from scratch on every call, so
+  calling it once per pipeline input costs time proportional to the number of
+  distinct Statistics each time. `StatisticsAccumulator` keeps one merged
+  `Statistic` per name and folds new Statistics into it as they arrive.
+  """
+
+  def __init__(self, stats_list=None):
+    """Constructs a `StatisticsAccumulator`.
+
+    Args:
+      stats_list: An optional list of `Statistic` objects to start with.
+    """
+    self._stats = {}
+    if stats_list is not None:
+      self.add(stats_list)
+
+  def add(self, stats_list):
+    """Merges the given Statistics into the accumulated Statistics.
+
+    The first `Statistic` seen for each name is copied, so the given objects
+    are never mutated.
+
+    Args:
+      stats_list: An iterable of `Statistic` objects.
+    """
+    for stat in stats_list:
+      if stat.name in self._stats:
+        self._stats[stat.name].merge_from(stat)
+      else:
+        self._stats[stat.name] = stat.copy()
+
+  def snapshot(self):
+    """Returns a list of copies of the accumulated Statistics.
+
+    The returned Statistics are not affected by subsequent calls to `add`.
+
+    Returns:
+      A list of `Statistic` objects. Each name will appear only once.
+    """
+    return [stat.copy() for stat in self._stats.values()]
+
+  def __len__(self):
+    return len(self._stats)
+
+
 def log_statistics_list(stats_list, logger_fn=tf.logging.info):
   """Calls the given logger function on each `Statistic` in the list.
 
@@ -274,4 +322,6 @@ class Histogram(Statistic):
          if self.verbose_pretty_print or self.counters[lower]])
 
   def copy(self):
-    return copy.copy(self)
+    histogram_copy = copy.copy(self)
+    histogram_copy.counters = dict(self.counters)
+    return histogram_copy
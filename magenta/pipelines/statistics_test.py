@@ -91,6 +91,36 @@ class StatisticsTest(tf.test.TestCase):
                      {float('-inf'): 6, 1: 1, 2: 13, 10: 3})
     self.assertEqual(histo_copy.name, 'name_123')
 
+  def testStatisticsAccumulator(self):
+    counter_1 = statistics.Counter('counter_1', 2)
+    histo = statistics.Histogram('histo', [0, 10])
+    histo.increment(5)
+    accumulator = statistics.StatisticsAccumulator([counter_1, histo])
+
+    histo_2 = statistics.Histogram('histo', [0, 10])
+    histo_2.increment(20, 3)
+    accumulator.add([statistics.Counter('counter_1', 3),
+                     statistics.Counter('counter_2', 7),
+                     histo_2])
+    self.assertEqual(3, len(accumulator))
+
+    snapshot = dict((stat.name, stat) for stat in accumulator.snapshot())
+    self.assertEqual(5, snapshot['counter_1'].count)
+    self.assertEqual(7, snapshot['counter_2'].count)
+    self.assertEqual({float('-inf'): 0, 0: 1, 10: 3},
+                     snapshot['histo'].counters)
+
+    # Neither the given stats nor earlier snapshots are mutated by merging.
+    accumulator.add([statistics.Counter('counter_1', 1), histo_2])
+    self.assertEqual(2, counter_1.count)
+    self.assertEqual({float('-inf'): 0, 0: 1, 10: 0}, histo.counters)
+    self.assertEqual(5, snapshot['counter_1'].count)
+    self.assertEqual({float('-inf'): 0, 0: 1, 10: 3},
+                     snapshot['histo'].counters)
+
+    with self.assertRaises(statistics.MergeStatisticsException):
+      accumulator.add([statistics.Histogram('counter_1', [0])])
+
   def testMergeDifferentNames(self):
     counter_1 = statistics.Counter('counter_1')
     counter_2 = statistics.Counter('counter_2')
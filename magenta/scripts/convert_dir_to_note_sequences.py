@@ -21,13 +21,16 @@ Example usage:
   $ ./bazel-bin/magenta/scripts/convert_dir_to_note_sequences \
     --input_dir=/path/to/input/dir \
     --output_file=/path/to/tfrecord/file \
-    --num_threads=4 \
+    --num_workers=4 \
     --log=INFO
 """
 
+import json
+import multiprocessing
 import os
 
 # internal imports
+import six
 import tensorflow as tf
 
 from magenta.music import midi_io
@@ -36,6 +39,8 @@ from magenta.music import note_sequence_io
 
 FLAGS = tf.app.flags.FLAGS
 
+_CONVERTIBLE_EXTENSIONS = ('.mid', '.midi', '.xml', '.mxl')
+
 tf.app.flags.DEFINE_string('input_dir', None,
                            'Directory containing files to convert.')
 tf.app.flags.DEFINE_string('output_file', None,
@@ -43,63 +48,24 @@ tf.app.flags.DEFINE_string('output_file', None,
                            'if it already exists.')
 tf.app.flags.DEFINE_bool('recursive', False,
                          'Whether or not to recurse into subdirectories.')
-tf.app.flags.DEFINE_integer('num_threads', 1,
-                            'Number of worker threads to run in parallel.')
+tf.app.flags.DEFINE_integer('num_workers', 1,
+                            'Number of worker processes used to parse files '
+                            'in parallel.')
+tf.app.flags.DEFINE_integer('num_shards', 1,
+                            'Number of output shards. If greater than 1, '
+                            'output is written to files named '
+                            '<output_file>-NNNNN-of-NNNNN.')
+tf.app.flags.DEFINE_string('index_file', None,
+                           'Optional path to an index of converted files. '
+                           'Files converted by a previous run whose path, '
+                           'modification time and size are unchanged are '
+                           'skipped, and the index is updated with the files '
+                           'processed in this run.')
 tf.app.flags.DEFINE_string('log', 'INFO',
                            'The threshold for what messages will be logged '
                            'DEBUG, INFO, WARN, ERROR, or FATAL.')
 
 
-def convert_files(root_dir, sub_dir, writer, recursive=False):
-  """Converts files.
-
-  Args:
-    root_dir: A string specifying a root directory.
-    sub_dir: A string specifying a path to a directory under `root_dir` in which
-        to convert contents.
-    writer: A TFRecord writer
-    recursive: A boolean specifying whether or not recursively convert files
-        contained in subdirectories of the specified directory.
-
-  Returns:
-    A map from the resulting Futures to the file paths being converted.
-  """
-  dir_to_convert = os.path.join(root_dir, sub_dir)
-  tf.logging.info("Converting files in '%s'.", dir_to_convert)
-  files_in_dir = tf.gfile.ListDirectory(os.path.join(dir_to_convert))
-  recurse_sub_dirs = []
-  written_count = 0
-  for file_in_dir in files_in_dir:
-    tf.logging.log_every_n(tf.logging.INFO, '%d files converted.',
-                           1000, written_count)
-    full_file_path = os.path.join(dir_to_convert, file_in_dir)
-    if (full_file_path.lower().endswith('.mid') or
-        full_file_path.lower().endswith('.midi')):
-      try:
-        sequence = convert_midi(root_dir, sub_dir, full_file_path)
-      except Exception as exc:  # pylint: disable=broad-except
-        tf.logging.fatal('%r generated an exception: %s', full_file_path, exc)
-      if sequence:
-        writer.write(sequence)
-    elif (full_file_path.lower().endswith('.xml') or
-          full_file_path.lower().endswith('.mxl')):
-      try:
-        sequence = convert_musicxml(root_dir, sub_dir, full_file_path)
-      except Exception as exc:  # pylint: disable=broad-except
-        tf.logging.fatal('%r generated an exception: %s', full_file_path, exc)
-      if sequence:
-        writer.write(sequence)
-    else:
-      if recursive and tf.gfile.IsDirectory(full_file_path):
-        recurse_sub_dirs.append(os.path.join(sub_dir, file_in_dir))
-      else:
-        tf.logging.warning(
-            'Unable to find a converter for file %s', full_file_path)
-
-  for recurse_sub_dir in recurse_sub_dirs:
-    convert_files(root_dir, recurse_sub_dir, writer, recursive)
-
-
 def convert_midi(root_dir, sub_dir, full_file_path):
   """Converts a midi file to a sequence proto.
 
@@ -155,7 +121,73 @@ def convert_musicxml(root_dir, sub_dir, full_file_path):
   return sequence
 
 
-def convert_directory(root_dir, output_file, recursive=False):
+def _find_files(root_dir, sub_dir, recursive):
+  """Finds files that can be converted.
+
+  Args:
+    root_dir: A string specifying a root directory.
+    sub_dir: A string specifying a path to a directory under `root_dir` in which
+        to look for files.
+    recursive: A boolean specifying whether or not to look in subdirectories.
+
+  Returns:
+    A list of (sub_dir, full_file_path) tuples.
+  """
+  dir_to_convert = os.path.join(root_dir, sub_dir)
+  files = []
+  recurse_sub_dirs = []
+  for file_in_dir in tf.gfile.ListDirectory(dir_to_convert):
+    full_file_path = os.path.join(dir_to_convert, file_in_dir)
+    if full_file_path.lower().endswith(_CONVERTIBLE_EXTENSIONS):
+      files.append((sub_dir, full_file_path))
+    elif recursive and tf.gfile.IsDirectory(full_file_path):
+      recurse_sub_dirs.append(os.path.join(sub_dir, file_in_dir))
+    else:
+      tf.logging.warning(
+          'Unable to find a converter for file %s', full_file_path)
+  for recurse_sub_dir in recurse_sub_dirs:
+    files.extend(_find_files(root_dir, recurse_sub_dir, recursive))
+  return files
+
+
+def _convert_file(task):
+  """Converts a single file. Runs in a worker process.
+
+  Args:
+    task: A (task_index, root_dir, sub_dir, full_file_path) tuple.
+
+  Returns:
+    A (task_index, serialized_sequence) tuple, where `serialized_sequence` is
+    the serialized NoteSequence, or None if the file could not be converted.
+  """
+  task_index, root_dir, sub_dir, full_file_path = task
+  try:
+    if full_file_path.lower().endswith(('.mid', '.midi')):
+      sequence = convert_midi(root_dir, sub_dir, full_file_path)
+    else:
+      sequence = convert_musicxml(root_dir, sub_dir, full_file_path)
+  except Exception as exc:  # pylint: disable=broad-except
+    tf.logging.error('%r generated an exception: %s', full_file_path, exc)
+    sequence = None
+  return task_index, sequence.SerializeToString() if sequence else None
+
+
+def _read_index(index_file):
+  """Returns the dict of indexed files in `index_file`, or {} if missing."""
+  if not index_file or not tf.gfile.Exists(index_file):
+    return {}
+  with tf.gfile.GFile(index_file, 'r') as f:
+    return json.loads(f.read())['files']
+
+
+def _write_index(index_file, indexed_files):
+  """Writes the dict of indexed files to `index_file`."""
+  with tf.gfile.GFile(index_file, 'w') as f:
+    f.write(json.dumps({'files': indexed_files}, indent=1, sort_keys=True))
+
+
+def convert_directory(root_dir, output_file, recursive=False, num_workers=1,
+                      num_shards=1, index_file=None):
   """Converts files to NoteSequences and writes to `output_file`.
 
   Input files found in `root_dir` are converted to NoteSequence protos with the
@@ -163,14 +195,88 @@ def convert_directory(root_dir, output_file, recursive=False):
   file from `root_dir` as the filename. If `recursive` is true, recursively
   converts any subdirectories of the specified directory.
 
+  Files are parsed by a pool of `num_workers` processes, and written in the
+  order they were found. If `num_shards` is greater than 1, the i-th file
+  found is written to shard i % `num_shards`, named
+  "<output_file>-0000i-of-0000N".
+
+  If `index_file` is given, files that a previous run converted and recorded
+  in it with the same relative path, modification time and size are skipped,
+  so only new, changed or previously failed files are written to
+  `output_file`. The index is then updated with
+  the files processed by this run.
+
   Args:
     root_dir: A string specifying a root directory.
     output_file: Path to TFRecord file to write results to.
     recursive: A boolean specifying whether or not recursively convert files
         contained in subdirectories of the specified directory.
+    num_workers: Number of worker processes used to parse files.
+    num_shards: Number of output shards.
+    index_file: Optional path to the index of previously converted files.
+
+  Returns:
+    A list with a (converted_count, failed_count) tuple for each shard.
   """
-  with note_sequence_io.NoteSequenceRecordWriter(output_file) as writer:
-    convert_files(root_dir, '', writer, recursive)
+  indexed_files = _read_index(index_file)
+  tasks = []
+  file_stats = []
+  skipped_count = 0
+  for sub_dir, full_file_path in _find_files(root_dir, '', recursive):
+    relative_path = os.path.relpath(full_file_path, root_dir)
+    stat = tf.gfile.Stat(full_file_path)
+    file_stat = {'mtime_nsec': stat.mtime_nsec, 'size': stat.length}
+    indexed = indexed_files.get(relative_path)
+    if (indexed is not None and indexed.get('converted') and
+        (indexed['mtime_nsec'], indexed['size']) == (
+            file_stat['mtime_nsec'], file_stat['size'])):
+      skipped_count += 1
+      continue
+    tasks.append((len(tasks), root_dir, sub_dir, full_file_path))
+    file_stats.append((relative_path, file_stat))
+  tf.logging.info('Converting %d files, skipping %d previously indexed files.',
+                  len(tasks), skipped_count)
+
+  if num_shards > 1:
+    output_paths = ['%s-%05d-of-%05d' % (output_file, i, num_shards)
+                    for i in range(num_shards)]
+  else:
+    output_paths = [output_file]
+  writers = [note_sequence_io.NoteSequenceRecordWriter(path)
+             for path in output_paths]
+  shard_counts = [[0, 0] for _ in output_paths]
+
+  pool = None
+  if num_workers > 1:
+    pool = multiprocessing.Pool(num_workers)
+    results = pool.imap(_convert_file, tasks, chunksize=16)
+  else:
+    results = six.moves.map(_convert_file, tasks)
+  try:
+    for count, (task_index, serialized_sequence) in enumerate(results):
+      tf.logging.log_every_n(tf.logging.INFO, '%d files converted.',
+                             1000, count)
+      shard = task_index % num_shards
+      relative_path, file_stat = file_stats[task_index]
+      file_stat['converted'] = serialized_sequence is not None
+      indexed_files[relative_path] = file_stat
+      if serialized_sequence is None:
+        shard_counts[shard][1] += 1
+      else:
+        writers[shard].write_serialized(serialized_sequence)
+        shard_counts[shard][0] += 1
+  finally:
+    if pool is not None:
+      pool.terminate()
+    for writer in writers:
+      writer.close()
+
+  for path, (converted, failed) in zip(output_paths, shard_counts):
+    tf.logging.info('%s: %d files converted, %d failed.',
+                    path, converted, failed)
+  if index_file:
+    _write_index(index_file, indexed_files)
+  return [tuple(counts) for counts in shard_counts]
 
 
 def main(unused_argv):
@@ -190,7 +296,11 @@ def main(unused_argv):
   if output_dir:
     tf.gfile.MakeDirs(output_dir)
 
-  convert_directory(input_dir, output_file, FLAGS.recursive)
+  index_file = (os.path.expanduser(FLAGS.index_file) if FLAGS.index_file
+                else None)
+  convert_directory(input_dir, output_file, FLAGS.recursive,
+                    num_workers=FLAGS.num_workers, num_shards=FLAGS.num_shards,
+                    index_file=index_file)
 
 
 def console_entry_point():
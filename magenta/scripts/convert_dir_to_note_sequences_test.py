@@ -19,6 +19,7 @@ import tempfile
 # internal imports
 import tensorflow as tf
 
+from magenta.common import record_index
 from magenta.music import note_sequence_io
 from magenta.scripts import convert_dir_to_note_sequences
 
@@ -102,6 +103,85 @@ class ConvertMidiDirToSequencesTest(tf.test.TestCase):
     self.runTest('sub_1/sub', recursive=True)
     self.runTest('sub_2', recursive=True)
 
+  def testConvertMidiDirToSequences_Sharded(self):
+    output_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    output_file = os.path.join(output_dir, 'notesequences.tfrecord')
+    shard_counts = convert_dir_to_note_sequences.convert_directory(
+        self.root_dir, output_file, recursive=True, num_workers=2,
+        num_shards=2)
+    self.assertEqual([(3, 0), (3, 0)], shard_counts)
+
+    def read_shard_filenames(output_file):
+      return [[sequence.filename for sequence in
+               note_sequence_io.note_sequence_record_iterator(
+                   '%s-%05d-of-00002' % (output_file, shard))]
+              for shard in range(2)]
+
+    shard_filenames = read_shard_filenames(output_file)
+    self.assertEqual(
+        sorted(['midi_1.mid', 'midi_2.mid', 'sub_1/midi_3.mid',
+                'sub_2/midi_3.mid', 'sub_2/midi_4.mid',
+                'sub_1/sub/midi_5.mid']),
+        sorted(shard_filenames[0] + shard_filenames[1]))
+
+    # Shards are written in the same order regardless of the number of workers.
+    serial_output_file = os.path.join(output_dir, 'serial.tfrecord')
+    convert_dir_to_note_sequences.convert_directory(
+        self.root_dir, serial_output_file, recursive=True, num_workers=1,
+        num_shards=2)
+    self.assertEqual(
+        read_shard_filenames(serial_output_file), shard_filenames)
+
+  def testConvertMidiDirToSequences_ShardIndexes(self):
+    output_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    output_file = os.path.join(output_dir, 'notesequences.tfrecord')
+    convert_dir_to_note_sequences.convert_directory(
+        self.root_dir, output_file, recursive=True, num_shards=2)
+
+    for shard in range(2):
+      shard_file = '%s-%05d-of-00002' % (output_file, shard)
+      index = record_index.read_index(shard_file)
+      self.assertIsNotNone(index)
+      self.assertEqual(3, index.num_records)
+
+  def testConvertMidiDirToSequences_Incremental(self):
+    output_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    index_file = os.path.join(output_dir, 'index.json')
+    root_dir = os.path.join(self.root_dir, 'sub_2')
+
+    convert_dir_to_note_sequences.convert_directory(
+        root_dir, os.path.join(output_dir, 'first.tfrecord'),
+        index_file=index_file)
+
+    tf.gfile.Copy(os.path.join(root_dir, 'midi_3.mid'),
+                  os.path.join(root_dir, 'midi_6.mid'))
+    shard_counts = convert_dir_to_note_sequences.convert_directory(
+        root_dir, os.path.join(output_dir, 'second.tfrecord'),
+        index_file=index_file)
+    self.assertEqual([(1, 0)], shard_counts)
+    self.assertEqual(
+        ['midi_6.mid'],
+        [sequence.filename for sequence in
+         note_sequence_io.note_sequence_record_iterator(
+             os.path.join(output_dir, 'second.tfrecord'))])
+
+  def testConvertMidiDirToSequences_IncrementalRetriesFailedFiles(self):
+    output_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    index_file = os.path.join(output_dir, 'index.json')
+    root_dir = os.path.join(self.root_dir, 'sub_2')
+    with tf.gfile.Open(os.path.join(root_dir, 'bad.mid'), 'wb') as f:
+      f.write(b'not a midi file')
+
+    shard_counts = convert_dir_to_note_sequences.convert_directory(
+        root_dir, os.path.join(output_dir, 'first.tfrecord'),
+        index_file=index_file)
+    self.assertEqual([(2, 1)], shard_counts)
+
+    shard_counts = convert_dir_to_note_sequences.convert_directory(
+        root_dir, os.path.join(output_dir, 'second.tfrecord'),
+        index_file=index_file)
+    self.assertEqual([(0, 1)], shard_counts)
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -55,6 +55,7 @@ else:
   REQUIRED_PACKAGES.append('tensorflow >= 1.1.0')
 
 CONSOLE_SCRIPTS = [
+    'magenta.interfaces.generator_server.magenta_generator_server',
     'magenta.interfaces.midi.magenta_midi',
     'magenta.interfaces.midi.midi_clock',
     'magenta.models.drums_rnn.drums_rnn_create_dataset',